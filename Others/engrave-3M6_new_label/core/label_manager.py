@@ -1,3 +1,4 @@
+from core.spatial_index import LabelGrid
 from core.static import solve_rect_position
 from core.template import LabelCode, Label
 
@@ -9,6 +10,7 @@ class LabelManager:
         self._lbl_current = None
         self._lbl_code = LabelCode.CSA
         self._lbl_copied = None
+        self._grid = LabelGrid(labels=labels)   # Kept in sync with self._labels
 
     @property
     def active_editor(self):
@@ -26,6 +28,7 @@ class LabelManager:
         self._lbl_current.y = _y
         self.active_editor.attach(self._lbl_current)
         self._labels.add(self._lbl_current)
+        self._grid.insert(self._lbl_current)
 
     def copy(self):
         if self._lbl_current:
@@ -40,16 +43,20 @@ class LabelManager:
         self._lbl_copied = self._lbl_current.copy()
         self.active_editor.detach()
         self._labels.add(self._lbl_current)
+        self._grid.insert(self._lbl_current)
         self.select_label(self._lbl_current)
 
     def selected_delete(self):
         if not self._lbl_current:
             return
         self._labels.remove(self._lbl_current)
+        self._grid.remove(self._lbl_current)
         self.active_editor.detach()
         self._lbl_current = None
 
     def select_label(self, lbl: Label):
+        if self._lbl_current:
+            self._grid.update(self._lbl_current)   # The editor may have resized it
         self._lbl_current = lbl
         self.active_editor.detach()
         if lbl is None:
@@ -76,15 +83,17 @@ class LabelManager:
 
     # MOVEMENT
     def label_at_pos(self, x, y):
-        for l in self._labels:
-            if l.within_bbox(x, y):
-                return l
+        for l in self._grid.at(x, y):
+            return l
 
     def current_move(self, dx, dy):
         if self._lbl_current:
             bw = self._labels.width()
             bh = self._labels.height()
-            solve_rect_position(self._lbl_current, self._labels, bw, bh, dx, dy, margin=2.0)
+            solve_rect_position(self._lbl_current, self._grid, bw, bh, dx, dy, margin=2.0)
+
+    def solve_current(self):
+        self.current_move(0, 0)
 
     def get_labels(self):
         return self._labels
\ No newline at end of file
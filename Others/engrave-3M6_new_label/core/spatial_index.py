@@ -0,0 +1,102 @@
+from math import floor
+
+
+class LabelGrid:
+    """Uniform grid over label rectangles (mm): a query only looks at the labels
+    registered in the cells it covers instead of every label on the board."""
+
+    def __init__(self, cell_size=25.0, labels=()):
+        self._cell = float(cell_size)
+        self._cells = {}    # (col, row) -> set of label ids
+        self._entries = {}  # label id -> (order, label, cells)
+        self._order = 0
+        for lbl in labels:
+            self.insert(lbl)
+
+    @property
+    def cell_size(self):
+        return self._cell
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, lbl):
+        return id(lbl) in self._entries
+
+    def _cells_for(self, x, y, w, h):
+        c = self._cell
+        c0, c1 = floor(x / c), floor((x + w) / c)
+        r0, r1 = floor(y / c), floor((y + h) / c)
+        return [(col, row) for col in range(c0, c1 + 1) for row in range(r0, r1 + 1)]
+
+    def insert(self, lbl):
+        key = id(lbl)
+        if key in self._entries:
+            self.update(lbl)
+            return
+        cells = self._cells_for(lbl.x, lbl.y, lbl.width, lbl.height)
+        for cell in cells:
+            self._cells.setdefault(cell, set()).add(key)
+        self._entries[key] = (self._order, lbl, cells)
+        self._order += 1
+
+    def remove(self, lbl):
+        entry = self._entries.pop(id(lbl), None)
+        if entry is None:
+            return
+        for cell in entry[2]:
+            bucket = self._cells.get(cell)
+            if bucket is not None:
+                bucket.discard(id(lbl))
+                if not bucket:
+                    del self._cells[cell]
+
+    def update(self, lbl):
+        # Called after a label moved or was resized; only the cells that changed are touched
+        key = id(lbl)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.insert(lbl)
+            return
+        order, _, old_cells = entry
+        new_cells = self._cells_for(lbl.x, lbl.y, lbl.width, lbl.height)
+        if new_cells == old_cells:
+            return
+        old_set, new_set = set(old_cells), set(new_cells)
+        for cell in old_set - new_set:
+            bucket = self._cells[cell]
+            bucket.discard(key)
+            if not bucket:
+                del self._cells[cell]
+        for cell in new_set - old_set:
+            self._cells.setdefault(cell, set()).add(key)
+        self._entries[key] = (order, lbl, new_cells)
+
+    def clear(self):
+        self._cells.clear()
+        self._entries.clear()
+
+    def query(self, x, y, w, h, margin=0.0, exclude=None):
+        """Labels overlapping the rectangle (x, y, w, h) with the same test as Label.overlaps(l, margin),
+        in insertion order."""
+        keys = set()
+        for cell in self._cells_for(x - margin, y - margin, w + 2 * margin, h + 2 * margin):
+            bucket = self._cells.get(cell)
+            if bucket:
+                keys.update(bucket)
+        found = []
+        for key in keys:
+            order, l, _ = self._entries[key]
+            if l is exclude:
+                continue
+            if x - margin < l.x + l.width and x + w + margin > l.x and \
+                    y - margin < l.y + l.height and y + h + margin > l.y:
+                found.append((order, l))
+        found.sort(key=lambda e: e[0])
+        return [l for _, l in found]
+
+    def at(self, x, y):
+        """Labels whose bounding box contains the point (x, y), in insertion order."""
+        bucket = self._cells.get((floor(x / self._cell), floor(y / self._cell)), ())
+        found = sorted(self._entries[key][:2] for key in bucket)
+        return [l for _, l in found if l.within_bbox(x, y)]
@@ -2,9 +2,9 @@ import os
 import platform
 import sys
 import winreg
-import numpy as np
 from PyQt5.QtWidgets import QFileDialog
 
+from core.spatial_index import LabelGrid
 from core.template import Label
 
 
@@ -31,6 +31,7 @@ def get_res_item(filename: str):
     return os.path.join(_path_res, filename)
 
 def solve_rect_position(lbl: Label, others, w_border, h_border, dx=0, dy=0, margin=2.0):
+    # others: LabelGrid kept up to date by the caller (LabelManager), or any iterable of labels
     if lbl is None:
         return
     m = margin
@@ -41,79 +42,83 @@ def solve_rect_position(lbl: Label, others, w_border, h_border, dx=0, dy=0, marg
     min_bh, max_bh = 0+margin, bh - lbl.height - margin*2
     lbl.x = max(min_bw, min(lbl.x + dx, max_bw))
     lbl.y = max(min_bh, min(lbl.y + dy, max_bh))
-    others = [l for l in others if l is not lbl]
-    if not others:
-        return
-    if not any([lbl.overlaps(l, 2.0) for l in others]):
-        return
-    others_x = np.array([l.x for l in others])
-    others_y = np.array([l.y for l in others])
-    others_w = np.array([l.width for l in others])
-    others_h = np.array([l.height for l in others])
+    if isinstance(others, LabelGrid):
+        grid = others
+    else:
+        grid = LabelGrid(labels=[l for l in others if l is not lbl])
     lbl_w = lbl.width
     lbl_h = lbl.height
-    max_iter = 10
-    for _ in range(max_iter):
-        lbl_x = lbl.x
-        lbl_y = lbl.y
-        over_left = lbl_x + lbl_w + m > others_x
-        over_right = lbl_x < others_x + others_w + m
-        over_top = lbl_y + lbl_h + m > others_y
-        over_bot = lbl_y < others_y + others_h + m
-        overlaps = over_left & over_right & over_top & over_bot
-        if not np.any(overlaps):
+
+    def neighbours(x, y):
+        return grid.query(x, y, lbl_w, lbl_h, m, exclude=lbl)
+
+    try:
+        overlapping = neighbours(lbl.x, lbl.y)
+        if not overlapping:
             return
-        overlap_indices = np.where(overlaps)[0]
-        ol_x = others_x[overlap_indices]
-        ol_y = others_y[overlap_indices]
-        ol_w = others_w[overlap_indices]
-        ol_h = others_h[overlap_indices]
-        ol_l = (ol_x + ol_w + m) - lbl_x
-        ol_r = (lbl_x + lbl_w + m) - ol_x
-        ol_t = (ol_y + ol_h + m) - lbl_y
-        ol_b = (lbl_y + lbl_h + m) - ol_y
-        adj_x = np.where(lbl_x < ol_x, -ol_r, ol_l)
-        adj_y = np.where(lbl_y < ol_y, -ol_b, ol_t)
-        min_adj_x = adj_x[np.argmin(np.abs(adj_x))]
-        min_adj_y = adj_y[np.argmin(np.abs(adj_y))]
-        if abs(min_adj_x) < abs(min_adj_y):
-            lbl.x += min_adj_x
-            lbl.x = max(min_bw, min(lbl.x, max_bw))
-        else:
-            lbl.y += min_adj_y
-            lbl.y = max(min_bh, min(lbl.y, max_bh))
-    else:
-        # Could not resolve overlaps within max iterations. Compute distances to other labels
-        center_lbl = np.array([lbl.x + lbl_w / 2, lbl.y + lbl_h / 2])
-        centers_others = np.column_stack((others_x + others_w / 2, others_y + others_h / 2))
-        distances = np.linalg.norm(centers_others - center_lbl, axis=1)
-        sorted_indices = np.argsort(distances)
-        for idx in sorted_indices:
-            ol = others[idx]
-            ow_n = ol.x - lbl_w - m
-            ow_p = ol.x + ol.width + m
-            oh_n = ol.y - lbl_h - m
-            oh_p = ol.y + ol.height + m
-            positions = [
-                (ol.x, oh_n), (ol.x, oh_p),  # b
-                (ow_n, ol.y), (ow_p, ol.y),  # r
-                (ow_n, oh_n), (ow_p, oh_n),  # tr
-                (ow_n, oh_p), (ow_p, oh_p),  # br
-            ]
-            for x_new, y_new in positions:
-                if (0 <= x_new <= bw - lbl_w) and (0 <= y_new <= bh - lbl_h):
-                    lbl.x, lbl.y = x_new, y_new
-                    lbl_x = lbl.x
-                    lbl_y = lbl.y
-                    over_left = lbl_x + lbl_w + m > others_x
-                    over_right = lbl_x < others_x + others_w + m
-                    over_top = lbl_y + lbl_h + m > others_y
-                    over_bot = lbl_y < others_y + others_h + m
-                    overlaps = over_left & over_right & over_top & over_bot
-                    if not np.any(overlaps):
+        max_iter = 10
+        for _ in range(max_iter):
+            lbl_x = lbl.x
+            lbl_y = lbl.y
+            if _ > 0:
+                overlapping = neighbours(lbl_x, lbl_y)
+                if not overlapping:
+                    return
+            min_adj_x = min_adj_y = None
+            for ol in overlapping:
+                if lbl_x < ol.x:
+                    adj_x = -((lbl_x + lbl_w + m) - ol.x)
+                else:
+                    adj_x = (ol.x + ol.width + m) - lbl_x
+                if lbl_y < ol.y:
+                    adj_y = -((lbl_y + lbl_h + m) - ol.y)
+                else:
+                    adj_y = (ol.y + ol.height + m) - lbl_y
+                if min_adj_x is None or abs(adj_x) < abs(min_adj_x):
+                    min_adj_x = adj_x
+                if min_adj_y is None or abs(adj_y) < abs(min_adj_y):
+                    min_adj_y = adj_y
+            if abs(min_adj_x) < abs(min_adj_y):
+                lbl.x += min_adj_x
+                lbl.x = max(min_bw, min(lbl.x, max_bw))
+            else:
+                lbl.y += min_adj_y
+                lbl.y = max(min_bh, min(lbl.y, max_bh))
+        if not neighbours(lbl.x, lbl.y):
+            return
+        # Could not resolve overlaps within max iterations. Snap next to the closest labels,
+        # widening the search window around the label until it covers the whole board
+        cx, cy = lbl.x + lbl_w / 2, lbl.y + lbl_h / 2
+        tried = set()
+        reach = 2 * max(lbl_w, lbl_h, grid.cell_size)
+        while True:
+            window = grid.query(cx - reach, cy - reach, 2 * reach, 2 * reach, exclude=lbl)
+            candidates = [ol for ol in window if id(ol) not in tried]
+            candidates.sort(key=lambda ol: (ol.x + ol.width / 2 - cx) ** 2 + (ol.y + ol.height / 2 - cy) ** 2)
+            for ol in candidates:
+                tried.add(id(ol))
+                ow_n = ol.x - lbl_w - m
+                ow_p = ol.x + ol.width + m
+                oh_n = ol.y - lbl_h - m
+                oh_p = ol.y + ol.height + m
+                positions = [
+                    (ol.x, oh_n), (ol.x, oh_p),  # b
+                    (ow_n, ol.y), (ow_p, ol.y),  # r
+                    (ow_n, oh_n), (ow_p, oh_n),  # tr
+                    (ow_n, oh_p), (ow_p, oh_p),  # br
+                ]
+                for x_new, y_new in positions:
+                    if (0 <= x_new <= bw - lbl_w) and (0 <= y_new <= bh - lbl_h) and not neighbours(x_new, y_new):
+                        lbl.x, lbl.y = x_new, y_new
                         return
+            if reach >= max(bw, bh):
+                break
+            reach *= 2
         lbl.x, lbl.y = ox, oy
         print("Warning: Could not resolve overlaps.")
+    finally:
+        if lbl in grid:
+            grid.update(lbl)
 
 def open_dialog_filepath(filter: str = "Images (*.png *.jpg *.jpeg)"):
     dialog = QFileDialog()
@@ -17,7 +17,7 @@ from core.label.label_jacmar import LabelJacmar
 from core.label_manager import LabelManager
 from core.labels import Labels
 from core.label_display import LabelDisplay
-from core.static import find_chrome_path, get_res_item, solve_rect_position
+from core.static import find_chrome_path, get_res_item
 from core.template import LabelCode
 
 
@@ -85,7 +85,7 @@ class LabelCreator(QMainWindow):
         self.update_display()
 
     def update_display(self):
-        solve_rect_position(self.label_manager.current_label(), self._labels, self._labels.width(), self._labels.height(), margin=2.0)
+        self.label_manager.solve_current()
         self._display.update_pixmap()
 
     def on_export_pdf(self):
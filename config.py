@@ -2,5 +2,8 @@
 CONFIG = {
     'DEBUG': True,
     'APP_NAME': 'GDJ',
-    'DATA_PATH': 'data'  # Répertoire pour stocker les fichiers JSON
+    'DATA_PATH': 'data',  # Répertoire pour stocker les fichiers JSON
+    'RDJ_LAZY_OPEN': True,  # Ouvrir les .rdj sans extraire les factures (extraites à la demande)
+    'SVG_PATH_TOLERANCE_MM': 0.0,  # Simplification optionnelle des chemins avant envoi au laser, en mm (0 = désactivée, 0.02 recommandé)
+    'UPDATE_CHECK_INTERVAL_HOURS': 6  # Vérification des mises à jour au démarrage au plus une fois par intervalle (0 = à chaque démarrage)
 }
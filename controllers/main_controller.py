@@ -1,5 +1,5 @@
 from PyQt5.QtWidgets import QDialog, QApplication, QMainWindow, QMessageBox, QFileDialog, QWidget
-from PyQt5.QtCore import Qt, QTimer, QObject, pyqtSlot, QCoreApplication
+from PyQt5.QtCore import Qt, QTimer, QObject, pyqtSlot, QCoreApplication, QThread
 # --- AJOUT DE L'IMPORT QIcon ---
 from PyQt5.QtGui import QIcon
 # --- AJOUT DE L'IMPORT Optional ---
@@ -12,9 +12,9 @@ import sys
 import configparser
 from packaging import version
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QMessageBox, QDialog,
-                             QVBoxLayout, QTextBrowser, QPushButton, QSizePolicy)
+                             QVBoxLayout, QTextBrowser, QPushButton, QSizePolicy, QProgressDialog)
 from config import CONFIG
-from updater.update_checker import check_for_updates
+from updater.update_checker import UPDATE_CHECK_INTERVAL_HOURS, UpdateCheckWorker
 from utils.stylesheet_loader import load_stylesheet
 import logging
 import functools # <<< AJOUT IMPORT
@@ -47,6 +47,8 @@ from pathlib import Path
 # os est déjà importé plus haut
 # RapportDepense sera importé dynamiquement ou via une vérification de type
 from models.documents.rapport_depense import RapportDepense # Pour vérification de type
+from utils.rdj_archive import RdjSaveWorker, RDJ_DATA_MEMBER
+from utils.batch_export import BatchExportWorker, format_batch_summary
 # ---------------------------------
 from datetime import date # Ajout import date pour _load_and_display_rdj_document
 # ---------------------------------
@@ -99,6 +101,7 @@ class MainController(QObject):
         # ------------------------------------------------------
         self.navigate_to_notes_after_welcome = False 
         self._startup_update_check_done = False
+        self._active_update_check = None # (QThread, UpdateCheckWorker) pendant la vérification au démarrage
         # --- MODIFICATION: Utiliser une liste pour les fenêtres de documents --- 
         # self.new_doc_window = None # ANCIEN
         self.open_document_windows = [] # NOUVEAU: Liste pour stocker les fenêtres ouvertes
@@ -106,6 +109,8 @@ class MainController(QObject):
         self.settings_window = None # <<< AJOUT: Référence à SettingsWindow
         self.type_selection_window_instance = None # Pour garder une référence si besoin
         self.doc_creation_source_window = None # << AJOUT pour la fenêtre source
+        self._active_rdj_saves = {} # chemin_destination -> (QThread, RdjSaveWorker) en cours
+        self._active_batch_export = None # (QThread, BatchExportWorker) de l'export par lot en cours
         # --- AJOUT FLAG ---
         self._expecting_welcome_after_close = False
         # ------------------
@@ -146,10 +151,25 @@ class MainController(QObject):
         if do_navigate_on_startup:
             logger.debug("DEBUG __init__: Writing current version to last_run_version.txt because navigation flag is set.")
             self._write_last_run_version(last_run_version_file, self.current_version_str)
+
+        # Reprendre les travaux laissés dans la file d'impression à la dernière fermeture
+        QTimer.singleShot(0, self._resume_print_queue)
             
         # --- Exiting MainController __init__ --- 
         logger.info("--- Exiting MainController __init__ --- ")
 
+    def _resume_print_queue(self):
+        """Redémarre les travailleurs de la file d'impression s'il reste des travaux en attente."""
+        try:
+            from utils.print_queue import PrintQueue
+            print_queue = PrintQueue.get_instance()
+            pending_jobs = print_queue.pending_jobs()
+            if pending_jobs:
+                logger.info(f"MainController: reprise de {len(pending_jobs)} travail(aux) de la file d'impression.")
+                print_queue.start()
+        except Exception as e:
+            logger.error(f"MainController: impossible de reprendre la file d'impression: {e}", exc_info=True)
+
     def show_welcome_page(self):
         """Crée et affiche la WelcomeWindow, et lance la vérif MàJ."""
         logger.critical(">>> ENTERING show_welcome_page <<< START") # Log critique entrée
@@ -564,25 +584,48 @@ class MainController(QObject):
 
     # --- NOUVELLE MÉTHODE POUR LA VÉRIFICATION AU DÉMARRAGE ---
     def _perform_startup_update_check(self):
-        """Vérifie les MàJ au démarrage et planifie l'action si confirmée."""
-        logger.info("Performing startup update check...")
-        try:
-            status, update_info = check_for_updates()
-            logger.info(f"Startup update check status: {status}")
-            if status == "USER_CONFIRMED_UPDATE":
-                logger.info("User confirmed update from startup prompt. Scheduling navigation within WelcomeWindow...")
-                self.pending_update_info = update_info
-                # --- APPELER LA NOUVELLE MÉTHODE VIA QTIMER --- 
-                QTimer.singleShot(0, self._navigate_welcome_to_settings_and_update)
-            elif status == "UPDATE_DECLINED":
-                 logger.info("Startup update declined by user.")
-            elif update_info and not update_info.get('available') and status != "À jour":
-                 logger.info(f"Startup update check notice: {status}") # Affiche les erreurs etc.
+        """
+        Lance la vérification des MàJ au démarrage dans un thread: l'affichage ne dépend pas
+        du réseau. Le résultat est livré à WelcomeWindow par le signal UpdateCheckWorker.finished.
+        """
+        if self._active_update_check is not None or self.welcome_window is None:
+            return
+        logger.info("Performing startup update check (background)...")
+        max_age_seconds = UPDATE_CHECK_INTERVAL_HOURS * 3600 or None
+        check_thread = QThread(self)
+        check_worker = UpdateCheckWorker(max_age_seconds=max_age_seconds)
+        check_worker.moveToThread(check_thread)
+
+        check_worker.finished.connect(self.welcome_window.on_update_check_finished)
+        check_worker.finished.connect(self._on_startup_update_check_finished)
+        check_thread.started.connect(check_worker.run)
+        check_worker.finished.connect(check_thread.quit)
+        check_thread.finished.connect(check_thread.deleteLater)
+        check_worker.finished.connect(check_worker.deleteLater)
+
+        self._active_update_check = (check_thread, check_worker)
+        app = QApplication.instance()
+        if app:
+            app.aboutToQuit.connect(self._stop_startup_update_check)
+        check_thread.start()
+
+    def _on_startup_update_check_finished(self, status: str, update_info: dict):
+        self._active_update_check = None
+        logger.info(f"Startup update check status: {status}")
+
+    def _stop_startup_update_check(self, timeout_ms: int = 2000):
+        """À la fermeture: attend (brièvement) la fin d'une requête de vérification en cours."""
+        if self._active_update_check is None:
+            return
+        check_thread, _worker = self._active_update_check
+        if not check_thread.wait(timeout_ms):
+            logger.warning("La vérification des mises à jour ne s'est pas terminée avant la fermeture.")
 
-        except Exception as e:
-            logger.error(f"Error during startup update check: {e}")
-            if hasattr(self, 'pending_update_info'):
-                 del self.pending_update_info
+    def start_update_from_welcome(self, update_info: dict):
+        """Appelé par WelcomeWindow quand l'utilisateur accepte la mise à jour proposée au démarrage."""
+        logger.info("User confirmed update from startup prompt. Scheduling navigation within WelcomeWindow...")
+        self.pending_update_info = update_info
+        QTimer.singleShot(0, self._navigate_welcome_to_settings_and_update)
 
     # --- NOUVELLE MÉTHODE POUR GÉRER DANS WELCOMEWINDOW --- 
     def _navigate_welcome_to_settings_and_update(self):
@@ -771,6 +814,9 @@ class MainController(QObject):
                     logger.info("MainController: Signal settings_requested connecté.")
                 else:
                      logger.warning("MainController: title_bar n'a pas le signal 'settings_requested'.")
+
+                if hasattr(new_window.title_bar, 'batch_export_requested'):
+                    new_window.title_bar.batch_export_requested.connect(functools.partial(self.show_batch_export_dialog, new_window))
             except AttributeError as e_connect:
                  logger.error(f"ERREUR connexion signal(s) DocumentWindow: {e_connect}")
             # ----------------------------------------------------------
@@ -836,6 +882,64 @@ class MainController(QObject):
         logger.info(f"Fin _handle_document_window_closed pour: {closed_window}")
     # ----------------------------------------------------
 
+    # --- Export PDF par lot ---
+    def show_batch_export_dialog(self, source_window: Optional[QWidget] = None):
+        """Demande un dossier de rapports .rdj et un dossier de destination, puis lance l'export par lot."""
+        if self._active_batch_export is not None:
+            QMessageBox.information(source_window, "Export par lot", "Un export par lot est déjà en cours.")
+            return
+        source_dir = QFileDialog.getExistingDirectory(source_window, "Dossier contenant les rapports (.rdj)")
+        if not source_dir:
+            return
+        output_dir = QFileDialog.getExistingDirectory(source_window, "Dossier de destination des PDF", source_dir)
+        if not output_dir:
+            return
+        merge_reply = QMessageBox.question(source_window, "Export par lot",
+                                           "Ajouter les factures à la fin de chaque PDF ?",
+                                           QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        merge_factures = merge_reply == QMessageBox.Yes
+
+        progress_dialog = QProgressDialog("Export des rapports en PDF...", None, 0, 0, source_window)
+        progress_dialog.setWindowTitle("Export par lot")
+        progress_dialog.setWindowModality(Qt.WindowModal)
+        progress_dialog.setMinimumDuration(0)
+        progress_dialog.setAutoClose(False)
+
+        export_thread = QThread(self)
+        export_worker = BatchExportWorker([source_dir], output_dir=output_dir, merge_factures=merge_factures)
+        export_worker.moveToThread(export_thread)
+
+        export_worker.progress.connect(functools.partial(self._on_batch_export_progress, progress_dialog))
+        export_worker.finished.connect(functools.partial(self._on_batch_export_finished, source_window, progress_dialog))
+        export_thread.started.connect(export_worker.run)
+        export_worker.finished.connect(export_thread.quit)
+        export_thread.finished.connect(export_thread.deleteLater)
+        export_worker.finished.connect(export_worker.deleteLater)
+
+        self._active_batch_export = (export_thread, export_worker)
+        logger.info(f"Démarrage de l'export par lot: {source_dir} -> {output_dir} (factures: {merge_factures})")
+        export_thread.start()
+
+    def _on_batch_export_progress(self, progress_dialog: QProgressDialog, done: int, total: int, rdj_path: str):
+        progress_dialog.setMaximum(total)
+        progress_dialog.setLabelText(f"Export des rapports en PDF...\n{Path(rdj_path).name}")
+        progress_dialog.setValue(done)
+
+    def _on_batch_export_finished(self, source_window: Optional[QWidget], progress_dialog: QProgressDialog, results: list):
+        """Appelé (dans le thread GUI) à la fin de l'export par lot: affiche le résumé."""
+        self._active_batch_export = None
+        progress_dialog.close()
+        progress_dialog.deleteLater()
+        if not results:
+            QMessageBox.information(source_window, "Export par lot", "Aucun fichier .rdj trouvé dans ce dossier.")
+            return
+        summary = format_batch_summary(results)
+        if all(r.success for r in results):
+            QMessageBox.information(source_window, "Export par lot", summary)
+        else:
+            QMessageBox.warning(source_window, "Export par lot", summary)
+    # ---------------------------
+
     # --- AJOUT: Méthode pour afficher la fenêtre des paramètres ---
     def show_settings_window(self):
         """Crée (si nécessaire) et affiche la fenêtre des paramètres."""
@@ -1031,57 +1135,69 @@ class MainController(QObject):
         
         logger.info(f"Chemin de destination pour la sauvegarde (après nettoyage): {file_path_destination}")
 
+        if file_path_destination in self._active_rdj_saves:
+            logger.info(f"Sauvegarde déjà en cours pour {file_path_destination}. Requête ignorée.")
+            QMessageBox.information(source_window, "Sauvegarde", "Une sauvegarde de ce document est déjà en cours.")
+            return
+
         try:
             rapport_data, facture_dossiers_sources = document_object.save()
             logger.debug(f"Données du rapport préparées: {list(rapport_data.keys())}")
             logger.debug(f"Dossiers de factures sources: {facture_dossiers_sources}")
-
-            with tempfile.TemporaryDirectory() as tmpdir:
-                tmpdir_path = Path(tmpdir)
-                logger.debug(f"Répertoire temporaire créé: {tmpdir_path}")
-
-                # Écrire le fichier JSON principal
-                json_file_path = tmpdir_path / "rapport_data.json"
-                with open(json_file_path, 'w', encoding='utf-8') as f:
-                    json.dump(rapport_data, f, ensure_ascii=False, indent=4)
-                logger.debug(f"Fichier JSON écrit dans le répertoire temporaire: {json_file_path}")
-
-                # Copier les dossiers de factures
-                if facture_dossiers_sources:
-                    factures_dir_in_tmp = tmpdir_path / "factures"
-                    factures_dir_in_tmp.mkdir()
-                    logger.debug(f"Sous-dossier 'factures' créé dans tmp: {factures_dir_in_tmp}")
-                    for src_folder_path_str in facture_dossiers_sources:
-                        src_folder = Path(src_folder_path_str)
-                        if src_folder.exists() and src_folder.is_dir():
-                            dest_folder_in_tmp = factures_dir_in_tmp / src_folder.name
-                            shutil.copytree(src_folder, dest_folder_in_tmp)
-                            logger.debug(f"Dossier facture copié: {src_folder} -> {dest_folder_in_tmp}")
-                        else:
-                            logger.warning(f"Dossier facture source non trouvé ou n'est pas un dossier: {src_folder_path_str}")
-                else:
-                    logger.debug("Aucun dossier de facture source à copier.")
-
-                # Créer l'archive ZIP
-                # shutil.make_archive attend base_name SANS extension pour le zip
-                archive_base_name = str(Path(file_path_destination).with_suffix(''))
-                shutil.make_archive(base_name=archive_base_name, format='zip', root_dir=tmpdir_path)
-                logger.debug(f"Archive ZIP créée: {archive_base_name}.zip")
-                
-                # Renommer .zip en .rdj
-                zip_file_path = archive_base_name + '.zip'
-                if os.path.exists(file_path_destination) and str(Path(zip_file_path).resolve()) != str(Path(file_path_destination).resolve()):
-                     os.remove(file_path_destination) # Supprimer l'ancien .rdj s'il existe et est différent du .zip (cas overwrite)
-                os.rename(zip_file_path, file_path_destination)
-                logger.info(f"Fichier sauvegardé avec succès sous: {file_path_destination}")
-                QMessageBox.information(source_window, "Sauvegarde Réussie", f"Le document a été sauvegardé avec succès sous:\n{file_path_destination}")
-                document_object.is_modified = False # Supposant un indicateur de modification
-                if hasattr(source_window, 'update_window_title_modified_indicator'):
-                    source_window.update_window_title_modified_indicator(False)
-
         except Exception as e:
-            logger.error(f"Erreur lors de la sauvegarde du document: {e}", exc_info=True)
+            logger.error(f"Erreur lors de la préparation des données du document: {e}", exc_info=True)
             QMessageBox.critical(source_window, "Erreur de Sauvegarde", f"Une erreur est survenue lors de la sauvegarde du document:\n{e}")
+            return
+
+        # L'écriture de l'archive se fait dans un QThread pour ne jamais figer la fenêtre
+        progress_dialog = QProgressDialog("Sauvegarde du rapport...", None, 0, 100, source_window)
+        progress_dialog.setWindowTitle("Sauvegarde")
+        progress_dialog.setWindowModality(Qt.WindowModal)
+        progress_dialog.setMinimumDuration(400) # N'apparaît que pour les sauvegardes longues
+        progress_dialog.setAutoClose(False)
+        progress_dialog.setValue(0)
+
+        save_thread = QThread(self)
+        # Les factures d'un .rdj ouvert paresseusement sont recopiées depuis l'archive d'origine
+        source_archive_path = getattr(document_object, 'original_file_path', None)
+        save_worker = RdjSaveWorker(file_path_destination, rapport_data, facture_dossiers_sources,
+                                    source_archive_path=source_archive_path)
+        save_worker.moveToThread(save_thread)
+
+        save_worker.progress.connect(functools.partial(self._on_rdj_save_progress, progress_dialog))
+        save_worker.finished.connect(functools.partial(self._on_rdj_save_finished, source_window, document_object, progress_dialog, file_path_destination))
+        save_thread.started.connect(save_worker.run)
+        save_worker.finished.connect(save_thread.quit)
+        save_thread.finished.connect(save_thread.deleteLater)
+        save_worker.finished.connect(save_worker.deleteLater)
+
+        self._active_rdj_saves[file_path_destination] = (save_thread, save_worker)
+        logger.info(f"Démarrage du thread de sauvegarde pour: {file_path_destination}")
+        save_thread.start()
+
+    def _on_rdj_save_progress(self, progress_dialog: QProgressDialog, done_bytes: int, total_bytes: int, member_name: str):
+        """Met à jour la boîte de progression de la sauvegarde .rdj."""
+        percent = int(done_bytes * 100 / total_bytes) if total_bytes > 0 else 100
+        progress_dialog.setLabelText(f"Sauvegarde du rapport...\n{Path(member_name).name}")
+        progress_dialog.setValue(min(percent, 99)) # 100 seulement à la fin réelle
+
+    def _on_rdj_save_finished(self, source_window: QWidget, document_object, progress_dialog: QProgressDialog,
+                              file_path_destination: str, success: bool, path_or_error: str):
+        """Appelé (dans le thread GUI) lorsque l'écriture de l'archive .rdj est terminée."""
+        self._active_rdj_saves.pop(file_path_destination, None)
+        progress_dialog.setValue(100)
+        progress_dialog.close()
+        progress_dialog.deleteLater()
+
+        if success:
+            logger.info(f"Fichier sauvegardé avec succès sous: {path_or_error}")
+            QMessageBox.information(source_window, "Sauvegarde Réussie", f"Le document a été sauvegardé avec succès sous:\n{path_or_error}")
+            document_object.is_modified = False # Supposant un indicateur de modification
+            if hasattr(source_window, 'update_window_title_modified_indicator'):
+                source_window.update_window_title_modified_indicator(False)
+        else:
+            logger.error(f"Erreur lors de la sauvegarde du document: {path_or_error}")
+            QMessageBox.critical(source_window, "Erreur de Sauvegarde", f"Une erreur est survenue lors de la sauvegarde du document:\n{path_or_error}")
 
     def show_type_selection_window(self, source_window=None):
         """Crée et affiche la fenêtre TypeSelectionWindow."""
@@ -1214,31 +1330,37 @@ class MainController(QObject):
     from utils.paths import get_user_data_path # Assurer que get_user_data_path est importé
     # -----------------------------------------------------
 
-    def _load_and_display_rdj_document(self, rdj_file_path: str, target_window: Optional[DocumentWindow] = None): # AJOUT target_window
-        logger.info(f"MainController: Tentative de chargement du document .rdj: {rdj_file_path}. Cible: {target_window}") # MOD log
+    def _load_and_display_rdj_document(self, rdj_file_path: str, target_window: Optional[DocumentWindow] = None,
+                                       lazy: Optional[bool] = None): # AJOUT target_window
+        """
+        Ouvre un .rdj et l'affiche.
+
+        En mode paresseux (lazy, par défaut selon CONFIG['RDJ_LAZY_OPEN']), seul rapport_data.json est lu
+        depuis le répertoire central du ZIP: chaque Facture garde une référence vers l'archive et n'extrait
+        ses fichiers qu'au premier besoin (miniature, visionneuse, édition).
+        """
+        if lazy is None:
+            lazy = CONFIG.get('RDJ_LAZY_OPEN', True)
+        logger.info(f"MainController: Tentative de chargement du document .rdj: {rdj_file_path}. Cible: {target_window}. Lazy: {lazy}") # MOD log
         temp_dir_obj = None
+        temp_extract_path = None
 
         try:
-            # Créer un répertoire temporaire unique pour l'extraction
-            temp_dir_obj = tempfile.TemporaryDirectory(prefix="rdj_extract_")
-            temp_extract_path = Path(temp_dir_obj.name)
-            logger.info(f"_load_and_display_rdj_document: Fichier .rdj '{rdj_file_path}' sera extrait vers '{temp_extract_path}'")
-
-            # Étape 1: Décompresser l'archive .rdj dans le répertoire temporaire
+            # Étape 1 et 2: Lire rapport_data.json directement depuis l'archive
             with zipfile.ZipFile(rdj_file_path, 'r') as zip_ref:
-                zip_ref.extractall(temp_extract_path)
-            logger.info(f"_load_and_display_rdj_document: Contenu de .rdj extrait dans {temp_extract_path}")
-
-            # Étape 2: Lire le fichier rapport_data.json
-            json_file_path = temp_extract_path / "rapport_data.json"
-            if not json_file_path.exists():
-                logger.error(f"_load_and_display_rdj_document: Fichier rapport_data.json non trouvé dans l'archive à {json_file_path}")
-                QMessageBox.critical(self.main_window if self.main_window else None, "Erreur d'Ouverture", 
-                                     f"Le fichier 'rapport_data.json' est manquant dans l'archive {Path(rdj_file_path).name}.")
-                return
-
-            with open(json_file_path, 'r', encoding='utf-8') as f:
-                json_data = json.load(f)
+                if RDJ_DATA_MEMBER not in zip_ref.namelist():
+                    logger.error(f"_load_and_display_rdj_document: Fichier {RDJ_DATA_MEMBER} non trouvé dans l'archive {rdj_file_path}")
+                    QMessageBox.critical(self.main_window if self.main_window else None, "Erreur d'Ouverture", 
+                                         f"Le fichier 'rapport_data.json' est manquant dans l'archive {Path(rdj_file_path).name}.")
+                    return
+                json_data = json.loads(zip_ref.read(RDJ_DATA_MEMBER).decode('utf-8'))
+
+                if not lazy:
+                    # Mode complet: décompresser l'archive .rdj dans un répertoire temporaire
+                    temp_dir_obj = tempfile.TemporaryDirectory(prefix="rdj_extract_")
+                    temp_extract_path = Path(temp_dir_obj.name)
+                    zip_ref.extractall(temp_extract_path)
+                    logger.info(f"_load_and_display_rdj_document: Contenu de .rdj extrait dans {temp_extract_path}")
             logger.info(f"_load_and_display_rdj_document: Contenu de rapport_data.json chargé.")
 
             doc_type_from_json = json_data.get('type_document', 'Inconnu')
@@ -1289,8 +1411,11 @@ class MainController(QObject):
             logger.info(f"_load_and_display_rdj_document: Dossier de destination pour les factures de cette session: {final_factures_path_for_session}")
 
             # Étape 4: Copier les dossiers de factures depuis temp/factures vers le dossier unique
-            source_factures_in_zip_path = temp_extract_path / "factures"
-            if source_factures_in_zip_path.exists() and source_factures_in_zip_path.is_dir():
+            # (en mode paresseux, rien n'est copié: chaque Facture s'extrait elle-même au besoin)
+            source_factures_in_zip_path = temp_extract_path / "factures" if temp_extract_path else None
+            if lazy:
+                logger.info(f"_load_and_display_rdj_document: Ouverture paresseuse, factures laissées dans l'archive.")
+            elif source_factures_in_zip_path.exists() and source_factures_in_zip_path.is_dir():
                 for item in source_factures_in_zip_path.iterdir():
                     if item.is_dir(): # On s'attend à des dossiers individuels par facture
                         try:
@@ -1306,7 +1431,8 @@ class MainController(QObject):
             # Le original_rdj_filepath est rdj_file_path
             # Le base_path_for_factures est final_factures_path_for_session
             try:
-                rapport_objet = RapportDepense.from_dict(json_data, str(final_factures_path_for_session), rdj_file_path)
+                rapport_objet = RapportDepense.from_dict(json_data, str(final_factures_path_for_session), rdj_file_path,
+                                                     lazy_factures=lazy)
                 rapport_objet.original_file_path = rdj_file_path # Stocker le chemin d'origine
                 rapport_objet.factures_session_path = str(final_factures_path_for_session) # Stocker où les factures ont été copiées pour cette session
                 logger.info(f"_load_and_display_rdj_document: Objet RapportDepense créé à partir de from_dict.")
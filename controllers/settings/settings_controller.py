@@ -10,7 +10,7 @@ from config import CONFIG
 # Importer la vue et potentiellement le main_controller et update_checker
 from pages.settings.settings_page import SettingsPage
 # from controllers.main_controller import MainController # Décommenter si besoin
-from updater.update_checker import check_for_updates, prompt_update 
+from updater.update_checker import check_for_updates, prompt_update, delta_update_supported, launch_delta_updater
 # Importer le worker de téléchargement
 from updater.downloader import DownloadWorker 
 
@@ -26,6 +26,8 @@ class SettingsController(QObject):
         # --- Références pour le thread de téléchargement --- 
         self.download_thread = None
         self.download_worker = None
+        # Le téléchargement en cours est le paquet différentiel (repli sur l'installateur en cas d'échec)
+        self._downloading_delta = False
 
         self._connect_signals()
         self._update_initial_view()
@@ -153,42 +155,62 @@ class SettingsController(QObject):
         """Lance le téléchargement de la mise à jour."""
         logger.info("Update button clicked. Initiating download...")
         if self.last_update_info["available"] and self.last_update_info["url"]:
-            installer_url = self.last_update_info["url"]
-            
             # Passer à l'état téléchargement
             self._set_downloading_state()
-            
-            # Définir le dossier de destination (ex: dossier temporaire de l'OS)
-            # Attention: Il faut pouvoir retrouver ce chemin après téléchargement
-            # Peut-être un sous-dossier dans AppData/Local/GDJ/temp ?
-            temp_dir = os.path.join(os.getenv('LOCALAPPDATA', '.'), CONFIG.get('APP_NAME', 'GDJ'), 'temp_updates')
-            os.makedirs(temp_dir, exist_ok=True)
-            logger.debug(f"Download destination folder: {temp_dir}")
+            self._start_update_download(self.last_update_info)
+
+        else:
+             logger.error("ERROR: _perform_update called but no valid update info available.")
+             self._set_idle_state()
 
-            # Créer et démarrer le thread de téléchargement
-            self.download_thread = QThread(self) # parent=self pour cleanup
-            self.download_worker = DownloadWorker(installer_url, temp_dir)
-            self.download_worker.moveToThread(self.download_thread)
+    def _start_update_download(self, update_info):
+        """Télécharge le paquet différentiel s'il est publié pour cette version, sinon l'installateur complet."""
+        if update_info.get("delta_url") and delta_update_supported():
+            logger.info("Paquet différentiel disponible: téléchargement des seuls fichiers modifiés.")
+            self._start_download(update_info["delta_url"], is_delta=True)
+        else:
+            self._start_download(update_info["url"])
 
-            # Connecter les signaux du worker aux slots du contrôleur
-            self.download_worker.progress.connect(self._update_download_progress)
-            self.download_worker.finished.connect(self._download_finished)
-            self.download_worker.error.connect(self._download_error)
+    def _start_download(self, url, is_delta=False):
+        """Crée et démarre le thread de téléchargement vers le dossier temporaire des mises à jour."""
+        # Définir le dossier de destination (ex: dossier temporaire de l'OS)
+        # Attention: Il faut pouvoir retrouver ce chemin après téléchargement
+        temp_dir = os.path.join(os.getenv('LOCALAPPDATA', '.'), CONFIG.get('APP_NAME', 'GDJ'), 'temp_updates')
+        os.makedirs(temp_dir, exist_ok=True)
+        logger.debug(f"Download destination folder: {temp_dir}")
 
-            # Connecter le démarrage du thread à l'exécution du worker
-            self.download_thread.started.connect(self.download_worker.run)
-            # Connecter la fin du worker à l'arrêt du thread
-            self.download_worker.finished.connect(self.download_thread.quit)
-            # Optionnel: Nettoyer les ressources quand le thread finit
-            self.download_thread.finished.connect(self.download_thread.deleteLater)
-            self.download_worker.finished.connect(self.download_worker.deleteLater)
+        # S'assurer qu'un téléchargement n'est pas déjà en cours (sécurité)
+        if self.download_thread is not None:
+             logger.warning("Warning: Download thread already exists. Cancelling previous one?")
+             # Pour l'instant, on écrase les références, l'ancien thread pourrait continuer un peu
+             # S'il est géré correctement par Qt (parent=self), il sera détruit.
 
-            logger.info("Starting download thread...")
-            self.download_thread.start()
+        self._downloading_delta = is_delta
+        self.download_thread = QThread(self) # parent=self pour cleanup
+        self.download_worker = DownloadWorker(url, temp_dir)
+        self.download_worker.moveToThread(self.download_thread)
 
-        else:
-             logger.error("ERROR: _perform_update called but no valid update info available.")
-             self._set_idle_state()
+        # Connecter les signaux du worker aux slots du contrôleur
+        self.download_worker.progress.connect(self._update_download_progress)
+        self.download_worker.finished.connect(self._download_finished)
+        self.download_worker.error.connect(self._download_error)
+
+        # Connecter le démarrage du thread à l'exécution du worker
+        self.download_thread.started.connect(self.download_worker.run)
+        # Connecter la fin du worker à l'arrêt du thread
+        self.download_worker.finished.connect(self.download_thread.quit)
+        # Nettoyer les ressources quand le thread finit
+        self.download_thread.finished.connect(self.download_thread.deleteLater)
+        self.download_worker.finished.connect(self.download_worker.deleteLater)
+
+        logger.info("Starting download thread...")
+        self.download_thread.start()
+
+    def _fall_back_to_installer(self, reason):
+        """Échec de la mise à jour différentielle: téléchargement de l'installateur complet."""
+        logger.warning(f"Mise à jour différentielle impossible ({reason}), repli sur l'installateur complet.")
+        self.view.lbl_update_status.setText("Statut : Téléchargement de l'installateur complet...")
+        self._start_download(self.last_update_info["url"])
 
     # --- Slots pour les signaux du downloader ---
     @Slot(int, int, float)
@@ -229,10 +251,21 @@ class SettingsController(QObject):
         logger.info(f"Download finished signal received. Success: {success}, Path/Error: {path_or_error}")
         self.download_thread = None # Réinitialiser
         self.download_worker = None
-        if success:
+        was_delta, self._downloading_delta = self._downloading_delta, False
+        if success and was_delta:
+            # L'update helper applique le paquet une fois l'application fermée
+            self.view.lbl_update_status.setText("Statut : Téléchargement terminé. Application de la mise à jour...")
+            QApplication.processEvents()
+            if launch_delta_updater(path_or_error, self.last_update_info["url"]):
+                QApplication.instance().quit()
+            else:
+                self._fall_back_to_installer("lancement de l'update helper impossible")
+        elif success:
             self.view.lbl_update_status.setText("Statut : Téléchargement terminé. Lancement...")
             QApplication.processEvents()
             self._launch_installer_and_exit(path_or_error)
+        elif was_delta and path_or_error != "Annulé":
+            self._fall_back_to_installer(path_or_error)
         else:
             # Afficher l'erreur (path_or_error contient le message d'erreur ici)
             if path_or_error != "Annulé": # Ne pas réafficher si déjà annulé
@@ -244,6 +277,8 @@ class SettingsController(QObject):
          # Ce slot est un peu redondant avec finished(False, error_msg)
          # mais on le garde pour l'instant.
         logger.error(f"Download error signal received: {message}")
+        if self._downloading_delta:
+            return # _download_finished se rabat sur l'installateur complet
         if self.download_thread: # S'assurer qu'on n'est pas déjà revenu à idle
             self.view.lbl_update_status.setText(f"Statut : Erreur ({message})")
             self._set_idle_state()
@@ -308,41 +343,10 @@ class SettingsController(QObject):
         if update_info and update_info.get("available") and update_info.get("url"):
             # Stocker ces infos comme si on venait de les vérifier
             self.last_update_info = update_info
-            installer_url = update_info["url"]
-            
+
             # Passer à l'état téléchargement
             self._set_downloading_state()
-            
-            # Définir le dossier de destination (identique à _perform_update)
-            temp_dir = os.path.join(os.getenv('LOCALAPPDATA', '.'), CONFIG.get('APP_NAME', 'GDJ'), 'temp_updates')
-            os.makedirs(temp_dir, exist_ok=True)
-            logger.debug(f"Download destination folder: {temp_dir}")
-
-            # Créer et démarrer le thread de téléchargement (identique à _perform_update)
-            # S'assurer qu'un téléchargement n'est pas déjà en cours (sécurité)
-            if self.download_thread is not None:
-                 logger.warning("Warning: Download thread already exists. Cancelling previous one?")
-                 # Optionnel: Tenter d'annuler l'ancien avant de lancer le nouveau?
-                 # Pour l'instant, on écrase les références, l'ancien thread pourrait continuer un peu
-                 # S'il est géré correctement par Qt (parent=self), il sera détruit.
-            
-            self.download_thread = QThread(self) # parent=self pour cleanup
-            self.download_worker = DownloadWorker(installer_url, temp_dir)
-            self.download_worker.moveToThread(self.download_thread)
-
-            # Connecter les signaux du worker
-            self.download_worker.progress.connect(self._update_download_progress)
-            self.download_worker.finished.connect(self._download_finished)
-            self.download_worker.error.connect(self._download_error)
-
-            # Connecter le démarrage/fin du thread
-            self.download_thread.started.connect(self.download_worker.run)
-            self.download_worker.finished.connect(self.download_thread.quit)
-            self.download_thread.finished.connect(self.download_thread.deleteLater)
-            self.download_worker.finished.connect(self.download_worker.deleteLater)
-
-            logger.info("Starting download thread from prompt...")
-            self.download_thread.start()
+            self._start_update_download(update_info)
 
         else:
              logger.error("ERROR: initiate_update_from_prompt called with invalid update info.")
@@ -5,8 +5,11 @@ import requests
 import configparser
 import json
 import shutil
+import hashlib
 import logging
 
+from updater.delta_update import MANIFEST_ASSET_NAME, build_delta_pack, build_manifest, delta_asset_name
+
 # Initialisation du logger
 logger = logging.getLogger('GDJ_App')
 
@@ -74,6 +77,7 @@ API_URL = f"https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}/releases"
 ISCC_PATH = r"C:\Program Files (x86)\Inno Setup 6\ISCC.exe"  # Chemin vers Inno Setup Compiler
 ISS_SCRIPT = os.path.join("installer", "GDJ_Installer.iss")  # Script Inno Setup
 INSTALLER_OUTPUT = os.path.join("installer", "Output", "GDJ_Installer.exe")  # Sortie du script .iss
+MANIFEST_OUTPUT = os.path.join("installer", "Output", MANIFEST_ASSET_NAME)  # Empreintes des fichiers installés
 
 
 # ---------- Fonctions ----------
@@ -214,6 +218,82 @@ def upload_asset(upload_url, asset_path, asset_label=None):
         sys.exit(1)
 
 
+def write_sha256_file(asset_path):
+    """
+    Écrit '<asset>.sha256' (format sha256sum) à côté de l'asset. Publié avec la release,
+    il sert à vérifier le téléchargement (updater/download_engine.py).
+    """
+    hasher = hashlib.sha256()
+    with open(asset_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(block)
+    checksum_path = asset_path + ".sha256"
+    with open(checksum_path, "w", encoding="utf-8", newline="\n") as f:
+        f.write(f"{hasher.hexdigest()}  {os.path.basename(asset_path)}\n")
+    logger.info(f"SHA-256 de {os.path.basename(asset_path)} : {hasher.hexdigest()}")
+    return checksum_path
+
+
+def release_tree_files():
+    """
+    Fichiers installés par l'installateur (section [Files] de GDJ_Installer.iss):
+    chemin relatif dans {app} (séparateurs '/') -> fichier source.
+    """
+    files = {"GDJ.exe": os.path.join("installer", "GDJ.exe")}
+    for folder, dest in ((os.path.join("installer", "updater"), "updater"), ("resources", "resources")):
+        for root, _, names in os.walk(folder):
+            for name in names:
+                source = os.path.join(root, name)
+                rel_path = os.path.relpath(source, folder).replace(os.sep, "/")
+                files[f"{dest}/{rel_path}"] = source
+    for rel_path in ("data/config_data.json", "data/version.txt", "RELEASE_NOTES.md", "README.md"):
+        files[rel_path] = rel_path.replace("/", os.sep)
+    return files
+
+
+def get_previous_release_manifest():
+    """
+    Manifeste publié avec la dernière release (avant la création de la nouvelle), ou None
+    si elle n'en a pas: le paquet différentiel est alors simplement omis.
+    """
+    headers = {
+        "Authorization": f"token {GITHUB_TOKEN}",
+        "Accept": "application/vnd.github.v3+json",
+    }
+    try:
+        response = requests.get(f"{API_URL}/latest", headers=headers, timeout=20)
+        if response.status_code == 404:
+            logger.info("Aucune release précédente: pas de paquet différentiel.")
+            return None
+        response.raise_for_status()
+        for asset in response.json().get("assets", []):
+            if asset.get("name", "").lower() == MANIFEST_ASSET_NAME:
+                manifest_response = requests.get(asset["url"], headers={**headers, "Accept": "application/octet-stream"},
+                                                 timeout=20)
+                manifest_response.raise_for_status()
+                return manifest_response.json()
+        logger.info("La release précédente n'a pas de manifeste: pas de paquet différentiel.")
+    except (requests.exceptions.RequestException, ValueError) as e:
+        logger.warning(f"Avertissement : Manifeste de la release précédente inaccessible ({e}). Pas de paquet différentiel.")
+    return None
+
+
+def write_release_manifests(previous_manifest):
+    """
+    Écrit le manifeste de cette version et, si possible, le paquet différentiel depuis la
+    version précédente. Retourne (chemin du manifeste, chemin du paquet ou None).
+    """
+    files = release_tree_files()
+    manifest = build_manifest(files, TAG_NAME)
+    with open(MANIFEST_OUTPUT, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    logger.info(f"Manifeste écrit : {MANIFEST_OUTPUT} ({len(manifest['files'])} fichiers).")
+    if not previous_manifest or previous_manifest.get("version") == manifest["version"]:
+        return MANIFEST_OUTPUT, None
+    delta_path = os.path.join(os.path.dirname(MANIFEST_OUTPUT), delta_asset_name(previous_manifest["version"], TAG_NAME))
+    return MANIFEST_OUTPUT, build_delta_pack(files, previous_manifest, manifest, delta_path)
+
+
 # ---------- Main ----------
 def main():
     # Étape 0 : Récupérer le tag
@@ -259,6 +339,10 @@ def main():
         if os.path.exists(updater_dest_folder_installer): shutil.rmtree(updater_dest_folder_installer)
         sys.exit(1)
 
+    # Étape 2.5 : Manifeste des fichiers installés et paquet différentiel depuis la release précédente
+    # (lue avant la création de la nouvelle release, qui deviendra 'latest').
+    manifest_path, delta_path = write_release_manifests(get_previous_release_manifest())
+
     # *** NOUVEAU: Créer et pousser le tag Git ***
     logger.info(f"Création et push du tag Git {TAG_NAME}...")
     try:
@@ -298,6 +382,13 @@ def main():
     # Étape 4 : Uploader l'installateur sur la release.
     upload_url = release_info["upload_url"]
     upload_asset(upload_url, INSTALLER_OUTPUT, asset_label="Installateur GDJ")
+    # Somme de contrôle publiée à côté de l'installateur (même nom + '.sha256')
+    upload_asset(upload_url, write_sha256_file(INSTALLER_OUTPUT), asset_label="SHA-256 de l'installateur")
+    # Mise à jour différentielle: manifeste de cette version et fichiers modifiés depuis la précédente
+    upload_asset(upload_url, manifest_path, asset_label="Manifeste des fichiers")
+    if delta_path:
+        upload_asset(upload_url, delta_path, asset_label="Mise à jour différentielle")
+        upload_asset(upload_url, write_sha256_file(delta_path), asset_label="SHA-256 de la mise à jour différentielle")
 
     # Étape 5 : Supprimée - GDJ.exe n'est plus uploadé séparément
 
@@ -1,9 +1,15 @@
 import sys
 import os
 import logging
+import multiprocessing
 import traceback
+# --- Profilage du démarrage: installé avant les autres imports (GDJ_PROFILE_STARTUP=1 ou --profile-startup) ---
+from utils import startup_profiler
+profiler = startup_profiler.start()
+# --------------------------------------------------------------------------------------------------------------
 from PyQt5.QtWidgets import QApplication
 from PyQt5.QtGui import QIcon
+from PyQt5.QtCore import QTimer
 # from ui.main_window import MainWindow  # We'll launch this from the controller now
 # from controllers.main_controller import MainController
 # from updater.update_checker import check_for_updates
@@ -35,7 +41,8 @@ logger.debug("--- Logger configuré dans main.py (Vérification immédiate) ---"
 
 def main():
     logging.info("Entering main() function.")
-    app = QApplication(sys.argv)
+    with profiler.phase("QApplication"):
+        app = QApplication(sys.argv)
     logging.info("QApplication instance created.")
     
     # --- RÉTABLIR LA FERMETURE AUTO PAR DÉFAUT ---
@@ -53,10 +60,19 @@ def main():
         sys.exit(1) # Quitter si les signaux ne peuvent pas être initialisés
     # ------------------------------------------
     
+    # --- Mise à jour différentielle interrompue (update helper tué, coupure): retour en arrière ---
+    if getattr(sys, 'frozen', False):
+        from updater.delta_update import DeltaUpdateError, STALE_JOURNAL_SECONDS, recover_interrupted_update
+        try:
+            recover_interrupted_update(os.path.dirname(sys.executable), min_age_seconds=STALE_JOURNAL_SECONDS)
+        except (OSError, ValueError, DeltaUpdateError) as e:
+            logger.error(f"Récupération de la mise à jour interrompue impossible: {e}")
+
     # --- IMPORTS LOCAUX À LA FONCTION main() (APRÈS INIT SIGNAUX) ---
     from utils.paths import get_resource_path # Gardé pour clarté, pourrait être global si non dépendant
     # from updater.update_checker import check_for_updates # Si nécessaire, déplacez aussi
-    from controllers.main_controller import MainController # Import local
+    with profiler.phase("import controllers.main_controller"):
+        from controllers.main_controller import MainController # Import local
     from utils.stylesheet_loader import load_stylesheet # Import local
     from models.preference import Preference # Import local
     from utils import icon_loader # Import local
@@ -106,15 +122,17 @@ def main():
     try:
         qss_files = ["resources/styles/global.qss", "resources/styles/frame.qss"]
         logging.info(f"Loading stylesheet with initial theme: '{initial_theme}'")
-        combined_stylesheet = load_stylesheet(qss_files, theme_name=initial_theme) # Utilise l'import local load_stylesheet
-        app.setStyleSheet(combined_stylesheet)
+        with profiler.phase("feuilles de style"):
+            combined_stylesheet = load_stylesheet(qss_files, theme_name=initial_theme) # Utilise l'import local load_stylesheet
+            app.setStyleSheet(combined_stylesheet)
         logging.info("Global stylesheet applied.")
     except Exception as e_qss:
         logging.error(f"Error loading/applying stylesheet: {e_qss}", exc_info=True)
     # ------------------------------------------
     
     logging.info("Creating MainController instance...")
-    controller = MainController() # Utilise l'import local MainController
+    with profiler.phase("MainController()"):
+        controller = MainController() # Utilise l'import local MainController
     logging.info("MainController instance created.")
 
     # --- GESTION DES ARGUMENTS DE LIGNE DE COMMANDE ---
@@ -132,15 +150,26 @@ def main():
         logger.info(f"Tentative d'ouverture du fichier au démarrage: {file_to_open_on_startup}")
         # S'assurer que le contrôleur a une méthode pour gérer cela
         if hasattr(controller, 'handle_startup_file_argument'):
-            controller.handle_startup_file_argument(file_to_open_on_startup)
+            with profiler.phase("ouverture du fichier .rdj"):
+                controller.handle_startup_file_argument(file_to_open_on_startup)
+            ready_label = "document_window"
         else:
             logger.error("MainController n'a pas de méthode 'handle_startup_file_argument'. Affichage de la WelcomeWindow par défaut.")
             controller.show_welcome_page() # Fallback
+            ready_label = "welcome_window"
     else:
         logging.info("Aucun fichier à ouvrir au démarrage via argument, appel de controller.show_welcome_page()...")
-        controller.show_welcome_page()
+        with profiler.phase("show_welcome_page()"):
+            controller.show_welcome_page()
+        ready_label = "welcome_window"
     # --- FIN GESTION DES ARGUMENTS ---
 
+    # --- Temps de démarrage à froid: mesuré au premier tour de la boucle d'événements (fenêtre affichée) ---
+    from updater.update_checker import get_local_version
+    from utils.logger import LOG_FILE_PATH
+    QTimer.singleShot(0, lambda: profiler.finish(ready_label, version=get_local_version(),
+                                                 log_dir=LOG_FILE_PATH.parent))
+
     logging.info("Starting QApplication event loop (app.exec_)...")
     exit_code = app.exec_()
     logging.info(f"QApplication event loop finished. Exit code: {exit_code}")
@@ -150,6 +179,12 @@ if __name__ == '__main__':
     # Le bloc try-except global est déplacé pour entourer uniquement l'appel à main()
     # afin que les imports au niveau du module en dehors de main() ne soient pas affectés
     # s'ils ne sont pas censés l'être.
+    # Requis pour ProcessPoolExecutor dans l'exécutable figé (export par lot)
+    multiprocessing.freeze_support()
+    # --- Mode sans interface: export PDF par lot (main.py --batch-export SOURCES... [-o DOSSIER]) ---
+    if len(sys.argv) > 1 and sys.argv[1] == "--batch-export":
+        from utils.batch_export import run_batch_export_cli
+        sys.exit(run_batch_export_cli(sys.argv[2:]))
     try:
         logging.info("__name__ == '__main__', calling main().")
         main()
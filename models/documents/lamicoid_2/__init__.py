@@ -7,6 +7,9 @@ from .elements import ElementTemplateBase, ElementTexte
 from .template_lamicoid import TemplateLamicoid
 from .lamicoid import Lamicoid
 from .feuille_lamicoid import FeuilleLamicoid, LamicoidPositionne
+from .nesting import imbriquer, imbriquer_lamicoids, PieceAImbriquer, PlacementPiece, ResultatImbrication
+from .import_donnees import (importer_lamicoids, variables_du_template, ErreurImportLamicoids, ErreurLigne,
+                             ResultatImportLamicoids)
 
 __all__ = [
     "ElementTemplateBase",
@@ -14,5 +17,15 @@ __all__ = [
     "TemplateLamicoid",
     "Lamicoid",
     "FeuilleLamicoid",
-    "LamicoidPositionne"
+    "LamicoidPositionne",
+    "imbriquer",
+    "imbriquer_lamicoids",
+    "PieceAImbriquer",
+    "PlacementPiece",
+    "ResultatImbrication",
+    "importer_lamicoids",
+    "variables_du_template",
+    "ErreurImportLamicoids",
+    "ErreurLigne",
+    "ResultatImportLamicoids"
 ] 
\ No newline at end of file
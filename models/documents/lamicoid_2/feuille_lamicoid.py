@@ -10,6 +10,7 @@ class LamicoidPositionne:
     lamicoid: Lamicoid
     position_x_mm: float
     position_y_mm: float
+    rotation_deg: float = 0.0 # 90 = tourné d'un quart de tour (horaire), coin sup. gauche conservé
 
 @dataclass
 class FeuilleLamicoid:
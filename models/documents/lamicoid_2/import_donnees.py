@@ -0,0 +1,205 @@
+"""
+Création de lamicoids en lot à partir d'un tableur (CSV ou Excel).
+
+Chaque ligne du fichier donne les valeurs des variables d'un TemplateLamicoid
+(colonnes nommées comme les ElementTexte.nom_variable du template) et, au besoin,
+une colonne 'quantite'. Les lignes sont lues au fil de l'eau: une ligne invalide
+est signalée (numéro de ligne et raison) sans interrompre l'import des autres.
+"""
+
+import codecs
+import csv
+import unicodedata
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .elements import ElementTexte
+from .lamicoid import Lamicoid
+from .nesting import nouveau_lamicoid
+from .template_lamicoid import TemplateLamicoid
+
+EXTENSIONS_CSV = ('.csv', '.txt')
+EXTENSIONS_EXCEL = ('.xlsx', '.xlsm')
+COLONNE_QUANTITE = "quantite"
+QUANTITE_MAX_PAR_LIGNE = 1000
+DELIMITEURS_CSV = ",;\t"
+TAILLE_ECHANTILLON_CSV = 64 * 1024
+
+
+class ErreurImportLamicoids(ValueError):
+    """Le fichier ne peut pas être importé (format non pris en charge, colonnes manquantes, etc.)."""
+
+
+@dataclass
+class ErreurLigne:
+    """Ligne du tableur rejetée."""
+    numero_ligne: int # Numéro de ligne dans le fichier (1 = en-tête)
+    message: str
+
+
+@dataclass
+class ResultatImportLamicoids:
+    """Lamicoids créés à partir d'un tableur et lignes rejetées."""
+    lamicoids: List[Lamicoid] = field(default_factory=list)
+    erreurs: List[ErreurLigne] = field(default_factory=list)
+    lignes_lues: int = 0
+    colonnes_ignorees: List[str] = field(default_factory=list) # Colonnes sans variable correspondante
+
+
+def variables_du_template(template: TemplateLamicoid) -> List[str]:
+    """Noms des variables (ElementTexte.nom_variable) du template, dans l'ordre des éléments."""
+    noms = []
+    for element in template.elements:
+        if isinstance(element, ElementTexte) and element.est_variable and element.nom_variable:
+            if element.nom_variable not in noms:
+                noms.append(element.nom_variable)
+    return noms
+
+
+def _normaliser_nom(nom: str) -> str:
+    """Nom de colonne comparable: sans accents, espaces de bord ni casse ('Quantité ' == 'quantite')."""
+    decompose = unicodedata.normalize('NFKD', str(nom).strip().casefold())
+    return "".join(c for c in decompose if not unicodedata.combining(c))
+
+
+def _encodage_csv(chemin: Path) -> str:
+    """UTF-8 (avec ou sans BOM) si l'échantillon est valide, sinon Windows-1252 (export Excel classique)."""
+    with open(chemin, 'rb') as f:
+        echantillon = f.read(TAILLE_ECHANTILLON_CSV)
+    try:
+        # final=False: un caractère coupé à la fin de l'échantillon n'est pas une erreur
+        codecs.getincrementaldecoder('utf-8')().decode(echantillon, final=False)
+        return 'utf-8-sig'
+    except UnicodeDecodeError:
+        return 'cp1252'
+
+
+def _lignes_csv(chemin: Path) -> Iterator[Tuple[int, List[str]]]:
+    encodage = _encodage_csv(chemin)
+    try:
+        with open(chemin, 'r', encoding=encodage, newline='') as f:
+            echantillon = f.read(TAILLE_ECHANTILLON_CSV)
+            f.seek(0)
+            try:
+                dialecte = csv.Sniffer().sniff(echantillon, delimiters=DELIMITEURS_CSV)
+            except csv.Error:
+                dialecte = csv.excel
+            lecteur = csv.reader(f, dialecte)
+            for cellules in lecteur:
+                yield lecteur.line_num, cellules
+    except UnicodeDecodeError as e:
+        raise ErreurImportLamicoids(f"Encodage du fichier CSV non reconnu ({encodage}): {e}") from e
+    except csv.Error as e:
+        raise ErreurImportLamicoids(f"Fichier CSV invalide: {e}") from e
+
+
+def _texte_cellule_excel(valeur) -> str:
+    if valeur is None:
+        return ""
+    if isinstance(valeur, float) and valeur.is_integer():
+        return str(int(valeur)) # 12.0 -> "12" (Excel stocke les nombres en flottants)
+    return str(valeur)
+
+
+def _lignes_excel(chemin: Path) -> Iterator[Tuple[int, List[str]]]:
+    try:
+        import openpyxl
+    except ImportError as e:
+        raise ErreurImportLamicoids("La lecture des fichiers Excel requiert le module 'openpyxl'.") from e
+    try:
+        # read_only: les lignes sont lues au fur et à mesure, sans charger toute la feuille
+        classeur = openpyxl.load_workbook(chemin, read_only=True, data_only=True)
+    except Exception as e:
+        raise ErreurImportLamicoids(f"Fichier Excel illisible: {e}") from e
+    try:
+        for numero, valeurs in enumerate(classeur.active.iter_rows(values_only=True), start=1):
+            yield numero, [_texte_cellule_excel(v) for v in valeurs]
+    finally:
+        classeur.close()
+
+
+def lire_lignes_tableur(chemin: str) -> Iterator[Tuple[int, List[str]]]:
+    """Lit un fichier CSV ou Excel ligne par ligne: (numéro de ligne, cellules en texte)."""
+    chemin = Path(chemin)
+    extension = chemin.suffix.lower()
+    if extension in EXTENSIONS_CSV:
+        return _lignes_csv(chemin)
+    if extension in EXTENSIONS_EXCEL:
+        return _lignes_excel(chemin)
+    raise ErreurImportLamicoids(f"Format de fichier non pris en charge: '{chemin.suffix}' "
+                                f"(attendu: {', '.join(EXTENSIONS_CSV + EXTENSIONS_EXCEL)}).")
+
+
+def importer_lamicoids(chemin: str, template: TemplateLamicoid,
+                       colonne_quantite: Optional[str] = COLONNE_QUANTITE,
+                       quantite_max: int = QUANTITE_MAX_PAR_LIGNE) -> ResultatImportLamicoids:
+    """
+    Crée un lamicoid par ligne (ou 'quantite' lamicoids) du tableur, à partir du template.
+
+    La première ligne non vide est l'en-tête: chaque variable du template doit y avoir une
+    colonne (comparaison sans casse ni accents), sinon ErreurImportLamicoids est levée.
+    Les lignes vides sont ignorées; une ligne dont une variable est vide ou dont la
+    quantité est invalide est rejetée et signalée dans le résultat.
+    """
+    variables = variables_du_template(template)
+    resultat = ResultatImportLamicoids()
+    lignes = lire_lignes_tableur(chemin)
+
+    index_variables: Dict[str, int] = {}
+    index_quantite = None
+    for numero, cellules in lignes:
+        if not any(c.strip() for c in cellules):
+            continue
+        colonnes = {}
+        for index, nom in enumerate(cellules):
+            if nom.strip():
+                colonnes.setdefault(_normaliser_nom(nom), index)
+        manquantes = [v for v in variables if _normaliser_nom(v) not in colonnes]
+        if manquantes:
+            raise ErreurImportLamicoids(
+                f"Colonne(s) manquante(s) pour le template '{template.nom_template}': {', '.join(manquantes)} "
+                f"(ligne d'en-tête {numero}).")
+        index_variables = {v: colonnes[_normaliser_nom(v)] for v in variables}
+        if colonne_quantite:
+            index_quantite = colonnes.get(_normaliser_nom(colonne_quantite))
+        utilisees = set(index_variables.values()) | {index_quantite}
+        resultat.colonnes_ignorees = [cellules[i].strip() for i in sorted(colonnes.values()) if i not in utilisees]
+        break
+    else:
+        raise ErreurImportLamicoids("Le fichier est vide (aucune ligne d'en-tête).")
+
+    for numero, cellules in lignes:
+        if not any(c.strip() for c in cellules):
+            continue
+        resultat.lignes_lues += 1
+
+        def cellule(index: int) -> str:
+            return cellules[index].strip() if index < len(cellules) else ""
+
+        valeurs = {variable: cellule(index) for variable, index in index_variables.items()}
+        vides = [variable for variable, valeur in valeurs.items() if not valeur]
+        if vides:
+            resultat.erreurs.append(ErreurLigne(numero, f"Valeur manquante pour: {', '.join(vides)}"))
+            continue
+
+        quantite = 1
+        if index_quantite is not None and cellule(index_quantite):
+            try:
+                valeur_quantite = float(cellule(index_quantite).replace(',', '.'))
+                if not valeur_quantite.is_integer():
+                    raise ValueError
+                quantite = int(valeur_quantite)
+            except (ValueError, OverflowError):
+                resultat.erreurs.append(ErreurLigne(numero, f"Quantité invalide: '{cellule(index_quantite)}'"))
+                continue
+            if not 1 <= quantite <= quantite_max:
+                resultat.erreurs.append(ErreurLigne(numero, f"Quantité hors limites (1 à {quantite_max}): {quantite}"))
+                continue
+
+        for _ in range(quantite):
+            lamicoid = nouveau_lamicoid(template)
+            lamicoid.valeurs_variables = dict(valeurs)
+            resultat.lamicoids.append(lamicoid)
+
+    return resultat
@@ -0,0 +1,280 @@
+"""
+Imbrication automatique de lamicoids sur des feuilles de production.
+
+Algorithme MaxRects: chaque feuille tient la liste des rectangles libres maximaux; une
+pièce est placée dans le rectangle libre, parmi toutes les feuilles ouvertes, qui
+l'accueille le mieux selon l'heuristique (plus petit côté résiduel, plus petite
+surface résiduelle ou position la plus haute), avec rotation de 90° si elle est
+permise. Une nouvelle feuille n'est ouverte que si la pièce n'entre dans aucune
+feuille existante.
+
+L'espacement (trait de coupe + jeu) est ajouté entre les pièces et la marge le long
+des bords de la feuille. Chaque combinaison d'ordre de tri (pièces les plus grandes
+d'abord) et d'heuristique est essayée et la disposition utilisant le moins de feuilles
+est retenue: quelques dizaines de millisecondes pour quelques centaines de lamicoids.
+"""
+
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+from .feuille_lamicoid import FeuilleLamicoid, LamicoidPositionne
+from .lamicoid import Lamicoid
+from .template_lamicoid import TemplateLamicoid
+
+ESPACEMENT_DEFAUT_MM = 2.0 # Trait de coupe du laser + jeu entre deux lamicoids
+MARGE_DEFAUT_MM = 5.0 # Bord de feuille non utilisable
+_EPSILON = 1e-9
+
+# Heuristiques de choix du rectangle libre
+HEURISTIQUE_COTE_COURT = "cote_court" # Best Short Side Fit
+HEURISTIQUE_SURFACE = "surface" # Best Area Fit
+HEURISTIQUE_HAUT_GAUCHE = "haut_gauche" # Bottom-Left (coordonnées y vers le bas)
+HEURISTIQUES = (HEURISTIQUE_COTE_COURT, HEURISTIQUE_SURFACE, HEURISTIQUE_HAUT_GAUCHE)
+
+# Ordres de placement essayés (clé de tri décroissante)
+ORDRES_DE_TRI = (
+    lambda p: (max(p.largeur_mm, p.hauteur_mm), p.largeur_mm * p.hauteur_mm),
+    lambda p: (p.largeur_mm * p.hauteur_mm, max(p.largeur_mm, p.hauteur_mm)),
+    lambda p: (p.hauteur_mm, p.largeur_mm),
+    lambda p: (p.largeur_mm, p.hauteur_mm),
+)
+
+
+@dataclass(frozen=True)
+class PieceAImbriquer:
+    """Rectangle à placer; 'cle' identifie la pièce dans le résultat."""
+    cle: Any
+    largeur_mm: float
+    hauteur_mm: float
+    rotation_permise: bool = True
+
+
+@dataclass(frozen=True)
+class PlacementPiece:
+    """Position d'une pièce: coin supérieur gauche sur la feuille 'feuille' (index à partir de 0)."""
+    cle: Any
+    feuille: int
+    x_mm: float
+    y_mm: float
+    largeur_mm: float # Dimensions une fois placée (inversées si tournée)
+    hauteur_mm: float
+    tournee: bool = False
+
+
+@dataclass
+class ResultatImbrication:
+    """Placements et mesures d'utilisation de la matière."""
+    largeur_feuille_mm: float
+    hauteur_feuille_mm: float
+    placements: List[PlacementPiece] = field(default_factory=list)
+    non_placees: List[PieceAImbriquer] = field(default_factory=list) # Plus grandes que la zone utile
+    surface_utilisee_par_feuille: List[float] = field(default_factory=list)
+
+    @property
+    def nombre_feuilles(self) -> int:
+        return len(self.surface_utilisee_par_feuille)
+
+    @property
+    def surface_feuille_mm2(self) -> float:
+        return self.largeur_feuille_mm * self.hauteur_feuille_mm
+
+    @property
+    def utilisation_par_feuille(self) -> List[float]:
+        """Fraction (0-1) de chaque feuille couverte par des lamicoids."""
+        surface = self.surface_feuille_mm2
+        return [utilisee / surface if surface else 0.0 for utilisee in self.surface_utilisee_par_feuille]
+
+    @property
+    def utilisation_moyenne(self) -> float:
+        """Fraction de la matière de toutes les feuilles couverte par des lamicoids."""
+        total = self.surface_feuille_mm2 * self.nombre_feuilles
+        return sum(self.surface_utilisee_par_feuille) / total if total else 0.0
+
+    @property
+    def chute_mm2(self) -> float:
+        """Surface de matière non utilisée (toutes feuilles)."""
+        return self.surface_feuille_mm2 * self.nombre_feuilles - sum(self.surface_utilisee_par_feuille)
+
+    def placements_de_feuille(self, index: int) -> List[PlacementPiece]:
+        return [placement for placement in self.placements if placement.feuille == index]
+
+
+def _contient(a: Tuple[float, float, float, float], b: Tuple[float, float, float, float]) -> bool:
+    """Vrai si le rectangle (x, y, l, h) a contient b."""
+    return (a[0] <= b[0] + _EPSILON and a[1] <= b[1] + _EPSILON
+            and a[0] + a[2] + _EPSILON >= b[0] + b[2] and a[1] + a[3] + _EPSILON >= b[1] + b[3])
+
+
+class _FeuilleMaxRects:
+    """Zone utile d'une feuille et ses rectangles libres maximaux."""
+
+    def __init__(self, largeur: float, hauteur: float):
+        self.libres = [(0.0, 0.0, largeur, hauteur)]
+
+    def meilleure_position(self, largeur: float, hauteur: float, rotation: bool,
+                           heuristique: str = HEURISTIQUE_COTE_COURT):
+        """Retourne (score, x, y, largeur, hauteur, tournée) de la meilleure position, ou None."""
+        meilleure = None
+        orientations = ((largeur, hauteur, False), (hauteur, largeur, True)) if rotation else ((largeur, hauteur, False),)
+        for x, y, l_libre, h_libre in self.libres:
+            for l_piece, h_piece, tournee in orientations:
+                if l_piece > l_libre + _EPSILON or h_piece > h_libre + _EPSILON:
+                    continue
+                reste_l, reste_h = l_libre - l_piece, h_libre - h_piece
+                if heuristique == HEURISTIQUE_SURFACE:
+                    score = (l_libre * h_libre - l_piece * h_piece, min(reste_l, reste_h), y, x)
+                elif heuristique == HEURISTIQUE_HAUT_GAUCHE:
+                    score = (y + h_piece, x, min(reste_l, reste_h), 0.0)
+                else:
+                    score = (min(reste_l, reste_h), max(reste_l, reste_h), y, x)
+                if meilleure is None or score < meilleure[0]:
+                    meilleure = (score, x, y, l_piece, h_piece, tournee)
+        return meilleure
+
+    def placer(self, x: float, y: float, largeur: float, hauteur: float):
+        """Occupe le rectangle donné: découpe les rectangles libres qu'il chevauche."""
+        droite, bas = x + largeur, y + hauteur
+        conserves, nouveaux = [], []
+        for libre in self.libres:
+            lx, ly, ll, lh = libre
+            if (x >= lx + ll - _EPSILON or droite <= lx + _EPSILON
+                    or y >= ly + lh - _EPSILON or bas <= ly + _EPSILON):
+                conserves.append(libre)
+                continue
+            if x > lx + _EPSILON:
+                nouveaux.append((lx, ly, x - lx, lh))
+            if droite < lx + ll - _EPSILON:
+                nouveaux.append((droite, ly, lx + ll - droite, lh))
+            if y > ly + _EPSILON:
+                nouveaux.append((lx, ly, ll, y - ly))
+            if bas < ly + lh - _EPSILON:
+                nouveaux.append((lx, bas, ll, ly + lh - bas))
+
+        # Élagage: seuls les nouveaux rectangles peuvent être contenus dans un autre ou en contenir un
+        # (les rectangles conservés étaient déjà maximaux entre eux)
+        nouveaux_gardes = []
+        for i, rect in enumerate(nouveaux):
+            # Contenu dans un autre nouveau rectangle (entre deux rectangles égaux, le premier est gardé)
+            if any(j != i and _contient(autre, rect) and (j < i or not _contient(rect, autre))
+                   for j, autre in enumerate(nouveaux)):
+                continue
+            if any(_contient(autre, rect) for autre in conserves):
+                continue
+            nouveaux_gardes.append(rect)
+        conserves = [rect for rect in conserves if not any(_contient(n, rect) for n in nouveaux_gardes)]
+        self.libres = conserves + nouveaux_gardes
+
+
+def imbriquer(pieces: List[PieceAImbriquer], largeur_feuille_mm: float, hauteur_feuille_mm: float,
+              espacement_mm: float = ESPACEMENT_DEFAUT_MM, marge_mm: float = MARGE_DEFAUT_MM,
+              rotation: bool = True) -> ResultatImbrication:
+    """
+    Répartit les pièces sur le plus petit nombre possible de feuilles identiques.
+
+    Args:
+        pieces: Rectangles à placer.
+        largeur_feuille_mm, hauteur_feuille_mm: Dimensions d'une feuille.
+        espacement_mm: Distance minimale entre deux pièces (trait de coupe compris).
+        marge_mm: Distance minimale entre une pièce et le bord de la feuille.
+        rotation: Autorise la rotation de 90° des pièces qui la permettent.
+
+    Returns:
+        Un ResultatImbrication (positions en mm depuis le coin supérieur gauche de la feuille).
+    """
+    # Chaque pièce est gonflée de l'espacement; la zone utile aussi, pour que la dernière
+    # pièce d'une rangée puisse toucher la marge.
+    largeur_utile = largeur_feuille_mm - 2 * marge_mm + espacement_mm
+    hauteur_utile = hauteur_feuille_mm - 2 * marge_mm + espacement_mm
+
+    meilleur = None
+    for cle_tri in ORDRES_DE_TRI:
+        ordre = sorted(pieces, key=cle_tri, reverse=True)
+        for heuristique in HEURISTIQUES:
+            resultat = _imbriquer_dans_l_ordre(ordre, largeur_feuille_mm, hauteur_feuille_mm, largeur_utile,
+                                               hauteur_utile, espacement_mm, marge_mm, rotation, heuristique)
+            # Moins de feuilles d'abord, puis dernière feuille la plus vide (chute regroupée)
+            qualite = (resultat.nombre_feuilles, min(resultat.surface_utilisee_par_feuille, default=0.0))
+            if meilleur is None or qualite < meilleur[0]:
+                meilleur = (qualite, resultat)
+    return meilleur[1]
+
+
+def _imbriquer_dans_l_ordre(ordre: List[PieceAImbriquer], largeur_feuille_mm: float, hauteur_feuille_mm: float,
+                            largeur_utile: float, hauteur_utile: float, espacement_mm: float, marge_mm: float,
+                            rotation: bool, heuristique: str) -> ResultatImbrication:
+    resultat = ResultatImbrication(largeur_feuille_mm, hauteur_feuille_mm)
+    feuilles: List[_FeuilleMaxRects] = []
+    for piece in ordre:
+        largeur, hauteur = piece.largeur_mm + espacement_mm, piece.hauteur_mm + espacement_mm
+        tourner = rotation and piece.rotation_permise
+        choix = None
+        for index, feuille in enumerate(feuilles):
+            position = feuille.meilleure_position(largeur, hauteur, tourner, heuristique)
+            if position is not None and (choix is None or position[0] < choix[1][0]):
+                choix = (index, position)
+        if choix is None:
+            nouvelle = _FeuilleMaxRects(largeur_utile, hauteur_utile)
+            position = nouvelle.meilleure_position(largeur, hauteur, tourner, heuristique)
+            if position is None:
+                resultat.non_placees.append(piece)
+                continue
+            feuilles.append(nouvelle)
+            choix = (len(feuilles) - 1, position)
+
+        index, (_score, x, y, l_placee, h_placee, tournee) = choix
+        feuilles[index].placer(x, y, l_placee, h_placee)
+        resultat.placements.append(PlacementPiece(
+            cle=piece.cle, feuille=index, x_mm=marge_mm + x, y_mm=marge_mm + y,
+            largeur_mm=l_placee - espacement_mm, hauteur_mm=h_placee - espacement_mm, tournee=tournee))
+
+    # Surface réelle des lamicoids (sans l'espacement)
+    resultat.surface_utilisee_par_feuille = [0.0] * len(feuilles)
+    for placement in resultat.placements:
+        resultat.surface_utilisee_par_feuille[placement.feuille] += placement.largeur_mm * placement.hauteur_mm
+    return resultat
+
+
+def imbriquer_lamicoids(lamicoids: List[Lamicoid], templates: Dict[str, TemplateLamicoid],
+                        feuille_modele: FeuilleLamicoid, espacement_mm: float = ESPACEMENT_DEFAUT_MM,
+                        marge_mm: float = MARGE_DEFAUT_MM,
+                        rotation: bool = True) -> Tuple[List[FeuilleLamicoid], ResultatImbrication]:
+    """
+    Dispose des lamicoids (dimensions tirées de leur template) sur des feuilles ayant le
+    format et l'épaisseur de feuille_modele. Retourne les feuilles remplies et le résultat
+    détaillé (utilisation, lamicoids non placés).
+    """
+    pieces = []
+    for lamicoid in lamicoids:
+        template = templates.get(lamicoid.template_id)
+        if template is None:
+            raise KeyError(f"Template inconnu pour le lamicoid {lamicoid.instance_id}: {lamicoid.template_id}")
+        pieces.append(PieceAImbriquer(lamicoid, template.largeur_mm, template.hauteur_mm))
+
+    resultat = imbriquer(pieces, feuille_modele.largeur_feuille_mm, feuille_modele.hauteur_feuille_mm,
+                         espacement_mm, marge_mm, rotation)
+    feuilles = [FeuilleLamicoid(feuille_modele.largeur_feuille_mm, feuille_modele.hauteur_feuille_mm,
+                                feuille_modele.epaisseur_mm) for _ in range(resultat.nombre_feuilles)]
+    for placement in resultat.placements:
+        feuilles[placement.feuille].lamicoids_sur_feuille.append(LamicoidPositionne(
+            placement.cle, placement.x_mm, placement.y_mm, rotation_deg=90.0 if placement.tournee else 0.0))
+    return feuilles, resultat
+
+
+def feuille_hors_format(non_placees: List[PieceAImbriquer], feuille_modele: FeuilleLamicoid) -> FeuilleLamicoid:
+    """
+    Regroupe les lamicoids trop grands pour la zone utile sur une feuille supplémentaire
+    (empilés sans rotation) afin qu'ils ne soient pas perdus lors du remplacement des feuilles.
+    """
+    feuille = FeuilleLamicoid(feuille_modele.largeur_feuille_mm, feuille_modele.hauteur_feuille_mm,
+                              feuille_modele.epaisseur_mm)
+    y_mm = 0.0
+    for piece in non_placees:
+        feuille.lamicoids_sur_feuille.append(LamicoidPositionne(piece.cle, 0.0, y_mm))
+        y_mm += piece.hauteur_mm
+    return feuille
+
+
+def nouveau_lamicoid(template: TemplateLamicoid) -> Lamicoid:
+    """Crée une instance de lamicoid (sans valeurs de variables) à partir d'un template."""
+    return Lamicoid(instance_id=str(uuid.uuid4()), template_id=template.template_id)
@@ -4,6 +4,7 @@ from .deplacement import Deplacement
 from .repas import Repas
 from .depense import Depense
 from .facture import Facture
+from .totaux import TotauxRapport, ResumeTotaux
 
 # Optionnel: Rendre accessibles les classes pour import direct
-__all__ = ['RapportDepense', 'Deplacement', 'Repas', 'Depense', 'Facture'] 
\ No newline at end of file
+__all__ = ['RapportDepense', 'Deplacement', 'Repas', 'Depense', 'Facture', 'TotauxRapport', 'ResumeTotaux'] 
\ No newline at end of file
@@ -83,7 +83,8 @@ class Depense:
         }
 
     @classmethod
-    def from_dict(cls, data: dict, base_path_for_factures_in_zip: str) -> 'Depense':
+    def from_dict(cls, data: dict, base_path_for_factures_in_zip: str,
+                  archive_path: Optional[str] = None) -> 'Depense':
         """
         Crée une instance de Depense à partir d'un dictionnaire.
 
@@ -91,6 +92,7 @@ class Depense:
             data: Dictionnaire contenant les attributs de la dépense.
             base_path_for_factures_in_zip: Le chemin du répertoire 'factures'
                                              où les dossiers de factures individuels.
+            archive_path: Optionnel. Archive .rdj d'où la facture sera extraite à la demande.
         
         Returns:
             Une instance de Depense.
@@ -104,7 +106,7 @@ class Depense:
         facture_obj = None
         if facture_data:
             try:
-                facture_obj = Facture.from_dict(facture_data, base_path_for_factures_in_zip)
+                facture_obj = Facture.from_dict(facture_data, base_path_for_factures_in_zip, archive_path)
             except Exception as e:
                 # logger.error(f"Erreur lors de la création de la facture pour une dépense: {e}")
                 print(f"AVERTISSEMENT: Erreur lors de la reconstruction de la facture pour une dépense: {e}. La dépense sera chargée sans facture.")
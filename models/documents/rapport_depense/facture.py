@@ -1,23 +1,45 @@
-from typing import List
+from typing import Dict, List, Optional
 import os
+import shutil
+import threading
+import zipfile
 
 # --- Imports relatifs supprimés car plus nécessaires --- 
 # from .repas import Repas
 # from .depense import Depense
 # ---------------------------------------------------
 
+# Verrous d'extraction par dossier de destination (hors de l'instance: une Facture reste
+# copiable avec copy.deepcopy, et ses copies partagent le verrou de leur dossier)
+_materialize_locks: Dict[str, threading.Lock] = {}
+_materialize_locks_guard = threading.Lock()
+
+
+def _materialize_lock(folder_path: str) -> threading.Lock:
+    key = os.path.normcase(os.path.abspath(folder_path))
+    with _materialize_locks_guard:
+        return _materialize_locks.setdefault(key, threading.Lock())
+
+
 class Facture:
     """Représente une ou plusieurs factures associées à une dépense."""
 
+    # Dossier des factures à l'intérieur d'une archive .rdj
+    ARCHIVE_FACTURES_DIR = "factures"
+
     def __init__(self,
                  folder_path: str,
-                 filenames: List[str]):
+                 filenames: List[str],
+                 archive_path: Optional[str] = None):
         """
         Initialise l'objet Facture.
 
         Args:
             folder_path: Le chemin d'accès au dossier contenant les fichiers de facture.
             filenames: Une liste des noms de fichiers de facture dans le dossier.
+            archive_path: Optionnel. Chemin d'une archive .rdj contenant les fichiers
+                          sous 'factures/<nom du dossier>/'. Tant qu'il est défini, les
+                          fichiers ne sont extraits vers folder_path qu'au premier besoin.
         """
         if not isinstance(folder_path, str):
             raise TypeError("folder_path doit être une chaîne de caractères.")
@@ -28,13 +50,79 @@ class Facture:
 
         self.folder_path: str = folder_path
         self.filenames: List[str] = filenames
+        self.archive_path: Optional[str] = archive_path
 
-    def get_full_paths(self) -> List[str]:
-        """Retourne la liste complète des chemins d'accès aux fichiers de facture."""
+    def get_full_paths(self, materialize: bool = True) -> List[str]:
+        """
+        Retourne la liste complète des chemins d'accès aux fichiers de facture.
+
+        Args:
+            materialize: Si True (défaut) et que la facture est adossée à une archive,
+                         les fichiers sont d'abord extraits vers folder_path.
+        """
+        if materialize:
+            self.materialize()
         return [os.path.join(self.folder_path, f) for f in self.filenames]
 
+    def is_materialized(self) -> bool:
+        """Indique si les fichiers de la facture sont disponibles sur le disque."""
+        return self.archive_path is None
+
+    def archive_member_name(self, filename: str) -> str:
+        """Retourne le nom du membre ZIP correspondant à un fichier de cette facture."""
+        return f"{self.ARCHIVE_FACTURES_DIR}/{os.path.basename(self.folder_path)}/{filename}"
+
+    def materialize(self) -> bool:
+        """
+        Extrait (une seule fois) les fichiers de la facture depuis l'archive .rdj vers folder_path.
+        Seuls les membres de cette facture sont lus, directement depuis le répertoire central du ZIP.
+
+        Returns:
+            True si les fichiers sont disponibles sur le disque, False si l'extraction a échoué.
+        """
+        if self.archive_path is None:
+            return True
+        with _materialize_lock(self.folder_path):
+            if self.archive_path is None: # Extrait entre-temps par un autre thread
+                return True
+            try:
+                os.makedirs(self.folder_path, exist_ok=True)
+                with zipfile.ZipFile(self.archive_path, 'r') as zf:
+                    for filename in self.filenames:
+                        target_path = os.path.join(self.folder_path, filename)
+                        if os.path.exists(target_path):
+                            continue
+                        try:
+                            member_info = zf.getinfo(self.archive_member_name(filename))
+                        except KeyError:
+                            print(f"AVERTISSEMENT: Fichier de facture absent de l'archive: {self.archive_member_name(filename)}")
+                            continue
+                        partial_path = target_path + ".part"
+                        with zf.open(member_info) as src, open(partial_path, 'wb') as dst:
+                            shutil.copyfileobj(src, dst, 1024 * 1024)
+                        os.replace(partial_path, target_path)
+            except (OSError, zipfile.BadZipFile) as e:
+                print(f"AVERTISSEMENT: Impossible d'extraire la facture '{self.folder_path}' depuis '{self.archive_path}': {e}")
+                return False
+            self.archive_path = None
+            return True
+
+    def read_bytes(self, filename: str) -> bytes:
+        """
+        Retourne le contenu d'un fichier de la facture, sans l'extraire sur le disque
+        si la facture n'a pas encore été matérialisée.
+        """
+        disk_path = os.path.join(self.folder_path, filename)
+        archive_path = self.archive_path
+        if archive_path is None or os.path.exists(disk_path):
+            with open(disk_path, 'rb') as f:
+                return f.read()
+        with zipfile.ZipFile(archive_path, 'r') as zf:
+            return zf.read(self.archive_member_name(filename))
+
     def __repr__(self):
-        return (f"Facture(folder='{self.folder_path}', files={self.filenames})")
+        lazy_repr = f", archive='{self.archive_path}'" if self.archive_path else ""
+        return (f"Facture(folder='{self.folder_path}', files={self.filenames}{lazy_repr})")
 
     def to_dict(self):
         """Retourne une représentation dictionnaire de l'objet Facture pour la sérialisation JSON."""
@@ -47,7 +135,8 @@ class Facture:
         }
 
     @classmethod
-    def from_dict(cls, data: dict, base_path_for_factures_in_zip: str) -> 'Facture':
+    def from_dict(cls, data: dict, base_path_for_factures_in_zip: str,
+                  archive_path: Optional[str] = None) -> 'Facture':
         """
         Crée une instance de Facture à partir d'un dictionnaire et du chemin de base
         où les dossiers de factures ont été extraits du ZIP.
@@ -56,6 +145,9 @@ class Facture:
             data: Dictionnaire contenant 'folder_name' et 'filenames'.
             base_path_for_factures_in_zip: Le chemin du répertoire 'factures'
                                              extrait du fichier .rdj.
+            archive_path: Optionnel. Archive .rdj d'où extraire les fichiers à la demande
+                          (ouverture paresseuse). Si None, les fichiers doivent déjà
+                          se trouver dans base_path_for_factures_in_zip.
         
         Returns:
             Une instance de Facture.
@@ -95,6 +187,6 @@ class Facture:
         
         reconstructed_folder_path = os.path.join(base_path_for_factures_in_zip, folder_name)
 
-        return cls(folder_path=reconstructed_folder_path, filenames=filenames)
+        return cls(folder_path=reconstructed_folder_path, filenames=filenames, archive_path=archive_path)
 
     # Ajouter d'autres méthodes si nécessaire 
\ No newline at end of file
@@ -6,6 +6,7 @@ from typing import List, Optional
 from .deplacement import Deplacement
 from .repas import Repas
 from .depense import Depense
+from .totaux import TotauxRapport, ResumeTotaux
 # ----------------------
 
 class RapportDepense(Document):
@@ -51,21 +52,45 @@ class RapportDepense(Document):
         self.depenses_diverses: List[Depense] = []
         # ----------------------------------------------------
 
+        # Totaux tenus en colonnes, mis à jour à chaque ajout/suppression/modification
+        self.totaux = TotauxRapport(self)
+
     # --- Méthodes pour ajouter des items --- 
     def ajouter_deplacement(self, deplacement: Deplacement):
         if not isinstance(deplacement, Deplacement):
             raise TypeError("L'objet ajouté doit être une instance de Deplacement.")
         self.deplacements.append(deplacement)
+        self.totaux.entree_ajoutee(deplacement)
 
     def ajouter_repas(self, repas: Repas):
         if not isinstance(repas, Repas):
             raise TypeError("L'objet ajouté doit être une instance de Repas.")
         self.repas.append(repas)
+        self.totaux.entree_ajoutee(repas)
 
     def ajouter_depense(self, depense: Depense):
         if not isinstance(depense, Depense):
             raise TypeError("L'objet ajouté doit être une instance de Depense.")
         self.depenses_diverses.append(depense)
+        self.totaux.entree_ajoutee(depense)
+
+    def retirer_entree(self, entree) -> bool:
+        """Retire un déplacement, repas ou dépense du rapport. Retourne False si l'entrée n'y est pas."""
+        for liste in (self.deplacements, self.repas, self.depenses_diverses):
+            for index, item in enumerate(liste):
+                if item is entree:
+                    del liste[index]
+                    self.totaux.entree_retiree(entree, index)
+                    return True
+        return False
+
+    def entree_modifiee(self, entree):
+        """Signale que les attributs d'une entrée du rapport ont été modifiés (met à jour les totaux)."""
+        self.totaux.entree_modifiee(entree)
+
+    def calculer_totaux(self) -> ResumeTotaux:
+        """Retourne les totaux et statistiques du rapport."""
+        return self.totaux.resume()
     # -------------------------------------
 
     # --- Adapter la validation --- 
@@ -139,7 +164,8 @@ class RapportDepense(Document):
     # -------------------------------------------------------------------- 
 
     @classmethod
-    def from_dict(cls, data: dict, base_path_for_factures: str, original_rdj_filepath: str) -> 'RapportDepense':
+    def from_dict(cls, data: dict, base_path_for_factures: str, original_rdj_filepath: str,
+                  lazy_factures: bool = False) -> 'RapportDepense':
         """
         Crée une instance de RapportDepense à partir d'un dictionnaire.
 
@@ -150,6 +176,9 @@ class RapportDepense(Document):
                                       ont été copiés (par exemple, dans un sous-dossier unique de FacturesEntrees).
             original_rdj_filepath: Le chemin complet du fichier .rdj d'origine qui a été ouvert.
                                      Utilisé pour initialiser self.nom_fichier.
+            lazy_factures: Si True, les factures ne sont pas attendues dans base_path_for_factures:
+                           chaque Facture garde une référence vers original_rdj_filepath et n'extrait
+                           ses fichiers qu'au premier besoin (miniature, visionneuse, édition).
         
         Returns:
             Une instance de RapportDepense.
@@ -185,6 +214,8 @@ class RapportDepense(Document):
             content=content
         )
 
+        factures_archive_path = original_rdj_filepath if lazy_factures else None
+
         # Reconstruire les déplacements
         deplacements_data = data.get('deplacements', [])
         for dep_data in deplacements_data:
@@ -198,7 +229,7 @@ class RapportDepense(Document):
         for rep_data in repas_data:
             try:
                 # Passer base_path_for_factures car Repas peut contenir une Facture
-                rapport.ajouter_repas(Repas.from_dict(rep_data, base_path_for_factures))
+                rapport.ajouter_repas(Repas.from_dict(rep_data, base_path_for_factures, factures_archive_path))
             except Exception as e:
                 print(f"AVERTISSEMENT: Erreur reconstruction repas: {e}. Item ignoré.")
 
@@ -207,7 +238,7 @@ class RapportDepense(Document):
         for dd_data in depenses_diverses_data:
             try:
                 # Passer base_path_for_factures car Depense peut contenir une Facture
-                rapport.ajouter_depense(Depense.from_dict(dd_data, base_path_for_factures))
+                rapport.ajouter_depense(Depense.from_dict(dd_data, base_path_for_factures, factures_archive_path))
             except Exception as e:
                 print(f"AVERTISSEMENT: Erreur reconstruction dépense diverse: {e}. Item ignoré.")
 
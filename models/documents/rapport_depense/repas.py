@@ -100,7 +100,8 @@ class Repas:
         }
 
     @classmethod
-    def from_dict(cls, data: dict, base_path_for_factures_in_zip: str) -> 'Repas':
+    def from_dict(cls, data: dict, base_path_for_factures_in_zip: str,
+                  archive_path: Optional[str] = None) -> 'Repas':
         """
         Crée une instance de Repas à partir d'un dictionnaire.
 
@@ -109,6 +110,7 @@ class Repas:
             base_path_for_factures_in_zip: Le chemin du répertoire 'factures'
                                              où les dossiers de factures individuels (nommés par folder_name)
                                              ont été copiés après extraction du .rdj.
+            archive_path: Optionnel. Archive .rdj d'où la facture sera extraite à la demande.
         
         Returns:
             Une instance de Repas.
@@ -124,7 +126,7 @@ class Repas:
         facture_obj = None
         if facture_data:
             try:
-                facture_obj = Facture.from_dict(facture_data, base_path_for_factures_in_zip)
+                facture_obj = Facture.from_dict(facture_data, base_path_for_factures_in_zip, archive_path)
             except Exception as e:
                 # Log l'erreur et continuer sans facture, ou remonter l'erreur
                 # selon la politique de gestion des erreurs souhaitée.
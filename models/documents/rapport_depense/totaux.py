@@ -0,0 +1,266 @@
+"""
+Moteur de totaux d'un RapportDepense.
+
+Les montants, indicateurs de payeur, colonnes de taxes, dates et présence de facture
+de chaque entrée sont tenus dans des colonnes NumPy (un tableau structuré par
+catégorie) alignées sur les listes du rapport. Les colonnes sont mises à jour à
+l'ajout, à la suppression et à la modification d'une entrée; tous les agrégats
+affichés par la page et imprimés dans le PDF sont ensuite calculés en une passe
+vectorisée au lieu de reparcourir les objets.
+"""
+
+from dataclasses import dataclass
+from datetime import date
+from typing import Optional
+
+import numpy as np
+
+from .deplacement import Deplacement
+from .repas import Repas
+from .depense import Depense
+
+# Colonnes tenues pour chaque catégorie
+DEPLACEMENT_DTYPE = np.dtype([
+    ('date', 'datetime64[D]'),
+    ('kilometrage', np.float64),
+    ('montant', np.float64),
+])
+REPAS_DTYPE = np.dtype([
+    ('date', 'datetime64[D]'),
+    ('payeur', np.bool_), # True = Employé
+    ('refacturer', np.bool_),
+    ('avant_taxes', np.float64),
+    ('pourboire', np.float64),
+    ('tps', np.float64),
+    ('tvq', np.float64),
+    ('tvh', np.float64),
+    ('apres_taxes', np.float64),
+    ('a_facture', np.bool_),
+])
+DEPENSE_DTYPE = np.dtype([
+    ('date', 'datetime64[D]'),
+    ('payeur', np.bool_),
+    ('avant_taxes', np.float64),
+    ('tps', np.float64),
+    ('tvq', np.float64),
+    ('tvh', np.float64),
+    ('apres_taxes', np.float64),
+    ('a_facture', np.bool_),
+])
+
+
+def _date64(valeur) -> np.datetime64:
+    return np.datetime64(valeur, 'D') if isinstance(valeur, date) else np.datetime64('NaT')
+
+
+def _montant(entree, attribut: str) -> float:
+    valeur = getattr(entree, attribut, 0.0)
+    try:
+        return float(valeur) if valeur is not None else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _a_facture(entree) -> bool:
+    facture = getattr(entree, 'facture', None)
+    return facture is not None and bool(getattr(facture, 'filenames', []))
+
+
+def _ligne_deplacement(d) -> tuple:
+    return (_date64(d.date), _montant(d, 'kilometrage'), _montant(d, 'montant'))
+
+
+def _ligne_repas(r) -> tuple:
+    return (_date64(r.date), bool(getattr(r, 'payeur', True)), bool(getattr(r, 'refacturer', False)),
+            _montant(r, 'totale_avant_taxes'), _montant(r, 'pourboire'),
+            _montant(r, 'tps'), _montant(r, 'tvq'), _montant(r, 'tvh'),
+            _montant(r, 'totale_apres_taxes'), _a_facture(r))
+
+
+def _ligne_depense(d) -> tuple:
+    return (_date64(d.date), bool(getattr(d, 'payeur', True)),
+            _montant(d, 'totale_avant_taxes'),
+            _montant(d, 'tps'), _montant(d, 'tvq'), _montant(d, 'tvh'),
+            _montant(d, 'totale_apres_taxes'), _a_facture(d))
+
+
+class _Colonnes:
+    """Tableau structuré à capacité croissante; les lignes [0, n) sont valides."""
+
+    def __init__(self, dtype: np.dtype, capacite: int = 16):
+        self._data = np.zeros(capacite, dtype=dtype)
+        self.n = 0
+
+    def vue(self) -> np.ndarray:
+        return self._data[:self.n]
+
+    def ajouter(self, ligne: tuple):
+        if self.n == len(self._data):
+            agrandi = np.zeros(max(16, 2 * len(self._data)), dtype=self._data.dtype)
+            agrandi[:self.n] = self._data[:self.n]
+            self._data = agrandi
+        self._data[self.n] = ligne
+        self.n += 1
+
+    def remplacer(self, index: int, ligne: tuple):
+        self._data[index] = ligne
+
+    def retirer(self, index: int):
+        self._data[index:self.n - 1] = self._data[index + 1:self.n]
+        self.n -= 1
+
+    def recharger(self, lignes):
+        self._data = np.array(list(lignes), dtype=self._data.dtype) if lignes else np.zeros(16, dtype=self._data.dtype)
+        self.n = len(lignes)
+
+
+@dataclass(frozen=True)
+class ResumeTotaux:
+    """Agrégats d'un rapport, tels qu'affichés par la page et imprimés dans le PDF."""
+    nombre_deplacements: int = 0
+    total_kilometrage: float = 0.0
+    total_deplacements: float = 0.0
+
+    repas_employe_count: int = 0
+    repas_employe_total: float = 0.0
+    repas_jacmar_count: int = 0
+    repas_jacmar_total: float = 0.0
+    repas_factures_manquantes: int = 0
+    repas_pourboires: float = 0.0
+    repas_tps: float = 0.0
+    repas_tvq: float = 0.0
+    repas_tvh: float = 0.0
+
+    depense_employe_count: int = 0
+    depense_employe_total: float = 0.0
+    depense_jacmar_count: int = 0
+    depense_jacmar_total: float = 0.0
+    depense_factures_manquantes: int = 0
+    depense_tps: float = 0.0
+    depense_tvq: float = 0.0
+    depense_tvh: float = 0.0
+
+    premiere_date: Optional[date] = None
+    derniere_date: Optional[date] = None
+
+    @property
+    def total_general(self) -> float:
+        """Total remboursé à l'employé (déplacements + repas et dépenses payés par l'employé)."""
+        return self.total_deplacements + self.repas_employe_total + self.depense_employe_total
+
+
+class TotauxRapport:
+    """
+    Vue en colonnes des entrées d'un RapportDepense, tenue à jour incrémentalement.
+
+    Les lignes suivent l'ordre des listes du rapport (deplacements, repas,
+    depenses_diverses). Le rapport notifie chaque changement: ajouter_*, retirer_entree
+    et entree_modifiee (à appeler après avoir modifié les attributs d'une entrée ou de sa
+    facture). Les listes ne doivent pas être modifiées sans passer par le rapport.
+    """
+
+    def __init__(self, rapport):
+        self._rapport = rapport
+        self._deplacements = _Colonnes(DEPLACEMENT_DTYPE)
+        self._repas = _Colonnes(REPAS_DTYPE)
+        self._depenses = _Colonnes(DEPENSE_DTYPE)
+        self._resume: Optional[ResumeTotaux] = None
+        self.reconstruire()
+
+    def _categorie(self, entree):
+        """Retourne (colonnes, liste du rapport, conversion en ligne) pour le type de l'entrée."""
+        if isinstance(entree, Deplacement):
+            return self._deplacements, self._rapport.deplacements, _ligne_deplacement
+        if isinstance(entree, Repas):
+            return self._repas, self._rapport.repas, _ligne_repas
+        if isinstance(entree, Depense):
+            return self._depenses, self._rapport.depenses_diverses, _ligne_depense
+        raise TypeError(f"Type d'entrée non pris en charge par les totaux: {type(entree).__name__}")
+
+    @staticmethod
+    def _index_de(liste, entree) -> int:
+        for index, item in enumerate(liste):
+            if item is entree:
+                return index
+        return -1
+
+    def reconstruire(self):
+        """Reconstruit toutes les colonnes à partir des listes du rapport."""
+        self._deplacements.recharger([_ligne_deplacement(d) for d in self._rapport.deplacements])
+        self._repas.recharger([_ligne_repas(r) for r in self._rapport.repas])
+        self._depenses.recharger([_ligne_depense(d) for d in self._rapport.depenses_diverses])
+        self._resume = None
+
+    def entree_ajoutee(self, entree):
+        """À appeler après l'ajout de l'entrée à la fin de sa liste."""
+        colonnes, liste, ligne = self._categorie(entree)
+        if colonnes.n == len(liste) - 1:
+            colonnes.ajouter(ligne(entree))
+        else:
+            colonnes.recharger([ligne(item) for item in liste])
+        self._resume = None
+
+    def entree_retiree(self, entree, index: int):
+        """À appeler après le retrait de l'entrée qui occupait la position 'index' de sa liste."""
+        colonnes, liste, ligne = self._categorie(entree)
+        if colonnes.n == len(liste) + 1 and 0 <= index < colonnes.n:
+            colonnes.retirer(index)
+        else:
+            colonnes.recharger([ligne(item) for item in liste])
+        self._resume = None
+
+    def entree_modifiee(self, entree):
+        """À appeler après la modification des attributs d'une entrée du rapport."""
+        colonnes, liste, ligne = self._categorie(entree)
+        index = self._index_de(liste, entree)
+        if colonnes.n == len(liste) and index >= 0:
+            colonnes.remplacer(index, ligne(entree))
+        else:
+            colonnes.recharger([ligne(item) for item in liste])
+        self._resume = None
+
+    def resume(self) -> ResumeTotaux:
+        """Retourne tous les agrégats du rapport (mis en cache jusqu'à la prochaine modification)."""
+        if self._resume is None:
+            self._resume = self._calculer()
+        return self._resume
+
+    def _calculer(self) -> ResumeTotaux:
+        dep = self._deplacements.vue()
+        rep = self._repas.vue()
+        div = self._depenses.vue()
+
+        rep_emp = rep['payeur']
+        div_emp = div['payeur']
+        rep_apres = rep['apres_taxes']
+        div_apres = div['apres_taxes']
+
+        dates = np.concatenate((dep['date'], rep['date'], div['date']))
+        dates = dates[~np.isnat(dates)]
+        premiere = dates.min().astype(date) if dates.size else None
+        derniere = dates.max().astype(date) if dates.size else None
+
+        return ResumeTotaux(
+            nombre_deplacements=int(dep.size),
+            total_kilometrage=float(dep['kilometrage'].sum()),
+            total_deplacements=float(dep['montant'].sum()),
+            repas_employe_count=int(np.count_nonzero(rep_emp)),
+            repas_employe_total=float(rep_apres[rep_emp].sum()),
+            repas_jacmar_count=int(rep.size - np.count_nonzero(rep_emp)),
+            repas_jacmar_total=float(rep_apres[~rep_emp].sum()),
+            repas_factures_manquantes=int(rep.size - np.count_nonzero(rep['a_facture'])),
+            repas_pourboires=float(rep['pourboire'].sum()),
+            repas_tps=float(rep['tps'].sum()),
+            repas_tvq=float(rep['tvq'].sum()),
+            repas_tvh=float(rep['tvh'].sum()),
+            depense_employe_count=int(np.count_nonzero(div_emp)),
+            depense_employe_total=float(div_apres[div_emp].sum()),
+            depense_jacmar_count=int(div.size - np.count_nonzero(div_emp)),
+            depense_jacmar_total=float(div_apres[~div_emp].sum()),
+            depense_factures_manquantes=int(div.size - np.count_nonzero(div['a_facture'])),
+            depense_tps=float(div['tps'].sum()),
+            depense_tvq=float(div['tvq'].sum()),
+            depense_tvh=float(div['tvh'].sum()),
+            premiere_date=premiere,
+            derniere_date=derniere,
+        )
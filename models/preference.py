@@ -87,6 +87,25 @@ class Application:
                 else:
                     setattr(self, key, value)
 
+class Lasers:
+    """Lasers Epilog de l'atelier (un travailleur de la file d'impression par machine)."""
+    def __init__(self, machines: list = None):
+        # Chaque machine: {"nom": ..., "modele": clé de EPILOG_MODEL_TO_ENUM_MAP, "ip": ...,
+        # "port": optionnel, envoi TCP brut au lieu de prn_gen_send_file (ex: faux laser local)}
+        self.machines = machines if machines is not None else [
+            {"nom": "Fusion Maker 24", "modele": "fusionmaker24", "ip": "192.168.100.211"}
+        ]
+
+    def to_dict(self):
+        """Retourne une représentation dictionnaire de l'objet."""
+        return self.__dict__
+
+    def update_from_dict(self, data: dict):
+        """Met à jour les attributs depuis un dictionnaire."""
+        machines = data.get('machines')
+        if isinstance(machines, list):
+            self.machines = [m for m in machines if isinstance(m, dict) and m.get('nom') and m.get('ip')]
+
 # --- MODIFICATION: Transformer Preference en Singleton --- 
 class Preference:
     """Classe Singleton contenant toutes les préférences."""
@@ -113,6 +132,7 @@ class Preference:
         self.profile = Profile()
         self.jacmar = Jacmar()
         self.application = Application()
+        self.lasers = Lasers()
         
         # Charger les données depuis le fichier
         self.load() # Appelle la méthode load de CETTE instance
@@ -135,7 +155,8 @@ class Preference:
         return {
             "profile": self.profile.to_dict(),
             "jacmar": self.jacmar.to_dict(),
-            "application": self.application.to_dict()
+            "application": self.application.to_dict(),
+            "lasers": self.lasers.to_dict()
         }
 
     def save(self, relative_filepath=None):
@@ -187,6 +208,8 @@ class Preference:
                 self.jacmar.update_from_dict(loaded_data['jacmar'])
             if 'application' in loaded_data and isinstance(loaded_data['application'], dict):
                 self.application.update_from_dict(loaded_data['application'])
+            if 'lasers' in loaded_data and isinstance(loaded_data['lasers'], dict):
+                self.lasers.update_from_dict(loaded_data['lasers'])
                 
             logger.info(f"Préférences chargées avec succès depuis {absolute_filepath}")
             return True
@@ -206,6 +229,8 @@ class Preference:
              self.jacmar.update_from_dict(data['jacmar'])
          if 'application' in data and isinstance(data['application'], dict):
              self.application.update_from_dict(data['application'])
+         if 'lasers' in data and isinstance(data['lasers'], dict):
+             self.lasers.update_from_dict(data['lasers'])
 
 # Exemple d'utilisation:
 if __name__ == '__main__':
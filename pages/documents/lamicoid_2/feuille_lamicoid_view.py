@@ -153,9 +153,11 @@ class FeuilleLamicoidView(QGraphicsView):
         """Ajuste la vue lorsque le widget est redimensionné."""
         super().resizeEvent(event)
 
-    def add_lamicoid_from_template(self, template: TemplateLamicoid):
+    def add_lamicoid_from_template(self, template: TemplateLamicoid, x_mm: float = 0.0, y_mm: float = 0.0,
+                                   rotation_deg: float = 0.0):
         """
-        Crée un groupe d'items graphiques à partir d'un template et l'ajoute à la scène.
+        Crée un groupe d'items graphiques à partir d'un template et l'ajoute à la scène,
+        le coin supérieur gauche de son encombrement en (x_mm, y_mm) sur la feuille.
         """
         # Créer le groupe qui contiendra tous les éléments du lamicoid
         lamicoid_group = QGraphicsItemGroup()
@@ -181,8 +183,16 @@ class FeuilleLamicoidView(QGraphicsView):
                 item.setPos(element.x_mm, element.y_mm)
                 lamicoid_group.addToGroup(item)
                 
+        # Position sur la feuille; un quart de tour horaire est compensé pour garder le coin sup. gauche
+        if rotation_deg % 360 == 90:
+            lamicoid_group.setRotation(90)
+            lamicoid_group.setPos(x_mm + template.hauteur_mm, y_mm)
+        else:
+            lamicoid_group.setPos(x_mm, y_mm)
+
         # Ajouter le groupe complet à la scène
         self.scene.addItem(lamicoid_group)
+        return lamicoid_group
 
     def display_feuille(self, feuille_lamicoid: FeuilleLamicoid):
         """Affiche le contenu d'un objet FeuilleLamicoid."""
@@ -1,11 +1,13 @@
 # pages/documents/lamicoid_2_page.py
 """Définit la page principale pour la gestion des documents Lamicoid v2."""
 
+import functools
 import logging
 import uuid
 from PyQt5.QtWidgets import (QWidget, QHBoxLayout, QVBoxLayout, QPushButton, QLabel, 
-                             QFrame, QStackedWidget, QComboBox, QSizePolicy, QAction, QToolBar, QListWidget, QGroupBox)
-from PyQt5.QtCore import Qt, QSize, QTimer
+                             QFrame, QStackedWidget, QComboBox, QSizePolicy, QAction, QToolBar, QListWidget, QGroupBox,
+                             QMessageBox, QFileDialog, QApplication, QProgressDialog)
+from PyQt5.QtCore import Qt, QSize, QTimer, QThread
 from PyQt5.QtGui import QIcon, QColor, QPixmap
 from typing import Dict, Optional
 import os
@@ -13,11 +15,14 @@ import os
 from utils.icon_loader import get_icon_path
 from ui.components.frame import Frame
 from ui.delegates.icon_only_delegate import IconOnlyDelegate
-from models.documents.lamicoid_2.feuille_lamicoid import FeuilleLamicoid
+from models.documents.lamicoid_2.feuille_lamicoid import FeuilleLamicoid, LamicoidPositionne
+from models.documents.lamicoid_2.nesting import feuille_hors_format, nouveau_lamicoid
 from .lamicoid_2.editor_page import EditorPage
 from .lamicoid_2.feuille_lamicoid_view import FeuilleLamicoidView
 from models.documents.lamicoid_2.template_lamicoid import TemplateLamicoid
 from utils.template_loader import load_template_from_tlj
+from utils.feuille_lamicoid_svg import exporter_feuilles_svg
+from utils.lamicoid_nesting_runner import LamicoidNestingWorker
 from utils import paths
 
 logger = logging.getLogger('GDJ_App')
@@ -32,6 +37,9 @@ class Lamicoid2Page(QWidget):
         self.setObjectName("Lamicoid2PageContainer")
         
         self.feuille_lamicoid = FeuilleLamicoid(largeur_feuille_mm=600, hauteur_feuille_mm=300)
+        self.feuilles = [self.feuille_lamicoid] # Feuilles de production (plusieurs après imbrication)
+        self._templates = {} # template_id -> TemplateLamicoid des lamicoids ajoutés
+        self._active_nesting_job = None # (QThread, LamicoidNestingWorker) de l'import/imbrication en cours
         self._is_first_show = True
 
         self.stack = QStackedWidget()
@@ -98,6 +106,11 @@ class Lamicoid2Page(QWidget):
         template_list_group.setLayout(template_list_layout)
         
         left_layout.addWidget(template_list_group)
+
+        self.import_spreadsheet_button = QPushButton("Importer un tableur (CSV/Excel)...")
+        self.import_spreadsheet_button.setToolTip(
+            "Crée un lamicoid par ligne du tableur à partir du template sélectionné.")
+        left_layout.addWidget(self.import_spreadsheet_button)
         
         left_layout.addStretch(1)
         left_panel_content_layout.addWidget(left_content_widget)
@@ -164,6 +177,24 @@ class Lamicoid2Page(QWidget):
             self.color_combo.setItemData(self.color_combo.count() - 1, name, Qt.UserRole)
             
         toolbar_layout.addWidget(self.color_combo)
+
+        separator_nesting = QFrame()
+        separator_nesting.setFrameShape(QFrame.VLine)
+        separator_nesting.setFrameShadow(QFrame.Sunken)
+        toolbar_layout.addWidget(separator_nesting)
+
+        self.nest_button = QPushButton("Imbriquer")
+        self.nest_button.setToolTip("Disposer automatiquement les lamicoids sur le moins de feuilles possible.")
+        toolbar_layout.addWidget(self.nest_button)
+        self.sheet_combo = QComboBox()
+        self.sheet_combo.addItem("Feuille 1")
+        toolbar_layout.addWidget(self.sheet_combo)
+        self.utilisation_label = QLabel("")
+        toolbar_layout.addWidget(self.utilisation_label)
+        self.export_svg_button = QPushButton("Exporter SVG")
+        self.export_svg_button.setToolTip("Écrire un fichier SVG par feuille de production.")
+        toolbar_layout.addWidget(self.export_svg_button)
+
         toolbar_layout.addStretch()
         layout.addLayout(toolbar_layout)
 
@@ -185,11 +216,15 @@ class Lamicoid2Page(QWidget):
 
         # Connexion pour la liste des templates
         self.template_list.itemDoubleClicked.connect(self.on_template_double_clicked)
+        self.import_spreadsheet_button.clicked.connect(self._on_import_spreadsheet_clicked)
 
         self.zoom_in_button.clicked.connect(self.feuille_view.zoom_in)
         self.zoom_out_button.clicked.connect(self.feuille_view.zoom_out)
         self.zoom_to_fit_button.clicked.connect(self.feuille_view.zoom_to_fit)
         self.color_combo.currentIndexChanged.connect(self._on_color_selected)
+        self.nest_button.clicked.connect(self._on_nest_clicked)
+        self.sheet_combo.currentIndexChanged.connect(self._display_sheet)
+        self.export_svg_button.clicked.connect(self._on_export_svg_clicked)
 
     def _on_color_selected(self, index):
         """Appelé lorsque l'utilisateur sélectionne une couleur."""
@@ -213,10 +248,181 @@ class Lamicoid2Page(QWidget):
         
         if loaded_template:
             logger.info(f"Template '{template_name}' chargé. Ajout à la feuille.")
+            self._templates[loaded_template.template_id] = loaded_template
+            feuille = self.feuilles[max(self.sheet_combo.currentIndex(), 0)]
+            feuille.lamicoids_sur_feuille.append(LamicoidPositionne(nouveau_lamicoid(loaded_template), 0.0, 0.0))
             self.feuille_view.add_lamicoid_from_template(loaded_template)
         else:
             logger.error(f"Échec du chargement du template '{template_name}'.")
 
+    def _on_nest_clicked(self):
+        """Répartit tous les lamicoids des feuilles sur le moins de feuilles possible."""
+        lamicoids = self._lamicoids_des_feuilles()
+        if not lamicoids:
+            QMessageBox.information(self, "Imbrication", "Aucun lamicoid à disposer sur la feuille.")
+            return
+        self._start_nesting_job("Imbrication", lamicoids)
+
+    def _lamicoids_des_feuilles(self):
+        return [positionne.lamicoid for feuille in self.feuilles for positionne in feuille.lamicoids_sur_feuille]
+
+    def _start_nesting_job(self, title: str, lamicoids, spreadsheet_path: Optional[str] = None,
+                           template: Optional[TemplateLamicoid] = None):
+        """
+        Lance l'import du tableur (optionnel) et l'imbrication dans un thread, avec une boîte
+        de progression annulable; le résultat est appliqué par _on_nesting_job_finished.
+        """
+        if self._active_nesting_job is not None:
+            QMessageBox.information(self, title, "Une imbrication est déjà en cours.")
+            return
+
+        label = "Lecture du tableur et imbrication..." if spreadsheet_path else "Imbrication des lamicoids..."
+        progress_dialog = QProgressDialog(label, "Annuler", 0, 0, self)
+        progress_dialog.setWindowTitle(title)
+        progress_dialog.setWindowModality(Qt.WindowModal)
+        progress_dialog.setMinimumDuration(300)
+
+        job_thread = QThread(self)
+        job_worker = LamicoidNestingWorker(lamicoids, self._templates, self.feuille_lamicoid,
+                                           spreadsheet_path=spreadsheet_path, template=template)
+        job_worker.moveToThread(job_thread)
+
+        job_worker.finished.connect(functools.partial(self._on_nesting_job_finished, progress_dialog, title, template))
+        progress_dialog.canceled.connect(lambda: job_worker.request_abort())
+        job_thread.started.connect(job_worker.run)
+        job_worker.finished.connect(job_thread.quit)
+        job_thread.finished.connect(job_thread.deleteLater)
+        job_worker.finished.connect(job_worker.deleteLater)
+
+        self._active_nesting_job = (job_thread, job_worker)
+        job_thread.start()
+
+    def _on_nesting_job_finished(self, progress_dialog: QProgressDialog, title: str,
+                                 template: Optional[TemplateLamicoid], result):
+        """Appelé (dans le thread GUI) à la fin d'un import/imbrication."""
+        self._active_nesting_job = None
+        progress_dialog.close()
+        progress_dialog.deleteLater()
+        if result.error is not None:
+            QMessageBox.critical(self, title, result.error)
+            return
+        if result.aborted:
+            logger.info(f"{title}: annulé, les feuilles actuelles sont conservées.")
+            return
+
+        applied = False
+        if result.nesting is not None:
+            applied = self._apply_nesting(result.lamicoids, result.feuilles, result.nesting)
+            if applied and template is not None:
+                self._templates[template.template_id] = template
+        if result.import_result is not None:
+            self._report_import(title, result.import_result, applied)
+
+    def _apply_nesting(self, lamicoids, feuilles, resultat) -> bool:
+        """
+        Remplace les feuilles par celles de l'imbrication et affiche la première.
+        Les lamicoids trop grands sont conservés sur une feuille « hors format » ajoutée à la fin,
+        après confirmation; si l'utilisateur refuse, les feuilles actuelles restent intactes.
+        Retourne True si les feuilles ont été remplacées.
+        """
+        logger.info(f"Imbrication: {len(lamicoids)} lamicoids sur {resultat.nombre_feuilles} feuille(s), "
+                    f"utilisation {resultat.utilisation_moyenne:.1%}, {len(resultat.non_placees)} non placé(s).")
+        feuilles = list(feuilles)
+        libelles = [f"Feuille {index + 1} ({utilisation:.0%})"
+                    for index, utilisation in enumerate(resultat.utilisation_par_feuille)]
+        if resultat.non_placees:
+            reponse = QMessageBox.question(
+                self, "Imbrication",
+                f"{len(resultat.non_placees)} lamicoid(s) plus grand(s) que la feuille ne peuvent pas être "
+                f"imbriqués.\nIls seront conservés sur une feuille « hors format » à la fin. Continuer?",
+                QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+            if reponse != QMessageBox.Yes:
+                logger.info("Imbrication annulée: les feuilles actuelles sont conservées.")
+                return False
+            feuilles.append(feuille_hors_format(resultat.non_placees, self.feuille_lamicoid))
+            libelles.append(f"Feuille {len(feuilles)} (hors format)")
+        if not feuilles:
+            return False
+        self.feuilles = feuilles
+        self.feuille_lamicoid = feuilles[0]
+        self.utilisation_label.setText(
+            f"{resultat.nombre_feuilles} feuille(s), utilisation {resultat.utilisation_moyenne:.0%}")
+
+        self.sheet_combo.blockSignals(True)
+        self.sheet_combo.clear()
+        self.sheet_combo.addItems(libelles)
+        self.sheet_combo.blockSignals(False)
+        self._display_sheet(0)
+        return True
+
+    def _on_import_spreadsheet_clicked(self):
+        """Crée les lamicoids d'un tableur (template sélectionné) puis les dispose sur les feuilles."""
+        item = self.template_list.currentItem()
+        if item is None:
+            QMessageBox.information(self, "Importer un tableur", "Sélectionnez d'abord un template dans la liste.")
+            return
+        template = load_template_from_tlj(os.path.join(self.templates_dir, item.text()))
+        if template is None:
+            QMessageBox.critical(self, "Importer un tableur", f"Impossible de charger le template '{item.text()}'.")
+            return
+        file_path, _ = QFileDialog.getOpenFileName(self, "Importer un tableur", "",
+                                                   "Tableurs (*.csv *.xlsx *.xlsm);;Tous les fichiers (*)")
+        if not file_path:
+            return
+        self._start_nesting_job("Importer un tableur", self._lamicoids_des_feuilles(),
+                                spreadsheet_path=file_path, template=template)
+
+    def _report_import(self, title: str, resultat, applied: bool):
+        """Affiche le bilan de l'import d'un tableur."""
+        logger.info(f"Tableur: {len(resultat.lamicoids)} lamicoid(s) créé(s), "
+                    f"{len(resultat.erreurs)} ligne(s) rejetée(s) sur {resultat.lignes_lues}.")
+        lines = [f"{len(resultat.lamicoids)} lamicoid(s) créé(s) à partir de {resultat.lignes_lues} ligne(s)."]
+        if resultat.lamicoids and not applied:
+            lines.append("Les lamicoids importés n'ont pas été ajoutés: les feuilles sont inchangées.")
+        if resultat.colonnes_ignorees:
+            lines.append(f"Colonnes ignorées: {', '.join(resultat.colonnes_ignorees)}")
+        if resultat.erreurs:
+            lines.append(f"{len(resultat.erreurs)} ligne(s) rejetée(s):")
+            lines.extend(f"  Ligne {erreur.numero_ligne}: {erreur.message}" for erreur in resultat.erreurs[:15])
+            if len(resultat.erreurs) > 15:
+                lines.append(f"  ... et {len(resultat.erreurs) - 15} autre(s).")
+        if resultat.erreurs or not resultat.lamicoids or not applied:
+            QMessageBox.warning(self, title, "\n".join(lines))
+        else:
+            QMessageBox.information(self, title, "\n".join(lines))
+
+    def _on_export_svg_clicked(self):
+        """Écrit un SVG par feuille de production dans le dossier choisi."""
+        if not any(feuille.lamicoids_sur_feuille for feuille in self.feuilles):
+            QMessageBox.information(self, "Exporter SVG", "Aucun lamicoid sur les feuilles.")
+            return
+        directory = QFileDialog.getExistingDirectory(self, "Dossier de destination des feuilles SVG")
+        if not directory:
+            return
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            chemins = exporter_feuilles_svg(self.feuilles, self._templates, directory)
+        except OSError as e:
+            QApplication.restoreOverrideCursor()
+            logger.error(f"Export SVG des feuilles impossible: {e}")
+            QMessageBox.critical(self, "Exporter SVG", f"Erreur lors de l'écriture des fichiers SVG:\n{e}")
+            return
+        QApplication.restoreOverrideCursor()
+        QMessageBox.information(self, "Exporter SVG", f"{len(chemins)} feuille(s) exportée(s) dans:\n{directory}")
+
+    def _display_sheet(self, index: int):
+        """Affiche une des feuilles de production avec ses lamicoids positionnés."""
+        if not 0 <= index < len(self.feuilles):
+            return
+        feuille = self.feuilles[index]
+        self.feuille_view.display_feuille(feuille)
+        self._on_color_selected(self.color_combo.currentIndex())
+        for positionne in feuille.lamicoids_sur_feuille:
+            template = self._templates.get(positionne.lamicoid.template_id)
+            if template is not None:
+                self.feuille_view.add_lamicoid_from_template(template, positionne.position_x_mm,
+                                                             positionne.position_y_mm, positionne.rotation_deg)
+
     def load_template_list(self):
         """Charge et affiche la liste des fichiers .tlj disponibles."""
         self.templates_dir = paths.get_path('lamicoid_templates')
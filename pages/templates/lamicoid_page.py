@@ -2,9 +2,10 @@ from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushBut
                              QFrame, QScrollArea, QFormLayout, QDateEdit, 
                              QLineEdit, QSpinBox, QComboBox, QSizePolicy, QMessageBox,
                              QStackedWidget, QDialog, QDoubleSpinBox, QFileDialog, QGraphicsItem,
-                             QColorDialog, QStyledItemDelegate, QStyle, QInputDialog)
-from PyQt5.QtCore import Qt, QDate, pyqtSignal, QSize, QPointF, QSizeF
+                             QColorDialog, QStyledItemDelegate, QStyle, QInputDialog, QProgressDialog)
+from PyQt5.QtCore import Qt, QDate, pyqtSignal, QSize, QPointF, QSizeF, QThread
 from PyQt5.QtGui import QFont, QIcon, QColor, QStandardItemModel, QStandardItem
+import functools
 import logging
 import os
 import json
@@ -20,9 +21,13 @@ from dialogs.variable_config_dialog import VariableConfigDialog
 from dialogs.existing_variables_dialog import ExistingVariablesDialog
 from models.documents.lamicoid.lamicoid import LamicoidDocument
 from models.documents.lamicoid.lamicoid_item import LamicoidItem
-from utils.epilog_printer import send_lamicoid_to_epilog
+from utils.epilog_job_runner import EpilogJobWorker
+from utils.epilog_cpp_wrapper import write_print_data
+from utils.print_queue import PrintQueue, configured_lasers, STATUS_DONE, STATUS_FAILED
 from utils.lamicoid_to_epilog_converter import generate_svg_for_epilog, generate_settings_json_for_custom_lamicoid # Ajout de l'import
 from utils.lamicoid_to_svg_paths_converter import generate_svg_with_text_as_paths # NOUVEL IMPORT
+from utils.svg_path_optimizer import optimize_svg_paths
+from config import CONFIG
 
 logger = logging.getLogger('GDJ_App')
 
@@ -72,6 +77,8 @@ class LamicoidPage(QWidget):
         super().__init__(parent)
         self.setObjectName("LamicoidPage")
         self.project_variables = [] # Liste pour stocker les variables
+        self._active_epilog_job = None # (QThread, EpilogJobWorker) de l'envoi en cours
+        self._queued_print_jobs = set() # job_id soumis à la file d'impression depuis cette page
         
         self._init_ui()
         self._connect_signals()
@@ -1480,34 +1487,149 @@ class LamicoidPage(QWidget):
             QMessageBox.warning(self, "Données manquantes", "Les données SVG n'ont pas pu être préparées pour le test Epilog.")
             return
 
-        machine_model_str = "fusionmaker24"
-        printer_ip = "192.168.100.211" # IP corrigée de la machine
-        
+        laser = self._choose_laser("Test de gravure Epilog")
+        if laser is None:
+            return
+        machine_model_str = laser.modele
+        printer_ip = laser.ip
+
         logger.info(f"Envoi du job de gravure test (SVG: {len(svg_data_str)} octets, JSON: {settings_dict.get('job_name')}) à {printer_ip} pour machine {machine_model_str}")
 
-        success, message_or_data = send_lamicoid_to_epilog(
-            svg_content=svg_data_str,
-            machine_model_name=machine_model_str,
-            laser_ip_address=printer_ip,
-            test_settings=settings_dict # Utiliser le dictionnaire JSON pour la gravure
-        )
+        self._start_epilog_job(svg_data_str, settings_dict, machine_model_str, printer_ip,
+                               "Test de gravure Epilog", on_success=self._offer_to_save_prn_data,
+                               keep_prn_data=True)
 
-        if success:
-            logger.info(f"Test de gravure Epilog (avec SVG exemple) semble avoir réussi. Données PRN reçues: {len(message_or_data)} octets")
-            save_path, _ = QFileDialog.getSaveFileName(self, "Sauvegarder les données de gravure", "", "Fichiers PRN (*.prn)")
-            if save_path:
-                try:
-                    with open(save_path, 'wb') as f:
-                        f.write(message_or_data)
-                    QMessageBox.information(self, "Succès", f"Données de gravure sauvegardées dans {save_path}")
-                except Exception as e:
-                    logger.error(f"Erreur lors de la sauvegarde des données de gravure : {e}")
-                    QMessageBox.critical(self, "Erreur Sauvegarde", f"Impossible de sauvegarder les données :\\n{e}")
+    def _offer_to_save_prn_data(self, result):
+        """Propose de sauvegarder le fichier PRN d'un travail Epilog réussi."""
+        logger.info(f"Test de gravure Epilog (avec SVG exemple) semble avoir réussi. Données PRN reçues: {len(result.prn_data or b'')} octets")
+        save_path, _ = QFileDialog.getSaveFileName(self, "Sauvegarder les données de gravure", "", "Fichiers PRN (*.prn)")
+        if save_path:
+            try:
+                write_print_data(save_path, result.prn_data or b'')
+                QMessageBox.information(self, "Succès", f"Données de gravure sauvegardées dans {save_path}")
+            except Exception as e:
+                logger.error(f"Erreur lors de la sauvegarde des données de gravure : {e}")
+                QMessageBox.critical(self, "Erreur Sauvegarde", f"Impossible de sauvegarder les données :\n{e}")
+        else:
+            QMessageBox.information(self, "Succès", "Le test de gravure Epilog a réussi, mais les données PRN n'ont pas été sauvegardées.\n\nLe job devrait être sur la machine.")
+
+    def _choose_laser(self, title: str):
+        """Retourne le laser configuré à utiliser (choix demandé s'il y en a plusieurs), ou None."""
+        lasers = configured_lasers()
+        if not lasers:
+            QMessageBox.warning(self, title, "Aucun laser Epilog n'est configuré dans les préférences.")
+            return None
+        if len(lasers) == 1:
+            return lasers[0]
+        names = [f"{laser.nom} ({laser.ip})" for laser in lasers]
+        choice, ok = QInputDialog.getItem(self, title, "Laser:", names, 0, False)
+        return lasers[names.index(choice)] if ok else None
+
+    def _optimize_svg_for_epilog(self, svg_content: str) -> str:
+        """
+        Étape optionnelle (CONFIG['SVG_PATH_TOLERANCE_MM'], 0 = désactivée): simplifie les chemins
+        des SVG générés par les convertisseurs Lamicoid, dont les unités utilisateur sont des mm.
+        Le SVG d'exemple du test de gravure (_handle_print_test_epilog) n'est pas concerné:
+        ses unités ne sont pas connues.
+        """
+        tolerance_mm = CONFIG.get('SVG_PATH_TOLERANCE_MM', 0.0)
+        if tolerance_mm <= 0:
+            return svg_content
+        svg_content, path_stats = optimize_svg_paths(svg_content, tolerance_mm)
+        if path_stats.points_before:
+            logger.info(f"Chemins SVG simplifiés avant l'envoi au laser: {path_stats.paths} chemin(s), "
+                        f"{path_stats.points_before} -> {path_stats.points_after} point(s) "
+                        f"(-{100 * path_stats.points_removed / path_stats.points_before:.0f} %).")
+        return svg_content
+
+    def _submit_to_print_queue(self, laser, svg_content: str, settings: dict, title: str):
+        """Ajoute un travail à la file d'impression persistante (génération et envoi en arrière-plan)."""
+        print_queue = PrintQueue.get_instance()
+        if not self._queued_print_jobs:
+            print_queue.job_changed.connect(self._on_print_job_changed)
+        job = print_queue.submit(laser.nom, svg_content, settings, titre=title)
+        self._queued_print_jobs.add(job.job_id)
+        position = print_queue.queue_position(job.job_id)
+        QMessageBox.information(self, "File d'impression",
+                                f"Travail ajouté à la file de {laser.nom} (position {position}).")
+
+    def _on_print_job_changed(self, job):
+        if job.job_id not in self._queued_print_jobs:
+            return
+        if job.statut == STATUS_DONE:
+            self._queued_print_jobs.discard(job.job_id)
+            logger.info(f"Travail '{job.titre}' envoyé à {job.machine}.")
+        elif job.statut == STATUS_FAILED:
+            self._queued_print_jobs.discard(job.job_id)
+            QMessageBox.critical(self, "File d'impression",
+                                 f"Le travail '{job.titre}' n'a pas pu être envoyé à {job.machine}:\n{job.derniere_erreur}")
+
+    def _start_epilog_job(self, svg_content: str, settings: dict, machine_model_name: str,
+                          laser_ip_address: str, title: str, on_success=None, keep_prn_data: bool = False):
+        """
+        Lance la génération PRN et l'envoi au laser dans un thread, avec une boîte de progression
+        annulable. on_success(result) est appelé dans le thread GUI si le travail réussit;
+        sinon un message d'information est affiché. keep_prn_data garde une copie du fichier
+        PRN dans le résultat (sinon il est envoyé directement depuis la mémoire du générateur).
+        """
+        if self._active_epilog_job is not None:
+            QMessageBox.information(self, title, "Un envoi au laser est déjà en cours.")
+            return
+
+        progress_dialog = QProgressDialog(f"Préparation du travail pour {laser_ip_address}...", "Annuler", 0, 1000, self)
+        progress_dialog.setWindowTitle(title)
+        progress_dialog.setWindowModality(Qt.WindowModal)
+        progress_dialog.setMinimumDuration(0)
+        progress_dialog.setAutoReset(False)
+        progress_dialog.setAutoClose(False)
+
+        job_thread = QThread(self)
+        job_worker = EpilogJobWorker(svg_content, machine_model_name, laser_ip_address, settings=settings,
+                                     keep_prn_data=keep_prn_data)
+        job_worker.moveToThread(job_thread)
+
+        job_worker.progress.connect(functools.partial(self._on_epilog_job_progress, progress_dialog))
+        job_worker.finished.connect(functools.partial(self._on_epilog_job_finished, progress_dialog, title, on_success))
+        # Appel direct (le worker est occupé dans run): l'annulation est relayée à prn_gen_request_abort
+        progress_dialog.canceled.connect(lambda: job_worker.request_abort())
+        job_thread.started.connect(job_worker.run)
+        job_worker.finished.connect(job_thread.quit)
+        job_thread.finished.connect(job_thread.deleteLater)
+        job_worker.finished.connect(job_worker.deleteLater)
+
+        self._active_epilog_job = (job_thread, job_worker)
+        logger.info(f"Démarrage du travail Epilog '{title}' vers {machine_model_name} ({laser_ip_address}).")
+        job_thread.start()
+
+    def _on_epilog_job_progress(self, progress_dialog: QProgressDialog, total_progress: float,
+                                stage_name: str, stage_index: int, stage_count: int):
+        if progress_dialog.wasCanceled():
+            progress_dialog.setLabelText("Annulation en cours...")
+            return
+        stage_label = f"Étape {stage_index + 1}/{stage_count}: {stage_name}" if stage_count else stage_name
+        progress_dialog.setLabelText(stage_label)
+        progress_dialog.setValue(int(total_progress * 1000))
+
+    def _on_epilog_job_finished(self, progress_dialog: QProgressDialog, title: str, on_success, result):
+        """Appelé (dans le thread GUI) à la fin d'un travail Epilog."""
+        self._active_epilog_job = None
+        progress_dialog.canceled.disconnect()
+        progress_dialog.close()
+        progress_dialog.deleteLater()
+        if result.success:
+            logger.info(f"{title}: {result.message}" + (" (fichier PRN du cache)" if result.from_cache else ""))
+            if on_success is not None:
+                on_success(result)
             else:
-                QMessageBox.information(self, "Succès", "Le test de gravure Epilog a réussi, mais les données PRN n'ont pas été sauvegardées.\\n\\nLe job devrait être sur la machine.")
+                QMessageBox.information(self, title, result.message)
+        elif result.aborted:
+            logger.info(f"{title}: travail annulé à l'étape '{result.stage_name}'.")
+            QMessageBox.information(self, title, "Le travail d'impression a été annulé.")
         else:
-            logger.error(f"Échec du test de gravure Epilog (avec SVG exemple) : {message_or_data}")
-            QMessageBox.critical(self, "Échec du test Epilog (Gravure)", f"Le test de gravure Epilog a échoué :\\n{message_or_data}")
+            details = f"\nÉtape: {result.stage_name}" if result.stage_name else ""
+            details += f"\nErreur: {result.error}" if result.error else ""
+            logger.error(f"{title}: {result.message}{details}")
+            QMessageBox.critical(self, title, f"{result.message}{details}")
 
     def _handle_send_custom_lamicoid_to_epilog(self):
         logger.info("Tentative d'envoi du Lamicoid personnalisé à l'imprimante Epilog.")
@@ -1546,6 +1668,7 @@ class LamicoidPage(QWidget):
             if not svg_content:
                 QMessageBox.critical(self, "Erreur SVG", "La génération du contenu SVG a échoué.")
                 return
+            svg_content = self._optimize_svg_for_epilog(svg_content)
 
             # 4. Générer le JSON de configuration
             # Mettre en dur les infos pour l'instant
@@ -1563,27 +1686,15 @@ class LamicoidPage(QWidget):
                 QMessageBox.critical(self, "Erreur JSON", "La génération du JSON de configuration a échoué.")
                 return
 
-            # 5. Envoyer à l'imprimante
-            # Mettre en dur l'IP et le modèle pour l'instant
-            laser_ip_address = "192.168.100.211" # À CONFIGURER
-            machine_model_name = "fusionmaker24" # À CONFIGURER
+            # 5. Ajouter le travail à la file d'impression du laser choisi
+            laser = self._choose_laser("Envoi du Lamicoid")
+            if laser is None:
+                return
 
             logger.debug(f"SVG à envoyer:\\n{svg_content}")
             logger.debug(f"JSON à envoyer:\\n{json.dumps(settings_json, indent=2)}")
 
-            success, message = send_lamicoid_to_epilog(
-                svg_content=svg_content,
-                test_settings=settings_json, # <<< CORRIGÉ ICI
-                laser_ip_address=laser_ip_address,
-                machine_model_name=machine_model_name
-            )
-
-            if success:
-                QMessageBox.information(self, "Envoi Réussi", f"Lamicoid envoyé avec succès à l'imprimante {laser_ip_address}.\\nDonnées PRN: {message}")
-                logger.info(f"Envoi réussi: {message}")
-            else:
-                QMessageBox.critical(self, "Erreur d'Envoi", f"Échec de l'envoi à l'imprimante :\\n{message}")
-                logger.error(f"Échec de l'envoi: {message}")
+            self._submit_to_print_queue(laser, svg_content, settings_json, job_name)
 
         except Exception as e:
             logger.error(f"Erreur inattendue lors de l'envoi du Lamicoid personnalisé: {e}", exc_info=True)
@@ -1622,6 +1733,7 @@ class LamicoidPage(QWidget):
 
             # Générer le SVG avec le texte converti en chemins
             svg_content = generate_svg_with_text_as_paths(lamicoid_params, editor_items)
+            svg_content = self._optimize_svg_for_epilog(svg_content)
             logger.debug(f"SVG généré pour test (texte en chemins):\n{svg_content}")
 
             # Générer le JSON de settings
@@ -1632,8 +1744,12 @@ class LamicoidPage(QWidget):
             # Les couleurs sont définies dans generate_svg_with_text_as_paths (blue pour texte, aqua pour découpe)
             job_name = "TestLamicoidPaths"
             firmware_version = "1.0.8.7" # À rendre configurable ou à récupérer des settings globaux
-            laser_ip_address = "192.168.100.211" # À rendre configurable
-            machine_model_name = "fusionmaker24" # À rendre configurable
+            laser = self._choose_laser("Test Impression Epilog")
+            if laser is None:
+                converter_logger.setLevel(original_level)
+                return
+            laser_ip_address = laser.ip
+            machine_model_name = laser.modele
 
             settings_dict = generate_settings_json_for_custom_lamicoid(
                 job_name=job_name,
@@ -1643,15 +1759,9 @@ class LamicoidPage(QWidget):
             )
             logger.info(f"Settings JSON pour test (texte en chemins): {settings_dict}")
 
-            # Envoyer à l'imprimante
-            send_lamicoid_to_epilog(
-                svg_content=svg_content,
-                test_settings=settings_dict, # Correction ici
-                machine_model_name=machine_model_name,
-                laser_ip_address=laser_ip_address
-            )
-            logger.info("Test d'impression Epilog avec texte en chemins envoyé.")
-            QMessageBox.information(self, "Test Impression Epilog", "Tâche d'impression (texte en chemins) envoyée.")
+            # Envoyer à l'imprimante (génération et envoi dans un thread)
+            self._start_epilog_job(svg_content, settings_dict, machine_model_name, laser_ip_address,
+                                   "Test Impression Epilog")
 
             # Restaurer le niveau de logging original après l'appel
             converter_logger.setLevel(original_level)
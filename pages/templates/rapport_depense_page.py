@@ -16,6 +16,7 @@ from widgets.custom_date_edit import CustomDateEdit
 from widgets.numeric_input_with_unit import NumericInputWithUnit # <<< S'ASSURER QUE CET IMPORT EST PRÉSENT ET CORRECT
 from ui.components.card import CardWidget # Importer le widget card renommé
 from widgets.thumbnail_widget import ThumbnailWidget
+from utils.thumbnail_cache import ThumbnailCache
 import traceback # Importer traceback pour débogage
 # --- AJOUTS POUR GESTION FICHIERS FACTURE ---
 import shutil
@@ -28,19 +29,14 @@ from utils.file_management import (
     get_next_file_index
 )
 # ---------------------------------------------
-# --- AJOUT: Tentative d'import de fitz et définition de PYMUPDF_AVAILABLE --- 
-try:
-    import fitz # PyMuPDF
-    PYMUPDF_AVAILABLE = True
-except ImportError:
-    fitz = None # Définir fitz à None si l'import échoue
-    PYMUPDF_AVAILABLE = False
-    # print("Avertissement: PyMuPDF (fitz) n'est pas installé. Les miniatures PDF ne seront pas disponibles.") # MODIFICATION
-    logger.warning("PyMuPDF (fitz) n'est pas installé. Les miniatures PDF ne seront pas disponibles.") # MODIFICATION
+# --- PyMuPDF (fitz) importé au premier usage; PYMUPDF_AVAILABLE sans l'importer --- 
+from utils.lazy_import import lazy_attribute, lazy_import, module_available
+fitz = lazy_import("fitz") # PyMuPDF
+PYMUPDF_AVAILABLE = module_available("fitz")
 # --------------------------------------------------------------------------
 import os # Pour manipuler les chemins
-# --- AJOUT: Import MediaViewer --- 
-from windows.media_viewer import MediaViewer
+# --- MediaViewer (et PyMuPDF) chargé à la première ouverture de la visionneuse --- 
+MediaViewer = lazy_attribute("windows.media_viewer", "MediaViewer")
 # ---------------------------------
 import functools # <--- AJOUT
 import copy       # <--- AJOUT pour deepcopy
@@ -58,6 +54,8 @@ from PyQt5.QtWidgets import QMessageBox # AJOUT
 # from models.documents.rapport_depense import RapportDepense
 
 logger = logging.getLogger('GDJ_App')
+if not PYMUPDF_AVAILABLE:
+    logger.warning("PyMuPDF (fitz) n'est pas installé. Les miniatures PDF ne seront pas disponibles.")
 
 class RapportDepensePage(QWidget):
     def __init__(self, document: RapportDepense, parent=None):
@@ -777,14 +775,7 @@ class RapportDepensePage(QWidget):
 
         # AJOUT: Logique de mise à jour du total remboursé
         try:
-            total_kilometrage = 0.0
-            if hasattr(self.document, 'deplacements') and isinstance(self.document.deplacements, list):
-                for deplacement_obj in self.document.deplacements:
-                    if hasattr(deplacement_obj, 'kilometrage'):
-                        try:
-                            total_kilometrage += float(deplacement_obj.kilometrage)
-                        except (ValueError, TypeError):
-                            logger.warning(f"Kilométrage invalide pour un déplacement: {deplacement_obj.kilometrage}")
+            total_kilometrage = self.document.calculer_totaux().total_kilometrage
             
             # AJOUT: Mettre à jour le label du kilométrage total
             if hasattr(self, 'total_kilometrage_label_value'):
@@ -2341,54 +2332,22 @@ class RapportDepensePage(QWidget):
     def _update_totals_display(self):
         """Calcule et affiche les totaux généraux et les statistiques par catégorie."""
         try:
-            # Calcul pour Repas
-            repas_employe_count = 0
-            repas_employe_total = 0.0
-            repas_jacmar_count = 0
-            repas_jacmar_total = 0.0
-            repas_factures_manquantes = 0
-            # total_repas_global = 0.0 # Non utilisé pour le remboursement direct
-
-            for repas in getattr(self.document, 'repas', []):
-                montant = float(getattr(repas, 'totale_apres_taxes', 0.0))
-                
-                if getattr(repas, 'payeur', True): # True = Employé par défaut
-                    repas_employe_count += 1
-                    repas_employe_total += montant
-                else:
-                    repas_jacmar_count += 1
-                    repas_jacmar_total += montant
-
-                facture = getattr(repas, 'facture', None)
-                if facture is None or not getattr(facture, 'filenames', []):
-                    repas_factures_manquantes += 1
-            
-            # Calcul pour Dépenses Diverses
-            depense_employe_count = 0
-            depense_employe_total = 0.0
-            depense_jacmar_count = 0
-            depense_jacmar_total = 0.0
-            depense_factures_manquantes = 0
-            # total_depenses_diverses_global = 0.0 # Non utilisé pour le remboursement direct
-
-            for depense in getattr(self.document, 'depenses_diverses', []):
-                montant_dep = float(getattr(depense, 'totale_apres_taxes', 0.0))
-                
-                if getattr(depense, 'payeur', True): 
-                    depense_employe_count += 1
-                    depense_employe_total += montant_dep
-                else:
-                    depense_jacmar_count += 1
-                    depense_jacmar_total += montant_dep
-                
-                facture_dep = getattr(depense, 'facture', None)
-                if facture_dep is None or not getattr(facture_dep, 'filenames', []):
-                    depense_factures_manquantes += 1
-
-            # Calcul pour Déplacements (total remboursé à l'employé)
-            total_deplacement_rembourse_employe = 0.0
-            for deplacement_obj in getattr(self.document, 'deplacements', []):
-                total_deplacement_rembourse_employe += float(getattr(deplacement_obj, 'montant', 0.0))
+            # Agrégats lus du moteur de totaux du modèle (tenu à jour à chaque ajout/suppression/modification)
+            totaux = self.document.calculer_totaux()
+            repas_employe_count = totaux.repas_employe_count
+            repas_employe_total = totaux.repas_employe_total
+            repas_jacmar_count = totaux.repas_jacmar_count
+            repas_jacmar_total = totaux.repas_jacmar_total
+            repas_factures_manquantes = totaux.repas_factures_manquantes
+
+            depense_employe_count = totaux.depense_employe_count
+            depense_employe_total = totaux.depense_employe_total
+            depense_jacmar_count = totaux.depense_jacmar_count
+            depense_jacmar_total = totaux.depense_jacmar_total
+            depense_factures_manquantes = totaux.depense_factures_manquantes
+
+            # Déplacements (total remboursé à l'employé)
+            total_deplacement_rembourse_employe = totaux.total_deplacements
 
             # --- Mise à jour des Labels ---
 
@@ -2401,7 +2360,7 @@ class RapportDepensePage(QWidget):
                 self.total_depenses_label.setText(f"{depense_employe_total:.2f} $")
             
             # Total Général (dans le cadre "Totaux")
-            total_general_rembourse = total_deplacement_rembourse_employe + repas_employe_total + depense_employe_total
+            total_general_rembourse = totaux.total_general
             if hasattr(self, 'total_general_label'): 
                 self.total_general_label.setText(f"{total_general_rembourse:.2f} $")
 
@@ -2482,21 +2441,11 @@ class RapportDepensePage(QWidget):
                        ['.png', '.jpg', '.jpeg', '.bmp', '.gif']) # Simplifié pour l'exemple
 
         try:
-            if is_image:
-                img = QImage(file_path)
-                if not img.isNull():
-                    pixmap = QPixmap.fromImage(img).scaled(size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-            elif file_path.lower().endswith('.pdf') and PYMUPDF_AVAILABLE:
-                doc = fitz.open(file_path)
-                if len(doc) > 0:
-                    page = doc.load_page(0)
-                    # Rendu à une résolution légèrement supérieure pour meilleure qualité de réduction
-                    zoom = 2.0
-                    mat = fitz.Matrix(zoom, zoom)
-                    pdf_pix = page.get_pixmap(matrix=mat, alpha=False)
-                    qimage = QImage(pdf_pix.samples, pdf_pix.width, pdf_pix.height, pdf_pix.stride, QImage.Format_RGB888)
-                    pixmap = QPixmap.fromImage(qimage).scaled(size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                doc.close()
+            if is_image or (file_path.lower().endswith('.pdf') and PYMUPDF_AVAILABLE):
+                # Miniature servie par le cache (mémoire puis disque), rasterisée une seule fois
+                cached_pixmap = ThumbnailCache.get_instance().get_pixmap(file_path)
+                if not cached_pixmap.isNull():
+                    pixmap = cached_pixmap.scaled(size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
             else:
                 # Fichier non trouvé ou type non supporté, utiliser une icône placeholder
                 placeholder_path = get_icon_path("round_description.png") # Ou une autre icône
@@ -2541,46 +2490,22 @@ class RapportDepensePage(QWidget):
 
     def _create_and_add_thumbnail(self, file_path):
         pixmap = None
+        render_async = False
         # --- PyMuPDF check (mis en global pour éviter répétition) ---
         global PYMUPDF_AVAILABLE, fitz 
         # ---------------------------------------------------------
         try:
-            # --- Génération Pixmap (Image) ---
-            if file_path.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp', '.gif')):
-                pixmap = QPixmap(file_path)
-                if pixmap.isNull():
-                     # print(f"Erreur: Impossible de charger l'image {file_path}") # MODIFICATION
-                     logger.error(f"Impossible de charger l'image {file_path}") # MODIFICATION
-                     return
-            # --- Génération Pixmap (PDF) ---
-            elif file_path.lower().endswith('.pdf'):
-                 if not PYMUPDF_AVAILABLE:
-                     QMessageBox.warning(self, "Module manquant", 
-                                           "PyMuPDF est requis pour les miniatures PDF. Veuillez l'installer (pip install pymupdf).")
-                     return
-                 try:
-                     doc = fitz.open(file_path)
-                     if len(doc) > 0:
-                         page = doc.load_page(0) 
-                         # Rendu à résolution plus élevée
-                         zoom = 2.0 
-                         mat = fitz.Matrix(zoom, zoom)
-                         fitz_pix = page.get_pixmap(matrix=mat, alpha=False)
-                         qimage = QImage(fitz_pix.samples, fitz_pix.width, fitz_pix.height, fitz_pix.stride, QImage.Format_RGB888)
-                         pixmap = QPixmap.fromImage(qimage)
-                     else:
-                          # print(f"Erreur: PDF vide {file_path}") # MODIFICATION
-                          logger.error(f"PDF vide {file_path}") # MODIFICATION
-                          # Créer un pixmap placeholder gris?
-                          pixmap = QPixmap(ThumbnailWidget.THUMBNAIL_SIZE, ThumbnailWidget.THUMBNAIL_SIZE)
-                          pixmap.fill(Qt.darkGray)
-                     doc.close()
-                 except Exception as pdf_error:
-                      logger.error(f"Erreur PyMuPDF pour {file_path}: {pdf_error}") # MODIFICATION
-                      QMessageBox.warning(self, "Erreur PDF", f"Impossible de générer la miniature pour {file_path}.\n{pdf_error}")
-                      # Créer un pixmap placeholder rouge?
-                      pixmap = QPixmap(ThumbnailWidget.THUMBNAIL_SIZE, ThumbnailWidget.THUMBNAIL_SIZE)
-                      pixmap.fill(Qt.red)
+            # --- Image ou PDF: placeholder immédiat, miniature rendue en arrière-plan ---
+            if file_path.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.pdf')):
+                if file_path.lower().endswith('.pdf') and not PYMUPDF_AVAILABLE:
+                    QMessageBox.warning(self, "Module manquant", 
+                                          "PyMuPDF est requis pour les miniatures PDF. Veuillez l'installer (pip install pymupdf).")
+                    return
+                if not os.path.exists(file_path):
+                    logger.error(f"Impossible de charger le fichier {file_path}")
+                    return
+                pixmap = ThumbnailWidget.placeholder_pixmap()
+                render_async = True
             # --- Format non supporté --- 
             else:
                 # print(f"Format non supporté: {file_path}") # MODIFICATION
@@ -2591,6 +2516,9 @@ class RapportDepensePage(QWidget):
             # --- Création et ajout du widget --- 
             if pixmap:
                 thumbnail_widget = ThumbnailWidget(file_path, pixmap)
+                if render_async:
+                    # Remplacé par la vraie miniature (cache mémoire immédiat, sinon pool de rendu)
+                    thumbnail_widget.load_thumbnail_async()
                 thumbnail_widget.delete_requested.connect(self._remove_facture_thumbnail)
                 # --- AJOUT: Connecter le signal clic --- 
                 thumbnail_widget.clicked.connect(self._open_media_viewer_from_form)
@@ -2612,6 +2540,7 @@ class RapportDepensePage(QWidget):
             # Déconnecter signal peut être une bonne pratique
             try: widget.delete_requested.disconnect(self._remove_facture_thumbnail) 
             except TypeError: pass # Ignore si déjà déconnecté
+            widget.cancel_thumbnail_job() # Abandonner le rendu en attente de cette miniature
             self.facture_thumbnails_layout.removeWidget(widget)
             widget.deleteLater()
             del self.current_facture_thumbnails[file_path]
@@ -2969,16 +2898,13 @@ class RapportDepensePage(QWidget):
             # --- FIN MODIFICATION ---
 
             if entry_type is Deplacement and entry_to_delete in self.document.deplacements:
-                self.document.deplacements.remove(entry_to_delete)
-                removed = True
+                removed = self.document.retirer_entree(entry_to_delete)
                 logger.info(f"Déplacement supprimé: {entry_to_delete}")
             elif entry_type is Repas and entry_to_delete in self.document.repas:
-                self.document.repas.remove(entry_to_delete)
-                removed = True
+                removed = self.document.retirer_entree(entry_to_delete)
                 logger.info(f"Repas supprimé: {entry_to_delete}")
             elif entry_type is Depense and hasattr(self.document, 'depenses_diverses') and entry_to_delete in self.document.depenses_diverses:
-                self.document.depenses_diverses.remove(entry_to_delete)
-                removed = True
+                removed = self.document.retirer_entree(entry_to_delete)
                 logger.info(f"Dépense (diverse) supprimée: {entry_to_delete}")
             elif entry_type is Depense and hasattr(self.document, 'depenses') and entry_to_delete in self.document.depenses:
                 self.document.depenses.remove(entry_to_delete)
@@ -3198,8 +3124,8 @@ class RapportDepensePage(QWidget):
                 # 2. Ajouter les miniatures de l'entrée en cours d'édition
                 facture_obj = getattr(entry, 'facture', None)
                 if isinstance(facture_obj, Facture) and facture_obj.folder_path and facture_obj.filenames:
-                    for filename in facture_obj.filenames:
-                        full_path = os.path.join(facture_obj.folder_path, filename)
+                    # get_full_paths() extrait les fichiers si la facture vient d'un .rdj ouvert paresseusement
+                    for full_path in facture_obj.get_full_paths():
                         if os.path.exists(full_path):
                             self._create_and_add_thumbnail(full_path)
                         else:
@@ -3258,8 +3184,7 @@ class RapportDepensePage(QWidget):
                 
                 facture_obj_dep = getattr(entry, 'facture', None)
                 if isinstance(facture_obj_dep, Facture) and facture_obj_dep.folder_path and facture_obj_dep.filenames:
-                    for filename in facture_obj_dep.filenames:
-                        full_path = os.path.join(facture_obj_dep.folder_path, filename)
+                    for full_path in facture_obj_dep.get_full_paths():
                         if os.path.exists(full_path):
                             self._create_and_add_thumbnail(full_path)
                         else:
@@ -3651,6 +3576,7 @@ class RapportDepensePage(QWidget):
                     logger.debug("Facture mise à None (pas de fichiers/dossier final).")
             
             logger.info(f"Modifications appliquées: {self.editing_entry}")
+            self.document.entree_modifiee(self.editing_entry)
             
             # --- 5. Rafraîchir l'UI et quitter le mode édition --- 
             self._update_totals_display()
@@ -3668,6 +3594,9 @@ class RapportDepensePage(QWidget):
              if hasattr(self.editing_entry, 'facture'):
                  self.editing_entry.facture = original_facture_data 
                  logger.info("Tentative restauration facture originale suite à erreur majeure.")
+             # Certains champs ont pu être appliqués avant l'erreur: les totaux suivent l'entrée
+             self.document.entree_modifiee(self.editing_entry)
+             self._update_totals_display()
              self._exit_edit_mode_ui()
 
     def _cancel_edit(self):
@@ -4081,54 +4010,22 @@ class RapportDepensePage(QWidget):
     def _update_totals_display(self):
         """Calcule et affiche les totaux généraux et les statistiques par catégorie."""
         try:
-            # Calcul pour Repas
-            repas_employe_count = 0
-            repas_employe_total = 0.0
-            repas_jacmar_count = 0
-            repas_jacmar_total = 0.0
-            repas_factures_manquantes = 0
-            # total_repas_global = 0.0 # Non utilisé pour le remboursement direct
-
-            for repas in getattr(self.document, 'repas', []):
-                montant = float(getattr(repas, 'totale_apres_taxes', 0.0))
-                
-                if getattr(repas, 'payeur', True): # True = Employé par défaut
-                    repas_employe_count += 1
-                    repas_employe_total += montant
-                else:
-                    repas_jacmar_count += 1
-                    repas_jacmar_total += montant
-
-                facture = getattr(repas, 'facture', None)
-                if facture is None or not getattr(facture, 'filenames', []):
-                    repas_factures_manquantes += 1
-            
-            # Calcul pour Dépenses Diverses
-            depense_employe_count = 0
-            depense_employe_total = 0.0
-            depense_jacmar_count = 0
-            depense_jacmar_total = 0.0
-            depense_factures_manquantes = 0
-            # total_depenses_diverses_global = 0.0 # Non utilisé pour le remboursement direct
-
-            for depense in getattr(self.document, 'depenses_diverses', []):
-                montant_dep = float(getattr(depense, 'totale_apres_taxes', 0.0))
-                
-                if getattr(depense, 'payeur', True): 
-                    depense_employe_count += 1
-                    depense_employe_total += montant_dep
-                else:
-                    depense_jacmar_count += 1
-                    depense_jacmar_total += montant_dep
-                
-                facture_dep = getattr(depense, 'facture', None)
-                if facture_dep is None or not getattr(facture_dep, 'filenames', []):
-                    depense_factures_manquantes += 1
-
-            # Calcul pour Déplacements (total remboursé à l'employé)
-            total_deplacement_rembourse_employe = 0.0
-            for deplacement_obj in getattr(self.document, 'deplacements', []):
-                total_deplacement_rembourse_employe += float(getattr(deplacement_obj, 'montant', 0.0))
+            # Agrégats lus du moteur de totaux du modèle (tenu à jour à chaque ajout/suppression/modification)
+            totaux = self.document.calculer_totaux()
+            repas_employe_count = totaux.repas_employe_count
+            repas_employe_total = totaux.repas_employe_total
+            repas_jacmar_count = totaux.repas_jacmar_count
+            repas_jacmar_total = totaux.repas_jacmar_total
+            repas_factures_manquantes = totaux.repas_factures_manquantes
+
+            depense_employe_count = totaux.depense_employe_count
+            depense_employe_total = totaux.depense_employe_total
+            depense_jacmar_count = totaux.depense_jacmar_count
+            depense_jacmar_total = totaux.depense_jacmar_total
+            depense_factures_manquantes = totaux.depense_factures_manquantes
+
+            # Déplacements (total remboursé à l'employé)
+            total_deplacement_rembourse_employe = totaux.total_deplacements
 
             # --- Mise à jour des Labels ---
 
@@ -4141,7 +4038,7 @@ class RapportDepensePage(QWidget):
                 self.total_depenses_label.setText(f"{depense_employe_total:.2f} $")
             
             # Total Général (dans le cadre "Totaux")
-            total_general_rembourse = total_deplacement_rembourse_employe + repas_employe_total + depense_employe_total
+            total_general_rembourse = totaux.total_general
             if hasattr(self, 'total_general_label'): 
                 self.total_general_label.setText(f"{total_general_rembourse:.2f} $")
 
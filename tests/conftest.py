@@ -0,0 +1,7 @@
+"""Configuration pytest: les tests importent les modules de l'application depuis la racine du dépôt."""
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
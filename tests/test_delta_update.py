@@ -0,0 +1,126 @@
+"""Paquets différentiels: échange fichier par fichier, GDJ.exe en dernier, reprise après interruption."""
+import json
+import os
+import time
+
+import pytest
+
+from updater import delta_update
+from updater.delta_update import build_delta_pack, build_manifest
+
+OLD_FILES = {"GDJ.exe": b"exe v1", "lib/core.dll": b"core v1", "data/obsolete.txt": b"a retirer",
+             "data/inchange.txt": b"identique"}
+NEW_FILES = {"GDJ.exe": b"exe v2", "lib/core.dll": b"core v2", "lib/nouveau.dll": b"nouveau",
+             "data/inchange.txt": b"identique"}
+
+
+def _write_tree(root, files):
+    for rel, content in files.items():
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+    return {rel: str(root / rel) for rel in files}
+
+
+def _read_tree(root):
+    return {os.path.relpath(os.path.join(dirpath, name), root).replace(os.sep, "/"):
+            open(os.path.join(dirpath, name), "rb").read()
+            for dirpath, _, names in os.walk(root) for name in names}
+
+
+@pytest.fixture
+def update(tmp_path):
+    """(dossier d'installation en version 1.0.0, paquet 1.0.0 -> 1.1.0)."""
+    old_sources = _write_tree(tmp_path / "v1", OLD_FILES)
+    new_sources = _write_tree(tmp_path / "v2", NEW_FILES)
+    pack = build_delta_pack(new_sources, build_manifest(old_sources, "1.0.0"), build_manifest(new_sources, "1.1.0"),
+                            str(tmp_path / "delta.zip"))
+    install_dir = tmp_path / "install"
+    _write_tree(install_dir, OLD_FILES)
+    return install_dir, pack
+
+
+class _Crash(BaseException):
+    """Arrêt brutal de l'update helper (rien n'est intercepté)."""
+
+
+def test_swap_is_per_file_with_main_executable_last(update, monkeypatch):
+    install_dir, pack = update
+    moves = []
+    real_replace = delta_update._replace_with_retry
+    monkeypatch.setattr(delta_update, "_replace_with_retry",
+                        lambda src, dst: (moves.append((src, dst)), real_replace(src, dst)))
+
+    info = delta_update.apply_delta_pack(pack, str(install_dir))
+
+    assert info["to_version"] == "1.1.0"
+    assert _read_tree(install_dir) == NEW_FILES
+    # Chaque fichier remplacé est gardé de côté puis immédiatement remplacé
+    backup, staging = delta_update.BACKUP_DIR_NAME, delta_update.STAGING_DIR_NAME
+    core = [i for i, (src, dst) in enumerate(moves) if src.endswith("core.dll") or dst.endswith("core.dll")]
+    assert backup in moves[core[0]][1] and staging in moves[core[1]][0] and core[1] == core[0] + 1
+    assert moves[-2][0] == str(install_dir / "GDJ.exe") and moves[-1][1] == str(install_dir / "GDJ.exe")
+
+
+@pytest.mark.parametrize("crash_at", [1, 2, 4, 5, 6])
+def test_interrupted_swap_is_rolled_back(update, monkeypatch, crash_at):
+    install_dir, pack = update
+    calls = []
+    real_replace = delta_update._replace_with_retry
+
+    def crashing_replace(src, dst):
+        calls.append(src)
+        if len(calls) == crash_at:
+            raise _Crash()
+        real_replace(src, dst)
+
+    monkeypatch.setattr(delta_update, "_replace_with_retry", crashing_replace)
+    with pytest.raises(_Crash):
+        delta_update.apply_delta_pack(pack, str(install_dir))
+    monkeypatch.setattr(delta_update, "_replace_with_retry", real_replace)
+    if crash_at <= 5:
+        # L'ancien exécutable reste en place tant que les autres fichiers ne sont pas échangés
+        assert (install_dir / "GDJ.exe").read_bytes() == b"exe v1"
+
+    assert delta_update.recover_interrupted_update(str(install_dir))
+    assert _read_tree(install_dir) == OLD_FILES
+
+
+def test_application_start_skips_update_in_progress(update, monkeypatch):
+    install_dir, pack = update
+    monkeypatch.setattr(delta_update, "_replace_with_retry", lambda src, dst: (_ for _ in ()).throw(_Crash()))
+    with pytest.raises(_Crash):
+        delta_update.apply_delta_pack(pack, str(install_dir))
+    monkeypatch.undo()
+    journal_path = install_dir / delta_update.JOURNAL_FILE_NAME
+    assert json.loads(journal_path.read_text(encoding="utf-8"))["swapped"] == 0
+
+    # Journal récent: l'update helper est peut-être encore en train d'échanger les fichiers
+    assert not delta_update.recover_interrupted_update(str(install_dir), min_age_seconds=300)
+    assert journal_path.exists()
+    stale = time.time() - 600
+    os.utime(journal_path, (stale, stale))
+    assert delta_update.recover_interrupted_update(str(install_dir), min_age_seconds=300)
+    assert _read_tree(install_dir) == OLD_FILES
+
+
+def test_crash_during_cleanup_keeps_new_version(update, monkeypatch):
+    install_dir, pack = update
+
+    real_rmtree = delta_update.shutil.rmtree
+
+    def crashing_rmtree(path, *args, **kwargs):
+        if os.path.isdir(path) and path.endswith(delta_update.BACKUP_DIR_NAME):
+            raise _Crash()
+        real_rmtree(path, *args, **kwargs)
+
+    # Échange terminé, arrêt brutal pendant la suppression du dossier de sauvegarde
+    monkeypatch.setattr(delta_update.shutil, "rmtree", crashing_rmtree)
+    with pytest.raises(_Crash):
+        delta_update.apply_delta_pack(pack, str(install_dir))
+    monkeypatch.undo()
+    assert not (install_dir / delta_update.JOURNAL_FILE_NAME).exists()
+    assert (install_dir / delta_update.BACKUP_DIR_NAME).is_dir()
+
+    assert not delta_update.recover_interrupted_update(str(install_dir))
+    assert _read_tree(install_dir) == NEW_FILES
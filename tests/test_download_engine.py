@@ -0,0 +1,173 @@
+"""Téléchargement reprenable contre un serveur HTTP local gérant (ou non) les requêtes Range."""
+import hashlib
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+
+from updater import download_engine # noqa: E402
+from updater.download_engine import DownloadCancelled, download_file # noqa: E402
+
+PAYLOAD = os.urandom(1024 * 1024 + 12345)
+
+
+class _RangeHandler(BaseHTTPRequestHandler):
+    """Sert self.server.data avec Range/If-Range; peut couper un transfert ou une somme de contrôle."""
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append((self.path, dict(self.headers)))
+        if self.path.endswith(".sha256"):
+            if server.checksum_failures > 0:
+                server.checksum_failures -= 1
+                self.close_connection = True
+                return # Connexion fermée sans réponse
+            body = f"{hashlib.sha256(server.data).hexdigest()}  fichier.bin\n".encode("ascii")
+            self._send(200, body)
+            return
+
+        data = server.data
+        start = 0
+        range_header = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if server.supports_range and range_header and (if_range is None or if_range == server.etag):
+            start = int(range_header.split("=", 1)[1].rstrip("-"))
+            if start >= len(data):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(data)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+        body = data[start:]
+        self.send_response(206 if start else 200)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", server.etag)
+        if server.supports_range:
+            self.send_header("Accept-Ranges", "bytes")
+        if start:
+            self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+        self.end_headers()
+        if server.cut_after is not None:
+            cut, server.cut_after = server.cut_after, None
+            self.wfile.write(body[:cut])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(download_engine, "RETRY_BASE_DELAY", 0.01)
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _RangeHandler)
+    httpd.data = PAYLOAD
+    httpd.etag = '"v1"'
+    httpd.supports_range = True
+    httpd.cut_after = None
+    httpd.checksum_failures = 0
+    httpd.requests = []
+    httpd.url = f"http://127.0.0.1:{httpd.server_port}/fichier.bin"
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _ranges(httpd):
+    return [headers.get("Range") for path, headers in httpd.requests if not path.endswith(".sha256")]
+
+
+def _cancel_after(limit):
+    """Interrompt le téléchargement (comme le bouton Annuler) une fois 'limit' octets reçus."""
+    received = [0]
+
+    def progress(done, total, speed):
+        received[0] = done
+
+    return progress, lambda: received[0] >= limit
+
+
+def test_resume_after_mid_transfer_cut(server, tmp_path):
+    server.cut_after = 300_000
+    dest = str(tmp_path / "fichier.bin")
+    result = download_file(server.url, dest, checksum_url=server.url + ".sha256")
+    assert result.verified
+    with open(dest, "rb") as f:
+        assert f.read() == PAYLOAD
+    ranges = _ranges(server)
+    assert ranges[0] is None and ranges[1].startswith("bytes=")
+    assert not os.path.exists(dest + download_engine.PARTIAL_SUFFIX)
+
+
+def test_cancel_then_resume(server, tmp_path):
+    dest = str(tmp_path / "fichier.bin")
+    progress, is_cancelled = _cancel_after(200_000)
+    with pytest.raises(DownloadCancelled):
+        download_file(server.url, dest, progress_callback=progress, is_cancelled=is_cancelled)
+    partial = os.path.getsize(dest + download_engine.PARTIAL_SUFFIX)
+    assert 0 < partial < len(PAYLOAD)
+
+    result = download_file(server.url, dest, expected_sha256=hashlib.sha256(PAYLOAD).hexdigest())
+    assert result.resumed_from == partial and result.verified
+    assert _ranges(server)[-1] == f"bytes={partial}-"
+    assert server.requests[-1][1]["If-Range"] == '"v1"'
+
+
+def test_etag_change_restarts_download(server, tmp_path):
+    dest = str(tmp_path / "fichier.bin")
+    progress, is_cancelled = _cancel_after(200_000)
+    with pytest.raises(DownloadCancelled):
+        download_file(server.url, dest, progress_callback=progress, is_cancelled=is_cancelled)
+
+    new_payload = os.urandom(len(PAYLOAD))
+    server.data, server.etag = new_payload, '"v2"'
+    result = download_file(server.url, dest, expected_sha256=hashlib.sha256(new_payload).hexdigest())
+    assert result.resumed_from == 0
+    with open(dest, "rb") as f:
+        assert f.read() == new_payload
+
+
+def test_416_on_complete_partial_file(server, tmp_path):
+    dest = str(tmp_path / "fichier.bin")
+    with open(dest + download_engine.PARTIAL_SUFFIX, "wb") as f:
+        f.write(PAYLOAD)
+    download_engine._save_meta(dest + download_engine.META_SUFFIX, {"url": server.url, "etag": '"v1"'})
+
+    result = download_file(server.url, dest, checksum_url=server.url + ".sha256")
+    assert result.verified and result.resumed_from == len(PAYLOAD)
+    assert _ranges(server) == [f"bytes={len(PAYLOAD)}-"]
+    with open(dest, "rb") as f:
+        assert f.read() == PAYLOAD
+
+
+def test_server_without_range_support(server, tmp_path):
+    server.supports_range = False
+    dest = str(tmp_path / "fichier.bin")
+    progress, is_cancelled = _cancel_after(200_000)
+    with pytest.raises(DownloadCancelled):
+        download_file(server.url, dest, progress_callback=progress, is_cancelled=is_cancelled)
+
+    result = download_file(server.url, dest, expected_sha256=hashlib.sha256(PAYLOAD).hexdigest())
+    assert result.resumed_from == 0 and result.size == len(PAYLOAD)
+    with open(dest, "rb") as f:
+        assert f.read() == PAYLOAD
+
+
+def test_checksum_fetch_is_retried(server, tmp_path):
+    server.checksum_failures = 2
+    dest = str(tmp_path / "fichier.bin")
+    result = download_file(server.url, dest, checksum_url=server.url + ".sha256")
+    assert result.verified
+    assert sum(path.endswith(".sha256") for path, _ in server.requests) == 3
@@ -0,0 +1,30 @@
+"""Factures adossées à une archive .rdj: extraction paresseuse et copie des entrées."""
+import copy
+import zipfile
+from datetime import date
+
+from models.documents.rapport_depense import Repas
+from models.documents.rapport_depense.facture import Facture
+
+
+def _facture_archivee(tmp_path):
+    archive = tmp_path / "rapport.rdj"
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr(f"{Facture.ARCHIVE_FACTURES_DIR}/facture_1/a.pdf", b"%PDF-1.4 facture")
+    return Facture(str(tmp_path / "FacturesEntrees" / "facture_1"), ["a.pdf"], archive_path=str(archive))
+
+
+def test_deepcopy_entry_with_archive_backed_invoice(tmp_path):
+    repas = Repas(date(2025, 1, 3), "Resto", "Client", True, False, "", 20.0, 3.0, 1.0, 2.0, 0.0, 26.0,
+                  facture=_facture_archivee(tmp_path))
+
+    copie = copy.deepcopy(repas)
+
+    assert copie.facture is not repas.facture
+    assert copie.facture.archive_path == repas.facture.archive_path
+    assert copie.facture.read_bytes("a.pdf") == b"%PDF-1.4 facture"
+    assert copie.facture.materialize()
+    assert copie.facture.archive_path is None and repas.facture.archive_path is not None
+    # Même dossier de destination: l'original trouve le fichier déjà extrait
+    assert repas.facture.materialize()
+    assert open(repas.facture.get_full_paths()[0], "rb").read() == b"%PDF-1.4 facture"
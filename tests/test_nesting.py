@@ -0,0 +1,46 @@
+"""Imbrication des lamicoids: aucun lamicoid n'est perdu, même s'il dépasse la feuille."""
+import pytest
+
+from models.documents.lamicoid_2.feuille_lamicoid import FeuilleLamicoid
+from models.documents.lamicoid_2.nesting import feuille_hors_format, imbriquer_lamicoids, nouveau_lamicoid
+from models.documents.lamicoid_2.template_lamicoid import TemplateLamicoid
+
+
+def test_unplaced_lamicoids_kept_on_overflow_sheet():
+    petit = TemplateLamicoid(template_id="petit", nom_template="Petit", largeur_mm=80.0, hauteur_mm=40.0)
+    geant = TemplateLamicoid(template_id="geant", nom_template="Géant", largeur_mm=500.0, hauteur_mm=400.0)
+    templates = {petit.template_id: petit, geant.template_id: geant}
+    lamicoids = [nouveau_lamicoid(petit) for _ in range(5)] + [nouveau_lamicoid(geant) for _ in range(2)]
+    modele = FeuilleLamicoid(300.0, 200.0, 1.6)
+
+    feuilles, resultat = imbriquer_lamicoids(lamicoids, templates, modele)
+    assert len(resultat.non_placees) == 2
+    hors_format = feuille_hors_format(resultat.non_placees, modele)
+
+    assert (hors_format.largeur_feuille_mm, hors_format.hauteur_feuille_mm) == (300.0, 200.0)
+    assert [p.position_y_mm for p in hors_format.lamicoids_sur_feuille] == [0.0, 400.0]
+    conserves = [p.lamicoid.instance_id for feuille in feuilles + [hors_format] for p in feuille.lamicoids_sur_feuille]
+    assert sorted(conserves) == sorted(lamicoid.instance_id for lamicoid in lamicoids)
+
+
+def test_spreadsheet_import_keeps_existing_lamicoids(tmp_path):
+    pytest.importorskip("PyQt5")
+    from models.documents.lamicoid_2.elements import ElementTexte
+    from utils.lamicoid_nesting_runner import LamicoidNestingWorker
+
+    texte = ElementTexte(element_id="t", x_mm=0.0, y_mm=0.0, largeur_mm=50.0, hauteur_mm=10.0,
+                         est_variable=True, nom_variable="Nom")
+    template = TemplateLamicoid(template_id="etiquette", nom_template="Étiquette", largeur_mm=60.0,
+                                hauteur_mm=30.0, elements=[texte])
+    existant = TemplateLamicoid(template_id="existant", nom_template="Existant", largeur_mm=80.0, hauteur_mm=40.0)
+    deja_la = [nouveau_lamicoid(existant) for _ in range(3)]
+    tableur = tmp_path / "lamicoids.csv"
+    tableur.write_text("Nom;Quantité\nPompe;2\nVanne;1\n", encoding="utf-8")
+
+    result = LamicoidNestingWorker(deja_la, {existant.template_id: existant}, FeuilleLamicoid(300.0, 200.0, 1.6),
+                                   spreadsheet_path=str(tableur), template=template).execute()
+
+    assert result.error is None and not result.aborted
+    assert len(result.import_result.lamicoids) == 3
+    places = {p.lamicoid.instance_id for feuille in result.feuilles for p in feuille.lamicoids_sur_feuille}
+    assert places == {lamicoid.instance_id for lamicoid in deja_la + result.import_result.lamicoids}
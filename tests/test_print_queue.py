@@ -0,0 +1,124 @@
+"""File d'impression contre le faux laser: priorités, nouveaux essais et persistance."""
+import json
+import time
+
+import pytest
+
+pytest.importorskip("PyQt5")
+
+from PyQt5.QtCore import QCoreApplication # noqa: E402
+
+from utils import print_queue as pq # noqa: E402
+from utils.fake_laser import FakeLaserServer, SIMULATED_PRN_HEADER # noqa: E402
+
+MACHINE = "Faux laser"
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+@pytest.fixture
+def lasers(monkeypatch):
+    """Lasers configurés (aucun au départ: les travaux soumis attendent le démarrage)."""
+    machines = []
+    monkeypatch.setattr(pq, "configured_lasers", lambda: list(machines))
+    monkeypatch.setattr(pq, "WAIT_POLL_INTERVAL", 0.05)
+    monkeypatch.setattr(pq, "RETRY_BASE_DELAY", 0.05)
+    return machines
+
+
+def _simulated_machine(server):
+    host, port = server.address
+    return pq.LaserMachine(nom=MACHINE, modele="fusionpro24", ip=host, port=port, simulation=True)
+
+
+def _wait_for(app, condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        app.processEvents()
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def _svg(received: bytes) -> str:
+    assert received.startswith(SIMULATED_PRN_HEADER)
+    return received.split(b"\n", 2)[2].decode("utf-8")
+
+
+def test_priority_order(app, lasers, tmp_path):
+    with FakeLaserServer() as server:
+        queue = pq.PrintQueue(state_dir=tmp_path)
+        try:
+            queue.submit(MACHINE, "<svg>normal-1</svg>", {}, titre="normal-1")
+            queue.submit(MACHINE, "<svg>normal-2</svg>", {}, titre="normal-2")
+            queue.submit(MACHINE, "<svg>urgent</svg>", {}, titre="urgent", priorite=pq.PRIORITY_HIGH)
+            lasers.append(_simulated_machine(server))
+            queue.start()
+            assert _wait_for(app, lambda: len(server.received) == 3)
+        finally:
+            queue.stop()
+    assert [_svg(data) for data in server.received] == ["<svg>urgent</svg>", "<svg>normal-1</svg>",
+                                                        "<svg>normal-2</svg>"]
+
+
+def test_retry_with_backoff(app, lasers, tmp_path):
+    assert [pq.retry_delay(n) for n in (1, 2, 3)] == [pq.RETRY_BASE_DELAY * f for f in (1, 2, 4)]
+    with FakeLaserServer(fail_first=2) as server:
+        lasers.append(_simulated_machine(server))
+        queue = pq.PrintQueue(state_dir=tmp_path)
+        try:
+            job = queue.submit(MACHINE, "<svg>retry</svg>", {"copies": 1})
+            assert _wait_for(app, lambda: queue.jobs()[0].statut == pq.STATUS_DONE)
+        finally:
+            queue.stop()
+        done = queue.jobs()[0]
+    assert done.job_id == job.job_id
+    assert done.tentatives == 2
+    assert len(server.received) == 1
+
+
+def test_send_gives_up_after_max_attempts(app, lasers, tmp_path, monkeypatch):
+    monkeypatch.setattr(pq, "MAX_SEND_ATTEMPTS", 2)
+    with FakeLaserServer(fail_first=10) as server:
+        lasers.append(_simulated_machine(server))
+        queue = pq.PrintQueue(state_dir=tmp_path)
+        try:
+            queue.submit(MACHINE, "<svg>echec</svg>", {})
+            assert _wait_for(app, lambda: queue.jobs()[0].statut == pq.STATUS_FAILED)
+        finally:
+            queue.stop()
+    assert server.received == []
+
+
+def test_state_is_persisted_and_restored(app, lasers, tmp_path):
+    queue = pq.PrintQueue(state_dir=tmp_path)
+    first = queue.submit(MACHINE, "<svg>1</svg>", {}, titre="premier")
+    second = queue.submit(MACHINE, "<svg>2</svg>", {}, titre="second", priorite=pq.PRIORITY_HIGH)
+    queue.stop()
+
+    # Travail interrompu pendant sa génération (fermeture de l'application)
+    state_path = tmp_path / pq.STATE_FILENAME
+    state = json.loads(state_path.read_text(encoding="utf-8"))
+    for job_data in state["jobs"]:
+        if job_data["job_id"] == first.job_id:
+            job_data["statut"] = pq.STATUS_GENERATING
+    state_path.write_text(json.dumps(state), encoding="utf-8")
+
+    restored = pq.PrintQueue(state_dir=tmp_path)
+    assert [job.job_id for job in restored.pending_jobs()] == [second.job_id, first.job_id]
+    assert all(job.statut == pq.STATUS_PENDING for job in restored.pending_jobs())
+
+    with FakeLaserServer() as server:
+        lasers.append(_simulated_machine(server))
+        try:
+            restored.start()
+            assert _wait_for(app, lambda: len(server.received) == 2)
+        finally:
+            restored.stop()
+    assert [_svg(data) for data in server.received] == ["<svg>2</svg>", "<svg>1</svg>"]
+    reloaded = pq.PrintQueue(state_dir=tmp_path)
+    assert {job.statut for job in reloaded.jobs()} == {pq.STATUS_DONE}
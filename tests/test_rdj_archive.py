@@ -0,0 +1,73 @@
+"""Écriture incrémentale des archives .rdj: recopie brute des membres et repli par recompression."""
+import sys
+import zipfile
+
+import pytest
+
+pytest.importorskip("PyQt5")
+
+from utils import rdj_archive # noqa: E402
+
+
+def _make_factures(tmp_path):
+    dossier = tmp_path / "entree_1"
+    dossier.mkdir()
+    (dossier / "facture.pdf").write_bytes(b"%PDF-1.4 " + bytes(range(256)) * 64)
+    (dossier / "note.txt").write_text("texte compressible " * 200, encoding="utf-8")
+    return [str(dossier)]
+
+
+def _members(path):
+    with zipfile.ZipFile(path) as zf:
+        assert zf.testzip() is None
+        return {info.filename: zf.read(info) for info in zf.infolist()}
+
+
+@pytest.mark.skipif(sys.version_info >= (3, 14), reason="Internes de zipfile vérifiés jusqu'à CPython 3.13")
+def test_raw_copy_supported_on_known_versions(tmp_path):
+    with zipfile.ZipFile(tmp_path / "a.zip", "w") as dest:
+        dest.writestr("x", b"x")
+    with zipfile.ZipFile(tmp_path / "a.zip") as src, zipfile.ZipFile(tmp_path / "b.zip", "w") as dest:
+        assert rdj_archive.raw_copy_supported(src, dest)
+
+
+def test_resave_copies_unchanged_members(tmp_path):
+    dossiers = _make_factures(tmp_path)
+    destination = tmp_path / "rapport.rdj"
+    rdj_archive.write_rdj_archive(str(destination), {"titre": "test"}, dossiers)
+    premier = _members(destination)
+
+    copies = []
+    original_copy = rdj_archive.copy_member
+    def spy(source_zip, info, dest_zip):
+        copies.append(info.filename)
+        return original_copy(source_zip, info, dest_zip)
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(rdj_archive, "copy_member", spy)
+        rdj_archive.write_rdj_archive(str(destination), {"titre": "test"}, dossiers)
+    assert sorted(copies) == sorted(premier)
+    assert _members(destination) == premier
+
+
+def test_fallback_when_zipfile_internals_are_missing(tmp_path):
+    dossiers = _make_factures(tmp_path)
+    destination = tmp_path / "rapport.rdj"
+    rdj_archive.write_rdj_archive(str(destination), {"titre": "test"}, dossiers)
+    premier = _members(destination)
+
+    with pytest.MonkeyPatch.context() as mp:
+        # Interne renommé ou retiré dans une autre version de CPython
+        mp.setattr(rdj_archive, "_RAW_COPY_MODULE_ATTRS",
+                   rdj_archive._RAW_COPY_MODULE_ATTRS + ("_interne_absent",))
+        with zipfile.ZipFile(destination) as src, zipfile.ZipFile(tmp_path / "copie.zip", "w") as dest:
+            assert not rdj_archive.raw_copy_supported(src, dest)
+            for info in src.infolist():
+                assert rdj_archive.copy_member(src, info, dest) is False
+        rdj_archive.write_rdj_archive(str(destination), {"titre": "modifié"}, dossiers)
+
+    assert _members(tmp_path / "copie.zip") == premier
+    relu = _members(destination)
+    assert set(relu) == set(premier)
+    assert relu["factures/entree_1/facture.pdf"] == premier["factures/entree_1/facture.pdf"]
+    assert b"modifi" in relu[rdj_archive.RDJ_DATA_MEMBER]
@@ -0,0 +1,31 @@
+"""Simplification des chemins SVG: les contours fermés le restent."""
+import math
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("PyQt5")
+
+from utils.svg_path_optimizer import optimize_svg_path_data, parse_svg_path_data # noqa: E402
+
+
+def test_closed_contour_keeps_its_closepath():
+    points = [(10 * math.cos(2 * math.pi * i / 200), 10 * math.sin(2 * math.pi * i / 200)) for i in range(200)]
+    d = "M10 0 " + " ".join(f"L{x:.4f} {y:.4f}" for x, y in points[1:]) + " Z"
+
+    optimized, before, after = optimize_svg_path_data(d, 0.02)
+
+    assert after < before
+    assert optimized.rstrip().endswith("z")
+    subpaths = parse_svg_path_data(optimized)
+    assert len(subpaths) == 1 and subpaths[0][2] # Sous-chemin fermé
+
+
+def test_open_contour_stays_open():
+    points = [(10 * math.cos(math.pi * i / 200), 10 * math.sin(math.pi * i / 200)) for i in range(200)]
+    d = "M10 0 " + " ".join(f"L{x:.4f} {y:.4f}" for x, y in points[1:])
+
+    optimized, before, after = optimize_svg_path_data(d, 0.02)
+
+    assert after < before
+    assert "z" not in optimized.lower()
@@ -0,0 +1,56 @@
+"""Totaux d'un rapport: le cache suit les ajouts, retraits et modifications notifiés par le rapport."""
+import copy
+from datetime import date
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from models.documents.rapport_depense import Deplacement, Repas, RapportDepense # noqa: E402
+from models.documents.rapport_depense.facture import Facture # noqa: E402
+
+
+def _rapport():
+    rapport = RapportDepense("test.rdj", date(2025, 1, 31), "Nom", "Prénom", "Ville", "Dép", "Sup", "0.5")
+    rapport.ajouter_deplacement(Deplacement(date(2025, 1, 2), "Client", "Ville", "C1", 100.0, 50.0))
+    rapport.ajouter_repas(Repas(date(2025, 1, 3), "Resto", "Client", True, False, "", 20.0, 3.0, 1.0, 2.0, 0.0, 26.0,
+                                facture=Facture("/tmp/factures/repas_1", ["a.pdf"], archive_path="/tmp/r.rdj")))
+    return rapport
+
+
+def test_notified_edit_and_cache_reuse():
+    rapport = _rapport()
+    premier = rapport.calculer_totaux()
+    assert premier.total_deplacements == 50.0
+    assert rapport.calculer_totaux() is premier # Rien n'a changé: résultat en cache
+    rapport.repas[0].totale_apres_taxes = 30.0
+    rapport.entree_modifiee(rapport.repas[0])
+    assert rapport.calculer_totaux().repas_employe_total == 30.0
+
+
+def test_invoice_removed_and_entry_deleted():
+    rapport = _rapport()
+    assert rapport.calculer_totaux().repas_factures_manquantes == 0
+    rapport.repas[0].facture = None
+    rapport.entree_modifiee(rapport.repas[0])
+    assert rapport.calculer_totaux().repas_factures_manquantes == 1
+    assert rapport.retirer_entree(rapport.deplacements[0])
+    assert rapport.calculer_totaux().nombre_deplacements == 0
+
+
+def test_duplicated_entry_with_invoice():
+    rapport = _rapport()
+    rapport.calculer_totaux()
+    # Duplication (RapportDepensePage._handle_duplicate_entry): copie indépendante, facture comprise
+    original = rapport.repas[0]
+    copie = copy.deepcopy(original)
+    rapport.ajouter_repas(copie)
+    assert copie.facture is not original.facture
+    copie.totale_apres_taxes = 4.0
+    copie.facture = None
+    rapport.entree_modifiee(copie)
+    totaux = rapport.calculer_totaux()
+    assert totaux.repas_employe_count == 2
+    assert totaux.repas_employe_total == 30.0
+    assert totaux.repas_factures_manquantes == 1
+    assert original.facture is not None
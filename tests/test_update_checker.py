@@ -0,0 +1,98 @@
+"""Vérification des mises à jour contre un serveur HTTP local (ETag, 304, intervalle)."""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("PyQt5")
+pytest.importorskip("requests")
+
+from updater import update_checker # noqa: E402
+
+ETAG = '"release-2.0.0"'
+RELEASE = {
+    "tag_name": "2.0.0",
+    "assets": [{"name": "gdj_installer.exe", "browser_download_url": "http://localhost/gdj_installer.exe"}],
+}
+
+
+class _ReleaseHandler(BaseHTTPRequestHandler):
+    """Réponse de l'API GitHub « releases/latest », conditionnelle sur l'ETag."""
+
+    def do_GET(self):
+        self.server.requests.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.send_header("ETag", ETAG)
+            self.end_headers()
+            return
+        body = json.dumps(RELEASE).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", ETAG)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def release_server(monkeypatch, tmp_path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ReleaseHandler)
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    version_file = tmp_path / "version.txt"
+    version_file.write_text("[Version]\nvalue = 1.0.0\n", encoding="utf-8")
+    monkeypatch.setattr(update_checker, "GITHUB_API_URL", f"http://127.0.0.1:{server.server_port}/releases/latest")
+    monkeypatch.setattr(update_checker, "VERSION_FILE", str(version_file))
+    monkeypatch.setattr(update_checker, "_release_cache_path", lambda: tmp_path / "latest_release.json")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _check(max_age_seconds):
+    """Exécute UpdateCheckWorker.run dans le thread courant et retourne (statut, update_info)."""
+    results = []
+    worker = update_checker.UpdateCheckWorker(max_age_seconds=max_age_seconds)
+    worker.finished.connect(lambda status, info: results.append((status, info)))
+    worker.run()
+    assert len(results) == 1
+    return results[0]
+
+
+def test_etag_cache_and_check_interval(release_server, tmp_path):
+    cache_path = tmp_path / "latest_release.json"
+
+    # 1. Premier contact: 200 avec ETag, la release est mise en cache
+    status, info = _check(max_age_seconds=3600)
+    assert status == "Mise à jour trouvée : 2.0.0"
+    assert info["available"] and info["version"] == "2.0.0"
+    assert "If-None-Match" not in release_server.requests[0]
+    cache = json.loads(cache_path.read_text(encoding="utf-8"))
+    assert cache["etag"] == ETAG and cache["release"] == RELEASE
+
+    # 2. Cache expiré: requête conditionnelle, le 304 réutilise la release en cache
+    cache["fetched_at"] = 0
+    cache_path.write_text(json.dumps(cache), encoding="utf-8")
+    status, info = _check(max_age_seconds=3600)
+    assert len(release_server.requests) == 2
+    assert release_server.requests[1]["If-None-Match"] == ETAG
+    assert status == "Mise à jour trouvée : 2.0.0" and info["version"] == "2.0.0"
+    assert json.loads(cache_path.read_text(encoding="utf-8"))["fetched_at"] > 0
+
+    # 3. Dans l'intervalle de vérification: GitHub n'est pas contacté
+    status, info = _check(max_age_seconds=3600)
+    assert len(release_server.requests) == 2
+    assert info["version"] == "2.0.0"
+
+
+def test_no_cache_reuse_without_interval(release_server):
+    _check(max_age_seconds=None)
+    _check(max_age_seconds=None)
+    assert len(release_server.requests) == 2
+    assert release_server.requests[1]["If-None-Match"] == ETAG
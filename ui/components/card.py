@@ -9,25 +9,16 @@ from utils.theme import get_theme_vars, RADIUS_BOX
 import os
 import functools
 from models.documents.rapport_depense.facture import Facture # Assumer l'import
-from PyQt5.QtGui import QPixmap, QImage # Pour _generate_thumbnail_pixmap
+from PyQt5.QtGui import QPixmap, QImage # Pour _create_thumbnail_widget
 # --- AJOUT: Importer RoundedImageWidget --- 
 from widgets.thumbnail_widget import ThumbnailWidget
 # ------------------------------------------
+from utils.thumbnail_cache import is_thumbnail_supported
 import logging # Ajout pour le logger
 
 # Initialisation du logger
 logger = logging.getLogger('GDJ_App')
 
-# --- AJOUT: Tentative d'import de fitz et définition de PYMUPDF_AVAILABLE --- 
-try:
-    import fitz # PyMuPDF
-    PYMUPDF_AVAILABLE = True
-except ImportError:
-    fitz = None # Définir fitz à None si l'import échoue
-    PYMUPDF_AVAILABLE = False
-    # Pas de print ici, pourrait être appelé souvent
-# --------------------------------------------------------------------------
-
 # --- Widget Card (Reconstruit, héritant de QFrame) --- 
 class CardWidget(QFrame):
     # --- AJOUT: Signal pour clic miniature --- 
@@ -322,7 +313,7 @@ class CardWidget(QFrame):
             facture_obj = getattr(self.entry_data, 'facture', None)
             has_facture = False
             if facture_obj and isinstance(facture_obj, Facture):
-                if facture_obj.get_full_paths():
+                if facture_obj.filenames: # Pas besoin d'extraire une facture paresseuse pour le savoir
                     has_facture = True
             
             if not has_facture:
@@ -466,16 +457,16 @@ class CardWidget(QFrame):
             facture_obj = getattr(self.entry_data, facture_attr, None)
             has_factures = False
             if facture_obj and isinstance(facture_obj, Facture):
-                all_files = facture_obj.get_full_paths()
+                # Chemins attendus sans extraction: les miniatures sont lues en mémoire si besoin
+                all_files = facture_obj.get_full_paths(materialize=False)
                 if all_files:
                     has_factures = True
                     for idx, file_path in enumerate(all_files):
-                        thumb_pixmap = self._generate_thumbnail_pixmap(file_path) 
-                        if not thumb_pixmap.isNull():
-                            # --- UTILISER ThumbnailWidget SANS Bouton Delete --- 
-                            thumbnail_widget = ThumbnailWidget(file_path, thumb_pixmap, show_delete_button=False)
+                        # --- UTILISER ThumbnailWidget SANS Bouton Delete --- 
+                        thumbnail_widget = self._create_thumbnail_widget(file_path, facture=facture_obj)
+                        if thumbnail_widget is not None:
                             # Connecter le signal clicked du ThumbnailWidget au slot interne
-                            thumbnail_widget.clicked.connect(functools.partial(self._on_thumbnail_button_clicked, all_files=all_files, index=idx))
+                            thumbnail_widget.clicked.connect(functools.partial(self._on_thumbnail_button_clicked, all_files=all_files, index=idx, facture=facture_obj))
                             facture_thumbs_layout.addWidget(thumbnail_widget)
                             # -------------------------------------------------
                     facture_thumbs_layout.addStretch() # Pour pousser à gauche
@@ -581,7 +572,7 @@ class CardWidget(QFrame):
             facture_obj_dep = getattr(self.entry_data, facture_attr_depense, None)
             has_factures_dep = False
             if facture_obj_dep and isinstance(facture_obj_dep, Facture):
-                all_files_dep = facture_obj_dep.get_full_paths()
+                all_files_dep = facture_obj_dep.get_full_paths(materialize=False)
                 if all_files_dep:
                     has_factures_dep = True
                     facture_thumbs_widget_dep = QWidget()
@@ -591,10 +582,9 @@ class CardWidget(QFrame):
                     facture_thumbs_layout_dep.setAlignment(Qt.AlignLeft | Qt.AlignTop)
 
                     for idx, file_path in enumerate(all_files_dep):
-                        thumb_pixmap = self._generate_thumbnail_pixmap(file_path)
-                        if not thumb_pixmap.isNull():
-                            thumbnail_widget_dep = ThumbnailWidget(file_path, thumb_pixmap, show_delete_button=False)
-                            thumbnail_widget_dep.clicked.connect(functools.partial(self._on_thumbnail_button_clicked, all_files=all_files_dep, index=idx))
+                        thumbnail_widget_dep = self._create_thumbnail_widget(file_path, facture=facture_obj_dep)
+                        if thumbnail_widget_dep is not None:
+                            thumbnail_widget_dep.clicked.connect(functools.partial(self._on_thumbnail_button_clicked, all_files=all_files_dep, index=idx, facture=facture_obj_dep))
                             facture_thumbs_layout_dep.addWidget(thumbnail_widget_dep)
                     facture_thumbs_layout_dep.addStretch()
                     # Ajouter sous le label Facture(s), span sur plusieurs lignes si nécessaire
@@ -784,61 +774,43 @@ class CardWidget(QFrame):
         # else: On ne restaure pas si "Modifier" a été cliqué, car set_editing_highlight va s'en charger.
         # ----------------------------------------------------------------------------
 
-    # --- Méthode pour générer miniature (copiée depuis rapport_depense_page) ---
-    # (Avec ajustement pour être une méthode de classe)
-    def _generate_thumbnail_pixmap(self, file_path, size=QSize(64, 64)):
-        """Génère un QPixmap miniature pour un fichier image ou PDF."""
-        # --- NE PAS PRE-SCALER ICI --- 
-        # La taille par défaut du QPixmap sera la taille originale ou rendue
-        pixmap = QPixmap() 
-        is_image = any(file_path.lower().endswith(ext) for ext in
-                       ['.png', '.jpg', '.jpeg', '.bmp', '.gif'])
-
+    # --- Création d'une miniature (rendu en arrière-plan) ---
+    def _create_thumbnail_widget(self, file_path, facture=None):
+        """
+        Crée un ThumbnailWidget (sans bouton de suppression) pour un fichier de facture.
+        Un placeholder est affiché immédiatement; la miniature réelle est prise dans le
+        cache mémoire ou rendue par le pool de rendu puis substituée.
+        Si 'facture' est une Facture pas encore extraite de son archive .rdj,
+        le fichier est lu depuis l'archive dans le thread de rendu.
+        """
         try:
-            if is_image:
-                img = QImage(file_path)
-                if not img.isNull():
-                    # Charger l'image, mais ne pas scaler ici
-                    pixmap = QPixmap.fromImage(img)
-            elif file_path.lower().endswith('.pdf') and PYMUPDF_AVAILABLE:
-                doc = fitz.open(file_path)
-                if len(doc) > 0:
-                    page = doc.load_page(0)
-                    zoom = 2.0
-                    mat = fitz.Matrix(zoom, zoom)
-                    pdf_pix = page.get_pixmap(matrix=mat, alpha=False)
-                    qimage = QImage(pdf_pix.samples, pdf_pix.width, pdf_pix.height, pdf_pix.stride, QImage.Format_RGB888)
-                    # Créer le pixmap depuis PDF rendu, mais ne pas scaler ici
-                    pixmap = QPixmap.fromImage(qimage)
-                doc.close()
-            else:
+            if not is_thumbnail_supported(file_path):
+                pixmap = QPixmap()
                 placeholder_path = get_icon_path("round_description.png")
                 if placeholder_path:
-                    # Charger l'icône placeholder, ne pas scaler ici (elle est petite)
-                    # On pourrait la scaler à la taille THUMBNAIL_SIZE si on veut un placeholder plus grand
-                    pixmap = QPixmap(placeholder_path) 
-
+                    pixmap = QPixmap(placeholder_path)
+                if pixmap.isNull():
+                    pixmap = ThumbnailWidget.placeholder_pixmap()
+                return ThumbnailWidget(file_path, pixmap, show_delete_button=False)
+
+            thumbnail_widget = ThumbnailWidget(file_path, ThumbnailWidget.placeholder_pixmap(), show_delete_button=False)
+            data_loader = None
+            if isinstance(facture, Facture) and not facture.is_materialized() and not os.path.exists(file_path):
+                data_loader = functools.partial(facture.read_bytes, os.path.basename(file_path))
+            thumbnail_widget.load_thumbnail_async(data_loader)
+            return thumbnail_widget
         except Exception as e:
-            logger.error(f"Erreur génération miniature (CardWidget) pour {file_path}: {e}")
-            placeholder_path = get_icon_path("round_description.png")
-            if placeholder_path:
-                 pixmap = QPixmap(placeholder_path)
-
-        if pixmap.isNull():
-            pixmap = QPixmap(size)
-            
-            # Créer un placeholder gris à la taille THUMBNAIL_SIZE désirée
-            placeholder_size = ThumbnailWidget.THUMBNAIL_SIZE if 'ThumbnailWidget' in globals() else 100
-            pixmap = QPixmap(placeholder_size, placeholder_size)
-            pixmap.fill(Qt.darkGray)
-
-        return pixmap
+            logger.error(f"Erreur création miniature (CardWidget) pour {file_path}: {e}")
+            return None
     # -----------------------------------------------------------------------
 
     # --- Slot interne pour gérer clic sur bouton miniature --- 
     @Slot(list, int)
-    def _on_thumbnail_button_clicked(self, all_files, index):
+    def _on_thumbnail_button_clicked(self, all_files, index, facture=None):
         """Émet le signal thumbnail_clicked avec les données reçues."""
+        if isinstance(facture, Facture):
+            # La visionneuse a besoin des fichiers sur le disque: extraction à la demande
+            all_files = facture.get_full_paths()
         logger.debug(f"CardWidget: Thumbnail clicked! Emitting signal with index {index} for list: {all_files}")
         self.thumbnail_clicked.emit(all_files, index)
     # ---------------------------------------------------------
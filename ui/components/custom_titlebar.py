@@ -41,6 +41,8 @@ class CustomTitleBar(QWidget):
     save_document_as_requested = pyqtSignal()
     # --- AJOUT NOUVEAU SIGNAL ---
     open_document_requested = pyqtSignal()
+    # --- Export PDF par lot de rapports .rdj ---
+    batch_export_requested = pyqtSignal()
     # ---------------------------------------
 
     def __init__(self, parent=None, title="Application", icon_base_name=None, show_menu_button_initially=False):
@@ -528,6 +530,11 @@ class CustomTitleBar(QWidget):
             action_close_all = QAction(QIcon(icon_loader.get_icon_path("round_close_all_docs.png")), "Fermer Tout", self) # AJOUT Icône
             action_close_all.triggered.connect(self.close_all_documents_requested.emit)
             self._file_menu.addAction(action_close_all)
+
+            action_batch_export = QAction(QIcon(icon_loader.get_icon_path("round_print.png")), "Exporter des rapports en PDF...", self)
+            action_batch_export.setToolTip("Exporter en PDF tous les rapports (.rdj) d'un dossier")
+            action_batch_export.triggered.connect(self.batch_export_requested.emit)
+            self._file_menu.addAction(action_batch_export)
             
             # action_print_all = self._file_menu.addAction("Imprimer Tout") # Laisser pour plus tard
 
@@ -0,0 +1,279 @@
+# updater/delta_update.py
+"""
+Mises à jour différentielles: paquets de fichiers modifiés entre deux versions consécutives.
+
+create_release.py publie avec chaque release un manifeste (chemin relatif -> SHA-256 et
+taille de chaque fichier installé) et, si la release précédente a aussi un manifeste,
+un paquet zip ne contenant que les fichiers ajoutés ou modifiés depuis celle-ci.
+
+update_helper applique le paquet de façon atomique: l'installation doit correspondre
+exactement à la version de départ (empreintes vérifiées), les nouveaux fichiers sont
+extraits et vérifiés dans un dossier de transit, puis échangés un par un avec les anciens
+qui sont gardés de côté (Windows permet de renommer un exécutable ou une DLL en cours
+d'utilisation, ce qui couvre les fichiers de l'update helper lui-même; ceux qui restent
+verrouillés dans le dossier de sauvegarde sont supprimés au lancement suivant). GDJ.exe est
+échangé en dernier: tant que l'échange n'est pas terminé, l'ancien exécutable reste en
+place. Un journal, réécrit après chaque fichier, permet d'annuler un échange interrompu
+(recover_interrupted_update, appelé au démarrage de l'update helper et de l'application).
+En cas d'échec, l'installateur complet reste la solution de repli.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+import zipfile
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger('GDJ_App')
+
+MANIFEST_ASSET_NAME = "gdj_manifest.json"
+DELTA_FORMAT = 1
+DELTA_INFO_MEMBER = "delta.json"
+DELTA_FILES_PREFIX = "files/"
+STAGING_DIR_NAME = ".update_staging"
+BACKUP_DIR_NAME = ".update_backup"
+JOURNAL_FILE_NAME = ".update_journal.json"
+MAIN_EXECUTABLE_NAME = "GDJ.exe" # Échangé en dernier
+STALE_JOURNAL_SECONDS = 300 # Au démarrage de l'application: journal sans progrès = échange abandonné
+REPLACE_ATTEMPTS = 60 # GDJ.exe peut rester verrouillé quelques secondes après la fermeture de l'application
+REPLACE_RETRY_DELAY = 0.5
+HASH_READ_SIZE = 1024 * 1024
+
+
+class DeltaUpdateError(Exception):
+    """Paquet inapplicable ou échec de l'application (l'installation est laissée intacte)."""
+
+
+def normalize_version(version_str: str) -> str:
+    """'v1.2.3' -> '1.2.3' (les tags GitHub ont un 'v', data/version.txt non)."""
+    return version_str.strip().lstrip("vV")
+
+
+def delta_asset_name(from_version: str, to_version: str) -> str:
+    """Nom de l'asset du paquet différentiel entre deux versions."""
+    return f"gdj_delta_{normalize_version(from_version)}_to_{normalize_version(to_version)}.zip"
+
+
+def file_sha256(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_READ_SIZE), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def build_manifest(files: Dict[str, str], version_str: str) -> dict:
+    """Manifeste d'une version: files associe chaque chemin relatif installé à son fichier source."""
+    return {
+        "version": normalize_version(version_str),
+        "files": {rel_path: {"sha256": file_sha256(source), "size": os.path.getsize(source)}
+                  for rel_path, source in sorted(files.items())},
+    }
+
+
+def diff_manifests(old_manifest: dict, new_manifest: dict) -> Tuple[List[str], List[str]]:
+    """(fichiers ajoutés ou modifiés, fichiers supprimés) entre deux manifestes."""
+    old_files, new_files = old_manifest["files"], new_manifest["files"]
+    changed = [rel for rel, entry in new_files.items()
+               if rel not in old_files or old_files[rel]["sha256"] != entry["sha256"]]
+    removed = [rel for rel in old_files if rel not in new_files]
+    return sorted(changed), sorted(removed)
+
+
+def build_delta_pack(files: Dict[str, str], old_manifest: dict, new_manifest: dict, output_path: str) -> str:
+    """Écrit le paquet des fichiers ajoutés/modifiés depuis old_manifest et retourne son chemin."""
+    changed, removed = diff_manifests(old_manifest, new_manifest)
+    info = {
+        "format": DELTA_FORMAT,
+        "from_version": old_manifest["version"],
+        "to_version": new_manifest["version"],
+        # Empreintes attendues dans l'installation avant l'application du paquet
+        "base": {rel: old_manifest["files"][rel] for rel in changed + removed if rel in old_manifest["files"]},
+        "target": {rel: new_manifest["files"][rel] for rel in changed},
+        "removed": removed,
+    }
+    with zipfile.ZipFile(output_path, 'w', compression=zipfile.ZIP_DEFLATED) as pack:
+        pack.writestr(DELTA_INFO_MEMBER, json.dumps(info, indent=1))
+        for rel in changed:
+            pack.write(files[rel], DELTA_FILES_PREFIX + rel)
+    logger.info(f"Paquet différentiel {info['from_version']} -> {info['to_version']}: "
+                f"{len(changed)} fichier(s) modifié(s), {len(removed)} supprimé(s) ({os.path.getsize(output_path)} octets).")
+    return output_path
+
+
+def _install_path(install_dir: str, rel_path: str) -> str:
+    path = os.path.normpath(os.path.join(install_dir, rel_path))
+    if os.path.commonpath([os.path.abspath(install_dir), os.path.abspath(path)]) != os.path.abspath(install_dir):
+        raise DeltaUpdateError(f"Chemin hors du dossier d'installation dans le paquet: {rel_path}")
+    return path
+
+
+def _replace_with_retry(src: str, dst: str):
+    """os.replace, en réessayant tant que le fichier de destination est verrouillé (Windows)."""
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    for attempt in range(REPLACE_ATTEMPTS):
+        try:
+            os.replace(src, dst)
+            return
+        except PermissionError:
+            if attempt == REPLACE_ATTEMPTS - 1:
+                raise
+            time.sleep(REPLACE_RETRY_DELAY)
+
+
+def _read_pack_info(pack: zipfile.ZipFile) -> dict:
+    try:
+        info = json.loads(pack.read(DELTA_INFO_MEMBER).decode('utf-8'))
+    except (KeyError, ValueError) as e:
+        raise DeltaUpdateError(f"Paquet différentiel invalide: {e}") from e
+    if info.get("format") != DELTA_FORMAT:
+        raise DeltaUpdateError(f"Format de paquet non pris en charge: {info.get('format')}")
+    return info
+
+
+def _check_base(info: dict, install_dir: str):
+    """L'installation doit être exactement la version de départ du paquet."""
+    for rel, expected in info["base"].items():
+        path = _install_path(install_dir, rel)
+        if not os.path.isfile(path) or file_sha256(path) != expected["sha256"]:
+            raise DeltaUpdateError(f"L'installation ne correspond pas à la version {info['from_version']} "
+                                   f"({rel} absent ou modifié).")
+
+
+def _stage_files(pack: zipfile.ZipFile, info: dict, staging_dir: str):
+    """Extrait et vérifie les nouveaux fichiers dans le dossier de transit."""
+    for rel, expected in info["target"].items():
+        staged = _install_path(staging_dir, rel)
+        os.makedirs(os.path.dirname(staged), exist_ok=True)
+        hasher = hashlib.sha256()
+        try:
+            with pack.open(DELTA_FILES_PREFIX + rel) as src, open(staged, 'wb') as dst:
+                for block in iter(lambda: src.read(HASH_READ_SIZE), b""):
+                    hasher.update(block)
+                    dst.write(block)
+        except KeyError as e:
+            raise DeltaUpdateError(f"Fichier manquant dans le paquet: {rel}") from e
+        if hasher.hexdigest() != expected["sha256"]:
+            raise DeltaUpdateError(f"Empreinte invalide dans le paquet pour {rel}")
+
+
+def _write_journal(install_dir: str, journal: dict):
+    journal_path = os.path.join(install_dir, JOURNAL_FILE_NAME)
+    with open(journal_path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(journal, f)
+    os.replace(journal_path + ".tmp", journal_path)
+
+
+def _cleanup(install_dir: str):
+    # Le journal est retiré en premier: c'est le point de validation. Une interruption pendant
+    # la suppression des dossiers laisse des restes sans journal, sans retour en arrière
+    # partiel (les fichiers gardés de côté ne sont supprimés qu'une fois le journal retiré).
+    journal_path = os.path.join(install_dir, JOURNAL_FILE_NAME)
+    for path in (journal_path, journal_path + ".tmp"):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    for name in (STAGING_DIR_NAME, BACKUP_DIR_NAME):
+        shutil.rmtree(os.path.join(install_dir, name), ignore_errors=True)
+
+
+def _rollback(install_dir: str, journal: dict):
+    """Remet en place les fichiers gardés de côté et retire les fichiers ajoutés."""
+    backup_dir = os.path.join(install_dir, BACKUP_DIR_NAME)
+    for rel in journal.get("added", []):
+        path = _install_path(install_dir, rel)
+        if os.path.exists(path):
+            os.remove(path)
+    for rel in journal.get("backed_up", []):
+        backup = _install_path(backup_dir, rel)
+        if os.path.exists(backup):
+            _replace_with_retry(backup, _install_path(install_dir, rel))
+
+
+def recover_interrupted_update(install_dir: str, min_age_seconds: float = 0) -> bool:
+    """
+    Annule un échange interrompu (coupure, plantage). True si une récupération a eu lieu.
+
+    min_age_seconds > 0 (démarrage de l'application): seul un journal qui n'a pas progressé
+    depuis ce délai est annulé, et les dossiers de transit ne sont pas touchés, pour ne pas
+    défaire une mise à jour que l'update helper est encore en train d'appliquer.
+    """
+    journal_path = os.path.join(install_dir, JOURNAL_FILE_NAME)
+    if not os.path.exists(journal_path):
+        if not min_age_seconds:
+            _cleanup(install_dir) # Dossier de transit laissé avant l'échange: sans effet sur l'installation
+        return False
+    if min_age_seconds and time.time() - os.path.getmtime(journal_path) < min_age_seconds:
+        logger.info("Mise à jour différentielle en cours d'application: aucune récupération.")
+        return False
+    with open(journal_path, 'r', encoding='utf-8') as f:
+        journal = json.load(f)
+    logger.warning(f"Mise à jour {journal.get('from_version')} -> {journal.get('to_version')} interrompue "
+                   f"après {journal.get('swapped', '?')} fichier(s): retour en arrière.")
+    _rollback(install_dir, journal)
+    _cleanup(install_dir)
+    return True
+
+
+def _swap_order(targets: List[str], removed: List[str]) -> List[str]:
+    """Fichiers supprimés, puis remplacés, GDJ.exe en dernier."""
+    order = removed + targets
+    return sorted(order, key=lambda rel: os.path.normcase(rel) == os.path.normcase(MAIN_EXECUTABLE_NAME))
+
+
+def apply_delta_pack(pack_path: str, install_dir: str) -> dict:
+    """
+    Applique un paquet différentiel à l'installation. Retourne les informations du paquet.
+    Lève DeltaUpdateError si le paquet ne peut pas être appliqué; l'installation est alors
+    laissée (ou remise) dans son état de départ.
+
+    Chaque fichier est gardé de côté puis immédiatement remplacé avant de passer au suivant:
+    une interruption ne laisse qu'un fichier entre deux états, que le journal permet de
+    remettre en place.
+    """
+    recover_interrupted_update(install_dir)
+    staging_dir = os.path.join(install_dir, STAGING_DIR_NAME)
+    backup_dir = os.path.join(install_dir, BACKUP_DIR_NAME)
+    try:
+        with zipfile.ZipFile(pack_path, 'r') as pack:
+            info = _read_pack_info(pack)
+            _check_base(info, install_dir)
+            _stage_files(pack, info, staging_dir)
+    except (OSError, zipfile.BadZipFile) as e:
+        _cleanup(install_dir)
+        raise DeltaUpdateError(f"Lecture du paquet impossible: {e}") from e
+    except DeltaUpdateError:
+        _cleanup(install_dir)
+        raise
+
+    targets = list(info["target"])
+    journal = {
+        "from_version": info["from_version"],
+        "to_version": info["to_version"],
+        "backed_up": [rel for rel in targets + info["removed"] if os.path.exists(_install_path(install_dir, rel))],
+        "added": [rel for rel in targets if not os.path.exists(_install_path(install_dir, rel))],
+        "swapped": 0,
+    }
+    _write_journal(install_dir, journal)
+    backed_up = set(journal["backed_up"])
+    try:
+        for rel in _swap_order(targets, info["removed"]):
+            if rel in backed_up:
+                _replace_with_retry(_install_path(install_dir, rel), _install_path(backup_dir, rel))
+            if rel in info["target"]:
+                _replace_with_retry(_install_path(staging_dir, rel), _install_path(install_dir, rel))
+            journal["swapped"] += 1
+            _write_journal(install_dir, journal)
+    except OSError as e:
+        logger.error(f"Échec de l'échange des fichiers ({e}) après {journal['swapped']} fichier(s): retour en arrière.")
+        _rollback(install_dir, journal)
+        _cleanup(install_dir)
+        raise DeltaUpdateError(f"Échange des fichiers impossible: {e}") from e
+    _cleanup(install_dir)
+    logger.info(f"Mise à jour différentielle {info['from_version']} -> {info['to_version']} appliquée "
+                f"({len(targets)} fichier(s), {len(info['removed'])} supprimé(s)).")
+    return info
@@ -0,0 +1,281 @@
+# updater/download_engine.py
+"""
+Moteur de téléchargement reprenable de l'installateur, sans dépendance à Qt (partagé
+par DownloadWorker dans l'application et par update_helper.exe).
+
+Le fichier est écrit dans '<destination>.part'. Une interruption (annulation, coupure
+réseau, VPN instable) conserve ce fichier partiel: le téléchargement suivant reprend
+avec une requête HTTP 'Range' (If-Range sur l'ETag pour ne pas mélanger deux versions).
+Le SHA-256 est calculé au fil de l'eau et comparé à la somme publiée à côté de l'asset
+('<asset>.sha256', voir create_release.py) avant de renommer le fichier final.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import requests
+import urllib3
+
+logger = logging.getLogger('GDJ_App')
+
+CHECKSUM_SUFFIX = ".sha256"
+PARTIAL_SUFFIX = ".part"
+META_SUFFIX = ".part.json"
+MIN_CHUNK_SIZE = 16 * 1024
+INITIAL_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 1024 * 1024
+WRITE_BUFFER_SIZE = 1024 * 1024
+FAST_READ_SECONDS = 0.05 # Lecture plus rapide: on double la taille des tranches
+SLOW_READ_SECONDS = 0.5 # Lecture plus lente: on la divise par deux (progression et annulation réactives)
+MAX_RETRIES = 5
+RETRY_BASE_DELAY = 1.0 # Secondes, doublé à chaque nouvel essai
+HASH_READ_SIZE = 1024 * 1024
+
+_SHA256_RE = re.compile(r"\b([0-9a-fA-F]{64})\b")
+
+# Appelé après chaque tranche: (octets reçus, taille totale ou 0, débit en octets/s)
+ProgressCallback = Callable[[int, int, float], None]
+
+
+class DownloadError(Exception):
+    """Échec du téléchargement (le fichier partiel est conservé s'il reste réutilisable)."""
+
+
+class DownloadCancelled(DownloadError):
+    """Téléchargement annulé: le fichier partiel est conservé pour une reprise."""
+
+
+class ChecksumMismatch(DownloadError):
+    """Le SHA-256 du fichier téléchargé ne correspond pas à la somme publiée."""
+
+
+@dataclass
+class DownloadResult:
+    path: str
+    size: int
+    sha256: str
+    resumed_from: int = 0 # Octets déjà présents au départ (0 = téléchargement complet)
+    verified: bool = False # True si comparé à une somme SHA-256 publiée
+
+
+def checksum_url_for(url: str) -> str:
+    """URL de la somme publiée à côté d'un asset ('<asset>.sha256')."""
+    return url + CHECKSUM_SUFFIX
+
+
+def fetch_expected_sha256(checksum_url: str, timeout: float = 20) -> Optional[str]:
+    """Lit une somme SHA-256 publiée (format sha256sum). None si elle n'est pas publiée."""
+    response = requests.get(checksum_url, timeout=timeout)
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    match = _SHA256_RE.search(response.text)
+    if not match:
+        raise DownloadError(f"Somme SHA-256 illisible à {checksum_url}")
+    return match.group(1).lower()
+
+
+def _fetch_expected_sha256_with_retries(checksum_url: str, timeout: float, max_retries: int,
+                                        is_cancelled: Optional[Callable[[], bool]] = None) -> Optional[str]:
+    """fetch_expected_sha256 avec les mêmes nouveaux essais que le fichier lui-même (coupures réseau)."""
+    retries = 0
+    while True:
+        try:
+            return fetch_expected_sha256(checksum_url, timeout)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            retries += 1
+            if retries > max_retries:
+                raise DownloadError(f"Somme de contrôle inaccessible ({checksum_url}) après "
+                                    f"{max_retries} nouveaux essais: {e}") from e
+            delay = RETRY_BASE_DELAY * 2 ** (retries - 1)
+            logger.warning(f"Somme de contrôle inaccessible ({e}), nouvel essai dans {delay:.0f} s.")
+            time.sleep(delay)
+            if is_cancelled and is_cancelled():
+                raise DownloadCancelled("Téléchargement annulé.")
+        except requests.exceptions.RequestException as e:
+            raise DownloadError(f"Somme de contrôle inaccessible ({checksum_url}): {e}") from e
+
+
+def _load_meta(meta_path: str) -> dict:
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        return meta if isinstance(meta, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_meta(meta_path: str, meta: dict):
+    try:
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+    except OSError as e:
+        logger.warning(f"Impossible d'écrire {meta_path}: {e}")
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Impossible de supprimer {path}: {e}")
+
+
+def _hash_existing(path: str, size: int):
+    """SHA-256 des 'size' premiers octets d'un fichier partiel (reprise)."""
+    hasher = hashlib.sha256()
+    remaining = size
+    with open(path, 'rb') as f:
+        while remaining > 0:
+            block = f.read(min(HASH_READ_SIZE, remaining))
+            if not block:
+                break
+            hasher.update(block)
+            remaining -= len(block)
+    return hasher
+
+
+def _total_from_response(response, offset: int) -> int:
+    content_range = response.headers.get('Content-Range', "")
+    if "/" in content_range:
+        total = content_range.rsplit("/", 1)[1].strip()
+        if total.isdigit():
+            return int(total)
+    length = response.headers.get('Content-Length')
+    return offset + int(length) if length and length.isdigit() else 0
+
+
+def download_file(url: str, dest_path: str, expected_sha256: Optional[str] = None,
+                  checksum_url: Optional[str] = None, progress_callback: Optional[ProgressCallback] = None,
+                  is_cancelled: Optional[Callable[[], bool]] = None, timeout: float = 20,
+                  max_retries: int = MAX_RETRIES) -> DownloadResult:
+    """
+    Télécharge url vers dest_path en reprenant un éventuel '<dest_path>.part'.
+
+    La somme attendue est expected_sha256 ou, à défaut, celle lue à checksum_url (absente =
+    fichier non vérifié, avec un avertissement). Les coupures réseau en cours de transfert
+    sont reprises jusqu'à max_retries fois. Lève DownloadCancelled, ChecksumMismatch ou
+    DownloadError; en cas de succès, dest_path est complet et vérifié.
+    """
+    part_path = dest_path + PARTIAL_SUFFIX
+    meta_path = dest_path + META_SUFFIX
+    os.makedirs(os.path.dirname(os.path.abspath(dest_path)), exist_ok=True)
+
+    if expected_sha256 is None and checksum_url:
+        expected_sha256 = _fetch_expected_sha256_with_retries(checksum_url, timeout, max_retries, is_cancelled)
+        if expected_sha256 is None:
+            logger.warning(f"Aucune somme SHA-256 publiée ({checksum_url}): fichier non vérifié.")
+    expected_sha256 = expected_sha256.lower() if expected_sha256 else None
+
+    meta = _load_meta(meta_path)
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    if offset and meta.get("url") != url:
+        logger.info("Fichier partiel d'un autre téléchargement: il est remplacé.")
+        offset = 0
+    if offset == 0:
+        _remove(part_path)
+        meta = {"url": url}
+    resumed_from = offset
+    hasher = _hash_existing(part_path, offset) if offset else hashlib.sha256()
+
+    total = 0
+    retries = 0
+    chunk_size = INITIAL_CHUNK_SIZE
+    start_time = time.monotonic()
+    while True:
+        headers = {}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            validator = meta.get("etag") or meta.get("last_modified")
+            if validator:
+                headers["If-Range"] = validator
+        try:
+            with requests.get(url, headers=headers, stream=True, timeout=timeout) as response:
+                if response.status_code == 416 and offset:
+                    # Plage hors du fichier: le fichier partiel est complet, ou l'asset a changé
+                    total_range = response.headers.get('Content-Range', "").rsplit("/", 1)[-1].strip()
+                    total = int(total_range) if total_range.isdigit() else 0
+                    if total != offset:
+                        logger.info("Fichier partiel incohérent avec le serveur (416): nouveau départ.")
+                        offset, hasher, resumed_from, meta = 0, hashlib.sha256(), 0, {"url": url}
+                        _remove(part_path)
+                        continue
+                    break
+                response.raise_for_status()
+                if offset and response.status_code != 206:
+                    # Pas de reprise possible (serveur sans Range, ou asset modifié): nouveau départ
+                    logger.info(f"Reprise refusée par le serveur ({response.status_code}): téléchargement complet.")
+                    offset, hasher, resumed_from = 0, hashlib.sha256(), 0
+                total = _total_from_response(response, offset)
+                meta.update(etag=response.headers.get('ETag'), last_modified=response.headers.get('Last-Modified'),
+                            total=total)
+                _save_meta(meta_path, meta)
+                if offset:
+                    logger.info(f"Reprise du téléchargement à {offset} / {total or '?'} octets.")
+
+                with open(part_path, 'ab' if offset else 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+                    while True:
+                        if is_cancelled and is_cancelled():
+                            raise DownloadCancelled("Téléchargement annulé.")
+                        read_start = time.monotonic()
+                        chunk = response.raw.read(chunk_size, decode_content=True)
+                        read_time = time.monotonic() - read_start
+                        if not chunk:
+                            break
+                        f.write(chunk)
+                        hasher.update(chunk)
+                        offset += len(chunk)
+                        retries = 0 # Le transfert avance: le compteur de nouveaux essais repart à zéro
+                        # Tranches adaptatives: plus grandes sur un lien rapide, plus petites sinon
+                        if read_time < FAST_READ_SECONDS and chunk_size < MAX_CHUNK_SIZE:
+                            chunk_size *= 2
+                        elif read_time > SLOW_READ_SECONDS and chunk_size > MIN_CHUNK_SIZE:
+                            chunk_size //= 2
+                        if progress_callback:
+                            elapsed = time.monotonic() - start_time
+                            speed = (offset - resumed_from) / elapsed if elapsed > 0 else 0.0
+                            progress_callback(offset, total, speed)
+            if total and offset < total:
+                raise requests.exceptions.ChunkedEncodingError(f"Connexion fermée à {offset} / {total} octets")
+            break
+        except DownloadCancelled:
+            logger.info(f"Téléchargement annulé à {offset} octets: fichier partiel conservé ({part_path}).")
+            raise
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                requests.exceptions.ChunkedEncodingError, urllib3.exceptions.HTTPError) as e:
+            # urllib3: erreurs levées par response.raw.read en cours de transfert
+            retries += 1
+            if retries > max_retries:
+                raise DownloadError(f"Erreur réseau après {max_retries} nouveaux essais: {e}") from e
+            delay = RETRY_BASE_DELAY * 2 ** (retries - 1)
+            logger.warning(f"Coupure du téléchargement à {offset} octets ({e}), nouvel essai dans {delay:.0f} s.")
+            time.sleep(delay)
+            if is_cancelled and is_cancelled():
+                raise DownloadCancelled("Téléchargement annulé.")
+        except requests.exceptions.RequestException as e:
+            raise DownloadError(f"Erreur réseau : {e}") from e
+        except OSError as e:
+            raise DownloadError(f"Erreur d'écriture du fichier : {e}") from e
+
+    sha256 = hasher.hexdigest()
+    if expected_sha256 and sha256 != expected_sha256:
+        # Un fichier corrompu ne doit pas servir de base à une reprise
+        _remove(part_path)
+        _remove(meta_path)
+        raise ChecksumMismatch(f"SHA-256 invalide pour {os.path.basename(dest_path)}: "
+                               f"attendu {expected_sha256}, obtenu {sha256}")
+    try:
+        os.replace(part_path, dest_path)
+    except OSError as e:
+        raise DownloadError(f"Impossible de finaliser {dest_path}: {e}") from e
+    _remove(meta_path)
+    logger.info(f"Téléchargement terminé: {dest_path} ({offset} octets, SHA-256 {sha256}"
+                f"{', vérifié' if expected_sha256 else ', non vérifié'}).")
+    return DownloadResult(dest_path, offset, sha256, resumed_from, verified=bool(expected_sha256))
@@ -1,102 +1,87 @@
 # updater/downloader.py
-import requests
 import time
 import os
 from PyQt5.QtCore import QObject, QThread, pyqtSignal, pyqtSlot
 import logging
 
+from updater.download_engine import (ChecksumMismatch, DownloadCancelled, DownloadError, checksum_url_for,
+                                     download_file)
+
 # Initialisation du logger
 logger = logging.getLogger('GDJ_App')
 
+PROGRESS_EMIT_INTERVAL = 0.5 # Secondes entre deux signaux de progression
+
 class DownloadWorker(QObject):
+    """
+    Télécharge l'installateur avec download_engine: reprise du fichier partiel (Range),
+    tranches adaptatives et vérification SHA-256 contre '<url>.sha256'.
+    """
     progress = pyqtSignal(int, int, float) # current_bytes, total_bytes, speed_mbps
     finished = pyqtSignal(bool, str) # success, downloaded_path_or_error
     error = pyqtSignal(str)
     
     _is_cancelled = False
 
-    def __init__(self, url, dest_folder):
+    def __init__(self, url, dest_folder, checksum_url=None, expected_sha256=None):
         super().__init__()
         self.url = url
         self.dest_folder = dest_folder
+        self.checksum_url = checksum_url or checksum_url_for(url)
+        self.expected_sha256 = expected_sha256
         self._is_cancelled = False
+        self._last_progress_emit = 0.0
+
+    def _emit_progress(self, current_bytes, total_bytes, speed_bps, force=False):
+        now = time.monotonic()
+        if force or now - self._last_progress_emit >= PROGRESS_EMIT_INTERVAL:
+            self._last_progress_emit = now
+            speed_mbps = (speed_bps * 8) / (1024 * 1024) # Megabits per second
+            self.progress.emit(current_bytes, total_bytes, speed_mbps)
 
     @pyqtSlot()
     def run(self):
-        """Exécute le téléchargement."""
+        """Exécute le téléchargement (reprend un fichier partiel laissé par un essai précédent)."""
         self._is_cancelled = False
-        downloaded_path = ""
+        filename = self.url.split('/')[-1] # Essayer d'obtenir un nom de fichier
+        if not filename:
+             filename = "downloaded_installer.exe" # Nom par défaut
+        downloaded_path = os.path.join(self.dest_folder, filename)
+        logger.info(f"Starting download from: {self.url}")
+        logger.info(f"Saving to: {downloaded_path}")
         try:
-            logger.info(f"Starting download from: {self.url}")
-            response = requests.get(self.url, stream=True, timeout=20)
-            response.raise_for_status() # Lève une exception pour les codes 4xx/5xx
-
-            total_size = int(response.headers.get('content-length', 0))
-            filename = self.url.split('/')[-1] # Essayer d'obtenir un nom de fichier
-            if not filename:
-                 filename = "downloaded_installer.exe" # Nom par défaut
-            downloaded_path = os.path.join(self.dest_folder, filename)
-            
-            # S'assurer que le dossier de destination existe
-            os.makedirs(self.dest_folder, exist_ok=True)
-
-            logger.info(f"Saving to: {downloaded_path}")
-            logger.info(f"Total size: {total_size} bytes")
-            
-            downloaded_size = 0
-            start_time = time.time()
-            last_update_time = start_time
-            chunk_size = 8192 # 8KB
-            
-            with open(downloaded_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=chunk_size):
-                    if self._is_cancelled:
-                        logger.info("Download cancelled by user.")
-                        # Supprimer le fichier partiellement téléchargé
-                        if os.path.exists(downloaded_path):
-                           try:
-                               os.remove(downloaded_path)
-                               logger.info(f"Removed partially downloaded file: {downloaded_path}")
-                           except OSError as e:
-                               logger.error(f"Error removing partial file {downloaded_path}: {e}")
-                        self.error.emit("Téléchargement annulé.")
-                        self.finished.emit(False, "Annulé")
-                        return # Sortir de la boucle et de la fonction
-                        
-                    if chunk: # filter out keep-alive new chunks
-                        f.write(chunk)
-                        downloaded_size += len(chunk)
-                        
-                        # Calculer la vitesse et émettre la progression
-                        current_time = time.time()
-                        # Mettre à jour la vitesse et la progression toutes les 0.5 secondes
-                        if current_time - last_update_time >= 0.5:
-                             elapsed_time_total = current_time - start_time
-                             speed_bps = downloaded_size / elapsed_time_total if elapsed_time_total > 0 else 0
-                             speed_mbps = (speed_bps * 8) / (1024 * 1024) # Megabits per second
-                             self.progress.emit(downloaded_size, total_size, speed_mbps)
-                             last_update_time = current_time
-            
-            # Émettre une dernière fois la progression complète
-            final_speed = (downloaded_size / (time.time() - start_time) * 8) / (1024*1024) if (time.time() - start_time) > 0 else 0
-            self.progress.emit(downloaded_size, total_size, final_speed)
-            
-            if not self._is_cancelled:
-                logger.info("Download finished successfully.")
-                self.finished.emit(True, downloaded_path)
-
-        except requests.exceptions.RequestException as e:
+            result = download_file(self.url, downloaded_path, expected_sha256=self.expected_sha256,
+                                   checksum_url=self.checksum_url, progress_callback=self._emit_progress,
+                                   is_cancelled=lambda: self._is_cancelled)
+        except DownloadCancelled:
+            logger.info("Download cancelled by user.")
+            self.error.emit("Téléchargement annulé.")
+            self.finished.emit(False, "Annulé")
+            return
+        except ChecksumMismatch as e:
+            logger.error(f"Download checksum error: {e}")
+            self.error.emit(f"Fichier téléchargé corrompu : {e}")
+            self.finished.emit(False, str(e))
+            return
+        except DownloadError as e:
             logger.error(f"Download error: {e}")
             self.error.emit(f"Erreur réseau : {e}")
             self.finished.emit(False, str(e))
+            return
         except Exception as e:
             logger.error(f"Unexpected download error: {e}")
             self.error.emit(f"Erreur inattendue : {e}")
             self.finished.emit(False, str(e))
+            return
+
+        # Émettre une dernière fois la progression complète
+        self._emit_progress(result.size, result.size, 0.0, force=True)
+        logger.info("Download finished successfully.")
+        self.finished.emit(True, result.path)
 
     @pyqtSlot()
     def cancel(self):
-         """Slot pour demander l'annulation du téléchargement."""
+         """Slot pour demander l'annulation du téléchargement (le fichier partiel est conservé)."""
          logger.info("Cancel requested for download worker.")
          self._is_cancelled = True
 
@@ -6,16 +6,19 @@ import requests
 import subprocess
 import sys
 import configparser
+import time
 from packaging import version  # Pour comparer les versions
 from config import CONFIG
 from PyQt5.QtWidgets import QMessageBox
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
 import logging # Ajout pour le logger
 
 # Initialisation du logger
 logger = logging.getLogger('GDJ_App')
 
 # --- Import de la fonction utilitaire --- 
-from utils.paths import get_resource_path
+from utils.paths import get_resource_path, get_user_data_path
+from updater.delta_update import delta_asset_name
 
 # Paramètres de votre dépôt GitHub (à adapter)
 REPO_OWNER = "3M6PR0"  # Remplacez par le nom de votre compte ou organisation
@@ -23,6 +26,10 @@ REPO_NAME = "GDJ_App"      # Remplacez par le nom de votre repository
 
 # URL de l'API GitHub pour la dernière release
 GITHUB_API_URL = f"https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}/releases/latest"
+# Dernière réponse de l'API conservée dans AppData (voir get_remote_release_info)
+RELEASE_CACHE_FILE_NAME = "latest_release.json"
+# Intervalle minimal entre deux vérifications automatiques (config.py: UPDATE_CHECK_INTERVAL_HOURS)
+UPDATE_CHECK_INTERVAL_HOURS = CONFIG.get("UPDATE_CHECK_INTERVAL_HOURS", 6)
 
 # --- Utiliser get_resource_path --- 
 VERSION_FILE = get_resource_path(os.path.join(CONFIG.get("DATA_PATH", "data"), "version.txt"))
@@ -45,12 +52,69 @@ def get_local_version():
         return "0.0.0"
 
 
-def get_remote_release_info():
-    """Interroge l'API GitHub pour récupérer les informations de la dernière release."""
+def _release_cache_path():
+    """Fichier où la dernière réponse de l'API GitHub est conservée (avec ETag et Last-Modified)."""
+    return get_user_data_path("UpdateCache") / RELEASE_CACHE_FILE_NAME
+
+
+def _load_release_cache(cache_path):
     try:
-        response = requests.get(GITHUB_API_URL, timeout=10)
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        return cache if isinstance(cache, dict) and isinstance(cache.get("release"), dict) else None
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Cache de release illisible ({cache_path}): {e}")
+        return None
+
+
+def _save_release_cache(cache_path, cache):
+    try:
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning(f"Écriture du cache de release impossible ({cache_path}): {e}")
+
+
+def get_remote_release_info(max_age_seconds=None, url=None, cache_path=None, timeout=10):
+    """
+    Interroge l'API GitHub pour récupérer les informations de la dernière release.
+
+    La réponse est conservée sur le disque: si elle date de moins de max_age_seconds, elle est
+    retournée sans accès réseau; sinon la requête est conditionnelle (If-None-Match /
+    If-Modified-Since) et une réponse 304 réutilise la release en cache.
+    """
+    url = url or GITHUB_API_URL
+    cache_path = cache_path or _release_cache_path()
+    cache = _load_release_cache(cache_path)
+    if cache and max_age_seconds and 0 <= time.time() - cache.get("fetched_at", 0) < max_age_seconds:
+        logger.info("Informations de release en cache encore valides, GitHub n'est pas contacté.")
+        return cache["release"]
+
+    headers = {}
+    if cache and cache.get("etag"):
+        headers["If-None-Match"] = cache["etag"]
+    if cache and cache.get("last_modified"):
+        headers["If-Modified-Since"] = cache["last_modified"]
+    try:
+        response = requests.get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304 and cache:
+            logger.info("Release inchangée depuis la dernière vérification (304).")
+            cache["fetched_at"] = time.time()
+            _save_release_cache(cache_path, cache)
+            return cache["release"]
         if response.status_code == 200:
-            return response.json()
+            release_info = response.json()
+            _save_release_cache(cache_path, {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "fetched_at": time.time(),
+                "release": release_info,
+            })
+            return release_info
         else:
             logger.error(f"Erreur lors de la récupération des informations de release : {response.status_code}") # Remplacement
     except Exception as e:
@@ -103,98 +167,123 @@ def launch_updater(installer_url):
                              f"Une erreur est survenue lors du lancement de la mise à jour :\n{e}")
 
 
-def check_for_updates(manual_check=False):
+def delta_update_supported():
+    """Mise à jour différentielle possible: application installée (exécutable figé) avec son update helper."""
+    return getattr(sys, 'frozen', False) and os.path.exists(UPDATER_EXECUTABLE)
+
+
+def launch_delta_updater(delta_path, installer_url):
     """
-    Vérifie les mises à jour sur GitHub et lance l'updater si nécessaire.
-    Retourne un message de statut pour affichage.
-    
+    Lance l'update helper pour appliquer un paquet différentiel déjà téléchargé (et vérifié)
+    une fois l'application fermée; il se rabat sur installer_url en cas d'échec.
+    Retourne True si l'helper a été lancé (l'appelant doit alors quitter l'application).
+    """
+    install_dir = os.path.dirname(sys.executable)
+    cmd = [UPDATER_EXECUTABLE, "--apply-delta", delta_path, "--install-dir", install_dir]
+    if installer_url:
+        cmd += ["--fallback-url", installer_url]
+    try:
+        logger.info(f"Lancement de l'update helper pour la mise à jour différentielle : {cmd}")
+        subprocess.Popen(cmd)
+        return True
+    except Exception as e:
+        logger.error(f"Erreur lors du lancement de l'updater (mise à jour différentielle) : {e}")
+        return False
+
+
+def get_update_status(max_age_seconds=None):
+    """
+    Compare la version locale à la dernière release, sans aucune interface (utilisable hors
+    du thread GUI).
+
     Args:
-        manual_check (bool): True si la vérification est déclenchée manuellement.
-                             Affecte seulement le message de retour.
-                             
+        max_age_seconds: Âge maximal de la release en cache avant de recontacter GitHub
+                         (None = toujours vérifier, avec une requête conditionnelle).
+
     Returns:
-        str: Un message décrivant le résultat ("À jour", "MàJ X trouvée", "Erreur: ...")
+        tuple: (message de statut, update_info {"available", "version", "url", "delta_url"})
+               delta_url: paquet différentiel depuis la version locale, s'il est publié.
     """
-    status_message = "Statut : Inconnu"
-    update_info = {"available": False, "version": None, "url": None} # Pour retourner plus d'infos
+    update_info = {"available": False, "version": None, "url": None, "delta_url": None}
     try:
         local_version = get_local_version()
-        release_info = get_remote_release_info()
+        release_info = get_remote_release_info(max_age_seconds=max_age_seconds)
         if not release_info:
-            status_message = "Erreur : Impossible de contacter GitHub."
-            if manual_check:
-                logger.info("Manual Check: " + status_message) # Remplacement
-            return status_message, update_info # Sortir tôt
+            return "Erreur : Impossible de contacter GitHub.", update_info
 
         remote_version = release_info.get("tag_name", "0.0.0")
         logger.info(f"Version locale : {local_version} | Version distante : {remote_version}") # Remplacement
-
-        is_new = is_new_version_available(local_version, remote_version)
-
-        if is_new:
-            status_message = f"Mise à jour trouvée : {remote_version}"
-            update_info["available"] = True
-            update_info["version"] = remote_version
-            
-            # --- Récupérer l'URL de l'installeur DANS TOUS LES CAS si MàJ trouvée ---
-            assets = release_info.get("assets", [])
-            installer_name_expected = "gdj_installer.exe"
-            installer_url = None
-            for asset in assets:
-                name = asset.get("name", "").lower()
-                if installer_name_expected == name:
-                    installer_url = asset.get("browser_download_url")
-                    break
-            update_info["url"] = installer_url
-            
-            # --- Gestion spécifique vérification automatique --- 
-            if not manual_check:
-                logger.info("Automatic check found update, prompting user...") # Remplacement
-                if not installer_url:
-                    # Si pas d'URL, on ne peut pas proposer la MàJ, même si version >
-                    status_message = f"Mise à jour trouvée ({remote_version}) mais asset introuvable."
-                    update_info["available"] = False # Marquer non dispo
-                    return status_message, update_info # Retourner ce statut
-                    
-                # Proposer la MàJ seulement si URL existe
-                if prompt_update(remote_version):
-                    logger.info("User accepted the update prompt.") # Remplacement
-                    # NE PAS LANCER L'UPDATER ICI
-                    # launch_updater(installer_url)
-                    # RETOURNER UN STATUT SPÉCIFIQUE
-                    return "USER_CONFIRMED_UPDATE", update_info
-                else:
-                    logger.info("User declined the update prompt.") # Remplacement
-                    status_message = "Mise à jour refusée par l'utilisateur."
-                    update_info["available"] = False # Refusée = non dispo pour l'instant
-                    # Retourner ce statut
-                    return "UPDATE_DECLINED", update_info
-            else:
-                 # Mode manuel: On a déjà l'URL dans update_info. Le statut est juste "Trouvée"
-                 logger.info("Manual check found update. Info stored.") # Remplacement
-                 if not installer_url:
-                      status_message = f"Mise à jour trouvée ({remote_version}) mais asset introuvable."
-                      update_info["available"] = False
-                 # On retourne le statut standard et l'info (qui contient l'URL ou None)
-                 # Le SettingsController décidera quoi faire
-
-        else:
-            status_message = "À jour"
+        if not is_new_version_available(local_version, remote_version):
             logger.info("Aucune mise à jour disponible.") # Remplacement
-            if manual_check:
-                logger.info("Manual Check: " + status_message) # Remplacement
-                # RETIRER: QMessageBox.information(None, "Mise à jour", "Votre application est à jour.")
+            return "À jour", update_info
+
+        # --- Récupérer l'URL de l'installeur DANS TOUS LES CAS si MàJ trouvée ---
+        installer_name_expected = "gdj_installer.exe"
+        delta_name_expected = delta_asset_name(local_version, remote_version)
+        installer_url = None
+        for asset in release_info.get("assets", []):
+            asset_name = asset.get("name", "").lower()
+            if asset_name == installer_name_expected:
+                installer_url = asset.get("browser_download_url")
+            elif asset_name == delta_name_expected:
+                # Publié seulement entre deux versions consécutives (voir create_release.py)
+                update_info["delta_url"] = asset.get("browser_download_url")
+        update_info["version"] = remote_version
+        update_info["url"] = installer_url
+        if not installer_url:
+            # Si pas d'URL, on ne peut pas proposer la MàJ, même si version >
+            return f"Mise à jour trouvée ({remote_version}) mais asset introuvable.", update_info
+        update_info["available"] = True
+        return f"Mise à jour trouvée : {remote_version}", update_info
 
     except Exception as e:
         error_text = str(e)
         logger.error(f"Erreur lors de la vérification des mises à jour: {error_text}") # Remplacement
-        status_message = f"Erreur lors de la vérification : {error_text}"
-        update_info["available"] = False
-        if manual_check:
-            logger.info("Manual Check: Échec de la vérification des mises à jour.") # Remplacement
-            # RETIRER: QMessageBox.warning(None, "Mise à jour", f"Impossible de vérifier les mises à jour.\nErreur: {e}")
+        return f"Erreur lors de la vérification : {error_text}", update_info
+
+
+def check_for_updates(manual_check=False):
+    """
+    Vérifie les mises à jour sur GitHub et, en vérification automatique, propose la mise à jour.
+    Retourne un message de statut pour affichage.
     
-    # Retourner le message final et l'info
-    return status_message, update_info
+    Args:
+        manual_check (bool): True si la vérification est déclenchée manuellement.
+                             Affecte seulement le message de retour.
+                             
+    Returns:
+        str: Un message décrivant le résultat ("À jour", "MàJ X trouvée", "Erreur: ...")
+    """
+    status_message, update_info = get_update_status()
+    if manual_check:
+        # Le SettingsController décidera quoi faire de update_info (qui contient l'URL ou None)
+        logger.info("Manual Check: " + status_message) # Remplacement
+        return status_message, update_info
+    if not update_info["available"]:
+        return status_message, update_info
+
+    # --- Gestion spécifique vérification automatique ---
+    logger.info("Automatic check found update, prompting user...") # Remplacement
+    if prompt_update(update_info["version"]):
+        logger.info("User accepted the update prompt.") # Remplacement
+        # NE PAS LANCER L'UPDATER ICI: le statut indique à l'appelant de le faire
+        return "USER_CONFIRMED_UPDATE", update_info
+    logger.info("User declined the update prompt.") # Remplacement
+    update_info["available"] = False # Refusée = non dispo pour l'instant
+    return "UPDATE_DECLINED", update_info
+
+
+class UpdateCheckWorker(QObject):
+    """Exécute get_update_status hors du thread de l'interface (vérification au démarrage)."""
+    finished = pyqtSignal(str, dict) # statut, update_info
+
+    def __init__(self, max_age_seconds=None):
+        super().__init__()
+        self.max_age_seconds = max_age_seconds
+
+    @pyqtSlot()
+    def run(self):
+        status, update_info = get_update_status(max_age_seconds=self.max_age_seconds)
+        self.finished.emit(status, update_info)
 
 logger.info("updater/update_checker.py défini") # Remplacement
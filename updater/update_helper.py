@@ -1,5 +1,6 @@
 import sys
 import os
+import argparse
 import requests # Import restauré
 import subprocess # Import restauré
 import time # Import restauré
@@ -8,6 +9,13 @@ from packaging import version # Import restauré
 # import win32con # Commenté - Suppression dépendance
 import logging
 
+try:
+    from updater.download_engine import ChecksumMismatch, DownloadError, checksum_url_for, download_file
+    from updater.delta_update import DeltaUpdateError, apply_delta_pack, recover_interrupted_update
+except ImportError: # Lancé comme script (update_helper.exe): le dossier updater est dans sys.path
+    from download_engine import ChecksumMismatch, DownloadError, checksum_url_for, download_file
+    from delta_update import DeltaUpdateError, apply_delta_pack, recover_interrupted_update
+
 # Initialisation du logger
 logger = logging.getLogger('GDJ_App')
 
@@ -19,36 +27,34 @@ logger = logging.getLogger('GDJ_App')
 
 def download_installer(installer_url, output_path):
     """
-    Télécharge l'installateur depuis installer_url et l'enregistre dans output_path.
+    Télécharge l'installateur depuis installer_url et l'enregistre dans output_path
+    (même moteur que l'application: reprise du fichier partiel et vérification SHA-256).
     Affiche une barre de progression.
     """
     logger.info(f"Téléchargement depuis: {installer_url}")
+    last_percent = [-1]
+
+    def show_progress(dl, total_length, _speed):
+        if not total_length:
+            return
+        percent = (dl / total_length) * 100
+        if int(percent) != last_percent[0]: # Une ligne par pourcent
+            last_percent[0] = int(percent)
+            done = int(50 * dl / total_length)
+            logger.info(f"[{'=' * done}{' ' * (50 - done)}] {percent:.1f}% ")
+
     try:
-        response = requests.get(installer_url, stream=True, timeout=30) # Ajout timeout
-        response.raise_for_status() # Vérifie les erreurs HTTP
-        total_length = response.headers.get('content-length')
-
-        with open(output_path, 'wb') as f:
-            if total_length is None:
-                f.write(response.content)
-                logger.info("Téléchargement terminé (taille inconnue).")
-            else:
-                dl = 0
-                total_length = int(total_length)
-                logger.info(f"Taille totale : {total_length / 1024 / 1024:.2f} Mo")
-                for data in response.iter_content(chunk_size=8192): # Augmentation chunk size
-                    dl += len(data)
-                    f.write(data)
-                    done = int(50 * dl / total_length)
-                    percent = (dl / total_length) * 100
-                    logger.info(f"[{'=' * done}{' ' * (50 - done)}] {percent:.1f}% ")
+        result = download_file(installer_url, output_path, checksum_url=checksum_url_for(installer_url),
+                               progress_callback=show_progress)
+        if result.resumed_from:
+            logger.info(f"Téléchargement repris à {result.resumed_from / 1024 / 1024:.2f} Mo.")
         logger.info(f"\nTéléchargement terminé : {output_path}")
         return True
-    except requests.exceptions.RequestException as e:
-        logger.error(f"\nErreur de téléchargement : {e}")
+    except ChecksumMismatch as e:
+        logger.error(f"\nFichier téléchargé corrompu : {e}")
         return False
-    except IOError as e:
-        logger.error(f"\nErreur d'écriture du fichier : {e}")
+    except DownloadError as e:
+        logger.error(f"\nErreur de téléchargement : {e}")
         return False
 
 def launch_installer(installer_path):
@@ -66,22 +72,31 @@ def launch_installer(installer_path):
         logger.error(f"Erreur imprévue lors du lancement (Popen) de l'installateur : {e}")
         return False
 
-# def schedule_update_helper_replace(current_path, new_path):
-#     """
-#     Fonction commentée - dépendance pywin32 supprimée
-#     """
-#     pass # Ne fait rien
-
-def main():
-    if len(sys.argv) < 2:
-        logger.error("Usage : update_helper.exe <installer_url>")
-        input("Appuyez sur Entrée pour quitter...") # Pause si lancé manuellement
-        sys.exit(1)
-
-    installer_url = sys.argv[1]
-    logger.info("-- Update Helper Démarré --")
-    logger.info(f"URL de l'installeur reçue : {installer_url}")
+def apply_delta_update(delta_path, install_dir):
+    """
+    Applique un paquet différentiel (voir delta_update.py) puis relance GDJ.exe.
+    Retourne False si le paquet n'a pas pu être appliqué (installation laissée intacte).
+    """
+    logger.info(f"Application du paquet différentiel {delta_path} dans {install_dir}")
+    try:
+        # GDJ.exe peut rester verrouillé un instant après la fermeture: l'échange réessaie
+        info = apply_delta_pack(delta_path, install_dir)
+    except DeltaUpdateError as e:
+        logger.error(f"Mise à jour différentielle impossible : {e}")
+        return False
+    logger.info(f"Mise à jour vers {info['to_version']} appliquée.")
+    try:
+        os.remove(delta_path)
+    except OSError:
+        pass
+    try:
+        subprocess.Popen([os.path.join(install_dir, "GDJ.exe")], cwd=install_dir)
+    except Exception as e:
+        logger.error(f"Impossible de relancer GDJ.exe : {e}")
+    return True
 
+def update_with_installer(installer_url):
+    """Télécharge l'installateur complet et le lance (quitte avec un code d'erreur en cas d'échec)."""
     temp_directory = os.environ.get("TEMP", os.getcwd())
     output_installer = os.path.join(temp_directory, "GDJ_downloaded_setup.exe") # Nom de fichier plus clair
     logger.info(f"Téléchargement vers : {output_installer}")
@@ -99,6 +114,48 @@ def main():
         input("Appuyez sur Entrée pour quitter...") # Pause
         sys.exit(1)
 
+# def schedule_update_helper_replace(current_path, new_path):
+#     """
+#     Fonction commentée - dépendance pywin32 supprimée
+#     """
+#     pass # Ne fait rien
+
+def main():
+    parser = argparse.ArgumentParser(prog="update_helper.exe")
+    parser.add_argument("installer_url", nargs="?", help="URL de l'installateur complet")
+    parser.add_argument("--apply-delta", dest="delta_path", help="Paquet différentiel déjà téléchargé")
+    parser.add_argument("--install-dir", help="Dossier d'installation (défaut: parent du dossier updater)")
+    parser.add_argument("--fallback-url", help="Installateur complet si le paquet ne peut pas être appliqué")
+    args = parser.parse_args()
+    if not args.installer_url and not args.delta_path:
+        logger.error("Usage : update_helper.exe <installer_url> | --apply-delta <paquet.zip> [--fallback-url <installer_url>]")
+        input("Appuyez sur Entrée pour quitter...") # Pause si lancé manuellement
+        sys.exit(1)
+
+    logger.info("-- Update Helper Démarré --")
+    install_dir = args.install_dir or os.path.dirname(os.path.dirname(os.path.abspath(sys.executable)))
+    # Échange différentiel interrompu (coupure, plantage): l'installation est remise en état
+    # avant toute autre opération, y compris le repli sur l'installateur complet
+    try:
+        recover_interrupted_update(install_dir)
+    except (OSError, ValueError, DeltaUpdateError) as e:
+        logger.error(f"Récupération de la mise à jour interrompue impossible : {e}")
+    if args.delta_path:
+        if apply_delta_update(args.delta_path, install_dir):
+            logger.info("-- Update Helper Terminé --")
+            sys.exit(0)
+        installer_url = args.fallback_url or args.installer_url
+        if not installer_url:
+            logger.error("Aucun installateur de repli fourni.")
+            input("Appuyez sur Entrée pour quitter...") # Pause
+            sys.exit(1)
+        logger.info("Repli sur l'installateur complet.")
+    else:
+        installer_url = args.installer_url
+
+    logger.info(f"URL de l'installeur reçue : {installer_url}")
+    update_with_installer(installer_url)
+
     # Section pour l'auto-update de l'helper commentée car dépendance pywin32 supprimée
     # new_helper_path = os.path.join(temp_directory, "update_helper_new.exe")
     # if os.path.exists(new_helper_path):
@@ -0,0 +1,277 @@
+"""
+Export PDF par lot de rapports de dépenses (.rdj).
+
+Chaque .rdj est chargé via RapportDepense.from_dict (factures laissées dans l'archive)
+puis rendu en PDF par DocumentPDFPrinter dans un ProcessPoolExecutor: WeasyPrint est
+limité par le CPU et ne se prête pas aux threads. Les factures peuvent être ajoutées
+à la fin de chaque PDF. Utilisable depuis l'application (BatchExportWorker) ou en
+ligne de commande (main.py --batch-export).
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional
+
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
+import logging
+
+from utils.rdj_archive import RDJ_DATA_MEMBER
+
+logger = logging.getLogger('GDJ_App')
+
+RDJ_EXTENSION = ".rdj"
+MERGE_IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif')
+
+# Appelé après chaque fichier: (terminés, total, résultat)
+BatchProgressCallback = Callable[[int, int, 'BatchExportResult'], None]
+
+
+@dataclass
+class BatchExportResult:
+    """Résultat de l'export d'un fichier .rdj."""
+    source_path: str
+    output_path: str
+    success: bool
+    duration: float = 0.0 # secondes
+    error: str = ""
+    factures_merged: int = 0
+
+
+def collect_rdj_files(sources: Iterable[str], recursive: bool = False) -> List[str]:
+    """Retourne les fichiers .rdj désignés par 'sources' (fichiers et/ou dossiers), sans doublon."""
+    found = []
+    for source in sources:
+        path = Path(source)
+        if path.is_dir():
+            pattern = f"**/*{RDJ_EXTENSION}" if recursive else f"*{RDJ_EXTENSION}"
+            found.extend(sorted(str(p) for p in path.glob(pattern) if p.is_file()))
+        elif path.is_file() and path.suffix.lower() == RDJ_EXTENSION:
+            found.append(str(path))
+        else:
+            logger.warning(f"Export par lot: '{source}' ignoré (ni dossier ni fichier .rdj).")
+    unique = []
+    seen = set()
+    for file_path in found:
+        key = os.path.normcase(os.path.abspath(file_path))
+        if key not in seen:
+            seen.add(key)
+            unique.append(file_path)
+    return unique
+
+
+def load_rapport_from_rdj(rdj_file_path: str):
+    """
+    Charge un RapportDepense depuis un .rdj sans extraire les factures
+    (elles restent lisibles via Facture.read_bytes).
+    """
+    from models.documents.rapport_depense.rapport_depense import RapportDepense
+
+    with zipfile.ZipFile(rdj_file_path, 'r') as zip_ref:
+        json_data = json.loads(zip_ref.read(RDJ_DATA_MEMBER).decode('utf-8'))
+
+    doc_type = json_data.get('type_document', 'Inconnu')
+    if doc_type.lower() != "rapport de depense" and doc_type != "RapportDepense":
+        raise ValueError(f"Type de document '{doc_type}' non supporté pour l'export PDF.")
+
+    # Jamais écrit tant que les factures ne sont pas matérialisées (l'export lit l'archive directement)
+    factures_base_path = os.path.join(tempfile.gettempdir(), "rdj_batch_export", Path(rdj_file_path).stem)
+    rapport = RapportDepense.from_dict(json_data, factures_base_path, rdj_file_path, lazy_factures=True)
+    rapport.original_file_path = rdj_file_path
+    return rapport
+
+
+def _iter_factures(rapport):
+    """Itère sur les factures du rapport, dans l'ordre d'affichage (repas puis dépenses)."""
+    for entry in list(rapport.repas) + list(rapport.depenses_diverses):
+        facture = getattr(entry, 'facture', None)
+        if facture is not None:
+            yield facture
+
+
+def merge_factures_into_pdf(rapport, pdf_path: str, output_path: str) -> int:
+    """
+    Écrit dans output_path le PDF pdf_path suivi des factures du rapport (PDF et images).
+    Retourne le nombre de fichiers de facture ajoutés.
+    """
+    import fitz # PyMuPDF, requis uniquement pour la fusion
+
+    merged = 0
+    with fitz.open(pdf_path) as out_doc:
+        for facture in _iter_factures(rapport):
+            for filename in facture.filenames:
+                extension = os.path.splitext(filename)[1].lower()
+                try:
+                    data = facture.read_bytes(filename)
+                    if extension == '.pdf':
+                        with fitz.open(stream=data, filetype="pdf") as facture_doc:
+                            out_doc.insert_pdf(facture_doc)
+                    elif extension in MERGE_IMAGE_EXTENSIONS:
+                        with fitz.open(stream=data, filetype=extension.lstrip('.')) as image_doc:
+                            with fitz.open("pdf", image_doc.convert_to_pdf()) as image_pdf:
+                                out_doc.insert_pdf(image_pdf)
+                    else:
+                        logger.warning(f"Export par lot: facture '{filename}' ignorée (format non supporté).")
+                        continue
+                    merged += 1
+                except Exception as e:
+                    logger.warning(f"Export par lot: impossible d'ajouter la facture '{filename}': {e}")
+        partial_path = output_path + ".part"
+        out_doc.save(partial_path, garbage=3, deflate=True)
+    os.replace(partial_path, output_path)
+    return merged
+
+
+def export_rdj_to_pdf(rdj_file_path: str, output_dir: Optional[str] = None,
+                      merge_factures: bool = False) -> BatchExportResult:
+    """
+    Exporte un .rdj en PDF (fonction de premier niveau: exécutée dans les processus du pool).
+    Le PDF porte le nom du .rdj, dans output_dir ou à côté du .rdj.
+    """
+    from utils.document_printer import DocumentPDFPrinter
+
+    start = time.perf_counter()
+    target_dir = output_dir or os.path.dirname(os.path.abspath(rdj_file_path))
+    output_path = os.path.join(target_dir, f"{Path(rdj_file_path).stem}.pdf")
+    result = BatchExportResult(source_path=rdj_file_path, output_path=output_path, success=False)
+    try:
+        os.makedirs(target_dir, exist_ok=True)
+        rapport = load_rapport_from_rdj(rdj_file_path)
+        printer = DocumentPDFPrinter()
+        if merge_factures:
+            fd, report_pdf_path = tempfile.mkstemp(prefix="rdj_batch_", suffix=".pdf")
+            os.close(fd)
+            try:
+                if not printer.generate(rapport, report_pdf_path, raise_errors=True):
+                    raise RuntimeError("Le rapport n'a produit aucun PDF (contenu HTML vide)")
+                result.factures_merged = merge_factures_into_pdf(rapport, report_pdf_path, output_path)
+            finally:
+                try:
+                    os.remove(report_pdf_path)
+                except OSError:
+                    pass
+        elif not printer.generate(rapport, output_path, raise_errors=True):
+            raise RuntimeError("Le rapport n'a produit aucun PDF (contenu HTML vide)")
+        result.success = True
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    result.duration = time.perf_counter() - start
+    return result
+
+
+def export_rdj_batch(sources: Iterable[str], output_dir: Optional[str] = None, merge_factures: bool = False,
+                     max_workers: Optional[int] = None, recursive: bool = False,
+                     progress_callback: Optional[BatchProgressCallback] = None) -> List[BatchExportResult]:
+    """
+    Exporte en PDF tous les .rdj désignés par 'sources', en parallèle sur plusieurs processus.
+
+    Args:
+        sources: Fichiers .rdj et/ou dossiers en contenant.
+        output_dir: Dossier de destination des PDF (défaut: à côté de chaque .rdj).
+        merge_factures: Ajouter les factures à la fin de chaque PDF.
+        max_workers: Nombre de processus (défaut: nombre de cœurs, borné au nombre de fichiers).
+        recursive: Chercher aussi dans les sous-dossiers.
+        progress_callback: Appelé après chaque fichier avec (terminés, total, résultat).
+
+    Returns:
+        Les résultats, dans l'ordre des fichiers trouvés.
+    """
+    rdj_files = collect_rdj_files(sources, recursive=recursive)
+    total = len(rdj_files)
+    if total == 0:
+        logger.info("Export par lot: aucun fichier .rdj trouvé.")
+        return []
+    workers = max(1, min(max_workers or os.cpu_count() or 1, total))
+    logger.info(f"Export par lot: {total} fichier(s) .rdj, {workers} processus.")
+
+    results = {}
+    batch_start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(export_rdj_to_pdf, rdj_path, output_dir, merge_factures): rdj_path
+                   for rdj_path in rdj_files}
+        for done, future in enumerate(as_completed(futures), start=1):
+            rdj_path = futures[future]
+            try:
+                result = future.result()
+            except Exception as e: # Processus interrompu, résultat non transférable, etc.
+                result = BatchExportResult(source_path=rdj_path, output_path="", success=False,
+                                           error=f"{type(e).__name__}: {e}")
+            results[rdj_path] = result
+            if result.success:
+                logger.info(f"Export par lot [{done}/{total}] {rdj_path} -> {result.output_path} ({result.duration:.2f} s)")
+            else:
+                logger.error(f"Export par lot [{done}/{total}] échec pour {rdj_path}: {result.error}")
+            if progress_callback:
+                progress_callback(done, total, result)
+    logger.info(f"Export par lot terminé en {time.perf_counter() - batch_start:.2f} s.")
+    return [results[rdj_path] for rdj_path in rdj_files]
+
+
+def format_batch_summary(results: List[BatchExportResult]) -> str:
+    """Résumé lisible: durée par fichier et échecs."""
+    succeeded = [r for r in results if r.success]
+    failed = [r for r in results if not r.success]
+    lines = [f"{len(succeeded)} PDF généré(s), {len(failed)} échec(s) sur {len(results)} fichier(s)."]
+    for r in succeeded:
+        merged = f", {r.factures_merged} facture(s) ajoutée(s)" if r.factures_merged else ""
+        lines.append(f"  OK     {Path(r.source_path).name} ({r.duration:.2f} s{merged})")
+    for r in failed:
+        lines.append(f"  ÉCHEC  {Path(r.source_path).name}: {r.error}")
+    return "\n".join(lines)
+
+
+def run_batch_export_cli(argv: List[str]) -> int:
+    """Point d'entrée sans interface (main.py --batch-export ...). Retourne le code de sortie."""
+    parser = argparse.ArgumentParser(prog="GDJ_App --batch-export",
+                                     description="Exporte en PDF des rapports de dépenses (.rdj).")
+    parser.add_argument("sources", nargs="+", help="Fichiers .rdj et/ou dossiers en contenant")
+    parser.add_argument("-o", "--output", dest="output_dir", default=None,
+                        help="Dossier de destination des PDF (défaut: à côté de chaque .rdj)")
+    parser.add_argument("--merge-factures", action="store_true", help="Ajouter les factures à la fin de chaque PDF")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="Nombre de processus (défaut: nombre de cœurs)")
+    parser.add_argument("-r", "--recursive", action="store_true", help="Chercher aussi dans les sous-dossiers")
+    args = parser.parse_args(argv)
+
+    def print_progress(done, total, result):
+        status = f"{result.duration:.2f} s" if result.success else f"ÉCHEC: {result.error}"
+        print(f"[{done}/{total}] {result.source_path} - {status}", flush=True)
+
+    results = export_rdj_batch(args.sources, output_dir=args.output_dir, merge_factures=args.merge_factures,
+                               max_workers=args.workers, recursive=args.recursive,
+                               progress_callback=print_progress)
+    print(format_batch_summary(results))
+    if not results:
+        return 2
+    return 0 if all(r.success for r in results) else 1
+
+
+class BatchExportWorker(QObject):
+    """Exécute export_rdj_batch hors du thread de l'interface (voir RdjSaveWorker)."""
+    progress = pyqtSignal(int, int, str) # terminés, total, fichier_courant
+    finished = pyqtSignal(list) # List[BatchExportResult]
+
+    def __init__(self, sources: List[str], output_dir: Optional[str] = None, merge_factures: bool = False):
+        super().__init__()
+        self.sources = list(sources)
+        self.output_dir = output_dir
+        self.merge_factures = merge_factures
+
+    @pyqtSlot()
+    def run(self):
+        results = []
+        try:
+            results = export_rdj_batch(
+                self.sources, output_dir=self.output_dir, merge_factures=self.merge_factures,
+                progress_callback=lambda done, total, result: self.progress.emit(done, total, result.source_path)
+            )
+        except Exception as e:
+            logger.error(f"Erreur lors de l'export par lot: {e}", exc_info=True)
+            results = [BatchExportResult(source_path=", ".join(self.sources), output_path="", success=False,
+                                         error=f"{type(e).__name__}: {e}")]
+        self.finished.emit(results)
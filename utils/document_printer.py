@@ -1,8 +1,13 @@
 from weasyprint import HTML, CSS
 # from weasyprint.fonts import FontConfiguration # Ancienne importation incorrecte
 from weasyprint.text.fonts import FontConfiguration # Importation corrigée
-from typing import TYPE_CHECKING, List
+from typing import TYPE_CHECKING, Callable, List, Optional
+from collections import OrderedDict
+import hashlib
+import logging
 import os
+import shutil
+import threading
 
 # --- AJOUT DE L'IMPORTATION POUR CONFIG_DATA ---
 from models.config_data import ConfigData
@@ -16,8 +21,32 @@ if TYPE_CHECKING:
     from models.documents.rapport_depense.repas import Repas
     from models.documents.rapport_depense.depense import Depense
 
+logger = logging.getLogger('GDJ_App')
+
 class DocumentPDFPrinter:
-    """Gère la génération de PDF pour différents types de documents en utilisant HTML et WeasyPrint."""
+    """
+    Gère la génération de PDF pour différents types de documents en utilisant HTML et WeasyPrint.
+
+    Les éléments coûteux sont partagés entre les instances (une instance est créée à chaque export):
+    la feuille de style CSS analysée une seule fois, la FontConfiguration, les fragments HTML de
+    chaque section (clé = empreinte des entrées couvertes) et les PDF déjà écrits (clé = empreinte
+    du HTML final). Un export identique à un précédent ne relance donc pas WeasyPrint.
+    """
+
+    # Champs rendus par section: l'empreinte d'une section ne dépend que de ces valeurs
+    DEPLACEMENT_FIELDS = ('date', 'client', 'ville', 'numero_commande', 'kilometrage', 'montant')
+    REPAS_FIELDS = ('date', 'restaurant', 'client', 'numero_commande', 'refacturer', 'payeur',
+                    'totale_avant_taxes', 'pourboire', 'tps', 'tvq', 'tvh', 'totale_apres_taxes')
+    DEPENSE_FIELDS = ('date', 'type_depense', 'description', 'fournisseur', 'payeur',
+                      'totale_avant_taxes', 'tps', 'tvq', 'tvh', 'totale_apres_taxes')
+    MAX_CACHED_SECTIONS = 64
+
+    # --- Cache partagé entre les instances (protégé par _cache_lock) ---
+    _cache_lock = threading.RLock()
+    _font_config: Optional[FontConfiguration] = None
+    _stylesheet: Optional[CSS] = None
+    _section_cache: "OrderedDict[str, str]" = OrderedDict()
+    _pdf_by_digest = {} # empreinte HTML -> chemin du dernier PDF écrit pour ce contenu
 
     def _get_base_css(self) -> str:
         """Retourne les styles CSS de base pour le document."""
@@ -157,6 +186,56 @@ class DocumentPDFPrinter:
             }
         """
 
+    # --- Ressources WeasyPrint partagées ---
+    @classmethod
+    def _get_font_config(cls) -> FontConfiguration:
+        """FontConfiguration créée une seule fois (la découverte des polices est coûteuse)."""
+        with cls._cache_lock:
+            if cls._font_config is None:
+                cls._font_config = FontConfiguration()
+            return cls._font_config
+
+    def _get_stylesheet(self) -> CSS:
+        """Feuille de style de base, analysée une seule fois puis réutilisée."""
+        cls = type(self)
+        with cls._cache_lock:
+            if cls._stylesheet is None:
+                cls._stylesheet = CSS(string=self._get_base_css(), font_config=self._get_font_config())
+            return cls._stylesheet
+
+    # --- Cache des fragments HTML ---
+    @staticmethod
+    def _digest(value) -> str:
+        return hashlib.blake2b(repr(value).encode('utf-8'), digest_size=16).hexdigest()
+
+    @staticmethod
+    def _entries_fingerprint(items, fields) -> tuple:
+        """Valeurs rendues de chaque entrée (les objets Facture, etc. sont ignorés)."""
+        return tuple(tuple(getattr(item, field, None) for field in fields) for item in (items or []))
+
+    def _cached_section(self, section_name: str, key_parts, builder: Callable[[], str]) -> str:
+        """Retourne le fragment HTML d'une section depuis le cache, ou le construit et le mémorise."""
+        cls = type(self)
+        key = f"{section_name}:{self._digest(key_parts)}"
+        with cls._cache_lock:
+            fragment = cls._section_cache.get(key)
+            if fragment is not None:
+                cls._section_cache.move_to_end(key)
+                return fragment
+        fragment = builder()
+        with cls._cache_lock:
+            cls._section_cache[key] = fragment
+            while len(cls._section_cache) > self.MAX_CACHED_SECTIONS:
+                cls._section_cache.popitem(last=False)
+        return fragment
+
+    @classmethod
+    def clear_cache(cls):
+        """Vide les fragments HTML et les PDF mémorisés (la CSS et les polices restent chargées)."""
+        with cls._cache_lock:
+            cls._section_cache.clear()
+            cls._pdf_by_digest.clear()
+
     def _generate_header_html(self, rapport: 'RapportDepense') -> str:
         """Génère le HTML pour l'en-tête du document (logo, titre, infos utilisateur)."""
         logo_path = os.path.abspath("resources/images/logo-jacmar.png")
@@ -194,15 +273,7 @@ class DocumentPDFPrinter:
             </table>
         """
 
-    def _generate_deplacements_html(self, rapport: 'RapportDepense') -> str:
-        deplacements = rapport.deplacements
-        if not deplacements: return ""
-
-        total_kilometrage = 0
-        for item in deplacements:
-            if hasattr(item, 'kilometrage') and item.kilometrage is not None:
-                total_kilometrage += item.kilometrage
-
+    def _get_taux_remboursement_str(self) -> str:
         config = ConfigData.get_instance()
 
         # Récupérer le taux de remboursement depuis ConfigData
@@ -214,6 +285,10 @@ class DocumentPDFPrinter:
                 taux_remboursement_km_str = f"{float(taux_val):.2f}"
         except Exception as e:
             print(f"Erreur lors de la récupération du taux de remboursement depuis ConfigData: {e}. Utilisation de la valeur par défaut.")
+        return taux_remboursement_km_str
+
+    def _get_plafond_deplacement_str(self, rapport: 'RapportDepense') -> str:
+        config = ConfigData.get_instance()
 
         # Récupérer le nom du plafond de déplacement depuis l'objet RapportDepense
         nom_plafond_deplacement = getattr(rapport, 'plafond_deplacement', None)
@@ -236,6 +311,12 @@ class DocumentPDFPrinter:
                 print(f"Erreur lors de la récupération de la valeur du plafond de déplacement '{nom_plafond_deplacement}' depuis ConfigData: {e}.")
         else:
             print("Aucun nom de plafond de déplacement défini dans l'objet RapportDepense.")
+        return plafond_deplacement_valeur_str
+
+    def _generate_deplacements_html(self, deplacements: List['Deplacement'],
+                                    taux_remboursement_km_str: str, plafond_deplacement_valeur_str: str,
+                                    total_kilometrage: float) -> str:
+        if not deplacements: return ""
 
         # Informations au-dessus du tableau, sur une ligne horizontale
         deplacement_info_html = f"""
@@ -446,33 +527,11 @@ class DocumentPDFPrinter:
         """
 
     def _generate_totaux_html(self, rapport: 'RapportDepense') -> str:
-        total_deplacements = 0.0
-        if hasattr(rapport, 'deplacements') and rapport.deplacements:
-            for deplacement in rapport.deplacements:
-                if hasattr(deplacement, 'montant') and deplacement.montant is not None:
-                    total_deplacements += deplacement.montant
-
-        total_repas = 0.0
-        if hasattr(rapport, 'repas') and rapport.repas:
-            for repas_item in rapport.repas:
-                # Sommer la totale_apres_taxes si payeur est True (Employé)
-                if (hasattr(repas_item, 'payeur') and
-                    repas_item.payeur and
-                    hasattr(repas_item, 'totale_apres_taxes') and
-                    repas_item.totale_apres_taxes is not None):
-                    total_repas += repas_item.totale_apres_taxes
-        
-        total_depenses_diverses = 0.0
-        if hasattr(rapport, 'depenses_diverses') and rapport.depenses_diverses:
-            for depense_item in rapport.depenses_diverses:
-                # Sommer la totale_apres_taxes si payeur est True (Employé)
-                if (hasattr(depense_item, 'payeur') and
-                    depense_item.payeur and
-                    hasattr(depense_item, 'totale_apres_taxes') and
-                    depense_item.totale_apres_taxes is not None):
-                    total_depenses_diverses += depense_item.totale_apres_taxes
-
-        grand_total_remboursement = total_deplacements + total_repas + total_depenses_diverses
+        totaux = rapport.calculer_totaux()
+        total_deplacements = totaux.total_deplacements
+        total_repas = totaux.repas_employe_total # Payés par l'employé
+        total_depenses_diverses = totaux.depense_employe_total
+        grand_total_remboursement = totaux.total_general
 
         return f"""
             <div class="totals-section">
@@ -495,24 +554,78 @@ class DocumentPDFPrinter:
     def _generate_rapport_depense_html(self, rapport: 'RapportDepense') -> str:
         """Construit la chaîne HTML complète pour un rapport de dépenses."""
         
-        html_content = "<html><head><meta charset='UTF-8'><title>Rapport de Dépenses</title>"
-        html_content += f"<style>{self._get_base_css()}</style></head><body>"
-        
+        # La CSS n'est plus incluse ici: elle est passée à write_pdf déjà analysée (_get_stylesheet)
+        html_content = "<html><head><meta charset='UTF-8'><title>Rapport de Dépenses</title></head><body>"
+
+        deplacements_fp = self._entries_fingerprint(rapport.deplacements, self.DEPLACEMENT_FIELDS)
+        repas_fp = self._entries_fingerprint(rapport.repas, self.REPAS_FIELDS)
+        depenses_fp = self._entries_fingerprint(rapport.depenses_diverses, self.DEPENSE_FIELDS)
+
         html_content += self._generate_header_html(rapport)
         html_content += self._generate_rapport_info_table_html(rapport)
-        html_content += self._generate_deplacements_html(rapport)
-        html_content += self._generate_repas_html(rapport.repas)
-        html_content += self._generate_depenses_diverses_html(rapport.depenses_diverses)
-        html_content += self._generate_totaux_html(rapport)
+        if rapport.deplacements:
+            taux_str = self._get_taux_remboursement_str()
+            plafond_str = self._get_plafond_deplacement_str(rapport)
+            html_content += self._cached_section(
+                "deplacements", (deplacements_fp, taux_str, plafond_str),
+                lambda: self._generate_deplacements_html(rapport.deplacements, taux_str, plafond_str,
+                                                         rapport.calculer_totaux().total_kilometrage))
+        html_content += self._cached_section(
+            "repas", repas_fp, lambda: self._generate_repas_html(rapport.repas))
+        html_content += self._cached_section(
+            "depenses_diverses", depenses_fp, lambda: self._generate_depenses_diverses_html(rapport.depenses_diverses))
+        html_content += self._cached_section(
+            "totaux", (deplacements_fp, repas_fp, depenses_fp), lambda: self._generate_totaux_html(rapport))
         html_content += self._generate_footer_html()
         
         html_content += "</body></html>"
         return html_content
 
-    def generate(self, document, output_path: str):
+    def _reuse_previous_pdf(self, html_digest: str, output_path: str) -> bool:
+        """
+        Si un PDF identique (même HTML) a déjà été écrit et n'a pas changé depuis,
+        le réutilise au lieu de relancer WeasyPrint. Retourne True si c'est le cas.
+        """
+        cls = type(self)
+        with cls._cache_lock:
+            previous = cls._pdf_by_digest.get(html_digest)
+        if not previous:
+            return False
+        previous_path, previous_size, previous_mtime_ns = previous
+        try:
+            st = os.stat(previous_path)
+        except OSError:
+            return False
+        if st.st_size != previous_size or st.st_mtime_ns != previous_mtime_ns:
+            return False # Le fichier a été modifié ou remplacé depuis
+        if os.path.abspath(previous_path) != os.path.abspath(output_path):
+            try:
+                shutil.copyfile(previous_path, output_path)
+            except OSError as e:
+                logger.warning(f"Copie du PDF précédent impossible ({e}), nouveau rendu.")
+                return False
+        return True
+
+    def _remember_pdf(self, html_digest: str, output_path: str):
+        try:
+            st = os.stat(output_path)
+        except OSError:
+            return
+        cls = type(self)
+        with cls._cache_lock:
+            cls._pdf_by_digest[html_digest] = (os.path.abspath(output_path), st.st_size, st.st_mtime_ns)
+
+    def generate(self, document, output_path: str, raise_errors: bool = False) -> bool:
         """
         Génère un PDF pour le document fourni en utilisant WeasyPrint.
         Détecte le type de document et appelle la méthode de génération HTML appropriée.
+        Un export dont le HTML est identique à un export précédent réutilise le PDF déjà écrit.
+
+        Args:
+            raise_errors: Si True, les erreurs de rendu sont propagées au lieu d'être seulement affichées.
+
+        Returns:
+            True si le PDF a été écrit (ou réutilisé), False sinon.
         """
         # --- Importations réelles ici pour éviter les dépendances circulaires au niveau du module ---
         from models.documents.rapport_depense.rapport_depense import RapportDepense
@@ -525,28 +638,37 @@ class DocumentPDFPrinter:
         #     html_string = self._generate_autre_type_html(document) # À implémenter
         else:
             print(f"Type de document non supporté pour la génération PDF HTML: {type(document).__name__}")
-            return
+            if raise_errors:
+                raise TypeError(f"Type de document non supporté: {type(document).__name__}")
+            return False
 
         if not html_string:
             print("Aucun contenu HTML généré.")
-            return
+            return False
 
         try:
-            # Configuration des polices pour WeasyPrint (si nécessaire, par exemple pour des polices non standard)
-            # font_config = FontConfiguration() # Commenté pour l'instant car non utilisé activement
-            
-            # Générer le PDF depuis la chaîne HTML
-            # La CSS de base est déjà incluse dans html_string via _generate_rapport_depense_html
-            # Si font_config était utilisé, il faudrait le passer ici ou à CSS() si on avait des CSS externes.
+            # La CSS fait partie du rendu: l'inclure dans l'empreinte
+            html_digest = self._digest((html_string, self._get_base_css()))
+            if self._reuse_previous_pdf(html_digest, output_path):
+                logger.info(f"PDF inchangé, rendu WeasyPrint évité : {output_path}")
+                return True
+
+            # Générer le PDF depuis la chaîne HTML, avec la CSS et les polices partagées
             html_doc = HTML(string=html_string, base_url=os.path.dirname(os.path.abspath(__file__)))
-            html_doc.write_pdf(output_path) # Potentiellement ajouter font_config=font_config ici si utilisé
+            html_doc.write_pdf(output_path, stylesheets=[self._get_stylesheet()],
+                               font_config=self._get_font_config())
+            self._remember_pdf(html_digest, output_path)
 
             print(f"PDF généré avec succès (via HTML) : {output_path}")
+            return True
 
         except Exception as e:
             print(f"Erreur lors de la génération du PDF avec WeasyPrint : {e}")
+            if raise_errors:
+                raise
             import traceback
             traceback.print_exc()
+            return False
 
 # --- Suppression des anciennes méthodes FPDF ---
 # _set_default_font
@@ -1,20 +1,20 @@
+"""
+Binding ctypes de la bibliothèque C++ Epilog Print API.
+
+La bibliothèque n'est pas chargée à l'import de ce module: EpilogBinding résout son
+chemin, appelle ctypes.CDLL et configure les prototypes au premier appel qui en a besoin
+(premier envoi ou première génération PRN), une seule fois et de façon thread-safe, puis
+garde le résultat. Si elle est introuvable ou ne se charge pas, chaque appel lève
+EpilogLibraryError avec la raison (l'échec n'est journalisé qu'une fois).
+"""
+
 import ctypes
 import platform
 import os
 import logging
+import threading
 
-# Configuration de logging spécifique pour ce module (pour débogage temporaire)
-# Cela permet de voir les logs DEBUG de ce fichier même si la config globale est différente.
-_module_logger = logging.getLogger(__name__)
-if not _module_logger.handlers: # Ajouter un handler seulement si ce logger n'en a pas déjà
-    _handler = logging.StreamHandler() # Par défaut vers sys.stderr, ou sys.stdout si disponible via la config globale de base
-    _formatter = logging.Formatter('[%(asctime)s] [%(name)s:%(lineno)d] [%(levelname)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
-    _handler.setFormatter(_formatter)
-    _module_logger.addHandler(_handler)
-_module_logger.setLevel(logging.DEBUG) # Forcer le niveau DEBUG pour ce logger
-# Fin de la configuration de logging spécifique pour débogage
-
-logger = _module_logger # S'assurer que le reste du module utilise ce logger configuré
+logger = logging.getLogger(__name__)
 
 # Nom de la bibliothèque partagée (corrigé selon vos informations)
 LIB_NAME_WINDOWS = "epilog_print_api_libcpp.dll"
@@ -23,45 +23,22 @@ LIB_NAME_LINUX = "libepilog-print-api.so" # Gardons celui-ci pour l'instant, à
 # Chemin vers la bibliothèque C++ (corrigé avec la double mention du dossier)
 # Cela suppose que la structure du dossier est GDJ_App/Others/epilog-print-api-release-latest/epilog-print-api-release-latest/cpp-library/
 # Et que ce fichier (epilog_cpp_wrapper.py) est dans GDJ_App/utils/
-# Correction: os.path.dirname appelé une fois de moins pour pointer vers la racine de GDJ_App
 APP_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) # Remonte à GDJ_App
 CPP_LIB_BASE_PATH = os.path.join(APP_ROOT_DIR, "Others", "epilog-print-api-release-latest", "epilog-print-api-release-latest", "cpp-library")
 
-# Charger la bibliothèque
-epilog_api_lib = None
-lib_path = None
 
-if platform.system() == "Windows":
-    lib_path = os.path.join(CPP_LIB_BASE_PATH, "win-x64", LIB_NAME_WINDOWS)
-    logger.info(f"Chemin calculé pour la DLL Windows: {lib_path}")
-    if os.path.exists(lib_path):
-        logger.info(f"Fichier DLL trouvé à: {lib_path}")
-        try:
-            epilog_api_lib = ctypes.CDLL(lib_path)
-        except OSError as e:
-            logger.error(f"Erreur lors du chargement de la DLL {LIB_NAME_WINDOWS} depuis {lib_path}: {e}")
-    else:
-        logger.error(f"Fichier DLL NON TROUVÉ à: {lib_path}")
-elif platform.system() == "Linux":
-    # Pour Linux, il faudra peut-être s'assurer que le dossier contenant .so est dans LD_LIBRARY_PATH
-    # ou utiliser le chemin absolu.
-    lib_path = os.path.join(CPP_LIB_BASE_PATH, "ubuntu-20.04", LIB_NAME_LINUX)
-    logger.info(f"Chemin calculé pour la bibliothèque partagée Linux: {lib_path}")
-    if os.path.exists(lib_path):
-        logger.info(f"Fichier de bibliothèque partagée trouvé à: {lib_path}")
-        try:
-            epilog_api_lib = ctypes.CDLL(lib_path)
-        except OSError as e:
-            logger.error(f"Erreur lors du chargement de la bibliothèque partagée {LIB_NAME_LINUX} depuis {lib_path}: {e}")
-    else:
-        logger.error(f"Fichier de bibliothèque partagée NON TROUVÉ à: {lib_path}")
-else:
-    logger.error(f"Plateforme non supportée: {platform.system()}")
+class EpilogLibraryError(RuntimeError):
+    """Bibliothèque Epilog C++ indisponible: introuvable, non chargeable ou fonction absente."""
 
-if epilog_api_lib:
-    logger.info(f"Bibliothèque Epilog C++ chargée avec succès depuis: {lib_path}")
-else:
-    logger.error("Impossible de charger la bibliothèque Epilog C++. Les fonctionnalités d'impression via C++ API ne seront pas disponibles.")
+
+def resolve_library_path() -> str:
+    """Chemin de la bibliothèque partagée pour la plateforme courante."""
+    system = platform.system()
+    if system == "Windows":
+        return os.path.join(CPP_LIB_BASE_PATH, "win-x64", LIB_NAME_WINDOWS)
+    if system == "Linux":
+        return os.path.join(CPP_LIB_BASE_PATH, "ubuntu-20.04", LIB_NAME_LINUX)
+    raise EpilogLibraryError(f"Plateforme non supportée par la bibliothèque Epilog: {system}")
 
 def get_enum_name_from_value(enum_class, value, default_name="Unknown"):
     """
@@ -165,100 +142,133 @@ class PrintData(ctypes.Structure):
         ("length", ctypes.c_uint64)
     ]
 
-# --- Définition des prototypes des fonctions C --- 
-
-# Fonction pour configurer argtypes et restype plus facilement
-def setup_func(name, restype, argtypes):
-    if epilog_api_lib:
+# --- Prototypes des fonctions C (configurés au chargement de la bibliothèque) --- 
+# nom -> (restype, argtypes)
+_PROTOTYPES = {
+    # Retour à l'hypothèse la plus directe de la doc C++: 3 arguments, retourne PrnGen*
+    "prn_gen_new": (PrnGen_p, [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_uint]),
+    "free_prn_gen": (ctypes.c_bool, [PrnGen_p]),
+    "prn_gen_add_font_data": (EpilogApiStatusCode, [PrnGen_p, ctypes.c_char_p, ctypes.c_uint64]),
+    # La doc C++ dit: [return: `bool`] Whether or not there is more work to do.
+    "prn_gen_run_chunk": (ctypes.c_bool, [PrnGen_p]),
+    # Retourne la structure ApiResultData elle-même, pas un pointeur.
+    "prn_gen_run_until_complete": (ApiResultData, [PrnGen_p]),
+    "prn_gen_request_abort": (EpilogApiStatusCode, [PrnGen_p]),
+    "prn_gen_get_progress": (CProgressReport, [PrnGen_p]),
+    # Retourne la structure ApiResultData elle-même, pas un pointeur.
+    "prn_gen_get_result": (ApiResultData, [PrnGen_p]),
+    "prn_gen_is_complete": (ctypes.c_bool, [PrnGen_p]),
+    "prn_gen_has_error": (ctypes.c_bool, [PrnGen_p]),
+    "prn_gen_was_aborted": (ctypes.c_bool, [PrnGen_p]),
+    "prn_gen_error_string": (ctypes.c_char_p, [PrnGen_p]),
+    # Signature C: bool prn_gen_send_file(EpilogMachine machine, const char *data, uintptr_t data_length, const char *ip_address);
+    "prn_gen_send_file": (ctypes.c_bool, [ctypes.c_uint, ctypes.POINTER(ctypes.c_ubyte), ctypes.c_uint64, ctypes.c_char_p]),
+    # Prend un pointeur vers la structure ApiResultData
+    "free_c_api_result": (ctypes.c_bool, [ApiResultData_p]),
+    "free_c_api_error": (ctypes.c_bool, [ctypes.POINTER(CApiError)]),
+    "free_cstring": (ctypes.c_bool, [ctypes.c_char_p]),
+    "free_carray": (ctypes.c_bool, [ctypes.c_char_p, ctypes.c_uint64]),
+    "api_version": (ctypes.c_char_p, []),
+    # free_c_progress_report (basé sur le header, semble manquer dans le README)
+    "free_c_progress_report": (EpilogApiStatusCode, [ctypes.POINTER(CProgressReport)]),
+}
+
+
+class EpilogBinding:
+    """Bibliothèque Epilog chargée au premier usage (une seule fois, thread-safe) et ses fonctions C."""
+
+    def __init__(self, lib_path: str | None = None):
+        self._lib_path = lib_path
+        self._lock = threading.Lock()
+        self._lib = None
+        self._functions = None # nom -> fonction configurée (None si absente de la bibliothèque)
+        self._error = None # Message de l'échec de chargement, gardé pour les appels suivants
+
+    @property
+    def lib_path(self) -> str:
+        return self._lib_path or resolve_library_path()
+
+    @property
+    def load_error(self) -> str | None:
+        return self._error
+
+    def _load_functions(self) -> dict:
+        functions = self._functions
+        if functions is not None:
+            return functions
+        with self._lock:
+            if self._functions is None and self._error is None:
+                try:
+                    self._functions = self._load_library()
+                except EpilogLibraryError as e:
+                    self._error = str(e)
+                    logger.error(f"{e} Les fonctionnalités d'impression via l'API C++ ne sont pas disponibles.")
+            if self._error is not None:
+                raise EpilogLibraryError(self._error)
+            return self._functions
+
+    def _load_library(self) -> dict:
+        lib_path = self.lib_path
+        if not os.path.exists(lib_path):
+            raise EpilogLibraryError(f"Bibliothèque Epilog C++ introuvable: {lib_path}.")
         try:
-            func = getattr(epilog_api_lib, name)
+            lib = ctypes.CDLL(lib_path)
+        except OSError as e:
+            raise EpilogLibraryError(f"Chargement de la bibliothèque Epilog C++ impossible ({lib_path}): {e}.") from e
+        functions = {}
+        for name, (restype, argtypes) in _PROTOTYPES.items():
+            try:
+                func = getattr(lib, name)
+            except AttributeError:
+                logger.warning(f"Fonction C '{name}' absente de la bibliothèque Epilog ({lib_path}).")
+                functions[name] = None
+                continue
             func.restype = restype
             func.argtypes = argtypes
-            return func
-        except AttributeError:
-            logger.critical(f"Fonction C '{name}' non trouvée dans la bibliothèque. L'API ne fonctionnera pas correctement.")
-            return None
-    return None
-
-# prn_gen_new
-# Retour à l'hypothèse la plus directe de la doc C++: 3 arguments, retourne PrnGen*
-prn_gen_new = setup_func("prn_gen_new", PrnGen_p, [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_uint])
-
-# free_prn_gen
-free_prn_gen = setup_func("free_prn_gen", ctypes.c_bool, [PrnGen_p])
-
-# prn_gen_add_font_data
-prn_gen_add_font_data = setup_func("prn_gen_add_font_data", EpilogApiStatusCode, [PrnGen_p, ctypes.c_char_p, ctypes.c_uint64])
-
-# prn_gen_run_chunk
-# La doc C++ dit: [return: `bool`] Whether or not there is more work to do.
-prn_gen_run_chunk = setup_func("prn_gen_run_chunk", ctypes.c_bool, [PrnGen_p])
-
-# prn_gen_run_until_complete
-# Retourne la structure ApiResultData*, pas un simple code.
-# MODIFIÉ: Retourne la structure ApiResultData elle-même, pas un pointeur.
-prn_gen_run_until_complete = setup_func("prn_gen_run_until_complete", ApiResultData, [PrnGen_p])
-
-# prn_gen_request_abort
-prn_gen_request_abort = setup_func("prn_gen_request_abort", EpilogApiStatusCode, [PrnGen_p])
-
-# prn_gen_get_progress
-prn_gen_get_progress = setup_func("prn_gen_get_progress", CProgressReport, [PrnGen_p])
-
-# prn_gen_get_result
-# Retourne la structure ApiResultData*, pas un simple code.
-# MODIFIÉ: Retourne la structure ApiResultData elle-même, pas un pointeur.
-prn_gen_get_result = setup_func("prn_gen_get_result", ApiResultData, [PrnGen_p])
-
-# prn_gen_is_complete
-# La doc C++ dit: [return: `bool`]
-prn_gen_is_complete = setup_func("prn_gen_is_complete", ctypes.c_bool, [PrnGen_p])
-
-# prn_gen_has_error
-# La doc C++ dit: [return: `bool`]
-prn_gen_has_error = setup_func("prn_gen_has_error", ctypes.c_bool, [PrnGen_p])
-
-# prn_gen_was_aborted
-# La doc C++ dit: [return: `bool`]
-prn_gen_was_aborted = setup_func("prn_gen_was_aborted", ctypes.c_bool, [PrnGen_p])
-
-# prn_gen_error_string
-prn_gen_error_string = setup_func("prn_gen_error_string", ctypes.c_char_p, [PrnGen_p])
-
-# prn_gen_send_file
-# Signature C: bool prn_gen_send_file(EpilogMachine machine, const char *data, uintptr_t data_length, const char *ip_address);
-# MODIFIÉ: La fonction C attend un pointeur direct vers les données et une longueur, pas une structure PrintData.
-prn_gen_send_file = setup_func(
-    "prn_gen_send_file", 
-    ctypes.c_bool, 
-    [ctypes.c_uint, ctypes.POINTER(ctypes.c_ubyte), ctypes.c_uint64, ctypes.c_char_p]
-)
-
-# free_c_api_result
-# Prend un pointeur vers la structure ApiResultData
-free_c_api_result = setup_func("free_c_api_result", ctypes.c_bool, [ApiResultData_p])
-
-# free_c_api_error
-free_c_api_error = setup_func("free_c_api_error", ctypes.c_bool, [ctypes.POINTER(CApiError)])
+            functions[name] = func
+        self._lib = lib
+        logger.info(f"Bibliothèque Epilog C++ chargée depuis: {lib_path}")
+        return functions
+
+    def function(self, name: str):
+        """Fonction C configurée; lève EpilogLibraryError si la bibliothèque ou la fonction manque."""
+        func = self._load_functions().get(name)
+        if func is None:
+            raise EpilogLibraryError(f"Fonction C '{name}' absente de la bibliothèque Epilog ({self.lib_path}).")
+        return func
+
+    def optional(self, name: str):
+        """Fonction C ou None si cette version de la bibliothèque ne la fournit pas (lève EpilogLibraryError si la bibliothèque manque)."""
+        return self._load_functions().get(name)
+
+    def has_function(self, name: str) -> bool:
+        """True si la fonction est disponible (charge la bibliothèque; lève EpilogLibraryError si elle manque)."""
+        return self.optional(name) is not None
+
+    def is_available(self) -> bool:
+        """True si la bibliothèque se charge (sans lever d'exception)."""
+        try:
+            self._load_functions()
+            return True
+        except EpilogLibraryError:
+            return False
 
-# free_cstring
-free_cstring = setup_func("free_cstring", ctypes.c_bool, [ctypes.c_char_p])
 
-# free_carray
-free_carray = setup_func("free_carray", ctypes.c_bool, [ctypes.c_char_p, ctypes.c_uint64])
+_binding = EpilogBinding()
 
-# api_version
-api_version = setup_func("api_version", ctypes.c_char_p, [])
 
-# free_c_progress_report (basé sur le header, semble manquer dans le README)
-free_c_progress_report = setup_func("free_c_progress_report", EpilogApiStatusCode, [ctypes.POINTER(CProgressReport)])
+def get_binding() -> EpilogBinding:
+    """Binding partagé du processus."""
+    return _binding
 
 
 # --- Fonctions Python wrapper (à implémenter) --- 
 
 def get_api_version() -> str:
-    if not api_version:
-        logger.warning("API C non chargée, impossible d'obtenir la version.")
+    try:
+        api_version = _binding.function("api_version")
+    except EpilogLibraryError as e:
+        logger.warning(f"API C non chargée, impossible d'obtenir la version: {e}")
         return "API C non chargée"
     try:
         version_ptr = api_version()
@@ -278,9 +288,11 @@ def get_api_version() -> str:
         return "Erreur API"
 
 def create_prn_generator(svg_data_str: str, settings_json_str: str, machine: EpilogMachine) -> tuple[PrnGen_p | None, bytes | None, bytes | None]:
-    if not prn_gen_new:
-        logger.error("Bibliothèque C Epilog non chargée, impossible de créer le générateur PRN.")
-        return None, None, None
+    """Crée le générateur PRN. Lève EpilogLibraryError si la bibliothèque n'est pas disponible."""
+    prn_gen_new = _binding.function("prn_gen_new")
+    prn_gen_has_error = _binding.optional("prn_gen_has_error")
+    prn_gen_error_string = _binding.optional("prn_gen_error_string")
+    free_prn_gen = _binding.optional("free_prn_gen")
 
     # Convertir les chaînes Python en objets bytes. CES OBJETS DOIVENT RESTER EN VIE.
     svg_data_bytes = svg_data_str.encode('utf-8')
@@ -347,6 +359,7 @@ def create_prn_generator(svg_data_str: str, settings_json_str: str, machine: Epi
         return None, None, None # Indiquer l'échec
 
 def destroy_prn_generator(gen_ptr: PrnGen_p):
+    free_prn_gen = _binding.optional("free_prn_gen")
     if not free_prn_gen:
         logger.warning("API C non chargée, impossible de libérer PrnGen.")
         return
@@ -364,17 +377,21 @@ def destroy_prn_generator(gen_ptr: PrnGen_p):
         logger.error(f"Exception lors de la libération du PrnGen {gen_ptr}: {e}")
 
 def generate_print_file_data(gen_ptr: PrnGen_p) -> bytes | None:
-    _module_logger.debug(f"generate_print_file_data REÇU gen_ptr: {gen_ptr}")
+    logger.debug(f"generate_print_file_data REÇU gen_ptr: {gen_ptr}")
+    prn_gen_run_until_complete = _binding.optional("prn_gen_run_until_complete")
+    free_c_api_result = _binding.optional("free_c_api_result")
+    prn_gen_has_error = _binding.optional("prn_gen_has_error")
+    prn_gen_error_string = _binding.optional("prn_gen_error_string")
 
     # Utiliser prn_gen_run_until_complete comme dans l'exemple C++
     if not all([prn_gen_run_until_complete, free_c_api_result]):
-        _module_logger.error("API C non chargée ou fonctions manquantes (prn_gen_run_until_complete/free_c_api_result), impossible de générer les données.")
+        logger.error("API C non chargée ou fonctions manquantes (prn_gen_run_until_complete/free_c_api_result), impossible de générer les données.")
         return None
     if not gen_ptr:
-        _module_logger.error("gen_ptr est nul dans generate_print_file_data.")
+        logger.error("gen_ptr est nul dans generate_print_file_data.")
         return None
 
-    _module_logger.info(f"Début de la génération des données avec prn_gen_run_until_complete pour gen_ptr: {gen_ptr}")
+    logger.info(f"Début de la génération des données avec prn_gen_run_until_complete pour gen_ptr: {gen_ptr}")
     
     returned_api_result_struct = None # Pour s'assurer qu'il est défini pour le bloc finally
 
@@ -383,29 +400,29 @@ def generate_print_file_data(gen_ptr: PrnGen_p) -> bytes | None:
         # Elle retourne la structure directement maintenant
         returned_api_result_struct = prn_gen_run_until_complete(gen_ptr)
         
-        _module_logger.debug(f"prn_gen_run_until_complete a retourné une STRUCTURE.")
-        _module_logger.debug(f"  Structure.error_message_ptr: {returned_api_result_struct.error_message_ptr}")
-        _module_logger.debug(f"  Structure.result_size: {returned_api_result_struct.result_size}")
-        _module_logger.debug(f"  Structure.result (pointeur): {returned_api_result_struct.result}")
+        logger.debug(f"prn_gen_run_until_complete a retourné une STRUCTURE.")
+        logger.debug(f"  Structure.error_message_ptr: {returned_api_result_struct.error_message_ptr}")
+        logger.debug(f"  Structure.result_size: {returned_api_result_struct.result_size}")
+        logger.debug(f"  Structure.result (pointeur): {returned_api_result_struct.result}")
 
         # Vérifier si un message d'erreur est présent
         error_msg = None
         if returned_api_result_struct.error_message_ptr:
             try:
                 error_msg = returned_api_result_struct.error_message_ptr.decode('utf-8')
-                _module_logger.info(f"  Message d'erreur de l'API (via ApiResultData.error_message_ptr): '{error_msg}'")
+                logger.info(f"  Message d'erreur de l'API (via ApiResultData.error_message_ptr): '{error_msg}'")
             except Exception as e:
-                _module_logger.error(f"  Impossible de décoder error_message_ptr: {e}")
+                logger.error(f"  Impossible de décoder error_message_ptr: {e}")
                 error_msg = "Erreur API non décodable"
 
         if error_msg and error_msg != "": # Vérifier si un message d'erreur non vide existe
             # Même si error_msg est "Print file generation not yet complete", on le logue comme une erreur ici.
-            _module_logger.error(f"Échec de la génération des données PRN. Message d'erreur API: '{error_msg}'")
+            logger.error(f"Échec de la génération des données PRN. Message d'erreur API: '{error_msg}'")
             return None # Échec
         
         # Si pas d'erreur, essayer de récupérer les données
         if returned_api_result_struct.result and returned_api_result_struct.result_size > 0:
-            _module_logger.info(f"Succès apparent de la génération. Taille des données: {returned_api_result_struct.result_size} octets.")
+            logger.info(f"Succès apparent de la génération. Taille des données: {returned_api_result_struct.result_size} octets.")
             # Copier les données du pointeur vers un objet bytes Python
             # Attention: returned_api_result_struct.result est POINTER(c_ubyte)
             # Nous devons créer un buffer Python à partir de cela.
@@ -414,18 +431,18 @@ def generate_print_file_data(gen_ptr: PrnGen_p) -> bytes | None:
             # Cela crée une copie des données, ce qui est sûr.
             prn_data_bytes = ctypes.string_at(returned_api_result_struct.result, returned_api_result_struct.result_size)
             
-            _module_logger.info(f"Données PRN copiées avec succès (taille: {len(prn_data_bytes)}).")
+            logger.info(f"Données PRN copiées avec succès (taille: {len(prn_data_bytes)}).")
             return prn_data_bytes
         elif returned_api_result_struct.result_size == 0 and (not error_msg or error_msg == ""):
-             _module_logger.warning("Génération des données PRN: Aucune erreur retournée, mais result_size est 0. Aucune donnée à retourner.")
+             logger.warning("Génération des données PRN: Aucune erreur retournée, mais result_size est 0. Aucune donnée à retourner.")
              return None # Pas d'erreur explicite mais pas de données
         else:
             # Ce cas ne devrait pas être atteint si error_msg a été traité, mais par sécurité
-            _module_logger.warning("Génération des données PRN: État inattendu après prn_gen_run_until_complete.")
+            logger.warning("Génération des données PRN: État inattendu après prn_gen_run_until_complete.")
             return None
 
     except Exception as e:
-        _module_logger.error(f"Exception majeure inattendue dans generate_print_file_data: {e}", exc_info=True)
+        logger.error(f"Exception majeure inattendue dans generate_print_file_data: {e}", exc_info=True)
         # Tenter de vérifier si prn_gen_has_error et prn_gen_error_string donnent plus d'infos
         # Cela ne devrait pas être nécessaire si returned_api_result_struct.error_message_ptr est utilisé
         # Mais pour le débogage, cela peut être utile.
@@ -433,38 +450,56 @@ def generate_print_file_data(gen_ptr: PrnGen_p) -> bytes | None:
             if prn_gen_has_error and prn_gen_has_error(gen_ptr):
                 c_error_str = prn_gen_error_string(gen_ptr)
                 if c_error_str:
-                    _module_logger.error(f"  Erreur supplémentaire via prn_gen_error_string: {c_error_str.decode('utf-8', errors='replace')}")
+                    logger.error(f"  Erreur supplémentaire via prn_gen_error_string: {c_error_str.decode('utf-8', errors='replace')}")
         except Exception as e_aux:
-            _module_logger.error(f"  Exception lors de la tentative de récupération d'erreur auxiliaire: {e_aux}")
+            logger.error(f"  Exception lors de la tentative de récupération d'erreur auxiliaire: {e_aux}")
         return None
     finally:
         # Libérer la mémoire allouée par l'API C pour la structure CApiResult et ses membres.
         # Nous devons passer un POINTEUR à la structure à free_c_api_result.
         if returned_api_result_struct is not None and free_c_api_result:
-            _module_logger.debug(f"  Appel de free_c_api_result avec POINTEUR vers la structure retournée.")
+            logger.debug(f"  Appel de free_c_api_result avec POINTEUR vers la structure retournée.")
             # Utiliser ctypes.byref() pour passer un pointeur vers la structure qui a été retournée par valeur.
             if not free_c_api_result(ctypes.byref(returned_api_result_struct)):
-                _module_logger.warning("  free_c_api_result a retourné false (échec de la libération).")
+                logger.warning("  free_c_api_result a retourné false (échec de la libération).")
             else:
-                _module_logger.info("  Mémoire du résultat API (prn_gen_run_until_complete) libérée avec free_c_api_result.")
+                logger.info("  Mémoire du résultat API (prn_gen_run_until_complete) libérée avec free_c_api_result.")
         
-        _module_logger.debug("Fin de generate_print_file_data.")
+        logger.debug("Fin de generate_print_file_data.")
 
-def send_print_data_to_laser(machine: EpilogMachine, print_data: bytes, ip_address_str: str) -> bool:
-    if not prn_gen_send_file:
-        logger.error("Bibliothèque C Epilog non chargée, impossible d'envoyer les données.")
-        return False
+PRN_WRITE_CHUNK_SIZE = 1024 * 1024 # Taille des écritures lors de la sauvegarde d'un fichier PRN
 
-    # Les données sont déjà en `bytes` Python. Nous avons besoin d'un pointeur vers ces données.
-    # ctypes.create_string_buffer crée une copie modifiable, ce qui est sûr.
-    # Ou, si print_data est déjà un buffer que l'on peut pointer directement (moins sûr sans copie) :
-    # data_ptr = ctypes.cast(print_data, ctypes.POINTER(ctypes.c_ubyte))
-    # Pour la sécurité, utilisons create_string_buffer qui alloue et copie.
-    
-    # Le buffer doit exister pendant l'appel à la fonction C.
-    c_buffer = ctypes.create_string_buffer(print_data) # print_data est un objet bytes
-    data_ptr = ctypes.cast(c_buffer, ctypes.POINTER(ctypes.c_ubyte))
-    data_len = len(print_data)
+def _print_data_pointer(print_data) -> tuple:
+    """
+    Retourne (POINTER(c_ubyte), longueur, référence à garder en vie) vers les octets de
+    print_data sans les copier: bytes (lecture seule côté C), bytearray, memoryview ou
+    tableau ctypes (ex: la vue d'un PrnResultBuffer). Seule une vue en lecture seule
+    sur autre chose qu'un bytes complet est copiée.
+    """
+    if isinstance(print_data, bytes):
+        # c_char_p pointe directement sur le tampon interne de l'objet bytes
+        return ctypes.cast(ctypes.c_char_p(print_data), ctypes.POINTER(ctypes.c_ubyte)), len(print_data), print_data
+    view = memoryview(print_data).cast('B')
+    if view.readonly:
+        if isinstance(view.obj, bytes) and view.nbytes == len(view.obj):
+            return _print_data_pointer(view.obj)
+        logger.debug(f"Tampon PRN en lecture seule ({type(view.obj).__name__}): copie de {view.nbytes} octets.")
+        c_array = (ctypes.c_ubyte * view.nbytes).from_buffer_copy(view)
+    else:
+        c_array = (ctypes.c_ubyte * view.nbytes).from_buffer(view)
+    return ctypes.cast(c_array, ctypes.POINTER(ctypes.c_ubyte)), view.nbytes, c_array
+
+def send_print_data_to_laser(machine: EpilogMachine, print_data, ip_address_str: str) -> bool:
+    """
+    Envoie un fichier d'impression au laser. print_data peut être un bytes, un bytearray,
+    une memoryview ou la vue d'un PrnResultBuffer: le tampon est passé à prn_gen_send_file
+    sans copie (il doit rester inchangé pendant l'appel). Lève EpilogLibraryError si la
+    bibliothèque n'est pas disponible.
+    """
+    prn_gen_send_file = _binding.function("prn_gen_send_file")
+
+    # Le tampon (et la référence retournée) doit exister pendant l'appel à la fonction C.
+    data_ptr, data_len, _data_ref = _print_data_pointer(print_data)
     
     c_ip_address = ctypes.c_char_p(ip_address_str.encode('utf-8'))
 
@@ -486,6 +521,160 @@ def send_print_data_to_laser(machine: EpilogMachine, print_data: bytes, ip_addre
         logger.error(f"prn_gen_send_file a échoué (retourné false) pour IP {ip_address_str}.")
         return False
 
+def run_generation_chunk(gen_ptr: PrnGen_p) -> bool:
+    """Exécute une tranche de la génération. Retourne True s'il reste du travail."""
+    prn_gen_run_chunk = _binding.optional("prn_gen_run_chunk")
+    if not prn_gen_run_chunk or not gen_ptr:
+        return False
+    return bool(prn_gen_run_chunk(gen_ptr))
+
+def request_generation_abort(gen_ptr: PrnGen_p) -> bool:
+    """Demande l'arrêt de la génération (effectif à la prochaine tranche)."""
+    prn_gen_request_abort = _binding.optional("prn_gen_request_abort")
+    if not prn_gen_request_abort or not gen_ptr:
+        return False
+    status = prn_gen_request_abort(gen_ptr)
+    return int(getattr(status, 'value', status)) == EpilogApiStatusCode.Success
+
+def get_generation_progress(gen_ptr: PrnGen_p) -> dict | None:
+    """
+    Lit l'avancement du générateur (CProgressReport). Les chaînes sont copiées puis la
+    structure C est libérée. total_progress est ramené entre 0 et 1.
+    """
+    prn_gen_get_progress = _binding.optional("prn_gen_get_progress")
+    free_c_progress_report = _binding.optional("free_c_progress_report")
+    if not prn_gen_get_progress or not gen_ptr:
+        return None
+    report = prn_gen_get_progress(gen_ptr)
+    try:
+        total_progress = float(report.total_progress)
+        if total_progress > 1.0: # Certaines versions de l'API rapportent un pourcentage
+            total_progress /= 100.0
+        return {
+            'stage_name': report.stage_name.decode('utf-8', errors='replace') if report.stage_name else "",
+            'stage_has_progress': bool(report.stage_has_progress),
+            'stage_progress': float(report.stage_progress),
+            'stage_index': int(report.stage_index),
+            'stage_count': int(report.stage_count),
+            'total_progress': min(max(total_progress, 0.0), 1.0),
+        }
+    finally:
+        if free_c_progress_report:
+            free_c_progress_report(ctypes.byref(report))
+
+def get_generator_error(gen_ptr: PrnGen_p) -> str | None:
+    """Message d'erreur courant du générateur (None s'il n'y en a pas)."""
+    prn_gen_has_error = _binding.optional("prn_gen_has_error")
+    prn_gen_error_string = _binding.optional("prn_gen_error_string")
+    if not (prn_gen_has_error and prn_gen_error_string) or not gen_ptr:
+        return None
+    if not prn_gen_has_error(gen_ptr):
+        return None
+    error_c_str = prn_gen_error_string(gen_ptr)
+    return error_c_str.decode('utf-8', errors='replace') if error_c_str else "Erreur inconnue du générateur"
+
+def generation_was_aborted(gen_ptr: PrnGen_p) -> bool:
+    prn_gen_was_aborted = _binding.optional("prn_gen_was_aborted")
+    if not prn_gen_was_aborted or not gen_ptr:
+        return False
+    return bool(prn_gen_was_aborted(gen_ptr))
+
+class PrnResultBuffer:
+    """
+    Résultat C (ApiResultData) gardé en vie le temps de l'utiliser, puis libéré par
+    free_c_api_result à la sortie du bloc 'with'. 'view' est une memoryview sur la mémoire
+    du générateur: elle peut être envoyée au laser, écrite sur disque ou mise en cache
+    sans copie, mais ne doit pas être utilisée après la libération (tobytes() pour garder
+    une copie).
+    """
+
+    def __init__(self, result_struct: ApiResultData | None, error: str | None = None):
+        self._result_struct = result_struct
+        self.error = error
+        self.view = None
+        if result_struct is None:
+            return
+        if result_struct.error_message_ptr:
+            self.error = result_struct.error_message_ptr.decode('utf-8', errors='replace')
+        elif not result_struct.result or result_struct.result_size == 0:
+            self.error = "Aucune donnée générée"
+        else:
+            size = int(result_struct.result_size)
+            c_array = ctypes.cast(result_struct.result, ctypes.POINTER(ctypes.c_ubyte * size)).contents
+            self.view = memoryview(c_array).cast('B')
+
+    @property
+    def ok(self) -> bool:
+        return self.view is not None
+
+    def __len__(self) -> int:
+        return self.view.nbytes if self.view is not None else 0
+
+    def tobytes(self) -> bytes | None:
+        return self.view.tobytes() if self.view is not None else None
+
+    def release(self):
+        if self.view is not None:
+            try:
+                self.view.release()
+            except BufferError:
+                # Une vue dérivée est encore utilisée: mieux vaut fuir le résultat que le libérer sous elle
+                logger.error("Tampon PRN encore référencé à la libération: résultat C non libéré.")
+                return
+            self.view = None
+        if self._result_struct is not None:
+            free_c_api_result = _binding.optional("free_c_api_result")
+            if free_c_api_result and not free_c_api_result(ctypes.byref(self._result_struct)):
+                logger.warning("free_c_api_result a retourné false (échec de la libération).")
+            self._result_struct = None
+
+    def __enter__(self) -> 'PrnResultBuffer':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+def generation_result_buffer(gen_ptr: PrnGen_p) -> PrnResultBuffer:
+    """Résultat d'une génération terminée par tranches (prn_gen_get_result), sans copie."""
+    prn_gen_get_result = _binding.optional("prn_gen_get_result")
+    free_c_api_result = _binding.optional("free_c_api_result")
+    if not (prn_gen_get_result and free_c_api_result) or not gen_ptr:
+        return PrnResultBuffer(None, "API C non chargée")
+    return PrnResultBuffer(prn_gen_get_result(gen_ptr))
+
+def run_generation_to_buffer(gen_ptr: PrnGen_p) -> PrnResultBuffer:
+    """Génère le fichier d'impression en un bloc (prn_gen_run_until_complete), sans copie."""
+    prn_gen_run_until_complete = _binding.optional("prn_gen_run_until_complete")
+    free_c_api_result = _binding.optional("free_c_api_result")
+    if not (prn_gen_run_until_complete and free_c_api_result) or not gen_ptr:
+        return PrnResultBuffer(None, "API C non chargée")
+    return PrnResultBuffer(prn_gen_run_until_complete(gen_ptr))
+
+def get_generation_result(gen_ptr: PrnGen_p) -> tuple[bytes | None, str | None]:
+    """Récupère (copie) le fichier d'impression d'une génération terminée: (données, message d'erreur)."""
+    with generation_result_buffer(gen_ptr) as result_buffer:
+        return result_buffer.tobytes(), result_buffer.error
+
+def supports_chunked_generation() -> bool:
+    """True si la bibliothèque permet la génération par tranches (annulable, avec avancement)."""
+    return _binding.has_function("prn_gen_run_chunk")
+
+def generator_error_string(gen_ptr: PrnGen_p) -> str | None:
+    """Chaîne d'erreur du générateur (prn_gen_error_string), sans vérifier prn_gen_has_error."""
+    prn_gen_error_string = _binding.optional("prn_gen_error_string")
+    if not prn_gen_error_string or not gen_ptr:
+        return None
+    error_c_str = prn_gen_error_string(gen_ptr)
+    return error_c_str.decode('utf-8', errors='ignore') if error_c_str else None
+
+def write_print_data(file_path: str, print_data) -> int:
+    """Écrit un fichier PRN par blocs depuis son tampon (bytes, memoryview...), sans le copier."""
+    view = memoryview(print_data).cast('B')
+    with open(file_path, 'wb') as f:
+        for offset in range(0, view.nbytes, PRN_WRITE_CHUNK_SIZE):
+            f.write(view[offset:offset + PRN_WRITE_CHUNK_SIZE])
+    return view.nbytes
+
 # Gestionnaire de contexte pour PrnGen pour assurer la libération
 class PrnGeneratorContext:
     def __init__(self, svg_content: str, settings_json_content: str, machine: EpilogMachine):
@@ -518,8 +707,8 @@ class PrnGeneratorContext:
 
 
 if __name__ == '__main__':
-    if epilog_api_lib:
+    if _binding.is_available():
         print(f"Version de l'API Epilog (via C++): {get_api_version()}")
         # Test basique pour voir si on peut appeler une fonction simple
     else:
-        print("Bibliothèque C++ non chargée, impossible de tester.") 
\ No newline at end of file
+        print(f"Bibliothèque C++ non chargée, impossible de tester: {_binding.load_error}")
\ No newline at end of file
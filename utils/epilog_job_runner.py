@@ -0,0 +1,184 @@
+"""
+Exécution d'un travail d'impression Epilog hors du thread de l'interface.
+
+Le générateur PRN est piloté tranche par tranche (prn_gen_run_chunk) dans un QThread:
+l'avancement (CProgressReport) est émis vers l'interface entre deux tranches, une
+annulation est transmise au générateur par prn_gen_request_abort, puis le fichier
+produit est envoyé au laser. Le résultat indique l'étape atteinte et le message
+d'erreur éventuel.
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
+
+from .epilog_cpp_wrapper import (
+    EpilogLibraryError,
+    PrnGeneratorContext,
+    PrnResultBuffer,
+    generation_result_buffer,
+    generation_was_aborted,
+    get_generation_progress,
+    get_generator_error,
+    request_generation_abort,
+    run_generation_chunk,
+    run_generation_to_buffer,
+    send_print_data_to_laser,
+    supports_chunked_generation,
+)
+from .epilog_printer import EPILOG_MODEL_TO_ENUM_MAP, build_laser_settings_json
+from .prn_cache import PrnCache
+
+logger = logging.getLogger(__name__)
+
+STAGE_CREATION = "Création du générateur"
+STAGE_CACHE = "Fichier d'impression en cache"
+STAGE_SENDING = "Envoi au laser"
+PROGRESS_EMIT_INTERVAL = 0.1 # Secondes minimum entre deux signaux d'avancement d'une même étape
+
+
+@dataclass
+class EpilogJobResult:
+    """Issue d'un travail d'impression Epilog."""
+    success: bool
+    message: str
+    stage_name: str = ""
+    error: Optional[str] = None
+    aborted: bool = False
+    prn_data: Optional[bytes] = None # Fichier d'impression (si keep_prn_data, pour sauvegarde éventuelle)
+    from_cache: bool = False # True si le fichier PRN provient du cache (génération évitée)
+
+
+class EpilogJobWorker(QObject):
+    """Génère le fichier PRN par tranches puis l'envoie au laser (voir BatchExportWorker)."""
+    progress = pyqtSignal(float, str, int, int) # avancement total (0-1), étape, index de l'étape, nombre d'étapes
+    finished = pyqtSignal(object) # EpilogJobResult
+
+    def __init__(self, svg_content: str, machine_model_name: str, laser_ip_address: str,
+                 settings: Optional[dict] = None, send_to_laser: bool = True, use_cache: bool = True,
+                 keep_prn_data: bool = False):
+        super().__init__()
+        self.svg_content = svg_content
+        self.machine_model_name = machine_model_name
+        self.laser_ip_address = laser_ip_address
+        self.settings = settings
+        self.send_to_laser = send_to_laser
+        self.use_cache = use_cache
+        # Sans keep_prn_data, le fichier est envoyé et mis en cache directement depuis la
+        # mémoire du générateur: aucune copie Python du fichier PRN n'est faite
+        self.keep_prn_data = keep_prn_data or not send_to_laser
+        self._abort_requested = threading.Event()
+
+    def request_abort(self):
+        """Demande l'annulation. Appelable depuis n'importe quel thread (le worker est occupé dans run)."""
+        self._abort_requested.set()
+
+    def is_abort_requested(self) -> bool:
+        return self._abort_requested.is_set()
+
+    @pyqtSlot()
+    def run(self):
+        self.finished.emit(self.execute())
+
+    def execute(self) -> EpilogJobResult:
+        """Exécute le travail dans le thread courant et retourne son résultat (sans lever d'exception)."""
+        try:
+            return self._run_job()
+        except EpilogLibraryError as e:
+            logger.error(f"Bibliothèque Epilog indisponible: {e}")
+            return EpilogJobResult(False, "Bibliothèque Epilog indisponible", error=str(e))
+        except Exception as e:
+            logger.error(f"Erreur inattendue du travail Epilog: {e}", exc_info=True)
+            return EpilogJobResult(False, "Erreur inattendue", error=f"{type(e).__name__}: {e}")
+
+    def _run_job(self) -> EpilogJobResult:
+        machine = EPILOG_MODEL_TO_ENUM_MAP.get(self.machine_model_name.lower().replace(" ", ""))
+        if machine is None:
+            return EpilogJobResult(False, "Modèle de machine Epilog inconnu", error=self.machine_model_name)
+        settings_json_str = build_laser_settings_json(self.settings)
+        if settings_json_str is None:
+            return EpilogJobResult(False, "Erreur de sérialisation JSON")
+
+        prn_cache = PrnCache.get_instance() if self.use_cache else None
+        cache_key = PrnCache.cache_key(self.svg_content, settings_json_str, machine) if prn_cache else None
+        cached_prn_data = prn_cache.load(cache_key) if prn_cache else None
+        if cached_prn_data is not None:
+            self.progress.emit(1.0, STAGE_CACHE, 0, 0)
+            if self.is_abort_requested():
+                return EpilogJobResult(False, "Travail annulé", stage_name=STAGE_CACHE, aborted=True)
+            return self._deliver(machine, cached_prn_data, STAGE_CACHE, from_cache=True)
+
+        self.progress.emit(0.0, STAGE_CREATION, 0, 0)
+        with PrnGeneratorContext(self.svg_content, settings_json_str, machine) as gen_ptr:
+            if not gen_ptr:
+                return EpilogJobResult(False, "Échec création PrnGen", stage_name=STAGE_CREATION)
+            if supports_chunked_generation():
+                stage_name, error = self._run_generator_by_chunks(gen_ptr)
+                if error or self.is_abort_requested():
+                    result_buffer = PrnResultBuffer(None, error)
+                else:
+                    result_buffer = generation_result_buffer(gen_ptr)
+            else:
+                # Bibliothèque sans exécution par tranches: génération en un bloc (non annulable)
+                stage_name = "Génération"
+                result_buffer = run_generation_to_buffer(gen_ptr)
+            # Le résultat C reste en vie (et le générateur aussi) jusqu'à la fin de l'envoi
+            with result_buffer:
+                if self.is_abort_requested() or generation_was_aborted(gen_ptr):
+                    return EpilogJobResult(False, "Travail annulé", stage_name=stage_name, aborted=True)
+                if not result_buffer.ok:
+                    error = result_buffer.error or get_generator_error(gen_ptr)
+                    return EpilogJobResult(False, "Échec génération données PRN", stage_name=stage_name, error=error)
+                logger.info(f"Données PRN générées ({len(result_buffer)} octets) à l'étape '{stage_name}'.")
+                if prn_cache:
+                    prn_cache.store(cache_key, result_buffer.view)
+                return self._deliver(machine, result_buffer.view, stage_name)
+
+    def _deliver(self, machine, prn_data, stage_name: str, from_cache: bool = False) -> EpilogJobResult:
+        """Envoie le fichier PRN (bytes ou vue sur la mémoire du générateur) au laser."""
+        kept_data = (prn_data if isinstance(prn_data, bytes) else bytes(prn_data)) if self.keep_prn_data else None
+        if not self.send_to_laser:
+            return EpilogJobResult(True, "Fichier d'impression généré.", stage_name=stage_name,
+                                   prn_data=kept_data, from_cache=from_cache)
+
+        # L'envoi réseau n'est pas interruptible: l'annulation n'est plus prise en compte ensuite
+        self.progress.emit(1.0, STAGE_SENDING, 0, 0)
+        if send_print_data_to_laser(machine, prn_data, self.laser_ip_address):
+            return EpilogJobResult(True, "Données envoyées avec succès.", stage_name=STAGE_SENDING,
+                                   prn_data=kept_data, from_cache=from_cache)
+        return EpilogJobResult(False, "Échec de l'envoi au laser", stage_name=STAGE_SENDING,
+                               error=f"prn_gen_send_file a échoué pour {self.laser_ip_address}",
+                               prn_data=kept_data, from_cache=from_cache)
+
+    def _run_generator_by_chunks(self, gen_ptr):
+        """Boucle de génération: retourne (dernière étape, message d'erreur ou None)."""
+        stage_name = ""
+        abort_sent = False
+        last_emit = 0.0
+        while True:
+            if self.is_abort_requested() and not abort_sent:
+                logger.info("Annulation demandée: transmission au générateur PRN.")
+                request_generation_abort(gen_ptr)
+                abort_sent = True
+            try:
+                more_work = run_generation_chunk(gen_ptr)
+            except Exception as e:
+                logger.error(f"Erreur lors de l'exécution d'une tranche de génération PRN: {e}")
+                more_work = False
+            report = get_generation_progress(gen_ptr)
+            if report:
+                now = time.monotonic()
+                if report['stage_name'] != stage_name or now - last_emit >= PROGRESS_EMIT_INTERVAL or not more_work:
+                    stage_name = report['stage_name'] or stage_name
+                    last_emit = now
+                    self.progress.emit(report['total_progress'], stage_name,
+                                       report['stage_index'], report['stage_count'])
+            if not more_work:
+                break
+
+        return stage_name, get_generator_error(gen_ptr)
+
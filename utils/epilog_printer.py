@@ -10,14 +10,17 @@ from PyQt5.QtGui import QIcon
 
 # Importations depuis le wrapper C++
 from .epilog_cpp_wrapper import (
+    EpilogLibraryError,
     EpilogMachine, 
     PrnGeneratorContext, 
-    generate_print_file_data, # On pourrait l'appeler via le contexte mais direct c'est bien aussi
+    generator_error_string,
+    run_generation_to_buffer,
     send_print_data_to_laser,
     get_api_version as get_cpp_api_version, # Renommer pour éviter conflit si une autre func s'appelle pareil
-    prn_gen_error_string # Implied import for prn_gen_error_string
 )
 
+from .prn_cache import PrnCache
+
 logger = logging.getLogger(__name__)
 
 # Dictionnaire pour mapper les noms de modèles conviviaux aux enums EpilogMachine
@@ -80,24 +83,8 @@ def get_epilog_machine_enum(model_name_str: str) -> EpilogMachine | None:
 #         return "epilog-print-api-runner.exe"
 #     return "epilog-print-api-runner"
 
-def send_lamicoid_to_epilog(
-    svg_content: str,
-    machine_model_name: str, # ex: "fusionmaker24"
-    laser_ip_address: str,
-    material_thickness_mm: float | None = None, # Pourrait être utilisé dans le JSON à l'avenir
-    test_settings: dict | None = None # Pour passer des paramètres spécifiques pour le test
-):
-    logger.info(f"Début de send_lamicoid_to_epilog pour machine {machine_model_name} à {laser_ip_address}")
-    logger.debug(f"SVG reçu (premiers 200 chars): {svg_content[:200]}...")
-
-    epilog_machine_enum = EPILOG_MODEL_TO_ENUM_MAP.get(machine_model_name.lower().replace(" ", ""))
-    if epilog_machine_enum is None:
-        logger.error(f"Modèle de machine Epilog inconnu: {machine_model_name}")
-        # Afficher les clés disponibles pour aider au débogage
-        available_keys = ", ".join(EPILOG_MODEL_TO_ENUM_MAP.keys())
-        logger.error(f"Modèles connus (clés pour EPILOG_MODEL_TO_ENUM_MAP): {available_keys}")
-        return False, "Modèle de machine Epilog inconnu"
-
+def build_laser_settings_json(test_settings: dict | None = None) -> str | None:
+    """Construit le JSON de paramètres laser (valeurs par défaut surchargées par test_settings)."""
     # Configuration JSON avec le sous-objet cut_through_settings
     laser_settings_dict = {
         "job_name": "TestCercleEngrave",
@@ -134,8 +121,52 @@ def send_lamicoid_to_epilog(
         logger.debug(f"JSON de configuration généré (premiers 300 chars): {settings_json_str[:300]}...")
     except Exception as e:
         logger.error(f"Erreur lors de la sérialisation JSON des paramètres: {e}")
+        return None
+    return settings_json_str
+
+def send_lamicoid_to_epilog(
+    svg_content: str,
+    machine_model_name: str, # ex: "fusionmaker24"
+    laser_ip_address: str,
+    material_thickness_mm: float | None = None, # Pourrait être utilisé dans le JSON à l'avenir
+    test_settings: dict | None = None, # Pour passer des paramètres spécifiques pour le test
+    use_cache: bool = True # Réutiliser un fichier PRN déjà généré pour les mêmes SVG/paramètres/machine
+):
+    try:
+        return _send_lamicoid_to_epilog(svg_content, machine_model_name, laser_ip_address, test_settings, use_cache)
+    except EpilogLibraryError as e:
+        # Bibliothèque chargée au premier envoi: son absence est signalée ici, pas au démarrage
+        logger.error(f"Bibliothèque Epilog indisponible: {e}")
+        return False, f"Bibliothèque Epilog indisponible: {e}"
+
+def _send_lamicoid_to_epilog(svg_content: str, machine_model_name: str, laser_ip_address: str,
+                             test_settings: dict | None, use_cache: bool):
+    logger.info(f"Début de send_lamicoid_to_epilog pour machine {machine_model_name} à {laser_ip_address}")
+    logger.debug(f"SVG reçu (premiers 200 chars): {svg_content[:200]}...")
+
+    epilog_machine_enum = EPILOG_MODEL_TO_ENUM_MAP.get(machine_model_name.lower().replace(" ", ""))
+    if epilog_machine_enum is None:
+        logger.error(f"Modèle de machine Epilog inconnu: {machine_model_name}")
+        # Afficher les clés disponibles pour aider au débogage
+        available_keys = ", ".join(EPILOG_MODEL_TO_ENUM_MAP.keys())
+        logger.error(f"Modèles connus (clés pour EPILOG_MODEL_TO_ENUM_MAP): {available_keys}")
+        return False, "Modèle de machine Epilog inconnu"
+
+    settings_json_str = build_laser_settings_json(test_settings)
+    if settings_json_str is None:
         return False, "Erreur de sérialisation JSON"
 
+    prn_cache = PrnCache.get_instance() if use_cache else None
+    cache_key = PrnCache.cache_key(svg_content, settings_json_str, epilog_machine_enum) if prn_cache else None
+    cached_prn_data = prn_cache.load(cache_key) if prn_cache else None
+    if cached_prn_data is not None:
+        # Même SVG, mêmes paramètres, même machine: envoi direct sans régénérer
+        if send_print_data_to_laser(epilog_machine_enum, cached_prn_data, laser_ip_address):
+            logger.info("Données (depuis le cache PRN) envoyées avec succès au laser Epilog.")
+            return True, "Données envoyées avec succès."
+        logger.error("Échec de l'envoi au laser Epilog des données du cache PRN.")
+        return False, "Échec de l'envoi au laser"
+
     # Utilisation du gestionnaire de contexte pour PrnGen
     with PrnGeneratorContext(svg_content, settings_json_str, epilog_machine_enum) as gen_ptr:
         if not gen_ptr:
@@ -144,39 +175,35 @@ def send_lamicoid_to_epilog(
 
         logger.info(f"Générateur PrnGen créé: {gen_ptr}. Tentative de génération des données du fichier d'impression...")
         
-        # Étape 2: Générer les données du fichier d'impression.
-        print_file_data_bytes = generate_print_file_data(gen_ptr)
-
-        if print_file_data_bytes is None:
-            logger.error("Échec de la génération des données du fichier d'impression (print_file_data_bytes est None).")
-            # Essayer d'obtenir un message d'erreur de l'API si le gen_ptr est toujours considéré comme "bon"
-            if prn_gen_error_string and gen_ptr: # Vérifier si la fonction et le ptr sont valides
-                error_c_str = prn_gen_error_string(gen_ptr)
-                if error_c_str:
-                    error_message_from_api = error_c_str.decode('utf-8', errors='ignore')
-                    logger.error(f"  Message d'erreur de l'API (via prn_gen_error_string après échec de generate_print_file_data): '{error_message_from_api}'")
+        # Étape 2: Générer les données du fichier d'impression. Le résultat C est gardé en vie
+        # jusqu'à la fin de l'envoi: les octets sont envoyés (et mis en cache) sans copie.
+        with run_generation_to_buffer(gen_ptr) as result_buffer:
+            if not result_buffer.ok:
+                logger.error(f"Échec de la génération des données du fichier d'impression: {result_buffer.error}")
+                # Essayer d'obtenir un message d'erreur de l'API si le gen_ptr est toujours considéré comme "bon"
+                error_message_from_api = generator_error_string(gen_ptr)
+                if error_message_from_api:
+                    logger.error(f"  Message d'erreur de l'API (via prn_gen_error_string): '{error_message_from_api}'")
                     # La doc indique que la chaîne de prn_gen_error_string est possédée par le générateur.
                     return False, f"Échec génération données PRN: {error_message_from_api}"
-            return False, "Échec génération données PRN"
+                if result_buffer.error:
+                    return False, f"Échec génération données PRN: {result_buffer.error}"
+                return False, "Échec génération données PRN"
 
-        logger.info(f"Données du fichier d'impression générées avec succès ({len(print_file_data_bytes)} octets).")
-        if len(print_file_data_bytes) == 0:
-            logger.warning("Les données du fichier d'impression générées sont vides (0 octets). Le laser pourrait ne rien faire.")
-            # C'est un succès de génération, mais peut-être pas le résultat attendu. On continue l'envoi.
+            logger.info(f"Données du fichier d'impression générées avec succès ({len(result_buffer)} octets).")
+            if prn_cache:
+                prn_cache.store(cache_key, result_buffer.view)
 
-        # Étape 3: Envoyer les données au laser.
-        logger.info(f"Tentative d'envoi des données ({len(print_file_data_bytes)} octets) au laser {machine_model_name} à {laser_ip_address}...")
-        success_send = send_print_data_to_laser(epilog_machine_enum, print_file_data_bytes, laser_ip_address)
+            # Étape 3: Envoyer les données au laser.
+            logger.info(f"Tentative d'envoi des données ({len(result_buffer)} octets) au laser {machine_model_name} à {laser_ip_address}...")
+            success_send = send_print_data_to_laser(epilog_machine_enum, result_buffer.view, laser_ip_address)
 
         if success_send:
             logger.info("Données envoyées avec succès au laser Epilog.")
             return True, "Données envoyées avec succès."
         else:
             logger.error("Échec de l'envoi des données au laser Epilog.")
-            # Essayer d'obtenir un message d'erreur de l'API.
             # Note: prn_gen_send_file ne prend pas de PrnGen_p, donc on ne peut pas utiliser prn_gen_error_string ici.
-            # Il faudrait une fonction d'erreur globale ou spécifique à l'envoi si elle existe.
-            # Pour l'instant, on se contente du booléen de retour.
             return False, "Échec de l'envoi au laser"
 
     # Le PrnGen est automatiquement libéré ici grâce au __exit__ du PrnGeneratorContext
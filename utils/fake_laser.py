@@ -0,0 +1,121 @@
+"""
+Faux laser: écoute TCP locale qui reçoit des fichiers PRN comme le ferait une machine.
+
+Sert à essayer la file d'impression sans laser ni bibliothèque Epilog: configurer une
+machine avec "ip": "127.0.0.1", "port": <port du faux laser> et "simulation": true dans
+Preference.lasers. Le PRN n'est alors pas généré (simulated_print_data) et l'envoi se
+fait en TCP brut (voir utils.print_queue.send_prn_over_tcp). Les premières connexions
+peuvent être refusées volontairement pour exercer les nouveaux essais.
+
+Utilisation: python -m utils.fake_laser --port 9100 --output-dir prn_recus --fail-first 2
+"""
+
+import argparse
+import json
+import logging
+import socket
+import socketserver
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+RECEIVE_CHUNK_SIZE = 64 * 1024
+SIMULATED_PRN_HEADER = b"GDJ-SIMULATION\n"
+
+
+def simulated_print_data(svg_content: str, settings: dict) -> bytes:
+    """Contenu envoyé au faux laser à la place d'un PRN: en-tête, paramètres (JSON) puis SVG."""
+    return SIMULATED_PRN_HEADER + json.dumps(settings, sort_keys=True).encode('utf-8') + b"\n" + svg_content.encode('utf-8')
+
+
+class _FakeLaserHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        server: FakeLaserServer = self.server.fake_laser
+        if server._should_fail():
+            logger.info(f"Faux laser: connexion de {self.client_address[0]} refusée (échec simulé).")
+            # Fermeture immédiate avec RST (SO_LINGER à 0): l'envoi échoue côté client
+            # (fermée ici: socketserver enverrait sinon un FIN normal avant)
+            self.request.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+            self.request.close()
+            return
+        chunks = []
+        while True:
+            chunk = self.request.recv(RECEIVE_CHUNK_SIZE)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        server._record(b"".join(chunks))
+
+
+class FakeLaserServer:
+    """Serveur TCP local qui enregistre chaque fichier reçu (en mémoire et, au besoin, sur disque)."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, output_dir: Optional[str] = None,
+                 fail_first: int = 0):
+        self.output_dir = Path(output_dir) if output_dir else None
+        self.fail_first = fail_first
+        self.received = [] # Fichiers reçus (bytes), dans l'ordre
+        self._lock = threading.Lock()
+        self._connections = 0
+        self._server = socketserver.ThreadingTCPServer((host, port), _FakeLaserHandler)
+        self._server.daemon_threads = True
+        self._server.fake_laser = self
+        self._thread = None
+
+    @property
+    def address(self) -> tuple:
+        """(hôte, port) réellement écoutés (port 0 = port libre choisi par le système)."""
+        return self._server.server_address
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            self._connections += 1
+            return self._connections <= self.fail_first
+
+    def _record(self, data: bytes):
+        with self._lock:
+            self.received.append(data)
+            index = len(self.received)
+        logger.info(f"Faux laser: fichier n°{index} reçu ({len(data)} octets).")
+        if self.output_dir:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            (self.output_dir / f"travail_{index:04d}_{int(time.time())}.prn").write_bytes(data)
+
+    def start(self) -> 'FakeLaserServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, name="FakeLaser", daemon=True)
+        self._thread.start()
+        logger.info(f"Faux laser à l'écoute sur {self.address[0]}:{self.address[1]}.")
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> 'FakeLaserServer':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Faux laser Epilog (réception TCP de fichiers PRN).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--output-dir", default=None, help="Dossier où écrire les fichiers reçus")
+    parser.add_argument("--fail-first", type=int, default=0, help="Nombre de connexions à refuser au départ")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    server = FakeLaserServer(args.host, args.port, args.output_dir, args.fail_first).start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,198 @@
+"""
+Rendu SVG des feuilles de production Lamicoid v2 (FeuilleLamicoid).
+
+Chaque lamicoid positionné est dessiné à partir de son template: textes à graver
+(variables remplacées par Lamicoid.valeurs_variables, tracé bleu) et contour de
+découpe (aqua), comme generate_svg_for_epilog. Le rendu travaille sur des
+dictionnaires simples (donnees_feuille) pour que plusieurs feuilles puissent être
+rendues en parallèle dans un ProcessPoolExecutor (voir utils.batch_export).
+"""
+
+import logging
+import os
+import xml.sax.saxutils
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from models.documents.lamicoid_2.feuille_lamicoid import FeuilleLamicoid
+from models.documents.lamicoid_2.template_lamicoid import TemplateLamicoid
+from .epilog_converter_utils import points_to_mm
+
+logger = logging.getLogger('GDJ_App')
+
+# Drapeaux d'alignement horizontal de Qt (Qt.AlignLeft, Qt.AlignRight, Qt.AlignHCenter)
+ALIGN_RIGHT = 0x0002
+ALIGN_HCENTER = 0x0004
+LINE_HEIGHT_EM = 1.2
+MIN_FEUILLES_PARALLELE = 4 # En dessous, démarrer des processus coûte plus que le rendu lui-même
+
+
+def donnees_feuille(feuille: FeuilleLamicoid, templates: Dict[str, TemplateLamicoid]) -> dict:
+    """Description d'une feuille en types simples (transférable à un autre processus)."""
+    lamicoids = []
+    templates_utilises = {}
+    for positionne in feuille.lamicoids_sur_feuille:
+        template_id = positionne.lamicoid.template_id
+        template = templates.get(template_id)
+        if template is None:
+            logger.warning(f"Rendu SVG: template inconnu '{template_id}', lamicoid {positionne.lamicoid.instance_id} ignoré.")
+            continue
+        if template_id not in templates_utilises:
+            template_data = template.to_dict()
+            for element_data in template_data['elements']:
+                if 'align' in element_data:
+                    element_data['align'] = int(element_data['align']) # Drapeau Qt -> int
+            templates_utilises[template_id] = template_data
+        lamicoids.append({
+            "template_id": template_id,
+            "x_mm": positionne.position_x_mm,
+            "y_mm": positionne.position_y_mm,
+            "rotation_deg": positionne.rotation_deg,
+            "valeurs_variables": dict(positionne.lamicoid.valeurs_variables),
+        })
+    return {
+        "largeur_mm": feuille.largeur_feuille_mm,
+        "hauteur_mm": feuille.hauteur_feuille_mm,
+        "lamicoids": lamicoids,
+        "templates": templates_utilises,
+    }
+
+
+def _contour_decoupe(w: float, h: float, r: float) -> str:
+    if r > 0.01 and r * 2 <= min(w, h): # Coins arrondis
+        path_d = (
+            f"M {r:.3f},0 L {w-r:.3f},0 A {r:.3f},{r:.3f} 0 0 1 {w:.3f},{r:.3f} "
+            f"L {w:.3f},{h-r:.3f} A {r:.3f},{r:.3f} 0 0 1 {w-r:.3f},{h:.3f} "
+            f"L {r:.3f},{h:.3f} A {r:.3f},{r:.3f} 0 0 1 0,{h-r:.3f} "
+            f"L 0,{r:.3f} A {r:.3f},{r:.3f} 0 0 1 {r:.3f},0 Z"
+        )
+        return f'<path d="{path_d}" fill="none" stroke="aqua" stroke-width="0.1"/>'
+    return f'<rect x="0" y="0" width="{w:.3f}" height="{h:.3f}" fill="none" stroke="aqua" stroke-width="0.1"/>'
+
+
+def _svg_texte(element: dict, valeurs_variables: dict) -> List[str]:
+    contenu = element.get('contenu', "")
+    if element.get('est_variable') and element.get('nom_variable'):
+        contenu = valeurs_variables.get(element['nom_variable'], contenu)
+    lignes = [ligne.strip() for ligne in str(contenu).split('\n')]
+    lignes = [ligne for ligne in lignes if ligne]
+    if not lignes:
+        return []
+
+    x, y = element['x_mm'], element['y_mm']
+    largeur, hauteur = element['largeur_mm'], element['hauteur_mm']
+    taille_mm = points_to_mm(element.get('taille_police_pt', 12))
+    style = [f"font-size:{taille_mm:.3f}mm;",
+             f"font-family:'{xml.sax.saxutils.escape(element.get('nom_police', 'Arial'))}';"]
+    if element.get('bold'):
+        style.append("font-weight:bold;")
+    if element.get('italic'):
+        style.append("font-style:italic;")
+    if element.get('underline'):
+        style.append("text-decoration:underline;")
+    style.extend(["fill:none;", "stroke:blue;", "stroke-width:0.1;"]) # Styles pour la gravure
+    style_attr = " ".join(style)
+
+    align = int(element.get('align', ALIGN_HCENTER))
+    if align & ALIGN_HCENTER:
+        ancre, x_texte = "middle", x + largeur / 2.0
+    elif align & ALIGN_RIGHT:
+        ancre, x_texte = "end", x + largeur
+    else:
+        ancre, x_texte = "start", x
+    # Bloc de lignes centré verticalement dans la boîte de l'élément (comme Qt.AlignVCenter)
+    interligne = taille_mm * LINE_HEIGHT_EM
+    y_premiere = y + hauteur / 2.0 - (len(lignes) - 1) / 2.0 * interligne
+
+    parts = []
+    rotation = element.get('rotation', 0.0) or 0.0
+    if rotation:
+        parts.append(f'<g transform="rotate({rotation:.3f} {x + largeur / 2.0:.3f} {y + hauteur / 2.0:.3f})">')
+    for i, ligne in enumerate(lignes):
+        parts.append(f'<text x="{x_texte:.3f}" y="{y_premiere + i * interligne:.3f}" text-anchor="{ancre}" '
+                     f'dominant-baseline="middle" style="{style_attr}">{xml.sax.saxutils.escape(ligne)}</text>')
+    if rotation:
+        parts.append('</g>')
+    return parts
+
+
+def _svg_image(element: dict) -> List[str]:
+    chemin = element.get('chemin_fichier')
+    if not chemin or not os.path.isabs(chemin):
+        return []
+    href = xml.sax.saxutils.quoteattr(Path(chemin).as_uri())
+    x, y = element['x_mm'], element['y_mm']
+    largeur, hauteur = element['largeur_mm'], element['hauteur_mm']
+    image = (f'<image x="{x:.3f}" y="{y:.3f}" width="{largeur:.3f}" height="{hauteur:.3f}" '
+             f'preserveAspectRatio="xMidYMid meet" href={href}/>')
+    rotation = element.get('rotation', 0.0) or 0.0
+    if rotation:
+        return [f'<g transform="rotate({rotation:.3f} {x + largeur / 2.0:.3f} {y + hauteur / 2.0:.3f})">', image, '</g>']
+    return [image]
+
+
+def generer_svg_feuille(donnees: dict) -> str:
+    """SVG (unités en mm) d'une feuille décrite par donnees_feuille."""
+    largeur, hauteur = donnees['largeur_mm'], donnees['hauteur_mm']
+    svg_parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{largeur}mm" height="{hauteur}mm" '
+        f'version="1.1" viewBox="0 0 {largeur} {hauteur}">'
+    ]
+    for index, lamicoid in enumerate(donnees['lamicoids']):
+        template = donnees['templates'][lamicoid['template_id']]
+        w, h = template['largeur_mm'], template['hauteur_mm']
+        # Un quart de tour horaire conserve le coin sup. gauche de l'encombrement (voir FeuilleLamicoidView)
+        if lamicoid['rotation_deg'] % 360 == 90:
+            transform = f"translate({lamicoid['x_mm'] + h:.3f} {lamicoid['y_mm']:.3f}) rotate(90)"
+        else:
+            transform = f"translate({lamicoid['x_mm']:.3f} {lamicoid['y_mm']:.3f})"
+        svg_parts.append(f'  <g id="Lamicoid{index + 1}" transform="{transform}">')
+        for element in template['elements']:
+            if element.get('type') == "texte":
+                element_parts = _svg_texte(element, lamicoid['valeurs_variables'])
+            elif element.get('type') == "image":
+                element_parts = _svg_image(element)
+            else:
+                element_parts = []
+            svg_parts.extend(f"    {part}" for part in element_parts)
+        svg_parts.append(f"    {_contour_decoupe(w, h, template.get('rayon_coin_mm', 0.0))}")
+        svg_parts.append("  </g>")
+    svg_parts.append("</svg>")
+    return "\n".join(svg_parts)
+
+
+def feuille_vers_svg(feuille: FeuilleLamicoid, templates: Dict[str, TemplateLamicoid]) -> str:
+    """SVG d'une feuille de production."""
+    return generer_svg_feuille(donnees_feuille(feuille, templates))
+
+
+def rendre_feuilles_svg(feuilles: List[FeuilleLamicoid], templates: Dict[str, TemplateLamicoid],
+                        max_workers: Optional[int] = None) -> List[str]:
+    """
+    SVG de chaque feuille, dans l'ordre. Les feuilles sont rendues en parallèle sur plusieurs
+    processus quand il y en a assez pour que cela vaille le coût de démarrage des processus.
+    """
+    payloads = [donnees_feuille(feuille, templates) for feuille in feuilles]
+    workers = max(1, min(max_workers or os.cpu_count() or 1, len(payloads)))
+    if workers > 1 and len(payloads) >= MIN_FEUILLES_PARALLELE:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                return list(executor.map(generer_svg_feuille, payloads))
+        except Exception as e: # Processus interrompu, environnement sans multiprocessing, etc.
+            logger.warning(f"Rendu SVG parallèle impossible ({type(e).__name__}: {e}), rendu séquentiel.")
+    return [generer_svg_feuille(payload) for payload in payloads]
+
+
+def exporter_feuilles_svg(feuilles: List[FeuilleLamicoid], templates: Dict[str, TemplateLamicoid],
+                          dossier: str, nom_base: str = "feuille", max_workers: Optional[int] = None) -> List[str]:
+    """Écrit un fichier SVG par feuille dans 'dossier' et retourne leurs chemins."""
+    destination = Path(dossier)
+    destination.mkdir(parents=True, exist_ok=True)
+    chemins = []
+    for index, svg in enumerate(rendre_feuilles_svg(feuilles, templates, max_workers), start=1):
+        chemin = destination / f"{nom_base}_{index:02d}.svg"
+        chemin.write_text(svg, encoding='utf-8')
+        chemins.append(str(chemin))
+    logger.info(f"{len(chemins)} feuille(s) SVG exportée(s) dans {destination}.")
+    return chemins
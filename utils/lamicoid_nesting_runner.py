@@ -0,0 +1,91 @@
+"""
+Import d'un tableur de lamicoids et imbrication sur les feuilles hors du thread de l'interface.
+
+Avec un gros tableur, la lecture du fichier et l'imbrication (MaxRects, plusieurs ordres
+essayés) prennent plusieurs secondes: elles sont faites dans un QThread et seul le résultat
+(feuilles remplies) est appliqué à la page dans le thread GUI, où les éléments graphiques
+des feuilles doivent être créés.
+"""
+
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
+
+from models.documents.lamicoid_2.feuille_lamicoid import FeuilleLamicoid
+from models.documents.lamicoid_2.import_donnees import (
+    ErreurImportLamicoids,
+    ResultatImportLamicoids,
+    importer_lamicoids,
+)
+from models.documents.lamicoid_2.lamicoid import Lamicoid
+from models.documents.lamicoid_2.nesting import ResultatImbrication, imbriquer_lamicoids
+from models.documents.lamicoid_2.template_lamicoid import TemplateLamicoid
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LamicoidNestingResult:
+    """Issue d'un import de tableur et/ou d'une imbrication."""
+    lamicoids: List[Lamicoid] = field(default_factory=list) # Tous les lamicoids imbriqués
+    feuilles: List[FeuilleLamicoid] = field(default_factory=list)
+    nesting: Optional[ResultatImbrication] = None # None si rien n'a été imbriqué
+    import_result: Optional[ResultatImportLamicoids] = None # None sans tableur
+    error: Optional[str] = None
+    aborted: bool = False
+
+
+class LamicoidNestingWorker(QObject):
+    """
+    Importe éventuellement un tableur (avec le template donné) puis imbrique les lamicoids
+    existants et importés sur des feuilles au format de feuille_modele.
+    """
+    finished = pyqtSignal(object) # LamicoidNestingResult
+
+    def __init__(self, lamicoids: List[Lamicoid], templates: Dict[str, TemplateLamicoid],
+                 feuille_modele: FeuilleLamicoid, spreadsheet_path: Optional[str] = None,
+                 template: Optional[TemplateLamicoid] = None):
+        super().__init__()
+        self.lamicoids = list(lamicoids)
+        self.templates = dict(templates) # Copie: la page peut modifier les siens pendant le travail
+        if template is not None:
+            self.templates[template.template_id] = template
+        self.feuille_modele = feuille_modele
+        self.spreadsheet_path = spreadsheet_path
+        self.template = template
+        self._abort_requested = threading.Event()
+
+    def request_abort(self):
+        """Demande l'annulation (prise en compte entre l'import et l'imbrication)."""
+        self._abort_requested.set()
+
+    @pyqtSlot()
+    def run(self):
+        self.finished.emit(self.execute())
+
+    def execute(self) -> LamicoidNestingResult:
+        """Exécute le travail dans le thread courant et retourne son résultat (sans lever d'exception)."""
+        result = LamicoidNestingResult(lamicoids=self.lamicoids)
+        try:
+            if self.spreadsheet_path is not None:
+                result.import_result = importer_lamicoids(self.spreadsheet_path, self.template)
+                result.lamicoids = self.lamicoids + result.import_result.lamicoids
+                if not result.import_result.lamicoids:
+                    return result
+            if self._abort_requested.is_set():
+                result.aborted = True
+                return result
+            result.feuilles, result.nesting = imbriquer_lamicoids(result.lamicoids, self.templates,
+                                                                  self.feuille_modele)
+        except (ErreurImportLamicoids, OSError) as e:
+            logger.error(f"Import du tableur '{self.spreadsheet_path}' impossible: {e}")
+            result.error = str(e)
+        except Exception as e:
+            logger.error(f"Erreur inattendue lors de l'imbrication: {e}", exc_info=True)
+            result.error = f"{type(e).__name__}: {e}"
+        if self._abort_requested.is_set() and result.error is None:
+            result.aborted = True
+        return result
@@ -3,6 +3,8 @@ from PyQt5.QtGui import QFont, QPainterPath, QTransform, QFontMetricsF
 from PyQt5.QtCore import Qt, QPointF, QRectF
 import xml.sax.saxutils
 
+import numpy as np
+
 from .epilog_converter_utils import mm_to_pixels, pixels_to_mm, points_to_mm
 
 logger = logging.getLogger(__name__)
@@ -19,44 +21,277 @@ logger = logging.getLogger(__name__)
 # # À ENLEVER QUAND DÉPLACÉ -> C'est fait, on peut supprimer ces lignes commentées.
 
 
+def _format_svg_number(thousandths: int) -> str:
+    """Formate une valeur exprimée en millièmes au plus court ('1.5', '-.25', '3')."""
+    sign = "-" if thousandths < 0 else ""
+    integer, fraction = divmod(abs(int(thousandths)), 1000)
+    if not fraction:
+        return f"{sign}{integer}"
+    fraction_str = f"{fraction:03d}".rstrip("0")
+    return f"{sign}{integer}.{fraction_str}" if integer else f"{sign}.{fraction_str}"
+
+
+def _format_svg_pair(delta) -> str:
+    return f"{_format_svg_number(delta[0])} {_format_svg_number(delta[1])}"
+
+
+def _path_elements(path: QPainterPath):
+    """Retourne (types, points Nx2) des éléments du chemin, lus via elementAt."""
+    count = path.elementCount()
+    types = np.empty(count, dtype=np.int8)
+    points = np.empty((count, 2), dtype=np.float64)
+    for index in range(count):
+        element = path.elementAt(index)
+        types[index] = element.type
+        points[index, 0] = element.x
+        points[index, 1] = element.y
+    return types, points
+
+
+def _linear_part(transform: QTransform) -> np.ndarray:
+    return np.array([[transform.m11(), transform.m12()],
+                     [transform.m21(), transform.m22()]])
+
+
+def _to_thousandths(points: np.ndarray, transform: QTransform) -> np.ndarray:
+    """Applique la transformation affine en bloc et arrondit les coordonnées au millième (entiers)."""
+    mapped = points @ _linear_part(transform) + (transform.dx(), transform.dy())
+    return np.rint(mapped * 1000.0).astype(np.int64)
+
+
+def _serialize_path_elements(types: np.ndarray, absolute: np.ndarray, current) -> tuple:
+    """
+    Écrit les éléments d'un chemin en commandes SVG relatives ('m', 'l', 'c', 'z').
+    'absolute' contient les points en millièmes entiers, 'current' le point courant de départ.
+    Retourne (liste des fragments, point courant final).
+    """
+    parts = []
+    command = ""
+    current = np.asarray(current, dtype=np.int64)
+    subpath_start = current
+    count = len(types)
+    index = 0
+    while index < count:
+        element_type = types[index]
+        if element_type == QPainterPath.MoveToElement:
+            parts.append("m" + _format_svg_pair(absolute[index] - current))
+            command = "m"
+            current = subpath_start = absolute[index]
+            index += 1
+        elif element_type == QPainterPath.CurveToElement and index + 2 < count:
+            # Les deux points de contrôle et le point final sont relatifs au point courant
+            values = (absolute[index:index + 3] - current).ravel()
+            numbers = " ".join(_format_svg_number(value) for value in values)
+            parts.append(numbers if command == "c" else "c" + numbers)
+            command = "c"
+            current = absolute[index + 2]
+            index += 3
+        else:
+            ends_subpath = index + 1 == count or types[index + 1] == QPainterPath.MoveToElement
+            if ends_subpath and np.array_equal(absolute[index], subpath_start):
+                parts.append("z") # Retour au début du sous-chemin (fermeture, même de longueur nulle)
+                command = "z"
+            else:
+                pair = _format_svg_pair(absolute[index] - current)
+                parts.append(pair if command == "l" else "l" + pair)
+                command = "l"
+            current = absolute[index]
+            index += 1
+    return parts, current
+
+
+def _join_svg_path_parts(parts) -> str:
+    # Un signe moins sépare déjà deux nombres: l'espace qui le précède est superflu
+    return " ".join(parts).replace(" -", "-")
+
+
+class FontGlyphs:
+    """
+    Contours et avances des glyphes d'une police, calculés une seule fois par caractère.
+    Une ligne est composée en translatant les contours en cache; l'approche (crénage)
+    de chaque paire de caractères est mesurée une fois et mise en cache elle aussi.
+    """
+
+    def __init__(self, font: QFont):
+        self.font = font
+        self.metrics = QFontMetricsF(font)
+        self._glyphs = {} # caractère -> (QPainterPath à l'origine de la ligne de base, avance)
+        self._kerning = {} # (caractère, caractère suivant) -> ajustement en pixels
+        self._svg_fragments = {} # (caractère, partie linéaire de la transformation) -> fragment SVG
+
+    def glyph(self, char: str):
+        entry = self._glyphs.get(char)
+        if entry is None:
+            path = QPainterPath()
+            path.addText(QPointF(0.0, 0.0), self.font, char)
+            entry = (path, self.metrics.horizontalAdvance(char))
+            self._glyphs[char] = entry
+        return entry
+
+    def kerning(self, char: str, next_char: str) -> float:
+        pair = (char, next_char)
+        adjustment = self._kerning.get(pair)
+        if adjustment is None:
+            adjustment = (self.metrics.horizontalAdvance(char + next_char)
+                          - self.glyph(char)[1] - self.glyph(next_char)[1])
+            if abs(adjustment) < 1e-6:
+                adjustment = 0.0
+            self._kerning[pair] = adjustment
+        return adjustment
+
+    def layout(self, text: str):
+        """Retourne ([(caractère, x)], largeur totale) pour une ligne, x relatif au début de la ligne."""
+        positions = []
+        x = 0.0
+        for index, char in enumerate(text):
+            positions.append((char, x))
+            x += self.glyph(char)[1]
+            if index + 1 < len(text):
+                x += self.kerning(char, text[index + 1])
+        return positions, x
+
+    def line_path(self, text: str, origin: QPointF) -> QPainterPath:
+        """Compose le contour d'une ligne dont la ligne de base commence à 'origin'."""
+        line_path = QPainterPath()
+        positions, _width = self.layout(text)
+        for char, x in positions:
+            glyph_path = self.glyph(char)[0]
+            if not glyph_path.isEmpty():
+                line_path.addPath(glyph_path.translated(origin.x() + x, origin.y()))
+        return line_path
+
+    def _svg_fragment(self, char: str, transform: QTransform):
+        """
+        Glyphe sérialisé pour la partie linéaire de 'transform', relatif à son origine:
+        (premier point, commandes suivant le premier 'm', point courant final), en millièmes.
+        None si le glyphe n'a pas de contour (espace).
+        """
+        key = (char, transform.m11(), transform.m12(), transform.m21(), transform.m22())
+        if key in self._svg_fragments:
+            return self._svg_fragments[key]
+        fragment = None
+        path = self.glyph(char)[0]
+        if not path.isEmpty():
+            types, points = _path_elements(path)
+            linear = QTransform(transform.m11(), transform.m12(), transform.m21(), transform.m22(), 0.0, 0.0)
+            absolute = _to_thousandths(points, linear)
+            parts, end = _serialize_path_elements(types, absolute, (0, 0))
+            # Le premier 'm' dépend du point courant au moment de la composition: il est recalculé
+            fragment = (absolute[0], parts[1:], end) if types[0] == QPainterPath.MoveToElement else None
+            if fragment is None:
+                logger.debug(f"Glyphe '{char}' sans MoveTo initial, conversion générique.")
+        self._svg_fragments[key] = fragment
+        return fragment
+
+    def line_svg_path_data(self, text: str, origin: QPointF, transform: QTransform) -> str:
+        """
+        Données de chemin SVG d'une ligne (équivalent à qpainterpath_to_svg_path_data(line_path(...))).
+        Chaque glyphe n'est sérialisé qu'une fois par transformation; l'origine de chaque glyphe
+        est arrondie au millième d'unité SVG, ce qui rend ses commandes relatives réutilisables.
+        """
+        if not transform.isAffine():
+            return qpainterpath_to_svg_path_data(self.line_path(text, origin), transform)
+        positions, _width = self.layout(text)
+        parts = []
+        current = np.zeros(2, dtype=np.int64)
+        for char, x in positions:
+            fragment = self._svg_fragment(char, transform)
+            if fragment is None:
+                glyph_path = self.glyph(char)[0]
+                if glyph_path.isEmpty():
+                    continue
+                # Repli: glyphe atypique converti directement
+                types, points = _path_elements(glyph_path.translated(origin.x() + x, origin.y()))
+                glyph_parts, current = _serialize_path_elements(types, _to_thousandths(points, transform), current)
+                parts.extend(glyph_parts)
+                continue
+            first, body, end = fragment
+            glyph_origin = transform.map(QPointF(origin.x() + x, origin.y()))
+            offset = np.array([round(glyph_origin.x() * 1000.0), round(glyph_origin.y() * 1000.0)], dtype=np.int64)
+            parts.append("m" + _format_svg_pair(offset + first - current))
+            parts.extend(body)
+            current = offset + end
+        return _join_svg_path_parts(parts)
+
+
+class GlyphOutlineCache:
+    """Cache des FontGlyphs par (famille, taille, gras, italique), partagé entre les générations."""
+
+    _instance = None
+
+    def __init__(self):
+        self._fonts = {}
+
+    @classmethod
+    def get_instance(cls) -> 'GlyphOutlineCache':
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def font_glyphs(self, family: str, size_pt: float, bold: bool, italic: bool) -> FontGlyphs:
+        key = (family, float(size_pt), bool(bold), bool(italic))
+        glyphs = self._fonts.get(key)
+        if glyphs is None:
+            font = QFont(family, -1)
+            font.setPointSizeF(float(size_pt))
+            font.setBold(bool(bold))
+            font.setItalic(bool(italic))
+            glyphs = FontGlyphs(font)
+            self._fonts[key] = glyphs
+        return glyphs
+
+    def clear(self):
+        self._fonts.clear()
+
+
 def qpainterpath_to_svg_path_data(path: QPainterPath, transform: QTransform = QTransform()) -> str:
     """
     Convertit un QPainterPath en une chaîne de données de chemin SVG (attribut 'd').
     Applique une transformation optionnelle au chemin avant la conversion.
     Les coordonnées dans le QPainterPath SONT CENSÉES ÊTRE EN PIXELS QT.
     La transformation fournie doit les convertir en unités SVG finales (mm).
+
+    Les éléments du chemin sont parcourus directement: les courbes de Bézier cubiques
+    restent des commandes 'c' (au lieu d'être aplaties en segments) et la transformation
+    affine est appliquée en bloc. Les coordonnées sont relatives, arrondies au millième
+    et écrites sous forme compacte.
     """
-    svg_path_parts = []
-    # Obtenir les polygones SANS appliquer la transformation ici.
-    polygons_orig = path.toSubpathPolygons() 
-    logger.debug(f"Path original ({path}) converti en {len(polygons_orig)} polygone(s) avant transformation explicite.")
+    if path.isEmpty():
+        return ""
+    if not transform.isAffine():
+        # Une projection ne conserve pas les courbes de Bézier: aplatir en polygones
+        return _qpainterpath_to_svg_polygon_data(path, transform)
+    types, points = _path_elements(path)
+    parts, _current = _serialize_path_elements(types, _to_thousandths(points, transform), (0, 0))
+    return _join_svg_path_parts(parts)
+
+
+def svg_path_data_from_elements(types, points) -> str:
+    """
+    Écrit des éléments de chemin (types QPainterPath.ElementType, points Nx2 déjà en unités
+    SVG finales) avec le même format compact que qpainterpath_to_svg_path_data.
+    """
+    if len(types) == 0:
+        return ""
+    absolute = np.rint(np.asarray(points, dtype=np.float64) * 1000.0).astype(np.int64)
+    parts, _current = _serialize_path_elements(np.asarray(types, dtype=np.int8), absolute, (0, 0))
+    return _join_svg_path_parts(parts)
+
 
-    for i, polygon_orig in enumerate(polygons_orig):
-        logger.debug(f"  Polygone original #{i}: {polygon_orig}")
+def _qpainterpath_to_svg_polygon_data(path: QPainterPath, transform: QTransform) -> str:
+    """Conversion par polygones (courbes aplaties), pour les transformations non affines."""
+    svg_path_parts = []
+    for polygon_orig in path.toSubpathPolygons():
         if polygon_orig.isEmpty():
-            logger.debug(f"    Polygone original #{i} est vide, ignoré.")
             continue
-        
-        # Transformer le polygone point par point
         polygon_transformed = transform.map(polygon_orig)
-
         if polygon_transformed.isEmpty():
-            logger.debug(f"    Polygone #{i} transformé est vide, ignoré.")
             continue
-
-        # Log du premier point avant et après transformation pour diagnostic
-        if i == 0 and not polygon_orig.isEmpty():
-            orig_pt = polygon_orig.at(0)
-            trans_pt = polygon_transformed.at(0)
-            logger.debug(f"    Polygone #0, Point #0: Orig({orig_pt.x():.3f}, {orig_pt.y():.3f})px -> Transformed({trans_pt.x():.3f}, {trans_pt.y():.3f})mm")
-
         start_point_transformed = polygon_transformed.at(0)
         svg_path_parts.append(f"M {start_point_transformed.x():.3f} {start_point_transformed.y():.3f}")
-        
         for j in range(1, polygon_transformed.size()):
             point_transformed = polygon_transformed.at(j)
             svg_path_parts.append(f"L {point_transformed.x():.3f} {point_transformed.y():.3f}")
-        
     return " ".join(svg_path_parts)
 
 
@@ -82,6 +317,7 @@ def generate_svg_with_text_as_paths(lamicoid_params: dict, editor_items: list) -
     # Conversion des dimensions du lamicoid en pixels (utilisé pour positionner les items)
     lamicoid_width_px = mm_to_pixels(lamicoid_width_mm)
     lamicoid_height_px = mm_to_pixels(lamicoid_height_mm)
+    glyph_cache = GlyphOutlineCache.get_instance()
 
     for item_data in editor_items:
         item_subtype = item_data.get('item_subtype')
@@ -114,12 +350,9 @@ def generate_svg_with_text_as_paths(lamicoid_params: dict, editor_items: list) -
             item_rect_scene = QRectF(item_pos_x_scene_px, item_pos_y_scene_px,
                                      item_width_scene_px, item_height_scene_px)
 
-            font = QFont(font_family, -1)
-            font.setPointSizeF(float(font_size_pt))
-            font.setBold(is_bold)
-            font.setItalic(is_italic)
-
-            fm = QFontMetricsF(font)
+            font_glyphs = glyph_cache.font_glyphs(font_family, font_size_pt, is_bold, is_italic)
+            font = font_glyphs.font
+            fm = font_glyphs.metrics
             actual_line_spacing_px = fm.lineSpacing()
 
             num_lines = len(text_lines) # Définition de num_lines ICI
@@ -142,7 +375,7 @@ def generate_svg_with_text_as_paths(lamicoid_params: dict, editor_items: list) -
             # La boucle for i, line_text ... reste structurellement la même mais utilise les variables ci-dessus
             for i, line_text in enumerate(text_lines):
                 current_line_baseline_y_px = first_line_baseline_y_px + (i * actual_line_spacing_px)
-                line_width_px = fm.horizontalAdvance(line_text)
+                _positions, line_width_px = font_glyphs.layout(line_text)
                 
                 current_line_start_x_px = item_rect_scene.x()
                 if qt_alignment & Qt.AlignHCenter:
@@ -152,9 +385,6 @@ def generate_svg_with_text_as_paths(lamicoid_params: dict, editor_items: list) -
                 
                 logger.debug(f"    Ligne {i}: '{line_text}', width={line_width_px:.2f}px, baseline_x={current_line_start_x_px:.2f}px, baseline_y={current_line_baseline_y_px:.2f}px")
 
-                line_path = QPainterPath()
-                line_path.addText(QPointF(current_line_start_x_px, current_line_baseline_y_px), font, line_text)
-                
                 transform_scene_to_svg = QTransform()
                 
                 # 1. Mise à l'échelle de pixels vers mm
@@ -170,8 +400,10 @@ def generate_svg_with_text_as_paths(lamicoid_params: dict, editor_items: list) -
                 # produiront le bon décalage en mm.
                 transform_scene_to_svg.translate(lamicoid_width_px / 2.0, lamicoid_height_px / 2.0)
                                 
-                svg_d_attribute = qpainterpath_to_svg_path_data(line_path, transform_scene_to_svg)
-                logger.debug(f"    Ligne '{line_text}': svg_d_attribute généré: '{svg_d_attribute}'")
+                svg_d_attribute = font_glyphs.line_svg_path_data(
+                    line_text, QPointF(current_line_start_x_px, current_line_baseline_y_px), transform_scene_to_svg)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"    Ligne '{line_text}': svg_d_attribute généré: '{svg_d_attribute}'")
 
                 if svg_d_attribute:
                     style_attr = "fill:none; stroke:blue; stroke-width:0.1mm;"
@@ -199,5 +431,6 @@ def generate_svg_with_text_as_paths(lamicoid_params: dict, editor_items: list) -
     svg_parts.append("</svg>")
     
     final_svg = "\n".join(svg_parts)
-    logger.debug(f"SVG (texte en chemins) généré:\n{final_svg}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"SVG (texte en chemins) généré:\n{final_svg}")
     return final_svg 
\ No newline at end of file
@@ -0,0 +1,75 @@
+"""
+Imports différés des modules lourds (PyMuPDF, visionneuse de médias, etc.).
+
+lazy_import('fitz') retourne un module mandataire: le vrai module n'est importé qu'au
+premier accès à un de ses attributs (fitz.open(...)), et non au chargement du module qui
+le déclare. Le démarrage de l'application ne paie donc que pour ce qu'il utilise.
+module_available() remplace le motif 'try: import x / except ImportError' pour savoir si
+un module optionnel est installé sans l'importer.
+"""
+
+import importlib
+import importlib.util
+import logging
+import threading
+import types
+
+logger = logging.getLogger('GDJ_App')
+
+
+class LazyModule(types.ModuleType):
+    """Mandataire d'un module importé au premier accès à un attribut (thread-safe)."""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__['_lazy_module'] = None
+        self.__dict__['_lazy_lock'] = threading.Lock()
+
+    def _load(self) -> types.ModuleType:
+        module = self.__dict__['_lazy_module']
+        if module is None:
+            with self.__dict__['_lazy_lock']:
+                module = self.__dict__['_lazy_module']
+                if module is None:
+                    logger.debug(f"Import différé de '{self.__name__}' au premier usage.")
+                    module = importlib.import_module(self.__name__)
+                    self.__dict__['_lazy_module'] = module
+        return module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "chargé" if self.__dict__['_lazy_module'] is not None else "non chargé"
+        return f"<module différé '{self.__name__}' ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Module 'name' importé au premier accès à un de ses attributs."""
+    return LazyModule(name)
+
+
+def lazy_attribute(module_name: str, attr: str):
+    """
+    Fonction ou classe importée au premier appel: remplace 'from module import attr' pour
+    un attribut appelable (la signature est celle de l'attribut réel).
+    """
+    module = lazy_import(module_name)
+
+    def _call(*args, **kwargs):
+        return getattr(module, attr)(*args, **kwargs)
+
+    _call.__name__ = _call.__qualname__ = attr
+    _call.__doc__ = f"Appel différé de {module_name}.{attr}."
+    return _call
+
+
+def module_available(name: str) -> bool:
+    """True si le module est installé, sans l'importer (seuls ses paquets parents le sont)."""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
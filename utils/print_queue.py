@@ -0,0 +1,441 @@
+"""
+File d'impression Epilog persistante, partagée entre plusieurs lasers.
+
+Chaque travail (SVG + paramètres laser) est destiné à une machine configurée dans les
+préférences (Preference.lasers). Pour chaque machine, deux QThread forment un pipeline:
+
+    - génération: prend le prochain travail dû (priorité la plus haute, puis le plus
+      ancien) et produit le fichier PRN (EpilogJobWorker, avec le cache PRN);
+    - envoi: transmet le PRN au laser pendant que la génération prépare déjà le
+      travail suivant (un seul travail prêt en attente entre les deux étapes).
+
+Un envoi qui échoue est replanifié avec un délai exponentiel; le PRN est alors repris
+du cache. L'état de la file est enregistré (JSON) à chaque changement dans le dossier
+utilisateur 'PrintQueue' et rechargé au démarrage: les travaux interrompus repartent
+en attente.
+"""
+
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field, fields, replace
+from pathlib import Path
+from typing import Optional
+
+from PyQt5.QtCore import QCoreApplication, QObject, QThread, pyqtSignal, pyqtSlot
+
+from models.preference import Preference
+from utils.epilog_cpp_wrapper import EpilogLibraryError, send_print_data_to_laser
+from utils.epilog_job_runner import EpilogJobWorker
+from utils.epilog_printer import get_epilog_machine_enum
+from utils.fake_laser import simulated_print_data
+from utils.paths import get_user_data_path
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = "en_attente"
+STATUS_GENERATING = "generation"
+STATUS_READY = "pret" # PRN généré, en attente de l'étape d'envoi
+STATUS_SENDING = "envoi"
+STATUS_DONE = "termine"
+STATUS_FAILED = "echec"
+STATUS_CANCELLED = "annule"
+ACTIVE_STATUSES = (STATUS_GENERATING, STATUS_READY, STATUS_SENDING)
+FINAL_STATUSES = (STATUS_DONE, STATUS_FAILED, STATUS_CANCELLED)
+
+PRIORITY_NORMAL = 0
+PRIORITY_HIGH = 10
+
+MAX_SEND_ATTEMPTS = 5
+RETRY_BASE_DELAY = 5.0 # Secondes avant le premier nouvel essai (doublé ensuite)
+RETRY_MAX_DELAY = 300.0
+MAX_FINISHED_JOBS = 100 # Historique gardé dans le fichier d'état
+WAIT_POLL_INTERVAL = 1.0 # Les travailleurs vérifient l'arrêt au moins à cet intervalle
+RAW_TCP_TIMEOUT = 30.0
+STATE_FILENAME = "print_queue.json"
+
+
+@dataclass
+class LaserMachine:
+    """
+    Laser configuré: modèle Epilog et adresse (port: envoi TCP brut au lieu de l'API).
+    simulation: faux laser (utils.fake_laser), le PRN n'est pas généré par la bibliothèque Epilog.
+    """
+    nom: str
+    modele: str
+    ip: str
+    port: Optional[int] = None
+    simulation: bool = False
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'LaserMachine':
+        port = data.get('port')
+        return cls(nom=str(data['nom']), modele=str(data.get('modele', '')), ip=str(data['ip']),
+                   port=int(port) if port else None, simulation=bool(data.get('simulation', False)))
+
+
+def configured_lasers() -> list:
+    """Retourne les LaserMachine définies dans les préférences."""
+    machines = []
+    for data in Preference.get_instance().lasers.machines:
+        try:
+            machines.append(LaserMachine.from_dict(data))
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Configuration de laser ignorée ({data}): {e}")
+    return machines
+
+
+@dataclass
+class PrintJob:
+    """Travail de la file d'impression (copie: les modifications passent par PrintQueue)."""
+    machine: str # LaserMachine.nom
+    svg_content: str
+    settings: dict
+    titre: str = ""
+    priorite: int = PRIORITY_NORMAL
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    statut: str = STATUS_PENDING
+    cree_le: float = field(default_factory=time.time)
+    tentatives: int = 0 # Envois échoués
+    prochain_essai: float = 0.0 # time.time() avant lequel le travail n'est pas repris
+    derniere_erreur: Optional[str] = None
+    termine_le: Optional[float] = None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'PrintJob':
+        known = {f.name for f in fields(cls)}
+        return cls(**{key: value for key, value in data.items() if key in known})
+
+
+def retry_delay(attempts: int) -> float:
+    """Délai avant le nouvel essai qui suit le n-ième envoi échoué."""
+    return min(RETRY_BASE_DELAY * (2 ** max(attempts - 1, 0)), RETRY_MAX_DELAY)
+
+
+def send_prn_over_tcp(host: str, port: int, print_data, timeout: float = RAW_TCP_TIMEOUT) -> bool:
+    """Envoie un fichier PRN tel quel sur une connexion TCP (ex: utils.fake_laser)."""
+    try:
+        with socket.create_connection((host, port), timeout=timeout) as sock:
+            sock.sendall(print_data)
+            sock.shutdown(socket.SHUT_WR)
+            sock.recv(1) # Attendre que le laser ferme la connexion (réception complète)
+        return True
+    except OSError as e:
+        logger.error(f"Échec de l'envoi TCP brut vers {host}:{port}: {e}")
+        return False
+
+
+class _GenerationWorker(QObject):
+    """Étape 1 d'une machine: génère le PRN du prochain travail dû."""
+    finished = pyqtSignal()
+
+    def __init__(self, print_queue: 'PrintQueue', machine: LaserMachine, handoff: queue.Queue):
+        super().__init__()
+        self.print_queue = print_queue
+        self.machine = machine
+        self.handoff = handoff
+        self._job_worker: Optional[EpilogJobWorker] = None # Génération en cours
+
+    def request_abort(self):
+        """Interrompt la génération en cours (appel direct depuis un autre thread, voir PrintQueue.stop)."""
+        job_worker = self._job_worker
+        if job_worker is not None:
+            job_worker.request_abort()
+
+    @pyqtSlot()
+    def run(self):
+        while not self.print_queue.is_stopping():
+            job = self.print_queue._take_next(self.machine.nom)
+            if job is None:
+                continue
+            if self.machine.simulation:
+                # Faux laser: pas de bibliothèque Epilog, le contenu du travail est envoyé tel quel
+                self._hand_off(job.job_id, simulated_print_data(job.svg_content, job.settings))
+                continue
+            self._job_worker = EpilogJobWorker(job.svg_content, self.machine.modele, self.machine.ip,
+                                               settings=job.settings, send_to_laser=False)
+            if self.print_queue.is_stopping():
+                self._job_worker.request_abort() # Arrêt demandé pendant la création du travailleur
+            result = self._job_worker.execute()
+            self._job_worker = None
+            if result.aborted or self.print_queue.is_stopping():
+                # Interrompu par l'arrêt de la file: le travail reste actif et repart en attente au rechargement
+                break
+            if not result.success:
+                # Une génération qui échoue échouerait de nouveau: pas de nouvel essai
+                self.print_queue._finish_job(job.job_id, STATUS_FAILED, result.error or result.message)
+                continue
+            self._hand_off(job.job_id, result.prn_data)
+        self.finished.emit()
+
+    def _hand_off(self, job_id: str, prn_data: bytes):
+        """Passe le PRN à l'étape d'envoi (attend qu'elle ait pris le précédent)."""
+        self.print_queue._set_status(job_id, STATUS_READY)
+        while not self.print_queue.is_stopping():
+            try:
+                self.handoff.put((job_id, prn_data), timeout=WAIT_POLL_INTERVAL)
+                return
+            except queue.Full:
+                pass
+
+
+class _SendWorker(QObject):
+    """Étape 2 d'une machine: envoie les PRN prêts au laser."""
+    finished = pyqtSignal()
+
+    def __init__(self, print_queue: 'PrintQueue', machine: LaserMachine, handoff: queue.Queue):
+        super().__init__()
+        self.print_queue = print_queue
+        self.machine = machine
+        self.handoff = handoff
+
+    def _send(self, prn_data: bytes) -> bool:
+        if self.machine.port:
+            return send_prn_over_tcp(self.machine.ip, self.machine.port, prn_data)
+        machine_enum = get_epilog_machine_enum(self.machine.modele)
+        if machine_enum is None:
+            return False
+        try:
+            return send_print_data_to_laser(machine_enum, prn_data, self.machine.ip)
+        except EpilogLibraryError as e:
+            logger.error(f"File d'impression: bibliothèque Epilog indisponible: {e}")
+            return False
+
+    @pyqtSlot()
+    def run(self):
+        while not self.print_queue.is_stopping():
+            try:
+                job_id, prn_data = self.handoff.get(timeout=WAIT_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            if not self.print_queue._set_status(job_id, STATUS_SENDING):
+                continue # Annulé entre la génération et l'envoi
+            logger.info(f"File d'impression: envoi du travail {job_id} ({len(prn_data)} octets) à {self.machine.nom}.")
+            if self._send(prn_data):
+                self.print_queue._finish_job(job_id, STATUS_DONE)
+            else:
+                self.print_queue._send_failed(job_id, f"Échec de l'envoi à {self.machine.nom} ({self.machine.ip})")
+        self.finished.emit()
+
+
+class PrintQueue(QObject):
+    """File d'impression persistante avec un pipeline génération/envoi par laser."""
+    job_changed = pyqtSignal(object) # PrintJob (copie), émis depuis n'importe quel thread
+
+    _instance = None
+
+    def __init__(self, state_dir: Optional[Path] = None):
+        super().__init__()
+        self.state_path = Path(state_dir or get_user_data_path("PrintQueue")) / STATE_FILENAME
+        self._condition = threading.Condition()
+        self._jobs = {} # job_id -> PrintJob
+        self._stopping = threading.Event()
+        self._threads = [] # (QThread, worker) actifs
+        self._running_machines = set()
+        self._load()
+
+    @classmethod
+    def get_instance(cls) -> 'PrintQueue':
+        """Retourne l'instance singleton de la file d'impression."""
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    # --- Persistance ---
+    def _load(self):
+        if not self.state_path.exists():
+            return
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for job_data in data.get('jobs', []):
+                job = PrintJob.from_dict(job_data)
+                if job.statut in ACTIVE_STATUSES:
+                    # Interrompu par la fermeture de l'application: à reprendre
+                    job.statut = STATUS_PENDING
+                self._jobs[job.job_id] = job
+            logger.info(f"File d'impression rechargée: {len(self.pending_jobs())} travail(aux) en attente.")
+        except (OSError, ValueError, TypeError) as e:
+            logger.error(f"Impossible de relire l'état de la file d'impression ({self.state_path}): {e}")
+
+    def _save_locked(self):
+        finished = sorted((j for j in self._jobs.values() if j.statut in FINAL_STATUSES),
+                          key=lambda j: j.termine_le or 0.0)
+        for job in finished[:-MAX_FINISHED_JOBS]:
+            del self._jobs[job.job_id]
+        tmp_path = self.state_path.with_suffix(".tmp")
+        try:
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'jobs': [asdict(job) for job in self._jobs.values()]}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            logger.error(f"Impossible d'enregistrer l'état de la file d'impression: {e}")
+
+    def _changed_locked(self, job: PrintJob):
+        self._save_locked()
+        self._condition.notify_all()
+        self.job_changed.emit(replace(job))
+
+    # --- API publique ---
+    def submit(self, machine_name: str, svg_content: str, settings: dict, titre: str = "",
+               priorite: int = PRIORITY_NORMAL) -> PrintJob:
+        """Ajoute un travail à la file et démarre les travailleurs au besoin."""
+        job = PrintJob(machine=machine_name, svg_content=svg_content, settings=settings,
+                       titre=titre, priorite=priorite)
+        with self._condition:
+            self._jobs[job.job_id] = job
+            self._changed_locked(job)
+        logger.info(f"File d'impression: travail {job.job_id} '{titre}' ajouté pour {machine_name} (priorité {priorite}).")
+        self.start()
+        return replace(job)
+
+    def cancel(self, job_id: str) -> bool:
+        """Annule un travail qui n'est pas encore en cours d'envoi."""
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None or job.statut in FINAL_STATUSES or job.statut == STATUS_SENDING:
+                return False
+            job.statut = STATUS_CANCELLED
+            job.termine_le = time.time()
+            self._changed_locked(job)
+        return True
+
+    def retry(self, job_id: str) -> bool:
+        """Remet en attente un travail en échec ou annulé."""
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None or job.statut not in (STATUS_FAILED, STATUS_CANCELLED):
+                return False
+            job.statut, job.tentatives, job.prochain_essai, job.termine_le = STATUS_PENDING, 0, 0.0, None
+            self._changed_locked(job)
+        self.start()
+        return True
+
+    def jobs(self) -> list:
+        """Copie des travaux, dans l'ordre de traitement (les travaux terminés à la fin)."""
+        with self._condition:
+            jobs = [replace(job) for job in self._jobs.values()]
+        return sorted(jobs, key=lambda j: (j.statut in FINAL_STATUSES, -j.priorite, j.cree_le))
+
+    def pending_jobs(self) -> list:
+        return [job for job in self.jobs() if job.statut not in FINAL_STATUSES]
+
+    def queue_position(self, job_id: str) -> int:
+        """Position (1 = prochain) d'un travail parmi ceux de sa machine (0 si absent ou terminé)."""
+        with self._condition:
+            job = self._jobs.get(job_id)
+            machine = job.machine if job else None
+        for position, other in enumerate((j for j in self.pending_jobs() if j.machine == machine), start=1):
+            if other.job_id == job_id:
+                return position
+        return 0
+
+    # --- Travailleurs ---
+    def is_stopping(self) -> bool:
+        return self._stopping.is_set()
+
+    def start(self):
+        """Démarre un pipeline génération/envoi pour chaque laser configuré (une seule fois par laser)."""
+        if self._stopping.is_set():
+            return
+        app = QCoreApplication.instance()
+        if app is not None and not self._threads:
+            app.aboutToQuit.connect(self.stop)
+        for machine in configured_lasers():
+            if machine.nom in self._running_machines:
+                continue
+            self._running_machines.add(machine.nom)
+            handoff = queue.Queue(maxsize=1)
+            for worker in (_GenerationWorker(self, machine, handoff), _SendWorker(self, machine, handoff)):
+                thread = QThread()
+                worker.moveToThread(thread)
+                thread.started.connect(worker.run)
+                worker.finished.connect(thread.quit)
+                self._threads.append((thread, worker))
+                thread.start()
+            logger.info(f"File d'impression: travailleurs démarrés pour {machine.nom} ({machine.modele}, {machine.ip}).")
+
+    def stop(self, timeout_ms: int = 5000):
+        """
+        Arrête les travailleurs: la génération en cours est interrompue, un envoi en cours
+        est terminé avant l'arrêt. Un thread qui ne s'arrête pas à temps reste référencé
+        (un QThread détruit pendant son exécution ferait planter l'application).
+        """
+        self._stopping.set()
+        with self._condition:
+            self._condition.notify_all()
+        for _thread, worker in self._threads:
+            if isinstance(worker, _GenerationWorker):
+                worker.request_abort()
+        still_running = []
+        for thread, worker in self._threads:
+            thread.quit()
+            if not thread.wait(timeout_ms):
+                logger.warning(f"File d'impression: un travailleur de {worker.machine.nom} ne s'est pas arrêté à temps.")
+                still_running.append((thread, worker))
+        self._threads = still_running
+        self._running_machines.clear()
+
+    # --- Transitions (appelées par les travailleurs) ---
+    def _take_next(self, machine_name: str) -> Optional[PrintJob]:
+        """Attend (au plus WAIT_POLL_INTERVAL) puis réserve le prochain travail dû de la machine."""
+        with self._condition:
+            now = time.time()
+            candidates = [job for job in self._jobs.values()
+                          if job.machine == machine_name and job.statut == STATUS_PENDING]
+            due = [job for job in candidates if job.prochain_essai <= now]
+            if not due:
+                next_due = min((job.prochain_essai for job in candidates), default=now + WAIT_POLL_INTERVAL)
+                self._condition.wait(min(max(next_due - now, 0.01), WAIT_POLL_INTERVAL))
+                return None
+            job = min(due, key=lambda j: (-j.priorite, j.cree_le))
+            job.statut = STATUS_GENERATING
+            self._changed_locked(job)
+            return replace(job)
+
+    def _set_status(self, job_id: str, statut: str) -> bool:
+        """Change l'état d'un travail actif. False si le travail a été annulé entre-temps."""
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None or job.statut in FINAL_STATUSES:
+                return False
+            job.statut = statut
+            self._changed_locked(job)
+            return True
+
+    def _finish_job(self, job_id: str, statut: str, error: Optional[str] = None):
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.statut = statut
+            job.derniere_erreur = error
+            job.termine_le = time.time()
+            self._changed_locked(job)
+        if statut == STATUS_DONE:
+            logger.info(f"File d'impression: travail {job_id} terminé.")
+        else:
+            logger.error(f"File d'impression: travail {job_id} en {statut}: {error}")
+
+    def _send_failed(self, job_id: str, error: str):
+        """Replanifie un envoi échoué avec un délai exponentiel, ou abandonne après MAX_SEND_ATTEMPTS."""
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.tentatives += 1
+            if job.tentatives < MAX_SEND_ATTEMPTS:
+                delay = retry_delay(job.tentatives)
+                job.statut = STATUS_PENDING
+                job.derniere_erreur = error
+                job.prochain_essai = time.time() + delay
+                self._changed_locked(job)
+                logger.warning(f"File d'impression: {error}. Nouvel essai ({job.tentatives + 1}/{MAX_SEND_ATTEMPTS}) dans {delay:.0f} s.")
+                return
+        self._finish_job(job_id, STATUS_FAILED, f"{error} ({MAX_SEND_ATTEMPTS} tentatives)")
@@ -0,0 +1,139 @@
+"""
+Cache disque des fichiers d'impression Epilog (PRN) générés.
+
+Un fichier PRN ne dépend que du SVG, du JSON de paramètres laser et du modèle de
+machine: la clé est le hachage de ces trois entrées. Une réimpression (bourrage,
+deuxième copie, nouvel essai après une erreur réseau) peut ainsi être envoyée au
+laser sans repasser par le générateur. La taille totale du dossier 'PrnCache' est
+plafonnée (éviction des fichiers les moins récemment utilisés).
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+from utils.paths import get_user_data_path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_DISK_BYTES = 512 * 1024 * 1024 # 512 Mo
+PRN_EXTENSION = ".prn"
+
+
+class PrnCache:
+    """Cache adressé par contenu des données PRN (utilisable depuis n'importe quel thread)."""
+
+    _instance = None
+
+    def __init__(self, cache_dir: Optional[Path] = None, max_disk_bytes: int = DEFAULT_MAX_DISK_BYTES):
+        self.cache_dir = Path(cache_dir) if cache_dir else get_user_data_path("PrnCache")
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_disk_bytes = max_disk_bytes
+        self._lock = threading.Lock()
+        self._disk_usage = None # Calculé au premier accès disque
+
+    @classmethod
+    def get_instance(cls) -> 'PrnCache':
+        """Retourne l'instance singleton du cache PRN."""
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    @staticmethod
+    def cache_key(svg_content: str, settings_json_str: str, machine) -> str:
+        """Clé d'un fichier PRN: hachage du SVG, du JSON de paramètres et de la machine."""
+        hasher = hashlib.blake2b(digest_size=20)
+        for part in (svg_content, settings_json_str, str(int(machine))):
+            encoded = part.encode('utf-8')
+            # Longueur préfixée pour que les frontières entre les parties soient non ambiguës
+            hasher.update(len(encoded).to_bytes(8, 'little'))
+            hasher.update(encoded)
+        return hasher.hexdigest()
+
+    def _disk_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}{PRN_EXTENSION}"
+
+    def _ensure_disk_usage(self):
+        if self._disk_usage is None:
+            total = 0
+            for prn_file in self.cache_dir.glob(f"*/*{PRN_EXTENSION}"):
+                try:
+                    total += prn_file.stat().st_size
+                except OSError:
+                    pass
+            self._disk_usage = total
+
+    def load(self, key: str) -> Optional[bytes]:
+        """Retourne les données PRN en cache pour cette clé (None si absentes)."""
+        disk_path = self._disk_path(key)
+        try:
+            with open(disk_path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"Lecture impossible du fichier PRN en cache {disk_path}: {e}")
+            return None
+        try:
+            os.utime(disk_path) # La date de modification sert d'horodatage LRU
+        except OSError:
+            pass
+        logger.info(f"Fichier PRN trouvé en cache ({len(data)} octets): {key}")
+        return data
+
+    def store(self, key: str, data: bytes):
+        """Écrit les données PRN sur le disque puis applique le plafond de taille."""
+        if not data or len(data) > self.max_disk_bytes:
+            return
+        disk_path = self._disk_path(key)
+        try:
+            disk_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = disk_path.with_suffix(f".{threading.get_ident()}.tmp")
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, disk_path)
+            with self._lock:
+                self._ensure_disk_usage()
+                self._disk_usage += len(data)
+                if self._disk_usage > self.max_disk_bytes:
+                    self._evict_disk_locked()
+        except OSError as e:
+            logger.warning(f"Erreur d'écriture du cache PRN ({disk_path}): {e}")
+
+    def _evict_disk_locked(self):
+        """Supprime les fichiers PRN les moins récemment utilisés jusqu'à 90 % du plafond."""
+        entries = []
+        for prn_file in self.cache_dir.glob(f"*/*{PRN_EXTENSION}"):
+            try:
+                st = prn_file.stat()
+                entries.append((st.st_mtime, st.st_size, prn_file))
+            except OSError:
+                pass
+        entries.sort()
+        total = sum(size for _mtime, size, _path in entries)
+        target = int(self.max_disk_bytes * 0.9)
+        removed = 0
+        for _mtime, size, prn_file in entries:
+            if total <= target:
+                break
+            try:
+                prn_file.unlink()
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+        self._disk_usage = total
+        logger.debug(f"Cache PRN: {removed} fichier(s) évincé(s), {total} octets restants.")
+
+    def clear(self):
+        """Vide le cache PRN."""
+        with self._lock:
+            for prn_file in self.cache_dir.glob(f"*/*{PRN_EXTENSION}"):
+                try:
+                    prn_file.unlink()
+                except OSError:
+                    pass
+            self._disk_usage = 0
@@ -0,0 +1,394 @@
+# utils/rdj_archive.py
+"""
+Écriture des archives .rdj (rapports de dépenses).
+
+Une archive .rdj est un ZIP contenant:
+    - rapport_data.json : les données sérialisées du rapport.
+    - factures/<dossier>/<fichier> : les fichiers de factures de chaque entrée.
+
+L'archive est écrite directement (en flux) dans un fichier temporaire situé
+à côté de la destination, puis remplacée de façon atomique. Aucun répertoire
+de transit n'est utilisé: chaque octet des factures n'est lu qu'une seule fois,
+et les membres inchangés d'une archive existante sont recopiés sans recompression.
+"""
+import contextlib
+import json
+import os
+import shutil
+import struct
+import tempfile
+import time
+import zipfile
+import zlib
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
+import logging
+
+# Initialisation du logger
+logger = logging.getLogger('GDJ_App')
+
+RDJ_DATA_MEMBER = "rapport_data.json"
+RDJ_FACTURES_DIR = "factures"
+
+# Formats déjà compressés: les dégonfler (deflate) coûte du temps CPU pour un gain nul.
+STORED_EXTENSIONS = frozenset({
+    '.pdf', '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic', '.zip', '.rdj',
+})
+
+COPY_CHUNK_SIZE = 1024 * 1024 # 1 Mo
+
+# Internes de zipfile utilisés par la recopie brute (non garantis d'une version de CPython à l'autre)
+_RAW_COPY_MODULE_ATTRS = ('structFileHeader', 'sizeFileHeader', 'stringFileHeader',
+                          '_FH_SIGNATURE', '_FH_FILENAME_LENGTH', '_FH_EXTRA_FIELD_LENGTH')
+_RAW_COPY_SOURCE_ATTRS = ('_lock', 'fp')
+_RAW_COPY_DEST_ATTRS = ('_lock', 'fp', '_writing', '_didModify', 'start_dir', '_writecheck', 'filelist', 'NameToInfo')
+
+# Type du callback de progression: (octets_traites, octets_totaux, nom_membre_courant)
+ProgressCallback = Callable[[int, int, str], None]
+
+
+def compress_type_for(filename: str) -> int:
+    """Retourne le mode de compression ZIP à utiliser pour un nom de fichier donné."""
+    if Path(filename).suffix.lower() in STORED_EXTENSIONS:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+def serialize_rapport_data(rapport_data: dict) -> bytes:
+    """Sérialise les données du rapport exactement comme elles sont écrites dans l'archive."""
+    return json.dumps(rapport_data, ensure_ascii=False, indent=4).encode('utf-8')
+
+
+def collect_facture_files(facture_dossiers_sources: Iterable[str]) -> Tuple[List[Tuple[Path, str]], List[str]]:
+    """
+    Liste les fichiers de factures à archiver.
+
+    Returns:
+        Un tuple (fichiers, dossiers_absents):
+            - fichiers: liste de tuples (chemin_source, nom_dans_archive), triée pour un ordre stable.
+            - dossiers_absents: noms des dossiers sources introuvables sur le disque
+              (par exemple des factures d'un .rdj ouvert paresseusement, jamais extraites).
+    """
+    files = []
+    missing_folder_names = []
+    for src_folder_path_str in sorted(set(facture_dossiers_sources or [])):
+        src_folder = Path(src_folder_path_str)
+        if not src_folder.is_dir():
+            missing_folder_names.append(src_folder.name)
+            continue
+        for root, _dirs, filenames in os.walk(src_folder):
+            for filename in sorted(filenames):
+                src_file = Path(root) / filename
+                relative = src_file.relative_to(src_folder.parent).as_posix()
+                files.append((src_file, f"{RDJ_FACTURES_DIR}/{relative}"))
+    return files, missing_folder_names
+
+
+def _archive_members_for_folders(source_zip: Optional[zipfile.ZipFile], folder_names: List[str]) -> List[zipfile.ZipInfo]:
+    """Retourne les membres 'factures/<dossier>/...' de l'archive source pour les dossiers demandés."""
+    members = []
+    if source_zip is None:
+        for folder_name in folder_names:
+            logger.warning(f"Dossier facture source non trouvé ou n'est pas un dossier: {folder_name}")
+        return members
+    prefixes = {folder_name: f"{RDJ_FACTURES_DIR}/{folder_name}/" for folder_name in folder_names}
+    found = set()
+    for info in source_zip.infolist():
+        if info.is_dir():
+            continue
+        for folder_name, prefix in prefixes.items():
+            if info.filename.startswith(prefix):
+                members.append(info)
+                found.add(folder_name)
+                break
+    for folder_name in folder_names:
+        if folder_name not in found:
+            logger.warning(f"Dossier facture introuvable sur le disque et dans l'archive source: {folder_name}")
+    return members
+
+
+def _dos_date_time(timestamp: float) -> tuple:
+    """Horodatage tel qu'il est relu depuis un en-tête ZIP (secondes arrondies à 2 s)."""
+    dt = time.localtime(timestamp)[:6]
+    return dt[:5] + (dt[5] // 2 * 2,)
+
+
+def _file_crc32(file_path: Path) -> int:
+    """Calcule le CRC-32 d'un fichier, comparable au CRC stocké dans un membre ZIP."""
+    crc = 0
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), b''):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+def _is_member_unchanged(src_file: Path, info: zipfile.ZipInfo) -> bool:
+    """
+    Indique si le fichier sur le disque correspond au membre de l'archive.
+    Taille + date de modification d'abord (aucune lecture), puis le CRC-32 si la date diffère
+    (par exemple pour une facture extraite de l'archive à l'ouverture).
+    """
+    try:
+        st = src_file.stat()
+    except OSError:
+        return False
+    if st.st_size != info.file_size:
+        return False
+    if _dos_date_time(st.st_mtime) == info.date_time:
+        return True
+    return _file_crc32(src_file) == info.CRC
+
+
+def _can_copy_raw(info: zipfile.ZipInfo) -> bool:
+    """Seuls les membres non chiffrés avec une méthode connue peuvent être recopiés tels quels."""
+    return not (info.flag_bits & 0x1) and info.compress_type in (
+        zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED, zipfile.ZIP_BZIP2, zipfile.ZIP_LZMA)
+
+
+def raw_copy_supported(source_zip: zipfile.ZipFile, dest_zip: zipfile.ZipFile) -> bool:
+    """True si les internes de zipfile nécessaires à copy_member_raw sont présents."""
+    return (all(hasattr(zipfile, attr) for attr in _RAW_COPY_MODULE_ATTRS)
+            and all(hasattr(source_zip, attr) for attr in _RAW_COPY_SOURCE_ATTRS)
+            and all(hasattr(dest_zip, attr) for attr in _RAW_COPY_DEST_ATTRS))
+
+
+def copy_member_recompressed(source_zip: zipfile.ZipFile, info: zipfile.ZipInfo, dest_zip: zipfile.ZipFile):
+    """Recopie un membre en le décompressant puis en le recompressant (API publique de zipfile uniquement)."""
+    new_info = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+    new_info.compress_type = info.compress_type
+    new_info.external_attr = info.external_attr
+    new_info.file_size = info.file_size # Permet à zipfile de choisir ZIP64 d'avance pour les gros membres
+    with source_zip.open(info, 'r') as src, dest_zip.open(new_info, 'w') as dst:
+        shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+
+
+def copy_member(source_zip: zipfile.ZipFile, info: zipfile.ZipInfo, dest_zip: zipfile.ZipFile) -> bool:
+    """
+    Recopie un membre d'une archive à l'autre: sans recompression si la version de zipfile
+    le permet, sinon par lecture/écriture. Retourne True si la copie brute a été utilisée.
+    """
+    if raw_copy_supported(source_zip, dest_zip):
+        copy_member_raw(source_zip, info, dest_zip)
+        return True
+    copy_member_recompressed(source_zip, info, dest_zip)
+    return False
+
+
+def copy_member_raw(source_zip: zipfile.ZipFile, info: zipfile.ZipInfo, dest_zip: zipfile.ZipFile):
+    """
+    Recopie un membre d'une archive à l'autre SANS le décompresser ni le recompresser:
+    les octets compressés sont transférés tels quels et un nouvel en-tête local est écrit.
+    Utilise des internes de zipfile: passer par copy_member(), qui vérifie leur présence.
+    """
+    with source_zip._lock:
+        src_fp = source_zip.fp
+        src_fp.seek(info.header_offset)
+        fheader = struct.unpack(zipfile.structFileHeader, src_fp.read(zipfile.sizeFileHeader))
+        if fheader[zipfile._FH_SIGNATURE] != zipfile.stringFileHeader:
+            raise zipfile.BadZipFile(f"En-tête local invalide pour le membre {info.filename}")
+        data_offset = (info.header_offset + zipfile.sizeFileHeader
+                       + fheader[zipfile._FH_FILENAME_LENGTH] + fheader[zipfile._FH_EXTRA_FIELD_LENGTH])
+
+        new_info = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+        new_info.compress_type = info.compress_type
+        new_info.CRC = info.CRC
+        new_info.compress_size = info.compress_size
+        new_info.file_size = info.file_size
+        new_info.external_attr = info.external_attr
+        # Les tailles sont connues: pas de descripteur de données après le contenu
+        new_info.flag_bits = info.flag_bits & ~0x08
+
+        with dest_zip._lock:
+            if dest_zip._writing:
+                raise ValueError("Impossible de recopier un membre pendant une écriture en cours.")
+            dest_fp = dest_zip.fp
+            dest_fp.seek(dest_zip.start_dir)
+            new_info.header_offset = dest_fp.tell()
+            dest_zip._writecheck(new_info)
+            dest_zip._didModify = True
+            dest_fp.write(new_info.FileHeader())
+
+            src_fp.seek(data_offset)
+            remaining = info.compress_size
+            while remaining > 0:
+                chunk = src_fp.read(min(COPY_CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise zipfile.BadZipFile(f"Contenu tronqué pour le membre {info.filename}")
+                dest_fp.write(chunk)
+                remaining -= len(chunk)
+
+            dest_zip.start_dir = dest_fp.tell()
+            dest_zip.filelist.append(new_info)
+            dest_zip.NameToInfo[new_info.filename] = new_info
+
+
+def write_rdj_archive(destination_path: str,
+                      rapport_data: dict,
+                      facture_dossiers_sources: Iterable[str],
+                      progress_callback: Optional[ProgressCallback] = None,
+                      source_archive_path: Optional[str] = None,
+                      incremental: bool = True) -> str:
+    """
+    Écrit une archive .rdj en flux vers un fichier temporaire voisin, puis le renomme
+    atomiquement sur la destination.
+
+    En mode incrémental, les membres identiques à ceux de l'archive existante (la destination
+    elle-même lors d'un Ctrl+S, sinon l'archive d'origine) sont recopiés tels quels, sans être
+    recompressés: seules les données nouvelles ou modifiées passent par le compresseur.
+
+    Args:
+        destination_path: Chemin final du fichier .rdj.
+        rapport_data: Dictionnaire retourné par RapportDepense.save().
+        facture_dossiers_sources: Dossiers de factures à inclure sous 'factures/'.
+        progress_callback: Appelé après chaque membre écrit avec
+                           (octets_traites, octets_totaux, nom_membre).
+        source_archive_path: Optionnel. Archive .rdj d'origine du rapport. Les dossiers de
+                             factures absents du disque (jamais extraits) y sont recopiés.
+        incremental: Réutiliser les membres inchangés des archives existantes (défaut: True).
+
+    Returns:
+        Le chemin de destination écrit.
+    """
+    destination = Path(destination_path)
+    destination.parent.mkdir(parents=True, exist_ok=True)
+
+    json_bytes = serialize_rapport_data(rapport_data)
+    facture_files, missing_folder_names = collect_facture_files(facture_dossiers_sources)
+
+    # Archives existantes consultées: la destination (re-sauvegarde) puis l'archive d'origine
+    reference_paths = []
+    if incremental and destination.is_file():
+        reference_paths.append(str(destination))
+    if source_archive_path and os.path.isfile(source_archive_path) \
+            and (incremental or missing_folder_names) \
+            and os.path.abspath(source_archive_path) not in [os.path.abspath(p) for p in reference_paths]:
+        reference_paths.append(source_archive_path)
+
+    # Le fichier temporaire est créé dans le même dossier pour que os.replace reste atomique.
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{destination.stem}_", suffix=".rdj.tmp", dir=str(destination.parent))
+    os.close(fd)
+    try:
+        with contextlib.ExitStack() as reference_stack:
+            # Les archives de référence sont fermées AVANT le remplacement (l'une peut être la destination)
+            reference_zips = []
+            for reference_path in reference_paths:
+                try:
+                    reference_zips.append(reference_stack.enter_context(zipfile.ZipFile(reference_path, 'r')))
+                except (OSError, zipfile.BadZipFile) as e:
+                    logger.warning(f"Archive de référence ignorée ({reference_path}): {e}")
+
+            def find_reference_member(arcname: str):
+                for reference_zip in reference_zips:
+                    info = reference_zip.NameToInfo.get(arcname)
+                    if info is not None and _can_copy_raw(info):
+                        return reference_zip, info
+                return None, None
+
+            # --- Plan d'écriture: ('bytes', nom, données) | ('file', chemin, nom) | ('raw', zip, info) ---
+            plan = []
+            json_crc = zlib.crc32(json_bytes)
+            json_zip, json_member = find_reference_member(RDJ_DATA_MEMBER) if incremental else (None, None)
+            if json_member is not None and json_member.file_size == len(json_bytes) and json_member.CRC == json_crc:
+                plan.append(('raw', json_zip, json_member))
+            else:
+                plan.append(('bytes', RDJ_DATA_MEMBER, json_bytes))
+
+            for src_file, arcname in facture_files:
+                ref_zip, ref_member = find_reference_member(arcname) if incremental else (None, None)
+                if ref_member is not None and _is_member_unchanged(src_file, ref_member):
+                    plan.append(('raw', ref_zip, ref_member))
+                else:
+                    plan.append(('file', src_file, arcname))
+
+            source_zip = None
+            if missing_folder_names and source_archive_path:
+                source_abspath = os.path.abspath(source_archive_path)
+                source_zip = next((z for z in reference_zips if os.path.abspath(z.filename) == source_abspath), None)
+            for info in _archive_members_for_folders(source_zip, missing_folder_names):
+                plan.append(('raw', source_zip, info))
+
+            def entry_size(entry) -> int:
+                if entry[0] == 'bytes':
+                    return len(entry[2])
+                if entry[0] == 'raw':
+                    return entry[2].file_size
+                try:
+                    return entry[1].stat().st_size
+                except OSError:
+                    return 0
+
+            total_bytes = sum(entry_size(entry) for entry in plan)
+            done_bytes = 0
+            raw_count = 0
+            if any(entry[0] == 'raw' for entry in plan) and not all(
+                    hasattr(zipfile, attr) for attr in _RAW_COPY_MODULE_ATTRS):
+                logger.warning("Recopie brute indisponible avec cette version de zipfile: "
+                               "les membres inchangés sont recompressés.")
+
+            with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+                for entry in plan:
+                    kind = entry[0]
+                    if kind == 'bytes':
+                        member_name = entry[1]
+                        member_info = zipfile.ZipInfo(member_name, date_time=time.localtime()[:6])
+                        member_info.compress_type = zipfile.ZIP_DEFLATED
+                        zf.writestr(member_info, entry[2])
+                    elif kind == 'file':
+                        src_file, member_name = entry[1], entry[2]
+                        zf.write(src_file, member_name, compress_type=compress_type_for(member_name))
+                        logger.debug(f"Facture ajoutée à l'archive: {src_file} -> {member_name}")
+                    else:
+                        ref_zip, ref_member = entry[1], entry[2]
+                        member_name = ref_member.filename
+                        if copy_member(ref_zip, ref_member, zf):
+                            raw_count += 1
+                    done_bytes += entry_size(entry)
+                    if progress_callback:
+                        progress_callback(done_bytes, total_bytes, member_name)
+
+        os.replace(tmp_path, destination)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    logger.info(f"Archive .rdj écrite: {destination} ({len(plan)} membre(s), "
+                f"{raw_count} recopié(s) sans recompression, {len(plan) - raw_count} écrit(s))")
+    return str(destination)
+
+
+class RdjSaveWorker(QObject):
+    """Écrit une archive .rdj hors du thread de l'interface."""
+    progress = pyqtSignal(int, int, str) # octets_traites, octets_totaux, membre_courant
+    finished = pyqtSignal(bool, str) # success, destination_path_or_error
+
+    def __init__(self, destination_path: str, rapport_data: dict, facture_dossiers_sources: List[str],
+                 source_archive_path: Optional[str] = None):
+        super().__init__()
+        self.destination_path = destination_path
+        self.rapport_data = rapport_data
+        self.facture_dossiers_sources = list(facture_dossiers_sources or [])
+        self.source_archive_path = source_archive_path
+
+    @pyqtSlot()
+    def run(self):
+        """Exécute l'écriture de l'archive."""
+        try:
+            written_path = write_rdj_archive(
+                self.destination_path,
+                self.rapport_data,
+                self.facture_dossiers_sources,
+                progress_callback=self.progress.emit,
+                source_archive_path=self.source_archive_path
+            )
+            self.finished.emit(True, written_path)
+        except Exception as e:
+            logger.error(f"Erreur lors de l'écriture de l'archive .rdj '{self.destination_path}': {e}", exc_info=True)
+            self.finished.emit(False, str(e))
+
+# Note: Comme DownloadWorker, ce worker est conçu pour être déplacé dans un QThread
+# (worker.moveToThread(thread), thread.started -> worker.run, worker.finished -> thread.quit).
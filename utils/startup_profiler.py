@@ -0,0 +1,255 @@
+"""
+Profilage du démarrage de l'application.
+
+Le temps de démarrage à froid (lancement -> première fenêtre affichée) est toujours
+mesuré: une ligne dans le log et dans '<dossier des logs>/startup_times.csv' pour suivre
+son évolution d'une version à l'autre.
+
+Le profil détaillé est optionnel (variable d'environnement GDJ_PROFILE_STARTUP=1 ou
+option '--profile-startup'): un chercheur placé en tête de sys.meta_path chronomètre
+l'import de chaque module (temps propre et cumulé, comme 'python -X importtime', mais
+aussi dans l'exécutable figé) et phase() chronomètre les étapes d'initialisation.
+Le rapport est écrit dans le dossier des logs ('startup_profile_<date>.txt').
+
+Ce module n'importe que la bibliothèque standard: main.py l'installe avant tout autre import.
+"""
+
+import csv
+import importlib.abc
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger('GDJ_App')
+
+PROFILE_ENV_VAR = "GDJ_PROFILE_STARTUP"
+PROFILE_CLI_FLAG = "--profile-startup"
+HISTORY_FILE_NAME = "startup_times.csv"
+HISTORY_MAX_ROWS = 500
+REPORT_TOP_MODULES = 60
+
+_start_time = time.perf_counter()
+
+
+class _TimedLoader:
+    """Enveloppe un loader pour chronométrer create_module/exec_module (le reste est délégué)."""
+
+    def __init__(self, loader, profiler: "StartupProfiler", name: str):
+        self._loader = loader
+        self._profiler = profiler
+        self._name = name
+
+    def create_module(self, spec):
+        create = getattr(self._loader, 'create_module', None)
+        if create is None:
+            return None
+        with self._profiler._timing(self._name):
+            return create(spec)
+
+    def exec_module(self, module):
+        # Le module garde son vrai loader (importlib.resources, pkgutil, PyInstaller)
+        module.__loader__ = self._loader
+        if getattr(module, '__spec__', None) is not None:
+            module.__spec__.loader = self._loader
+        with self._profiler._timing(self._name):
+            self._loader.exec_module(module)
+
+    def __getattr__(self, attr):
+        return getattr(self._loader, attr)
+
+
+class _TimingFinder(importlib.abc.MetaPathFinder):
+    """Délègue la recherche aux autres chercheurs et enveloppe le loader trouvé."""
+
+    def __init__(self, profiler: "StartupProfiler"):
+        self._profiler = profiler
+        self._local = threading.local()
+
+    def find_spec(self, fullname, path, target=None):
+        if getattr(self._local, 'searching', False):
+            return None
+        self._local.searching = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, 'find_spec'):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self._local.searching = False
+        if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+            spec.loader = _TimedLoader(spec.loader, self._profiler, fullname)
+        return spec
+
+
+class StartupProfiler:
+    """Temps d'import par module et temps des phases d'initialisation du démarrage."""
+
+    def __init__(self, detailed: bool = False):
+        self.detailed = detailed
+        self._finder: Optional[_TimingFinder] = None
+        self._lock = threading.Lock()
+        self._stack = threading.local()
+        self.imports: Dict[str, List[float]] = {} # module -> [cumulé, propre] (secondes)
+        self.import_order: List[str] = []
+        self.import_total = 0.0 # Somme des imports de premier niveau (sans double compte des imbriqués)
+        self.phases: List[Tuple[str, float, float]] = [] # (nom, début depuis le lancement, durée)
+        self.finished_at: Optional[float] = None
+        self.ready_label: Optional[str] = None
+
+    # --- Imports ---
+    def install(self):
+        """Active le chronométrage des imports (profil détaillé seulement)."""
+        if self.detailed and self._finder is None:
+            self._finder = _TimingFinder(self)
+            sys.meta_path.insert(0, self._finder)
+
+    def uninstall(self):
+        if self._finder is not None:
+            try:
+                sys.meta_path.remove(self._finder)
+            except ValueError:
+                pass
+            self._finder = None
+
+    @contextmanager
+    def _timing(self, name: str):
+        stack = getattr(self._stack, 'frames', None)
+        if stack is None:
+            stack = self._stack.frames = []
+        stack.append(0.0) # Temps cumulé des imports enfants
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            with self._lock:
+                if not stack:
+                    self.import_total += elapsed
+                entry = self.imports.get(name)
+                if entry is None:
+                    self.imports[name] = [elapsed, elapsed - children]
+                    self.import_order.append(name)
+                else: # create_module puis exec_module du même module
+                    entry[0] += elapsed
+                    entry[1] += elapsed - children
+
+    # --- Phases d'initialisation ---
+    @contextmanager
+    def phase(self, name: str):
+        """Chronomètre une étape du démarrage (création du contrôleur, chargement QSS, etc.)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, start - _start_time, time.perf_counter() - start))
+
+    def elapsed(self) -> float:
+        """Secondes écoulées depuis l'import de ce module (tout début de main.py)."""
+        return time.perf_counter() - _start_time
+
+    # --- Fin du démarrage ---
+    def finish(self, ready_label: str = "welcome_window", version: str = "", log_dir: Optional[Path] = None):
+        """
+        Marque la première fenêtre comme affichée: journalise le temps de démarrage à froid,
+        l'ajoute à l'historique et écrit le rapport détaillé si le profilage est actif.
+        Sans effet après le premier appel.
+        """
+        if self.finished_at is not None:
+            return
+        self.finished_at = self.elapsed()
+        self.ready_label = ready_label
+        self.uninstall()
+        logger.info(f"Démarrage à froid jusqu'à '{ready_label}': {self.finished_at * 1000:.0f} ms"
+                    + (f" (imports profilés: {self.import_total * 1000:.0f} ms)" if self.detailed else ""))
+        if log_dir is None:
+            return
+        self._append_history(log_dir, version)
+        if self.detailed:
+            report_path = self.write_report(log_dir, version)
+            if report_path:
+                logger.info(f"Profil de démarrage écrit: {report_path}")
+
+    def _append_history(self, log_dir: Path, version: str):
+        history_path = Path(log_dir) / HISTORY_FILE_NAME
+        row = [datetime.now().isoformat(timespec='seconds'), version, self.ready_label,
+               f"{self.finished_at * 1000:.0f}", f"{self.import_total * 1000:.0f}" if self.detailed else "",
+               "1" if getattr(sys, 'frozen', False) else "0"]
+        try:
+            rows = []
+            if history_path.exists():
+                with open(history_path, 'r', encoding='utf-8', newline='') as f:
+                    rows = list(csv.reader(f))[1:]
+            rows = rows[-(HISTORY_MAX_ROWS - 1):] + [row]
+            with open(history_path, 'w', encoding='utf-8', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(["date", "version", "fenetre", "demarrage_ms", "imports_ms", "fige"])
+                writer.writerows(rows)
+        except (OSError, csv.Error) as e:
+            logger.warning(f"Historique des temps de démarrage non écrit ({history_path}): {e}")
+
+    def format_report(self, version: str = "") -> str:
+        lines = [f"Profil de démarrage GDJ {version} - {datetime.now():%Y-%m-%d %H:%M:%S}",
+                 f"Démarrage à froid jusqu'à '{self.ready_label}': {(self.finished_at or self.elapsed()) * 1000:.1f} ms",
+                 f"Modules importés pendant le démarrage: {len(self.imports)} ({self.import_total * 1000:.1f} ms)", ""]
+        lines.append("Phases d'initialisation (début, durée en ms):")
+        for name, start, duration in self.phases:
+            lines.append(f"  {start * 1000:9.1f} {duration * 1000:9.1f}  {name}")
+        lines += ["", f"Modules les plus coûteux (temps propre, cumulé en ms; {REPORT_TOP_MODULES} premiers):"]
+        by_self = sorted(self.imports.items(), key=lambda item: item[1][1], reverse=True)
+        for name, (cumulative, own) in by_self[:REPORT_TOP_MODULES]:
+            lines.append(f"  {own * 1000:9.1f} {cumulative * 1000:9.1f}  {name}")
+        lines += ["", "Tous les modules, dans l'ordre d'import (propre, cumulé en ms):"]
+        for name in self.import_order:
+            cumulative, own = self.imports[name]
+            lines.append(f"  {own * 1000:9.2f} {cumulative * 1000:9.2f}  {name}")
+        return "\n".join(lines) + "\n"
+
+    def write_report(self, log_dir: Path, version: str = "") -> Optional[Path]:
+        report_path = Path(log_dir) / f"startup_profile_{datetime.now():%Y%m%d_%H%M%S}.txt"
+        try:
+            report_path.write_text(self.format_report(version), encoding='utf-8')
+            return report_path
+        except OSError as e:
+            logger.warning(f"Profil de démarrage non écrit ({report_path}): {e}")
+            return None
+
+
+def profiling_requested(argv: List[str]) -> bool:
+    """Profil détaillé demandé par GDJ_PROFILE_STARTUP=1 ou par l'option --profile-startup."""
+    return PROFILE_CLI_FLAG in argv or os.environ.get(PROFILE_ENV_VAR, "").strip().lower() in ("1", "true", "yes", "oui")
+
+
+_profiler: Optional[StartupProfiler] = None
+
+
+def start(argv: Optional[List[str]] = None) -> StartupProfiler:
+    """
+    Crée le profileur du processus (une seule fois) et retire --profile-startup de argv
+    pour que les autres arguments (fichier .rdj) restent à leur place.
+    """
+    global _profiler
+    if _profiler is None:
+        argv = sys.argv if argv is None else argv
+        _profiler = StartupProfiler(detailed=profiling_requested(argv))
+        while PROFILE_CLI_FLAG in argv:
+            argv.remove(PROFILE_CLI_FLAG)
+        _profiler.install()
+    return _profiler
+
+
+def get_profiler() -> StartupProfiler:
+    """Profileur du processus (démarré au besoin, sans profil détaillé)."""
+    return _profiler if _profiler is not None else start([])
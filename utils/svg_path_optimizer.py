@@ -0,0 +1,358 @@
+"""
+Optimisation géométrique des chemins SVG avant leur envoi à l'API Epilog.
+
+Étape optionnelle entre generate_svg_with_text_as_paths et send_lamicoid_to_epilog:
+les suites de segments (polylignes issues de l'aplatissement) sont simplifiées par
+Ramer-Douglas-Peucker avec une tolérance en mm, les segments colinéaires et les
+courbes quasi droites sont fusionnés, et les suites de points lisses sont
+réajustées en courbes de Bézier cubiques. Moins de points accélère la génération
+du fichier PRN et le tri vectoriel du laser.
+"""
+
+import logging
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PyQt5.QtGui import QPainterPath
+
+from .lamicoid_to_svg_paths_converter import svg_path_data_from_elements
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOLERANCE_MM = 0.02
+CORNER_ANGLE_DEG = 35.0 # Au-delà de ce changement de direction, un point est un coin conservé
+MIN_POINTS_FOR_CURVE_FIT = 5
+MAX_FIT_DEPTH = 8
+
+_MOVE, _LINE = QPainterPath.MoveToElement, QPainterPath.LineToElement
+_CURVE, _CURVE_DATA = QPainterPath.CurveToElement, QPainterPath.CurveToDataElement
+
+_PATH_ELEMENT_RE = re.compile(r'(<path\b[^>]*?\bd=")([^"]*)(")')
+_TOKEN_RE = re.compile(r'[MmLlHhVvCcZz]|[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?|[A-Za-z]')
+_ARG_COUNTS = {'M': 2, 'L': 2, 'H': 1, 'V': 1, 'C': 6, 'Z': 0}
+
+
+@dataclass
+class PathOptimizationStats:
+    """Bilan d'une optimisation (chemins pris en charge; points = paires de coordonnées)."""
+    paths: int = 0
+    points_before: int = 0
+    points_after: int = 0
+
+    @property
+    def points_removed(self) -> int:
+        return self.points_before - self.points_after
+
+
+# Sous-chemin: (point de départ, [('L', p) | ('C', c1, c2, p)], fermé)
+Subpath = Tuple[np.ndarray, list, bool]
+
+
+def parse_svg_path_data(d: str) -> Optional[List[Subpath]]:
+    """
+    Lit des données de chemin composées de M/L/H/V/C/Z (absolues ou relatives).
+    Retourne None si le chemin contient une autre commande (arcs, quadratiques...),
+    auquel cas il doit être laissé tel quel.
+    """
+    tokens = _TOKEN_RE.findall(d)
+    subpaths: List[Subpath] = []
+    current = np.zeros(2)
+    start = current
+    segments = None
+    command = None
+    index = 0
+    while index < len(tokens):
+        token = tokens[index]
+        if token.isalpha():
+            if token.upper() not in _ARG_COUNTS:
+                return None
+            command = token
+            index += 1
+            if command in 'Zz':
+                if segments is not None:
+                    subpaths[-1] = (subpaths[-1][0], segments, True)
+                    segments = None
+                current = start
+                continue
+        if command is None:
+            return None
+        count = _ARG_COUNTS[command.upper()]
+        try:
+            values = [float(value) for value in tokens[index:index + count]]
+        except ValueError:
+            return None
+        if len(values) < count:
+            return None
+        index += count
+        relative = command.islower()
+        upper = command.upper()
+        if upper == 'M':
+            point = current + values if relative else np.array(values)
+            segments = []
+            subpaths.append((point, segments, False))
+            current = start = point
+            command = 'l' if relative else 'L' # Paires suivantes: lignes implicites
+        elif upper in 'LHV':
+            if upper == 'L':
+                point = current + values if relative else np.array(values)
+            elif upper == 'H':
+                point = np.array([current[0] + values[0] if relative else values[0], current[1]])
+            else:
+                point = np.array([current[0], current[1] + values[0] if relative else values[0]])
+            if segments is None: # Segment après 'z' sans 'm': nouveau sous-chemin au même départ
+                segments = []
+                subpaths.append((current, segments, False))
+            segments.append(('L', point))
+            current = point
+        else: # 'C'
+            coords = np.array(values).reshape(3, 2)
+            if relative:
+                coords = coords + current
+            if segments is None:
+                segments = []
+                subpaths.append((current, segments, False))
+            segments.append(('C', coords[0], coords[1], coords[2]))
+            current = coords[2]
+    return subpaths
+
+
+def _count_points(subpaths: List[Subpath]) -> int:
+    return sum(1 + sum(1 if segment[0] == 'L' else 3 for segment in segments)
+               for _start, segments, _closed in subpaths)
+
+
+def _distances_to_chord(points: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Distances des points à la droite (segment) ab, calculées en bloc."""
+    chord = b - a
+    length = np.hypot(chord[0], chord[1])
+    if length < 1e-12:
+        return np.hypot(points[:, 0] - a[0], points[:, 1] - a[1])
+    return np.abs(chord[0] * (points[:, 1] - a[1]) - chord[1] * (points[:, 0] - a[0])) / length
+
+
+def _merge_collinear(points: np.ndarray, epsilon: float = 1e-9) -> np.ndarray:
+    """Retire les points intermédiaires exactement alignés (ou dupliqués)."""
+    if len(points) < 3:
+        return points
+    before = points[1:-1] - points[:-2]
+    after = points[2:] - points[1:-1]
+    cross = before[:, 0] * after[:, 1] - before[:, 1] * after[:, 0]
+    same_direction = (before * after).sum(axis=1) >= 0
+    keep = np.ones(len(points), dtype=bool)
+    keep[1:-1] = ~((np.abs(cross) <= epsilon) & same_direction)
+    return points[keep]
+
+
+def simplify_polyline(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """Ramer-Douglas-Peucker itératif; les distances de chaque intervalle sont calculées en bloc."""
+    count = len(points)
+    if count < 3 or tolerance <= 0:
+        return points
+    keep = np.zeros(count, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, count - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        distances = _distances_to_chord(points[first + 1:last], points[first], points[last])
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            split = first + 1 + farthest
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return points[keep]
+
+
+def _corner_indices(points: np.ndarray) -> List[int]:
+    """Indices des points où la direction change brusquement (à conserver tels quels)."""
+    if len(points) < 3:
+        return []
+    before = points[1:-1] - points[:-2]
+    after = points[2:] - points[1:-1]
+    norms = np.hypot(before[:, 0], before[:, 1]) * np.hypot(after[:, 0], after[:, 1])
+    cosines = np.divide((before * after).sum(axis=1), norms, out=np.ones(len(norms)), where=norms > 1e-12)
+    corners = np.nonzero(cosines < np.cos(np.radians(CORNER_ANGLE_DEG)))[0] + 1
+    return corners.tolist()
+
+
+def _unit(vector: np.ndarray) -> np.ndarray:
+    norm = np.hypot(vector[0], vector[1])
+    return vector / norm if norm > 1e-12 else vector
+
+
+def _bezier_points(bezier: np.ndarray, u: np.ndarray) -> np.ndarray:
+    mt = 1.0 - u
+    return (np.outer(mt ** 3, bezier[0]) + np.outer(3 * mt ** 2 * u, bezier[1])
+            + np.outer(3 * mt * u ** 2, bezier[2]) + np.outer(u ** 3, bezier[3]))
+
+
+def _chord_parameters(points: np.ndarray) -> np.ndarray:
+    lengths = np.concatenate(([0.0], np.cumsum(np.hypot(*np.diff(points, axis=0).T))))
+    return lengths / lengths[-1] if lengths[-1] > 1e-12 else np.linspace(0.0, 1.0, len(points))
+
+
+def _least_squares_bezier(points: np.ndarray, u: np.ndarray, tangent_start: np.ndarray,
+                          tangent_end: np.ndarray) -> np.ndarray:
+    """Bézier cubique aux extrémités fixées et tangentes imposées (méthode de Schneider)."""
+    first, last = points[0], points[-1]
+    mt = 1.0 - u
+    a1 = np.outer(3 * mt ** 2 * u, tangent_start)
+    a2 = np.outer(3 * mt * u ** 2, tangent_end)
+    residual = points - np.outer(mt ** 3 + 3 * mt ** 2 * u, first) - np.outer(3 * mt * u ** 2 + u ** 3, last)
+    c00, c01, c11 = (a1 * a1).sum(), (a1 * a2).sum(), (a2 * a2).sum()
+    x0, x1 = (a1 * residual).sum(), (a2 * residual).sum()
+    determinant = c00 * c11 - c01 * c01
+    chord = np.hypot(*(last - first))
+    alpha1 = alpha2 = 0.0
+    if abs(determinant) > 1e-12:
+        alpha1 = (x0 * c11 - x1 * c01) / determinant
+        alpha2 = (c00 * x1 - c01 * x0) / determinant
+    if alpha1 < 1e-6 * chord or alpha2 < 1e-6 * chord:
+        alpha1 = alpha2 = chord / 3.0 # Solution dégénérée: heuristique de Wu/Barsky
+    return np.array([first, first + alpha1 * tangent_start, last + alpha2 * tangent_end, last])
+
+
+def _midpoint_error(bezier: np.ndarray, points: np.ndarray, u: np.ndarray) -> float:
+    """Écart maximal de la courbe, entre deux points consécutifs, au segment qui les relie."""
+    middles = _bezier_points(bezier, (u[:-1] + u[1:]) / 2.0)
+    starts, ends = points[:-1], points[1:]
+    chords = ends - starts
+    lengths = (chords * chords).sum(axis=1)
+    t = np.clip(np.divide(((middles - starts) * chords).sum(axis=1), lengths,
+                          out=np.zeros(len(lengths)), where=lengths > 1e-12), 0.0, 1.0)
+    return float(np.hypot(*(middles - (starts + chords * t[:, None])).T).max())
+
+
+def _fit_cubics(points: np.ndarray, tangent_start: np.ndarray, tangent_end: np.ndarray,
+                tolerance: float, depth: int = 0) -> Optional[List[np.ndarray]]:
+    """Ajuste des Bézier cubiques à une suite lisse de points (None si l'ajustement échoue)."""
+    if len(points) == 2:
+        chord = np.hypot(*(points[1] - points[0])) / 3.0
+        return [np.array([points[0], points[0] + tangent_start * chord, points[1] + tangent_end * chord, points[1]])]
+    u = _chord_parameters(points)
+    bezier = _least_squares_bezier(points, u, tangent_start, tangent_end)
+    errors = np.hypot(*(_bezier_points(bezier, u) - points).T)
+    split = int(np.argmax(errors))
+    if errors[split] <= tolerance and _midpoint_error(bezier, points, u) <= tolerance:
+        return [bezier]
+    if depth >= MAX_FIT_DEPTH:
+        return None
+    split = min(max(split, 1), len(points) - 2)
+    tangent_center = _unit(points[split - 1] - points[split + 1])
+    left = _fit_cubics(points[:split + 1], tangent_start, tangent_center, tolerance, depth + 1)
+    right = _fit_cubics(points[split:], -tangent_center, tangent_end, tolerance, depth + 1)
+    if left is None or right is None:
+        return None
+    return left + right
+
+
+def _optimize_run(points: np.ndarray, tolerance: float) -> list:
+    """Optimise une suite de segments (points[0] = point courant) et retourne les segments remplaçants."""
+    points = _merge_collinear(points)
+    segments = []
+    bounds = [0] + _corner_indices(points) + [len(points) - 1]
+    for first, last in zip(bounds[:-1], bounds[1:]):
+        piece = points[first:last + 1]
+        simplified = simplify_polyline(piece, tolerance)
+        replacement = [('L', point) for point in simplified[1:]]
+        if len(simplified) >= 4 and len(piece) >= MIN_POINTS_FOR_CURVE_FIT:
+            # Portion courbe: un ajustement en Bézier est retenu s'il compte moins de points
+            cubics = _fit_cubics(piece, _unit(piece[1] - piece[0]), _unit(piece[-2] - piece[-1]), tolerance)
+            if cubics is not None and 3 * len(cubics) < len(replacement):
+                replacement = [('C', bezier[1], bezier[2], bezier[3]) for bezier in cubics]
+        segments.extend(replacement)
+    return segments
+
+
+def _flatten_if_straight(current: np.ndarray, segment: tuple, tolerance: float) -> tuple:
+    """Remplace une courbe dont les points de contrôle sont à moins de 'tolerance' de sa corde par une ligne."""
+    _kind, c1, c2, end = segment
+    if _distances_to_chord(np.array([c1, c2]), current, end).max() <= tolerance:
+        return ('L', end)
+    return segment
+
+
+def optimize_subpaths(subpaths: List[Subpath], tolerance: float) -> List[Subpath]:
+    optimized = []
+    for start, segments, closed in subpaths:
+        result = []
+        current = start
+        run = [start]
+        for segment in segments:
+            if segment[0] == 'C':
+                segment = _flatten_if_straight(current, segment, tolerance)
+            if segment[0] == 'L':
+                run.append(segment[1])
+            else:
+                if len(run) > 1:
+                    result.extend(_optimize_run(np.array(run), tolerance))
+                result.append(segment)
+                run = [segment[3]]
+            current = segment[-1]
+        if len(run) > 1:
+            result.extend(_optimize_run(np.array(run), tolerance))
+        optimized.append((start, result, closed))
+    return optimized
+
+
+def _subpaths_to_path_data(subpaths: List[Subpath]) -> str:
+    types, points = [], []
+    for start, segments, closed in subpaths:
+        types.append(_MOVE)
+        points.append(start)
+        for segment in segments:
+            if segment[0] == 'L':
+                types.append(_LINE)
+                points.append(segment[1])
+            else:
+                types.extend((_CURVE, _CURVE_DATA, _CURVE_DATA))
+                points.extend(segment[1:])
+        if closed:
+            # Toujours écrit comme 'z', même si le dernier segment finit déjà au départ:
+            # sans lui le contour serait ouvert (pas de jonction au point de départ)
+            types.append(_LINE)
+            points.append(start)
+    return svg_path_data_from_elements(types, np.array(points))
+
+
+def optimize_svg_path_data(d: str, tolerance_mm: float = DEFAULT_TOLERANCE_MM) -> Tuple[str, int, int]:
+    """
+    Optimise un attribut 'd'. Retourne (données, points avant, points après); les données
+    sont rendues inchangées si le chemin n'est pas pris en charge ou ne serait pas réduit.
+    """
+    subpaths = parse_svg_path_data(d)
+    if not subpaths:
+        return d, 0, 0
+    before = _count_points(subpaths)
+    optimized = optimize_subpaths(subpaths, tolerance_mm)
+    after = _count_points(optimized)
+    if after >= before:
+        return d, before, before
+    return _subpaths_to_path_data(optimized), before, after
+
+
+def optimize_svg_paths(svg_content: str, tolerance_mm: float = DEFAULT_TOLERANCE_MM) -> Tuple[str, PathOptimizationStats]:
+    """
+    Optimise tous les éléments <path> d'un SVG dont les unités utilisateur sont des mm
+    (cas des SVG de generate_svg_with_text_as_paths). Une tolérance <= 0 désactive l'étape.
+    """
+    stats = PathOptimizationStats()
+    if tolerance_mm <= 0:
+        return svg_content, stats
+
+    def replace(match):
+        d, before, after = optimize_svg_path_data(match.group(2), tolerance_mm)
+        if before:
+            stats.paths += 1
+        stats.points_before += before
+        stats.points_after += after
+        return match.group(1) + d + match.group(3)
+
+    optimized_svg = _PATH_ELEMENT_RE.sub(replace, svg_content)
+    logger.debug(f"Optimisation des chemins SVG (tolérance {tolerance_mm} mm): {stats.paths} chemin(s), "
+                f"{stats.points_removed} point(s) retiré(s) sur {stats.points_before}.")
+    return optimized_svg, stats
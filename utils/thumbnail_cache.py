@@ -0,0 +1,313 @@
+"""
+Cache persistant des miniatures de factures (images et PDF).
+
+Deux niveaux:
+    - Mémoire: QPixmap récemment utilisés (LRU, thread GUI uniquement).
+    - Disque: petites images PNG adressées par contenu dans le dossier utilisateur
+      'ThumbnailCache', avec une taille totale plafonnée (éviction LRU).
+
+La clé d'une miniature est dérivée du hachage du contenu du fichier, de sa taille et de
+la taille cible: un même reçu n'est donc rasterisé qu'une seule fois, même s'il est
+réextrait d'un .rdj sous un autre chemin. La date de modification sert à valider le
+hachage mémorisé pour un chemin, afin de ne pas relire un fichier inchangé.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from PyQt5.QtCore import QBuffer, QByteArray, QIODevice, Qt
+from PyQt5.QtGui import QImage, QImageReader, QPixmap
+import logging
+
+from utils.paths import get_user_data_path
+
+logger = logging.getLogger('GDJ_App')
+
+from utils.lazy_import import lazy_import, module_available
+fitz = lazy_import("fitz") # PyMuPDF, importé au premier usage
+PYMUPDF_AVAILABLE = module_available("fitz")
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif')
+PDF_EXTENSIONS = ('.pdf',)
+
+THUMBNAIL_RENDER_SIZE = 200 # Côté le plus long des miniatures mises en cache (px)
+DEFAULT_MAX_DISK_BYTES = 64 * 1024 * 1024 # 64 Mo
+DEFAULT_MAX_MEMORY_ITEMS = 256
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# PyMuPDF ne supporte pas les appels concurrents depuis plusieurs threads:
+# les rendus PDF sont sérialisés, les images (QImageReader) restent parallèles.
+FITZ_LOCK = threading.Lock()
+
+
+def is_thumbnail_supported(file_path: str) -> bool:
+    """Indique si une miniature peut être générée pour ce type de fichier."""
+    lower_path = file_path.lower()
+    if lower_path.endswith(IMAGE_EXTENSIONS):
+        return True
+    return lower_path.endswith(PDF_EXTENSIONS) and PYMUPDF_AVAILABLE
+
+
+def render_thumbnail_image(file_path: str, data: Optional[bytes] = None,
+                           target_size: int = THUMBNAIL_RENDER_SIZE) -> QImage:
+    """
+    Rasterise la miniature d'une image ou de la première page d'un PDF, directement
+    à la taille cible (pas de rendu pleine résolution suivi d'une réduction).
+    Utilisable hors du thread GUI (QImage uniquement).
+
+    Args:
+        file_path: Chemin du fichier (sert aussi à déterminer le type).
+        data: Optionnel. Contenu du fichier déjà en mémoire (ex: facture non extraite d'un .rdj).
+        target_size: Côté le plus long de la miniature, en pixels.
+
+    Returns:
+        Une QImage (nulle en cas d'échec).
+    """
+    lower_path = file_path.lower()
+    if lower_path.endswith(IMAGE_EXTENSIONS):
+        if data is not None:
+            buffer = QBuffer()
+            buffer.setData(QByteArray(data))
+            buffer.open(QIODevice.ReadOnly)
+            reader = QImageReader(buffer)
+        else:
+            reader = QImageReader(file_path)
+        reader.setAutoTransform(True)
+        original_size = reader.size()
+        if original_size.isValid() and max(original_size.width(), original_size.height()) > target_size:
+            # Le décodeur réduit l'image pendant la lecture (rapide pour les JPEG)
+            reader.setScaledSize(original_size.scaled(target_size, target_size, Qt.KeepAspectRatio))
+        image = reader.read()
+        if image.isNull():
+            logger.error(f"Impossible de charger l'image {file_path}: {reader.errorString()}")
+        return image
+
+    if lower_path.endswith(PDF_EXTENSIONS) and PYMUPDF_AVAILABLE:
+        with FITZ_LOCK:
+            doc = fitz.open(stream=data, filetype="pdf") if data is not None else fitz.open(file_path)
+            try:
+                if len(doc) == 0:
+                    logger.error(f"PDF vide {file_path}")
+                    return QImage()
+                page = doc.load_page(0)
+                longest_side = max(page.rect.width, page.rect.height) or 1
+                zoom = target_size / longest_side
+                pdf_pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+                # copy(): les échantillons appartiennent à fitz et seront libérés
+                return QImage(pdf_pix.samples, pdf_pix.width, pdf_pix.height, pdf_pix.stride, QImage.Format_RGB888).copy()
+            finally:
+                doc.close()
+
+    return QImage()
+
+
+class ThumbnailCache:
+    """Cache à deux niveaux (mémoire + disque) des miniatures de factures."""
+
+    _instance = None
+
+    def __init__(self, cache_dir: Optional[Path] = None,
+                 max_disk_bytes: int = DEFAULT_MAX_DISK_BYTES,
+                 max_memory_items: int = DEFAULT_MAX_MEMORY_ITEMS):
+        self.cache_dir = Path(cache_dir) if cache_dir else get_user_data_path("ThumbnailCache")
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_items = max_memory_items
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, QPixmap]" = OrderedDict()
+        self._file_hashes = {} # chemin -> (taille, mtime_ns, hachage)
+        self._disk_usage = None # Calculé au premier accès disque
+
+    @classmethod
+    def get_instance(cls) -> 'ThumbnailCache':
+        """Retourne l'instance singleton du cache de miniatures."""
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    # --- Clés ---
+    def _content_hash(self, file_path: str, data: Optional[bytes]) -> Optional[str]:
+        if data is not None:
+            return f"{hashlib.blake2b(data, digest_size=16).hexdigest()}_{len(data)}"
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+        memo_key = os.path.abspath(file_path)
+        with self._lock:
+            memo = self._file_hashes.get(memo_key)
+        if memo and memo[0] == st.st_size and memo[1] == st.st_mtime_ns:
+            return memo[2]
+        hasher = hashlib.blake2b(digest_size=16)
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                hasher.update(chunk)
+        digest = f"{hasher.hexdigest()}_{st.st_size}"
+        with self._lock:
+            self._file_hashes[memo_key] = (st.st_size, st.st_mtime_ns, digest)
+        return digest
+
+    def cache_key(self, file_path: str, data: Optional[bytes] = None,
+                  target_size: int = THUMBNAIL_RENDER_SIZE) -> Optional[str]:
+        """Retourne la clé de cache d'une miniature, ou None si le fichier est illisible."""
+        content_hash = self._content_hash(file_path, data)
+        if content_hash is None:
+            return None
+        return f"{content_hash}_{target_size}"
+
+    def _disk_path(self, key: str) -> Path:
+        # Sous-dossiers à 2 caractères pour éviter des milliers de fichiers dans un seul dossier
+        return self.cache_dir / key[:2] / f"{key}.png"
+
+    # --- Niveau disque (utilisable depuis n'importe quel thread) ---
+    def _ensure_disk_usage(self):
+        if self._disk_usage is None:
+            total = 0
+            for png_file in self.cache_dir.glob("*/*.png"):
+                try:
+                    total += png_file.stat().st_size
+                except OSError:
+                    pass
+            self._disk_usage = total
+
+    def load_image(self, key: str) -> Optional[QImage]:
+        """Lit une miniature depuis le disque et la marque comme récemment utilisée."""
+        disk_path = self._disk_path(key)
+        if not disk_path.exists():
+            return None
+        image = QImage(str(disk_path))
+        if image.isNull():
+            return None
+        try:
+            os.utime(disk_path) # La date de modification sert d'horodatage LRU
+        except OSError:
+            pass
+        return image
+
+    def store_image(self, key: str, image: QImage):
+        """Écrit une miniature sur le disque puis applique le plafond de taille."""
+        if image.isNull():
+            return
+        disk_path = self._disk_path(key)
+        try:
+            disk_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = disk_path.with_suffix(f".{threading.get_ident()}.tmp")
+            if not image.save(str(tmp_path), "PNG"):
+                logger.warning(f"Impossible d'écrire la miniature en cache: {disk_path}")
+                return
+            os.replace(tmp_path, disk_path)
+            with self._lock:
+                self._ensure_disk_usage()
+                self._disk_usage += disk_path.stat().st_size
+                if self._disk_usage > self.max_disk_bytes:
+                    self._evict_disk_locked()
+        except OSError as e:
+            logger.warning(f"Erreur d'écriture du cache de miniatures ({disk_path}): {e}")
+
+    def _evict_disk_locked(self):
+        """Supprime les miniatures les moins récemment utilisées jusqu'à 90 % du plafond."""
+        entries = []
+        for png_file in self.cache_dir.glob("*/*.png"):
+            try:
+                st = png_file.stat()
+                entries.append((st.st_mtime, st.st_size, png_file))
+            except OSError:
+                pass
+        entries.sort()
+        total = sum(size for _mtime, size, _path in entries)
+        target = int(self.max_disk_bytes * 0.9)
+        removed = 0
+        for _mtime, size, png_file in entries:
+            if total <= target:
+                break
+            try:
+                png_file.unlink()
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+        self._disk_usage = total
+        logger.debug(f"Cache de miniatures: {removed} fichier(s) évincé(s), {total} octets restants.")
+
+    def get_image(self, file_path: str, data: Optional[bytes] = None,
+                  target_size: int = THUMBNAIL_RENDER_SIZE) -> QImage:
+        """
+        Retourne la miniature (QImage) d'un fichier: depuis le disque si elle y est,
+        sinon en la rasterisant puis en l'enregistrant. Utilisable hors du thread GUI.
+        """
+        key = self.cache_key(file_path, data, target_size)
+        return self.image_for_key(key, file_path, data, target_size)
+
+    def image_for_key(self, key: Optional[str], file_path: str, data: Optional[bytes] = None,
+                      target_size: int = THUMBNAIL_RENDER_SIZE) -> QImage:
+        """Comme get_image(), pour une clé déjà calculée avec cache_key()."""
+        if key is not None:
+            cached = self.load_image(key)
+            if cached is not None:
+                return cached
+        image = render_thumbnail_image(file_path, data, target_size)
+        if key is not None and not image.isNull():
+            self.store_image(key, image)
+        return image
+
+    # --- Niveau mémoire (thread GUI uniquement: QPixmap) ---
+    def lookup_pixmap(self, key: str) -> Optional[QPixmap]:
+        """Retourne le QPixmap en mémoire pour cette clé, s'il existe."""
+        pixmap = self._memory.get(key)
+        if pixmap is not None:
+            self._memory.move_to_end(key)
+        return pixmap
+
+    def remember_pixmap(self, key: str, pixmap: QPixmap):
+        """Ajoute un QPixmap au niveau mémoire (LRU borné)."""
+        if pixmap.isNull():
+            return
+        self._memory[key] = pixmap
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def peek_pixmap(self, file_path: str, target_size: int = THUMBNAIL_RENDER_SIZE) -> Optional[QPixmap]:
+        """
+        Retourne le QPixmap en mémoire pour ce fichier sans jamais le lire ni le rasteriser
+        (seul un stat() est fait pour valider le hachage mémorisé). None si absent.
+        """
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+        with self._lock:
+            memo = self._file_hashes.get(os.path.abspath(file_path))
+        if not memo or memo[0] != st.st_size or memo[1] != st.st_mtime_ns:
+            return None
+        return self.lookup_pixmap(f"{memo[2]}_{target_size}")
+
+    def get_pixmap(self, file_path: str, data: Optional[bytes] = None,
+                   target_size: int = THUMBNAIL_RENDER_SIZE) -> QPixmap:
+        """Retourne la miniature d'un fichier sous forme de QPixmap (nul en cas d'échec)."""
+        key = self.cache_key(file_path, data, target_size)
+        if key is not None:
+            pixmap = self.lookup_pixmap(key)
+            if pixmap is not None:
+                return pixmap
+        image = self.image_for_key(key, file_path, data, target_size)
+        pixmap = QPixmap.fromImage(image) if not image.isNull() else QPixmap()
+        if key is not None:
+            self.remember_pixmap(key, pixmap)
+        return pixmap
+
+    def clear(self):
+        """Vide les deux niveaux du cache."""
+        self._memory.clear()
+        with self._lock:
+            for png_file in self.cache_dir.glob("*/*.png"):
+                try:
+                    png_file.unlink()
+                except OSError:
+                    pass
+            self._disk_usage = 0
@@ -0,0 +1,137 @@
+"""
+Rendu des miniatures de factures en arrière-plan.
+
+Les miniatures sont rasterisées (via ThumbnailCache) dans un QThreadPool dédié au
+nombre de threads borné. Le demandeur affiche un placeholder immédiatement et reçoit
+le QPixmap final dans le thread GUI, via un signal, lorsque le travail est terminé.
+Une demande peut être annulée (miniature retirée, widget détruit).
+"""
+
+import itertools
+import threading
+from typing import Callable, Dict, Optional
+
+from PyQt5.QtCore import QObject, QRunnable, QThread, QThreadPool, pyqtSignal, pyqtSlot
+from PyQt5.QtGui import QImage, QPixmap
+import logging
+
+from utils.thumbnail_cache import ThumbnailCache, THUMBNAIL_RENDER_SIZE
+
+logger = logging.getLogger('GDJ_App')
+
+# Fonction appelée dans le thread de rendu pour obtenir le contenu d'un fichier non présent sur le disque
+DataLoader = Callable[[], bytes]
+
+
+class _ThumbnailJobSignals(QObject):
+    """Signaux partagés par les travaux de rendu (l'objet vit dans le thread GUI)."""
+    done = pyqtSignal(int, str, QImage) # job_id, cache_key, image
+
+
+class _ThumbnailJob(QRunnable):
+    """Travail de rendu d'une miniature exécuté dans le QThreadPool."""
+
+    def __init__(self, job_id: int, file_path: str, data_loader: Optional[DataLoader],
+                 target_size: int, signals: _ThumbnailJobSignals):
+        super().__init__()
+        self.job_id = job_id
+        self.file_path = file_path
+        self.data_loader = data_loader
+        self.target_size = target_size
+        self.signals = signals
+        self.cancelled = threading.Event()
+
+    def run(self):
+        if self.cancelled.is_set():
+            return # Annulé avant d'avoir démarré: rien à faire
+        key, image = "", QImage()
+        try:
+            cache = ThumbnailCache.get_instance()
+            data = self.data_loader() if self.data_loader else None
+            key = cache.cache_key(self.file_path, data, self.target_size) or ""
+            image = cache.image_for_key(key or None, self.file_path, data, self.target_size)
+        except Exception as e:
+            logger.error(f"Erreur de rendu de la miniature {self.file_path}: {e}")
+        if not self.cancelled.is_set():
+            self.signals.done.emit(self.job_id, key, image)
+
+
+class ThumbnailRenderer(QObject):
+    """Pool de rendu des miniatures avec placeholder immédiat et remplacement par signal."""
+
+    thumbnail_ready = pyqtSignal(int, QPixmap) # job_id, pixmap (nul si le rendu a échoué)
+
+    _instance = None
+
+    def __init__(self, max_concurrent_jobs: Optional[int] = None, parent=None):
+        super().__init__(parent)
+        if max_concurrent_jobs is None:
+            max_concurrent_jobs = max(1, min(4, QThread.idealThreadCount() - 1))
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max_concurrent_jobs)
+        self._job_ids = itertools.count(1)
+        self._jobs: Dict[int, _ThumbnailJob] = {}
+        self._callbacks: Dict[int, Callable[[QPixmap], None]] = {}
+        self._signals = _ThumbnailJobSignals(self)
+        self._signals.done.connect(self._on_job_done)
+
+    @classmethod
+    def get_instance(cls) -> 'ThumbnailRenderer':
+        """Retourne l'instance singleton (à utiliser depuis le thread GUI)."""
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def cached_pixmap(self, file_path: str, target_size: int = THUMBNAIL_RENDER_SIZE) -> Optional[QPixmap]:
+        """Retourne la miniature si elle est déjà en mémoire, sans lire le fichier ni bloquer."""
+        return ThumbnailCache.get_instance().peek_pixmap(file_path, target_size)
+
+    def request(self, file_path: str, callback: Callable[[QPixmap], None],
+                data_loader: Optional[DataLoader] = None,
+                target_size: int = THUMBNAIL_RENDER_SIZE) -> int:
+        """
+        Planifie le rendu d'une miniature.
+
+        Args:
+            file_path: Chemin du fichier (image ou PDF).
+            callback: Appelé dans le thread GUI avec le QPixmap final (nul en cas d'échec).
+            data_loader: Optionnel. Fournit le contenu du fichier s'il n'est pas sur le disque
+                         (facture d'un .rdj ouvert paresseusement). Appelé dans le thread de rendu.
+            target_size: Côté le plus long de la miniature, en pixels.
+
+        Returns:
+            L'identifiant du travail, utilisable avec cancel().
+        """
+        job_id = next(self._job_ids)
+        job = _ThumbnailJob(job_id, file_path, data_loader, target_size, self._signals)
+        self._jobs[job_id] = job
+        self._callbacks[job_id] = callback
+        self._pool.start(job)
+        return job_id
+
+    def cancel(self, job_id: int):
+        """Annule un travail: il ne démarre pas s'il est en attente et son résultat est ignoré."""
+        job = self._jobs.pop(job_id, None)
+        self._callbacks.pop(job_id, None)
+        if job is not None:
+            job.cancelled.set()
+
+    def pending_count(self) -> int:
+        """Nombre de travaux planifiés ou en cours."""
+        return len(self._jobs)
+
+    @pyqtSlot(int, str, QImage)
+    def _on_job_done(self, job_id: int, key: str, image: QImage):
+        self._jobs.pop(job_id, None)
+        callback = self._callbacks.pop(job_id, None)
+        if callback is None:
+            return # Annulé entre-temps
+        pixmap = QPixmap.fromImage(image) if not image.isNull() else QPixmap()
+        if key and not pixmap.isNull():
+            ThumbnailCache.get_instance().remember_pixmap(key, pixmap)
+        self.thumbnail_ready.emit(job_id, pixmap)
+        try:
+            callback(pixmap)
+        except RuntimeError as e:
+            # Le widget destinataire a été détruit sans annuler la demande
+            logger.debug(f"Miniature {job_id} ignorée, destinataire détruit: {e}")
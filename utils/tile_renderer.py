@@ -0,0 +1,314 @@
+"""
+Rendu par tuiles des pages PDF et des images pour le visualiseur.
+
+Une source (page PDF ou image) est découpée en tuiles de taille fixe rendues à des
+niveaux de zoom discrets. Seules les tuiles visibles sont rendues, à partir d'un
+rectangle de découpe (clip fitz) ou d'une image décodée une fois par niveau, et
+conservées dans un cache LRU borné en octets. Zoomer ou se déplacer ne coûte donc
+que les tuiles qui deviennent visibles.
+
+Le rendu a lieu dans un QThreadPool: le widget dessine un placeholder pour une tuile
+absente et est notifié (tile_ready) lorsqu'elle arrive dans le cache.
+"""
+
+import bisect
+import itertools
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Set
+
+from PyQt5.QtCore import QObject, QRect, QRunnable, QSize, Qt, QThread, QThreadPool, pyqtSignal, pyqtSlot
+from PyQt5.QtGui import QImage, QImageIOHandler, QImageReader, QPixmap
+import logging
+
+from utils.thumbnail_cache import FITZ_LOCK
+
+from utils.lazy_import import lazy_import, module_available
+fitz = lazy_import("fitz") # PyMuPDF, importé au premier usage
+PYMUPDF_AVAILABLE = module_available("fitz")
+
+logger = logging.getLogger('GDJ_App')
+
+TILE_SIZE = 256 # Côté d'une tuile, en pixels du niveau de zoom
+# Niveaux de rendu discrets: une tuile est rendue au plus petit niveau >= zoom affiché
+ZOOM_LEVELS = (0.125, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 4.0, 6.0, 8.0)
+DEFAULT_TILE_CACHE_BYTES = 128 * 1024 * 1024
+MAX_DECODED_IMAGE_LEVELS = 2 # Images décodées gardées par ImageTileSource (niveau courant et précédent)
+PRIORITY_VISIBLE = 1 # Tuiles demandées au dessin, avant celles du préchargement
+PRIORITY_PREFETCH = 0
+
+
+def zoom_level_for(display_scale: float) -> float:
+    """Retourne le niveau de rendu discret à utiliser pour une échelle d'affichage."""
+    index = bisect.bisect_left(ZOOM_LEVELS, display_scale - 1e-6)
+    return ZOOM_LEVELS[min(index, len(ZOOM_LEVELS) - 1)]
+
+
+def tile_grid_rect(level_size: QSize, col: int, row: int) -> QRect:
+    """Rectangle (en pixels du niveau) couvert par la tuile (col, row), rogné à la source."""
+    rect = QRect(col * TILE_SIZE, row * TILE_SIZE, TILE_SIZE, TILE_SIZE)
+    return rect.intersected(QRect(0, 0, level_size.width(), level_size.height()))
+
+
+class TileSource:
+    """Source de tuiles: taille à 100 % et rendu d'un rectangle à un niveau donné."""
+
+    def __init__(self, source_id: str):
+        self.source_id = source_id # Identifie la source dans le cache de tuiles
+
+    def size(self) -> QSize:
+        raise NotImplementedError
+
+    def width(self) -> int:
+        return self.size().width()
+
+    def height(self) -> int:
+        return self.size().height()
+
+    def level_size(self, level: float) -> QSize:
+        """Taille de la source entière rendue au niveau 'level'."""
+        size = self.size()
+        return QSize(max(1, round(size.width() * level)), max(1, round(size.height() * level)))
+
+    def render_tile(self, level: float, rect: QRect) -> QImage:
+        """Rend le rectangle 'rect' (pixels du niveau 'level') et retourne une QImage de cette taille."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class PdfPageTileSource(TileSource):
+    """Page d'un document fitz déjà ouvert; chaque tuile est rendue avec un clip."""
+
+    def __init__(self, pdf_doc, page_num: int, source_id: str):
+        super().__init__(source_id)
+        self.pdf_doc = pdf_doc
+        self.page_num = page_num
+        with FITZ_LOCK:
+            self._page_rect = pdf_doc.load_page(page_num).rect
+        self._size = QSize(max(1, round(self._page_rect.width)), max(1, round(self._page_rect.height)))
+
+    def size(self) -> QSize:
+        return self._size
+
+    def render_tile(self, level: float, rect: QRect) -> QImage:
+        # Rectangle de la tuile ramené en points de la page (coordonnées à 100 %)
+        x0 = self._page_rect.x0 + rect.left() / level
+        y0 = self._page_rect.y0 + rect.top() / level
+        clip = fitz.Rect(x0, y0, x0 + rect.width() / level, y0 + rect.height() / level)
+        with FITZ_LOCK:
+            page = self.pdf_doc.load_page(self.page_num)
+            pix = page.get_pixmap(matrix=fitz.Matrix(level, level), clip=clip, alpha=False)
+            # copy(): les échantillons appartiennent à fitz et seront libérés
+            return QImage(pix.samples, pix.width, pix.height, pix.stride, QImage.Format_RGB888).copy()
+
+
+class ImageTileSource(TileSource):
+    """
+    Image sur disque. L'image est décodée une seule fois par niveau (directement à la
+    taille du niveau si le format le permet, ex. JPEG), puis les tuiles y sont découpées.
+    Au-delà de 100 %, les tuiles sont agrandies depuis l'image pleine résolution.
+    Les tuiles peuvent être rendues depuis plusieurs threads.
+    """
+
+    def __init__(self, file_path: str):
+        super().__init__(file_path)
+        self.file_path = file_path
+        self._lock = threading.Lock()
+        self._decoded = OrderedDict() # niveau de décodage -> QImage (LRU, MAX_DECODED_IMAGE_LEVELS)
+        reader = QImageReader(file_path)
+        reader.setAutoTransform(True)
+        self._size = reader.size()
+        self._scaled_decode = reader.supportsOption(QImageIOHandler.ScaledSize)
+        if not self._size.isValid() or reader.transformation() != QImageIOHandler.TransformationNone:
+            # Taille inconnue sans décodage, ou orientation EXIF à appliquer: décoder maintenant
+            full_image = reader.read()
+            self._size = full_image.size() if not full_image.isNull() else QSize()
+            self._decoded[1.0] = full_image
+            self._scaled_decode = False
+
+    def is_valid(self) -> bool:
+        return self._size.isValid() and not self._size.isEmpty()
+
+    def size(self) -> QSize:
+        return self._size
+
+    def _decode(self, decode_level: float) -> QImage:
+        reader = QImageReader(self.file_path)
+        reader.setAutoTransform(True)
+        expected = self.level_size(decode_level)
+        if decode_level < 1.0 and self._scaled_decode:
+            reader.setScaledSize(expected)
+        elif decode_level < 1.0:
+            # Format sans décodage réduit: partir de l'image pleine résolution déjà décodée
+            full_image = self._decoded.get(1.0)
+            if full_image is not None:
+                return full_image.scaled(expected, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+        image = reader.read()
+        if image.isNull():
+            logger.debug(f"Décodage impossible pour {self.file_path}: {reader.errorString()}")
+            return image
+        if image.size() != expected:
+            image = image.scaled(expected, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+        return image
+
+    def _level_image(self, level: float):
+        """(image décodée, niveau de décodage) pour un niveau de rendu; décode au plus une fois."""
+        decode_level = min(level, 1.0)
+        with self._lock:
+            image = self._decoded.get(decode_level)
+            if image is None:
+                image = self._decode(decode_level)
+                self._decoded[decode_level] = image
+                while len(self._decoded) > MAX_DECODED_IMAGE_LEVELS:
+                    self._decoded.popitem(last=False)
+            else:
+                self._decoded.move_to_end(decode_level)
+        return image, decode_level
+
+    def render_tile(self, level: float, rect: QRect) -> QImage:
+        image, decode_level = self._level_image(level)
+        if image.isNull():
+            return QImage()
+        if decode_level == level:
+            return image.copy(rect)
+        # Région correspondante dans l'image décodée, agrandie à la taille de la tuile
+        factor = decode_level / level
+        source_rect = QRect(int(rect.left() * factor), int(rect.top() * factor),
+                            max(1, round(rect.width() * factor)), max(1, round(rect.height() * factor)))
+        source_rect = source_rect.intersected(image.rect())
+        return image.copy(source_rect).scaled(rect.size(), Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+
+    def close(self):
+        with self._lock:
+            self._decoded.clear()
+
+
+class _TileJobSignals(QObject):
+    """Signaux partagés par les travaux de rendu de tuiles (l'objet vit dans le thread GUI)."""
+    done = pyqtSignal(int, object, QImage) # génération du cache, clé de la tuile, image
+
+
+class _TileJob(QRunnable):
+    """Rendu d'une tuile exécuté dans le QThreadPool du cache."""
+
+    def __init__(self, generation: int, key, source: TileSource, level: float, rect: QRect,
+                 signals: _TileJobSignals):
+        super().__init__()
+        self.generation = generation
+        self.key = key
+        self.source = source
+        self.level = level
+        self.rect = rect
+        self.signals = signals
+        self.cancelled = threading.Event()
+
+    def run(self):
+        if self.cancelled.is_set():
+            return
+        image = QImage()
+        try:
+            image = self.source.render_tile(self.level, self.rect)
+        except Exception as e:
+            logger.error(f"Erreur de rendu de la tuile {self.key}: {e}")
+        if not self.cancelled.is_set():
+            self.signals.done.emit(self.generation, self.key, image)
+
+
+class TileCache(QObject):
+    """
+    Cache LRU de tuiles (QPixmap) borné en octets, partagé par les pages d'un visualiseur.
+    Les tuiles absentes sont rendues en arrière-plan (request); tile_ready est émis
+    dans le thread GUI quand une tuile est disponible.
+    """
+
+    tile_ready = pyqtSignal(str, float, int, int) # source_id, niveau, col, row
+
+    def __init__(self, max_bytes: int = DEFAULT_TILE_CACHE_BYTES, max_concurrent_jobs: Optional[int] = None,
+                 parent=None):
+        super().__init__(parent)
+        self.max_bytes = max_bytes
+        self._tiles = OrderedDict() # (source_id, niveau, col, row) -> QPixmap
+        self._bytes = 0
+        if max_concurrent_jobs is None:
+            # Les pages PDF sont de toute façon rendues une à une (FITZ_LOCK)
+            max_concurrent_jobs = max(1, min(2, QThread.idealThreadCount() - 1))
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max_concurrent_jobs)
+        self._generation = itertools.count(1)
+        self._current_generation = next(self._generation)
+        self._pending: Dict[tuple, _TileJob] = {}
+        self._failed: Set[tuple] = set() # Tuiles dont le rendu a échoué: pas de nouvel essai
+        self._signals = _TileJobSignals(self)
+        self._signals.done.connect(self._on_job_done)
+
+    @staticmethod
+    def _pixmap_bytes(pixmap: QPixmap) -> int:
+        return pixmap.width() * pixmap.height() * 4
+
+    def get(self, key) -> Optional[QPixmap]:
+        pixmap = self._tiles.get(key)
+        if pixmap is not None:
+            self._tiles.move_to_end(key)
+        return pixmap
+
+    def put(self, key, pixmap: QPixmap):
+        old = self._tiles.pop(key, None)
+        if old is not None:
+            self._bytes -= self._pixmap_bytes(old)
+        self._tiles[key] = pixmap
+        self._bytes += self._pixmap_bytes(pixmap)
+        while self._bytes > self.max_bytes and len(self._tiles) > 1:
+            _key, evicted = self._tiles.popitem(last=False)
+            self._bytes -= self._pixmap_bytes(evicted)
+
+    def cached(self, source: TileSource, level: float, col: int, row: int) -> Optional[QPixmap]:
+        """Retourne la tuile si elle est en cache, sans jamais la rendre."""
+        return self.get((source.source_id, level, col, row))
+
+    def request(self, source: TileSource, level: float, col: int, row: int, priority: int = PRIORITY_VISIBLE):
+        """Planifie le rendu d'une tuile absente du cache (sans effet si elle est déjà en cache ou en cours)."""
+        key = (source.source_id, level, col, row)
+        if key in self._tiles or key in self._pending or key in self._failed:
+            return
+        rect = tile_grid_rect(source.level_size(level), col, row)
+        if rect.isEmpty():
+            return
+        job = _TileJob(self._current_generation, key, source, level, rect, self._signals)
+        self._pending[key] = job
+        self._pool.start(job, priority)
+
+    def cancel_pending(self, source_id: Optional[str] = None, keep_level: Optional[float] = None):
+        """Annule les rendus en attente (d'une source, sauf ceux du niveau keep_level)."""
+        for key, job in list(self._pending.items()):
+            if (source_id is None or key[0] == source_id) and key[1] != keep_level:
+                job.cancelled.set() # Le travail se termine sans rendu s'il n'a pas démarré
+                del self._pending[key]
+
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    @pyqtSlot(int, object, QImage)
+    def _on_job_done(self, generation: int, key, image: QImage):
+        if generation != self._current_generation:
+            return # Résultat d'avant clear(): la source n'est plus affichée
+        if self._pending.pop(key, None) is None:
+            return # Annulé entre-temps
+        if image.isNull():
+            self._failed.add(key)
+            return
+        self.put(key, QPixmap.fromImage(image))
+        self.tile_ready.emit(*key)
+
+    def clear(self):
+        """
+        Vide le cache et annule les rendus en attente. Attend la fin des rendus en cours:
+        la source (document fitz) peut être fermée sans risque au retour.
+        """
+        self._current_generation = next(self._generation)
+        self.cancel_pending()
+        self._pool.waitForDone()
+        self._tiles.clear()
+        self._failed.clear()
+        self._bytes = 0
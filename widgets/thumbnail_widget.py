@@ -1,5 +1,6 @@
 import sys
 import os
+import functools
 from PyQt5.QtWidgets import (
     QWidget, QLabel, QPushButton, QVBoxLayout, QHBoxLayout, QSizePolicy, QApplication
 )
@@ -7,6 +8,8 @@ from PyQt5.QtGui import QPixmap, QIcon, QPainter, QBitmap, QColor, QPainterPath,
 from PyQt5.QtCore import Qt, pyqtSignal, QSize, QRectF
 import logging # Ajout pour le logger
 
+from utils.thumbnail_renderer import ThumbnailRenderer
+
 # Initialisation du logger
 logger = logging.getLogger('GDJ_App')
 
@@ -67,6 +70,7 @@ class ThumbnailWidget(QWidget):
         super().__init__(parent)
         self.file_path = file_path
         self._border_radius = 8 # Stocker le radius ici aussi
+        self._thumbnail_job_id = None # Rendu en arrière-plan en attente (voir load_thumbnail_async)
 
         # Layout principal vertical (Image + Nom de fichier)
         main_layout = QVBoxLayout(self)
@@ -166,6 +170,55 @@ class ThumbnailWidget(QWidget):
 
         self.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed) # Le widget prend sa taille naturelle
 
+    @classmethod
+    def placeholder_pixmap(cls) -> QPixmap:
+        """Pixmap neutre affiché en attendant la miniature réelle."""
+        pixmap = QPixmap(cls.THUMBNAIL_SIZE, cls.THUMBNAIL_SIZE)
+        pixmap.fill(QColor(70, 70, 70))
+        return pixmap
+
+    def set_thumbnail_pixmap(self, pixmap: QPixmap):
+        """Remplace l'image affichée (mise à l'échelle comme dans le constructeur)."""
+        if pixmap.isNull():
+            return
+        scaled_pixmap = pixmap.scaled(self.THUMBNAIL_SIZE, self.THUMBNAIL_SIZE,
+                                      Qt.KeepAspectRatioByExpanding,
+                                      Qt.SmoothTransformation)
+        self.image_container.setPixmap(scaled_pixmap)
+
+    def load_thumbnail_async(self, data_loader=None):
+        """
+        Affiche la miniature de self.file_path: immédiatement si elle est déjà en mémoire,
+        sinon le placeholder actuel est conservé et remplacé quand le rendu en arrière-plan se termine.
+
+        Args:
+            data_loader: Optionnel. Fonction sans argument retournant le contenu du fichier
+                         s'il n'est pas sur le disque. Appelée hors du thread GUI.
+        """
+        self.cancel_thumbnail_job()
+        renderer = ThumbnailRenderer.get_instance()
+        if data_loader is None:
+            cached = renderer.cached_pixmap(self.file_path)
+            if cached is not None:
+                self.set_thumbnail_pixmap(cached)
+                return
+        self._thumbnail_job_id = renderer.request(self.file_path, self._on_thumbnail_rendered, data_loader)
+        # Si le widget est détruit avant la fin du rendu, le résultat est ignoré
+        self.destroyed.connect(functools.partial(renderer.cancel, self._thumbnail_job_id))
+
+    def cancel_thumbnail_job(self):
+        """Annule le rendu en arrière-plan en attente, s'il y en a un."""
+        if self._thumbnail_job_id is not None:
+            ThumbnailRenderer.get_instance().cancel(self._thumbnail_job_id)
+            self._thumbnail_job_id = None
+
+    def _on_thumbnail_rendered(self, pixmap: QPixmap):
+        self._thumbnail_job_id = None
+        if pixmap.isNull():
+            logger.warning(f"Miniature indisponible pour {self.file_path}, placeholder conservé.")
+            return
+        self.set_thumbnail_pixmap(pixmap)
+
     def _emit_delete_signal(self):
         self.delete_requested.emit(self.file_path)
 
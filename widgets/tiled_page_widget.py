@@ -0,0 +1,100 @@
+import math
+
+from PyQt5.QtWidgets import QWidget, QSizePolicy
+from PyQt5.QtGui import QPainter, QColor
+from PyQt5.QtCore import Qt, QRect, QRectF, pyqtSlot
+import logging
+
+from utils.tile_renderer import (PRIORITY_PREFETCH, PRIORITY_VISIBLE, TILE_SIZE, TileCache, TileSource,
+                                 tile_grid_rect, zoom_level_for)
+
+logger = logging.getLogger('GDJ_App')
+
+
+class TiledPageWidget(QWidget):
+    """
+    Affiche une page PDF ou une image à un zoom donné en ne dessinant que les tuiles
+    de la zone exposée. Les tuiles sont rendues au niveau discret le plus proche
+    (voir utils.tile_renderer) puis réduites à l'échelle d'affichage. Une tuile absente
+    du cache est demandée au rendu en arrière-plan et remplacée par un placeholder
+    jusqu'à son arrivée: le dessin ne bloque jamais sur PyMuPDF ou le décodage d'image.
+    """
+
+    PLACEHOLDER_COLOR = QColor(235, 235, 235)
+
+    def __init__(self, source: TileSource, tile_cache: TileCache, zoom: float = 1.0, parent=None):
+        super().__init__(parent)
+        self.source = source
+        self.tile_cache = tile_cache
+        self.zoom = zoom
+        self.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+        self.setAttribute(Qt.WA_OpaquePaintEvent, True)
+        self._apply_size()
+        self.tile_cache.tile_ready.connect(self._on_tile_ready)
+
+    def _apply_size(self):
+        size = self.source.size()
+        self.setFixedSize(max(1, int(size.width() * self.zoom)), max(1, int(size.height() * self.zoom)))
+
+    def set_zoom(self, zoom: float):
+        """Change le zoom affiché (la taille du widget suit)."""
+        if abs(zoom - self.zoom) < 1e-6:
+            return
+        self.zoom = zoom
+        # Les tuiles encore attendues à l'ancien niveau ne seront plus dessinées
+        self.tile_cache.cancel_pending(self.source.source_id, keep_level=self._render_level())
+        self._apply_size()
+        self.update()
+
+    def _render_level(self) -> float:
+        return zoom_level_for(self.zoom * self.devicePixelRatioF())
+
+    def _tiles_for(self, widget_rect: QRect, level: float):
+        """Itère sur (col, row, rectangle niveau) des tuiles couvrant widget_rect."""
+        scale = level / self.zoom # pixels du niveau par pixel du widget
+        level_size = self.source.level_size(level)
+        first_col = max(0, int(widget_rect.left() * scale) // TILE_SIZE)
+        first_row = max(0, int(widget_rect.top() * scale) // TILE_SIZE)
+        last_col = min(math.ceil(level_size.width() / TILE_SIZE) - 1, int((widget_rect.right() + 1) * scale) // TILE_SIZE)
+        last_row = min(math.ceil(level_size.height() / TILE_SIZE) - 1, int((widget_rect.bottom() + 1) * scale) // TILE_SIZE)
+        for row in range(first_row, last_row + 1):
+            for col in range(first_col, last_col + 1):
+                yield col, row, tile_grid_rect(level_size, col, row)
+
+    def _widget_rect(self, level_rect: QRect, level: float) -> QRectF:
+        """Rectangle du widget couvert par une tuile (bords arrondis au pixel: pas de joints visibles)."""
+        inverse = self.zoom / level # pixels du widget par pixel du niveau
+        left, top = round(level_rect.left() * inverse), round(level_rect.top() * inverse)
+        right = round((level_rect.left() + level_rect.width()) * inverse)
+        bottom = round((level_rect.top() + level_rect.height()) * inverse)
+        return QRectF(left, top, right - left, bottom - top)
+
+    def prefetch(self, widget_rect: QRect):
+        """Demande en arrière-plan, sans dessiner, les tuiles couvrant widget_rect (coordonnées du widget)."""
+        if widget_rect.isEmpty():
+            return
+        level = self._render_level()
+        for col, row, _rect in self._tiles_for(widget_rect, level):
+            self.tile_cache.request(self.source, level, col, row, PRIORITY_PREFETCH)
+
+    @pyqtSlot(str, float, int, int)
+    def _on_tile_ready(self, source_id: str, level: float, col: int, row: int):
+        if source_id != self.source.source_id or level != self._render_level() or not self.isVisible():
+            return
+        level_rect = tile_grid_rect(self.source.level_size(level), col, row)
+        self.update(self._widget_rect(level_rect, level).toAlignedRect())
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(event.rect(), QColor(Qt.white))
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        level = self._render_level()
+        for col, row, level_rect in self._tiles_for(event.rect(), level):
+            target = self._widget_rect(level_rect, level)
+            pixmap = self.tile_cache.cached(self.source, level, col, row)
+            if pixmap is None:
+                painter.fillRect(target, self.PLACEHOLDER_COLOR)
+                self.tile_cache.request(self.source, level, col, row, PRIORITY_VISIBLE)
+                continue
+            painter.drawPixmap(target, pixmap, QRectF(pixmap.rect()))
+        painter.end()
@@ -22,12 +22,9 @@ from PyQt5.QtWidgets import (
 )
 # ------------------------------------
 # --- PyMuPDF Import ---
-try:
-    import fitz # PyMuPDF
-    PYMUPDF_AVAILABLE = True
-except ImportError:
-    PYMUPDF_AVAILABLE = False
-    fitz = None
+from utils.lazy_import import lazy_import, module_available
+fitz = lazy_import("fitz") # PyMuPDF, importé au premier usage
+PYMUPDF_AVAILABLE = module_available("fitz")
 # ---------------------
 
 # --- QPixmap est à nouveau nécessaire --- 
@@ -48,17 +45,22 @@ from utils.theme import get_theme_vars
 # --- NOUVEAUX Imports --- 
 from typing import List, Union
 from models.documents.rapport_depense.facture import Facture
+from utils.tile_renderer import TileCache, PdfPageTileSource, ImageTileSource
+from widgets.tiled_page_widget import TiledPageWidget
 # -------------------------
 
 class MediaViewer(QWidget):
     """
     Fenêtre modale pour afficher des fichiers image ou PDF.
-    Utilise PyMuPDF pour rendre les pages PDF en haute résolution une fois.
-    Le zoom est géré par mise à l'échelle Qt des QLabels.
+    Les pages PDF et les images sont affichées par tuiles (TiledPageWidget): seules les
+    tuiles visibles, plus une fenêtre de préchargement, sont rendues à un niveau de zoom
+    discret proche du zoom courant, puis gardées dans un cache LRU borné.
     Inclut une barre d'outils personnalisée avec navigation de page interactive.
     """
-    PDF_RENDER_ZOOM = 1.5 # Facteur de zoom pour le rendu initial des PDF (150%)
     SCROLL_UPDATE_DELAY = 150 # ms délai pour mise à jour page après scroll
+    PREFETCH_SCREENS = 1 # Hauteurs d'écran préchargées au-dessus et au-dessous de la vue (PDF)
+    TILE_CACHE_BUDGET = 128 * 1024 * 1024 # Octets max. de tuiles gardées en mémoire
+    PREFETCH_DELAY = 30 # ms délai pour regrouper les préchargements pendant le scroll/zoom
 
     def __init__(self, media_source: Union[str, Facture, List[str]], 
                  initial_index: int = 0, parent=None):
@@ -105,10 +107,11 @@ class MediaViewer(QWidget):
         self.zoom_step = 0.1
         
         # --- Nouveaux attributs pour cette approche --- 
-        self.page_labels = [] # Liste des QLabel contenant les pages PDF rendues
-        self.original_pdf_pixmaps = [] # Liste des QPixmap originaux haute résolution
-        self.image_display_label = None 
-        self.original_image_pixmap = None 
+        self.page_labels = [] # Liste des TiledPageWidget (un par page PDF, rendus par tuiles)
+        self.pdf_page_sizes = [] # Taille (largeur, hauteur) de chaque page PDF à 100 %
+        self.tile_cache = TileCache(self.TILE_CACHE_BUDGET, parent=self) # Tuiles rendues (PDF et images)
+        self.image_display_widget = None 
+        self.image_tile_source = None # Source de tuiles de l'image (taille à 100 % sans décodage complet)
         
         # --- Attributs pour le Drag-to-Scroll --- 
         self.is_dragging = False
@@ -122,6 +125,13 @@ class MediaViewer(QWidget):
         self._scroll_update_timer.timeout.connect(self._update_current_page_input)
         # --------------------------------------------
 
+        # --- Timer pour le préchargement des tuiles PDF autour de la vue --- 
+        self._prefetch_timer = QTimer(self)
+        self._prefetch_timer.setSingleShot(True)
+        self._prefetch_timer.setInterval(self.PREFETCH_DELAY)
+        self._prefetch_timer.timeout.connect(self._prefetch_pdf_tiles)
+        # --------------------------------------------
+
         main_layout = QVBoxLayout(self)
         main_layout.setContentsMargins(5, 5, 5, 5)
         main_layout.setSpacing(5)
@@ -329,6 +339,8 @@ class MediaViewer(QWidget):
 
     def _clear_previous_content(self):
         """ Vide le contenu actuel et réinitialise les états liés au PDF. """
+        self._prefetch_timer.stop()
+        self.tile_cache.clear() # Annule les rendus de tuiles et attend ceux en cours avant de fermer le PDF
         if self.pdf_doc:
             try: self.pdf_doc.close()
             except: pass
@@ -338,13 +350,16 @@ class MediaViewer(QWidget):
         while self.scroll_content_layout.count():
             child = self.scroll_content_layout.takeAt(0)
             if child.widget():
+                child.widget().hide() # Ne plus dessiner de tuiles d'un document fermé
                 child.widget().deleteLater()
                 
         # --- Réinitialiser les listes PDF --- 
         self.page_labels = []
-        self.original_pdf_pixmaps = []
-        self.image_display_label = None
-        self.original_image_pixmap = None
+        self.pdf_page_sizes = []
+        self.image_display_widget = None
+        if self.image_tile_source:
+            self.image_tile_source.close()
+        self.image_tile_source = None
 
     def _load_media(self):
         self.file_path = self.file_list[self.current_file_index]
@@ -399,9 +414,9 @@ class MediaViewer(QWidget):
         # --------------------------------------------------
 
         if self.is_image:
-            # --- Charger l'image originale --- 
-            self.original_image_pixmap = QPixmap(self.file_path)
-            if self.original_image_pixmap.isNull():
+            # --- Lire la taille de l'image (les tuiles sont décodées à la demande) --- 
+            self.image_tile_source = ImageTileSource(self.file_path)
+            if not self.image_tile_source.is_valid():
                 error_label = QLabel("Impossible de charger l'image...")
                 self.scroll_content_layout.addWidget(error_label)
                 self.zoom_out_button.setVisible(False)
@@ -412,12 +427,10 @@ class MediaViewer(QWidget):
                 self.fit_height_button.setVisible(False)
                 self.fit_page_button.setVisible(False)
             else:
-                # --- Créer le QLabel pour l'affichage --- 
-                self.image_display_label = QLabel()
-                self.image_display_label.setAlignment(Qt.AlignCenter)
-                self.image_display_label.setScaledContents(True)
-                # Ajouter le QLabel au layout
-                self.scroll_content_layout.addWidget(self.image_display_label)
+                # --- Créer le widget d'affichage par tuiles --- 
+                self.image_display_widget = TiledPageWidget(self.image_tile_source, self.tile_cache, self.current_zoom)
+                # Ajouter le widget au layout
+                self.scroll_content_layout.addWidget(self.image_display_widget, 0, Qt.AlignCenter)
                 self.scroll_content_layout.addStretch()
                 
                 # --- Appliquer Fit to Page directement (différé) --- 
@@ -427,11 +440,13 @@ class MediaViewer(QWidget):
         elif self.is_pdf:
             self.page_input.setVisible(True)
             self.total_pages_label.setVisible(True)
-            # --- Rendu unique haute résolution --- 
-            self._render_all_pdf_pages_high_res()
-            if self.page_labels: # Si le rendu a réussi
+            # --- Mise en page virtuelle (rendu à la demande) --- 
+            self._layout_pdf_pages()
+            if self.page_labels: # Si l'ouverture a réussi
                  # --- Appliquer Fit to Page directement (différé) --- 
                  QTimer.singleShot(0, self._fit_to_page)
+                 # Premier préchargement (aussi nécessaire si le fit ne change pas le zoom)
+                 self._schedule_prefetch()
             # ----------------------------------
         else:
              # ... (gestion type non supporté, désactiver zoom)
@@ -449,8 +464,14 @@ class MediaViewer(QWidget):
         self._update_navigation_state()
         # ---------------------------------------------------------
 
-    # --- NOUVELLE fonction pour le rendu initial PDF --- 
-    def _render_all_pdf_pages_high_res(self):
+    # --- Mise en page PDF virtualisée --- 
+    def _layout_pdf_pages(self):
+        """
+        Ouvre le PDF et crée un TiledPageWidget par page, dimensionné d'après la taille
+        de la page. Aucune page n'est rasterisée ici: les tuiles sont rendues en arrière-plan
+        (et préchargées par _prefetch_pdf_tiles). Le document reste ouvert tant que le
+        fichier est affiché.
+        """
         if not PYMUPDF_AVAILABLE:
              # ... (gestion module manquant)
              return
@@ -467,42 +488,35 @@ class MediaViewer(QWidget):
             self.page_input.setValidator(self.page_validator)
             self.total_pages_label.setText(f" / {self.total_pages}")
             
-            # Matrice pour rendu haute résolution
-            render_matrix = fitz.Matrix(self.PDF_RENDER_ZOOM, self.PDF_RENDER_ZOOM)
-            max_width = 0
-            
             # Vider les listes avant de remplir
             self.page_labels = []
-            self.original_pdf_pixmaps = []
+            self.pdf_page_sizes = []
+            self.tile_cache.clear()
+            max_width = 0
             
             for page_num in range(self.total_pages):
-                page = self.pdf_doc.load_page(page_num)
-                pix = page.get_pixmap(matrix=render_matrix, alpha=False)
-                
-                qimage = QImage(pix.samples, pix.width, pix.height, pix.stride, QImage.Format_RGB888)
-                qpixmap_high_res = QPixmap.fromImage(qimage)
-                self.original_pdf_pixmaps.append(qpixmap_high_res)
+                # page.rect ne nécessite pas de rasterisation (taille en points à 100 %)
+                page_source = PdfPageTileSource(self.pdf_doc, page_num, f"{self.file_path}#{page_num}")
+                page_width, page_height = page_source.width(), page_source.height()
+                self.pdf_page_sizes.append((page_width, page_height))
+                if page_width > max_width:
+                     max_width = page_width
                 
-                if qpixmap_high_res.width() > max_width:
-                     max_width = qpixmap_high_res.width()
+                # Créer le widget de la page
+                page_widget = TiledPageWidget(page_source, self.tile_cache, self.current_zoom)
+                self.page_labels.append(page_widget)
+                self.scroll_content_layout.addWidget(page_widget, 0, Qt.AlignCenter)
                 
-                # Créer le QLabel
-                page_label = QLabel()
-                page_label.setAlignment(Qt.AlignCenter)
-                page_label.setScaledContents(True) # IMPORTANT pour le zoom Qt
-                # Pas besoin de setPixmap ici, _apply_pdf_zoom le fera avec la bonne taille initiale
-                self.page_labels.append(page_label)
-                self.scroll_content_layout.addWidget(page_label)
-                
-            self.scroll_content_widget.setMinimumWidth(int(max_width / self.PDF_RENDER_ZOOM) + 20) # Basé sur taille 100%
+            self.scroll_content_widget.setMinimumWidth(int(max_width) + 20) # Basé sur taille 100%
 
         except Exception as e:
             # ... (gestion erreur ouverture)
             QMessageBox.critical(self, "Erreur PDF", f"Impossible de rendre le PDF initial:\n{e}")
+            self.tile_cache.clear()
             if self.pdf_doc: self.pdf_doc.close(); self.pdf_doc = None
             self.total_pages = 0
             self.page_labels = []
-            self.original_pdf_pixmaps = []
+            self.pdf_page_sizes = []
             # Mettre à jour UI pour erreur
             self.page_input.setVisible(False)
             self.total_pages_label.setVisible(False)
@@ -515,16 +529,36 @@ class MediaViewer(QWidget):
             self.fit_page_button.setVisible(False)
             self.download_button.setEnabled(False)
             return
-        finally:
-            # Fermer le document après rendu initial car on a les pixmaps
-            if self.pdf_doc:
-                 try: self.pdf_doc.close(); self.pdf_doc = None
-                 except: pass
+    # ------------------------------------------------------
+
+    # --- Préchargement des tuiles PDF autour de la vue --- 
+    def _schedule_prefetch(self):
+        """Regroupe les demandes de préchargement (scroll, zoom, redimensionnement)."""
+        if getattr(self, 'is_pdf', False) and self.page_labels:
+            self._prefetch_timer.start()
+
+    def _prefetch_pdf_tiles(self):
+        """
+        Demande en arrière-plan les tuiles situées jusqu'à PREFETCH_SCREENS hauteurs d'écran
+        au-dessus et au-dessous de la vue. Les tuiles visibles sont demandées au dessin.
+        """
+        if not self.pdf_doc or not self.page_labels:
+            return
+        viewport = self.scroll_area.viewport()
+        margin = viewport.height() * self.PREFETCH_SCREENS
+        prefetch_area = QRect(self.scroll_area.horizontalScrollBar().value(),
+                              self.scroll_area.verticalScrollBar().value() - margin,
+                              viewport.width(), viewport.height() + 2 * margin)
+        for page_widget in self.page_labels:
+            page_area = prefetch_area.intersected(page_widget.geometry())
+            if page_area.isEmpty():
+                continue
+            page_widget.prefetch(page_area.translated(-page_widget.pos()))
     # ------------------------------------------------------
     
     # --- Méthode de zoom PDF modifiée (mise à l'échelle Qt) --- 
     def _apply_pdf_zoom(self, new_zoom, anchor_scroll=True):
-        if not self.page_labels or not self.original_pdf_pixmaps: return
+        if not self.page_labels or not self.pdf_page_sizes: return
         
         # --- Sauvegarde ancre VERTICALE --- 
         old_zoom = self.current_zoom
@@ -569,14 +603,10 @@ class MediaViewer(QWidget):
         max_width = 0
         
         for i, label in enumerate(self.page_labels):
-            original_pixmap = self.original_pdf_pixmaps[i]
-            original_size = original_pixmap.size()
-            new_width = int(original_size.width() * (self.current_zoom / self.PDF_RENDER_ZOOM))
-            new_height = int(original_size.height() * (self.current_zoom / self.PDF_RENDER_ZOOM))
-            new_width = max(1, new_width)
-            new_height = max(1, new_height)
-            label.setFixedSize(new_width, new_height)
-            label.setPixmap(original_pixmap)
+            page_width, page_height = self.pdf_page_sizes[i]
+            new_width = max(1, int(page_width * self.current_zoom))
+            new_height = max(1, int(page_height * self.current_zoom))
+            label.set_zoom(self.current_zoom) # Seules les tuiles visibles seront rendues
             
             if i == anchor_page_index:
                  new_anchor_page_top_y = cumulative_height
@@ -614,13 +644,15 @@ class MediaViewer(QWidget):
             max_scroll_h = scrollbar_h.maximum()
             final_scroll_x = max(0, min(int(target_scroll_x), max_scroll_h))
             scrollbar_h.setValue(final_scroll_x)
+            # Précharger les tuiles autour de la nouvelle position
+            self._schedule_prefetch()
             
         QTimer.singleShot(10, adjust_scrollbars) # Utiliser un seul timer
         # --------------------------------------------------------------------------
     
     # --- Modifiée pour accepter new_zoom --- 
     def _apply_image_zoom(self, new_zoom, anchor_scroll=True):
-        if not self.image_display_label or not self.original_image_pixmap:
+        if not self.image_display_widget or not self.image_tile_source:
              return
              
         # --- Début du bloc Try/Except principal --- 
@@ -635,7 +667,7 @@ class MediaViewer(QWidget):
             current_scroll_x = scrollbar_h.value()
             viewport_width = viewport.width()
             viewport_center_x = current_scroll_x + viewport_width / 2
-            old_content_width = self.image_display_label.width()
+            old_content_width = self.image_display_widget.width()
             anchor_x_ratio = 0.5
             if old_content_width > 0:
                  anchor_x_ratio = viewport_center_x / old_content_width
@@ -645,20 +677,19 @@ class MediaViewer(QWidget):
             current_scroll_y = scrollbar_v.value()
             viewport_height = viewport.height()
             viewport_center_y = current_scroll_y + viewport_height / 2
-            old_content_height = self.image_display_label.height()
+            old_content_height = self.image_display_widget.height()
             anchor_y_ratio = 0.5
             if old_content_height > 0:
                 anchor_y_ratio = viewport_center_y / old_content_height
             # -----------------------------------
                  
-            original_size = self.original_image_pixmap.size()
+            original_size = self.image_tile_source.size()
             new_width = int(original_size.width() * self.current_zoom)
             new_height = int(original_size.height() * self.current_zoom)
             if new_width <= 0 or new_height <= 0: return
             
-            # --- Redimensionner le QLabel --- 
-            self.image_display_label.setFixedSize(new_width, new_height)
-            self.image_display_label.setPixmap(self.original_image_pixmap) 
+            # --- Redimensionner le widget (tuiles visibles demandées au dessin) --- 
+            self.image_display_widget.set_zoom(self.current_zoom)
             # ------------------------------
             
             # --- Mettre à jour la taille du widget conteneur --- 
@@ -843,7 +874,9 @@ class MediaViewer(QWidget):
 
     # --- Gestion de la fermeture (accept/reject deviennent close) --- 
     def closeEvent(self, event):
-        # La logique de fermeture du doc PDF reste valide
+        # La logique de fermeture du doc PDF reste valide (après les rendus de tuiles en cours)
+        self._prefetch_timer.stop()
+        self.tile_cache.clear()
         if self.pdf_doc:
              try: self.pdf_doc.close()
              except: pass
@@ -855,6 +888,7 @@ class MediaViewer(QWidget):
         """Redémarre le timer à chaque changement de scroll."""
         if self.is_pdf: # Mettre à jour seulement si PDF
             self._scroll_update_timer.start()
+            self._schedule_prefetch()
     # --------------------------------------------------------------
 
     # --- Slot Go To Page modifié --- 
@@ -929,6 +963,9 @@ class MediaViewer(QWidget):
                     self.scroll_area.viewport().setCursor(Qt.OpenHandCursor)
                     return True # Événement géré
                 
+            # --- Redimensionnement: d'autres pages PDF peuvent devenir visibles --- 
+            elif event.type() == QEvent.Resize:
+                self._schedule_prefetch()
             # --- Ctrl + Wheel Zoom --- 
             elif event.type() == QEvent.Wheel:
                 if event.modifiers() & Qt.ControlModifier:
@@ -963,16 +1000,15 @@ class MediaViewer(QWidget):
         new_zoom = self.current_zoom # Défaut si calcul échoue
         
         try:
-            if self.is_image and self.original_image_pixmap:
-                original_width = self.original_image_pixmap.width()
+            if self.is_image and self.image_tile_source:
+                original_width = self.image_tile_source.width()
                 if original_width > 0:
                      new_zoom = available_width / original_width
                 
-            elif self.is_pdf and self.original_pdf_pixmaps:
+            elif self.is_pdf and self.pdf_page_sizes:
                 max_original_pdf_width = 0
-                for pixmap in self.original_pdf_pixmaps:
-                     # Calculer la largeur originale "théorique" (à zoom 1.0)
-                     original_page_width = pixmap.width() / self.PDF_RENDER_ZOOM
+                for original_page_width, _height in self.pdf_page_sizes:
+                     # Largeur de la page à zoom 1.0
                      if original_page_width > max_original_pdf_width:
                           max_original_pdf_width = original_page_width
                           
@@ -1014,16 +1050,15 @@ class MediaViewer(QWidget):
         new_zoom = self.current_zoom
         
         try:
-            if self.is_image and self.original_image_pixmap:
-                original_height = self.original_image_pixmap.height()
+            if self.is_image and self.image_tile_source:
+                original_height = self.image_tile_source.height()
                 if original_height > 0:
                     new_zoom = available_height / original_height
             
-            elif self.is_pdf and self.original_pdf_pixmaps:
+            elif self.is_pdf and self.pdf_page_sizes:
                 # Basé sur la première page
-                if len(self.original_pdf_pixmaps) > 0:
-                    first_page_pixmap = self.original_pdf_pixmaps[0]
-                    original_page_height = first_page_pixmap.height() / self.PDF_RENDER_ZOOM
+                if len(self.pdf_page_sizes) > 0:
+                    original_page_height = self.pdf_page_sizes[0][1]
                     if original_page_height > 0:
                         new_zoom = available_height / original_page_height
             
@@ -1068,12 +1103,11 @@ class MediaViewer(QWidget):
         try:
             # --- Calcul zoom pour largeur --- 
             content_width = 0
-            if self.is_image and self.original_image_pixmap:
-                content_width = self.original_image_pixmap.width()
-            elif self.is_pdf and self.original_pdf_pixmaps:
+            if self.is_image and self.image_tile_source:
+                content_width = self.image_tile_source.width()
+            elif self.is_pdf and self.pdf_page_sizes:
                 max_w = 0
-                for pixmap in self.original_pdf_pixmaps:
-                    w = pixmap.width() / self.PDF_RENDER_ZOOM
+                for w, _h in self.pdf_page_sizes:
                     if w > max_w: max_w = w
                 content_width = max_w
             
@@ -1081,8 +1115,8 @@ class MediaViewer(QWidget):
                 # Calcul initial sans marge
                 zoom_w_no_margin = available_width / content_width
                 # Si ce zoom nécessite une barre V, recalculer avec marge
-                estimated_height_at_zoom = (self.original_image_pixmap.height() * zoom_w_no_margin if self.is_image 
-                                            else (self.original_pdf_pixmaps[0].height() / self.PDF_RENDER_ZOOM) * zoom_w_no_margin if self.is_pdf else 0)
+                estimated_height_at_zoom = (self.image_tile_source.height() * zoom_w_no_margin if self.is_image 
+                                            else self.pdf_page_sizes[0][1] * zoom_w_no_margin if self.is_pdf else 0)
                 if estimated_height_at_zoom > available_height:
                      zoom_w = (available_width - v_margin) / content_width
                 else:
@@ -1092,17 +1126,17 @@ class MediaViewer(QWidget):
 
             # --- Calcul zoom pour hauteur --- 
             content_height = 0
-            if self.is_image and self.original_image_pixmap:
-                content_height = self.original_image_pixmap.height()
-            elif self.is_pdf and self.original_pdf_pixmaps:
-                if len(self.original_pdf_pixmaps) > 0:
-                    content_height = self.original_pdf_pixmaps[0].height() / self.PDF_RENDER_ZOOM
+            if self.is_image and self.image_tile_source:
+                content_height = self.image_tile_source.height()
+            elif self.is_pdf and self.pdf_page_sizes:
+                if len(self.pdf_page_sizes) > 0:
+                    content_height = self.pdf_page_sizes[0][1]
 
             if content_height > 0:
                 # Calcul initial sans marge
                 zoom_h_no_margin = available_height / content_height
                 # Si ce zoom nécessite une barre H, recalculer avec marge
-                estimated_width_at_zoom = (self.original_image_pixmap.width() * zoom_h_no_margin if self.is_image 
+                estimated_width_at_zoom = (self.image_tile_source.width() * zoom_h_no_margin if self.is_image 
                                            else content_width * zoom_h_no_margin if self.is_pdf else 0)
                 if estimated_width_at_zoom > available_width:
                      zoom_h = (available_height - h_margin) / content_height
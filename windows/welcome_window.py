@@ -56,6 +56,7 @@ from pages.preferences.preferences_page import PreferencesPage
 # --- AJOUT IMPORTS POUR SETTINGS --- 
 from pages.settings.settings_page import SettingsPage
 from controllers.settings.settings_controller import SettingsController
+from updater.update_checker import prompt_update
 
 # --- WelcomeWindow (Anciennement WelcomePage) --- 
 class WelcomeWindow(QWidget): # RENOMMÉ
@@ -161,6 +162,7 @@ class WelcomeWindow(QWidget): # RENOMMÉ
         app_name_label.setObjectName("SidebarAppName")
         version_label = QLabel(self.version_str)
         version_label.setObjectName("SidebarVersion")
+        self.version_label = version_label # Infobulle mise à jour par on_update_check_finished
         text_layout.addWidget(app_name_label)
         text_layout.addWidget(version_label)
         logo_section_layout.addLayout(text_layout, 0)
@@ -437,6 +439,23 @@ class WelcomeWindow(QWidget): # RENOMMÉ
             logger.error(f"ERROR: No target page defined for section_name '{section_name}'.")
             return False
 
+    @Slot(str, dict)
+    def on_update_check_finished(self, status, update_info):
+        """Reçoit le résultat de la vérification des MàJ faite en arrière-plan au démarrage."""
+        logger.debug(f"WelcomeWindow: update check finished: {status}")
+        if hasattr(self, 'version_label'):
+            self.version_label.setToolTip(status)
+        if not update_info.get("available"):
+            return
+        if not self.isVisible():
+            # La fenêtre d'accueil a été quittée entre-temps: la MàJ reste disponible dans les Paramètres
+            logger.info(f"Mise à jour {update_info.get('version')} disponible (fenêtre d'accueil fermée, pas de proposition).")
+            return
+        if prompt_update(update_info["version"]):
+            self.controller.start_update_from_welcome(update_info)
+        else:
+            logger.info("Startup update declined by user.")
+
     # --- AJOUT : Méthode pour récupérer le SettingsController ---
     def get_settings_controller(self):
         """Retourne l'instance du SettingsController."""